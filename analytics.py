@@ -0,0 +1,200 @@
+from collections import namedtuple
+
+import numpy as np
+
+
+FabricMetrics = namedtuple("FabricMetrics", ["fabric_id", "fabric_name", "units_sold", "revenue", "cogs", "profit",
+                                             "margin_pct", "units_purchased", "purchase_value", "stock",
+                                             "sell_through", "turnover"])
+
+PeriodMetrics = namedtuple("PeriodMetrics", ["period", "units_sold", "revenue", "cogs", "profit", "margin_pct",
+                                             "units_purchased", "purchase_value"])
+
+# Time series frequencies understood by Analytics.time_series
+FREQUENCIES = ("day", "week", "month")
+
+# Days since 1970-01-01 of a 'YYYY-MM-DD' day
+EPOCH_DAY_SQL = "CAST(julianday({0}) - 2440587.5 AS INTEGER)"
+
+TRANSACTION_DTYPE = np.dtype([("fabric_id", np.int64), ("quantity", np.float64), ("value", np.float64),
+                              ("cost", np.float64), ("day", np.int64)])
+
+
+class RangeData:
+    """
+    Sales and purchases between two dates as NumPy column arrays.
+
+    Each of sales and purchases is a structured array with fabric_id,
+    quantity, value (quantity * price), cost (cost of goods, 0 for purchases)
+    and day (days since 1970-01-01) fields,
+    holding at most one row per fabric per day for days wholly inside the range.
+    The fabric_ids, fabric_names and stock arrays hold the master data of every
+    fabric, sorted by fabric_id.
+    """
+
+    def __init__(self, start_date, end_date, sales, purchases, fabric_ids, fabric_names, stock):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.sales = sales
+        self.purchases = purchases
+        self.fabric_ids = fabric_ids
+        self.fabric_names = fabric_names
+        self.stock = stock
+
+    def fabric_index(self, fabric_id):
+        """Map fabric ids to positions in the fabric_* arrays."""
+        return np.searchsorted(self.fabric_ids, fabric_id)
+
+
+class Analytics:
+    """
+    Vectorized profit/loss, margin and inventory analytics.
+
+    A date range is loaded with one bulk fetch per table into NumPy arrays
+    (see load_range), read from the daily rollups where possible; every metric is then a grouped sum over those arrays,
+    so several reports over the same range cost a single pass over the
+    database.
+    """
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+
+    def _fetch_transactions(self, cursor, kind, start_date, end_date):
+        # Whole days come pre-summed from the daily rollups, so there is one row per
+        # fabric per day rather than one per transaction. The fabrics filter drops
+        # rows whose fabric no longer exists, as get_sales_data does.
+        range_rows, params = self.db_manager._range_rows_sql(kind, start_date, end_date, with_day=True)
+        cursor.execute(f"""SELECT fabric_id, quantity, value, cost, {EPOCH_DAY_SQL.format("day")}
+                           FROM ({range_rows})
+                           WHERE fabric_id IN (SELECT fabric_id FROM fabrics)""", params)
+        return np.fromiter(cursor, dtype=TRANSACTION_DTYPE)
+
+    def load_range(self, start_date, end_date):
+        """
+        Load the sales, purchases and fabric data needed for analytics.
+
+        Parameters:
+        - start_date (str): Start date in 'YYYY-MM-DD' format.
+        - end_date (str): End date in 'YYYY-MM-DD' format.
+
+        Returns:
+        - data (RangeData)
+        """
+        # One snapshot, so the sales, purchases and stock levels agree with each other
+        with self.db_manager.connections.snapshot() as cursor:
+            sales = self._fetch_transactions(cursor, "sales", start_date, end_date)
+            purchases = self._fetch_transactions(cursor, "purchases", start_date, end_date)
+            cursor.execute("SELECT fabric_id, fabric_name, stock FROM fabrics ORDER BY fabric_id")
+            fabrics = cursor.fetchall()
+        fabric_ids = np.array([row[0] for row in fabrics], dtype=np.int64)
+        fabric_names = np.array([row[1] for row in fabrics], dtype=object)
+        stock = np.array([row[2] for row in fabrics], dtype=np.float64)
+        return RangeData(start_date, end_date, sales, purchases, fabric_ids, fabric_names, stock)
+
+    @staticmethod
+    def _ratio(numerator, denominator, scale=1.0):
+        """numerator / denominator * scale, with NaN where the denominator is zero."""
+        result = np.full(np.shape(numerator), np.nan)
+        np.divide(numerator * scale, denominator, out=result, where=denominator != 0)
+        return result
+
+    def fabric_metrics(self, data, fabric_id=None):
+        """
+        Compute per-fabric revenue, cost of goods sold, margin and inventory ratios.
+
+        COGS is the cost of goods stored with each sale (see LotEngine), as in
+        the profit/loss summary. Sell-through is units sold / (units sold +
+        units in stock now); turnover is units sold per unit in stock now.
+
+        Parameters:
+        - data (RangeData): Loaded with load_range.
+        - fabric_id (int, optional): Only report this fabric.
+
+        Returns:
+        - rows (list): FabricMetrics for every fabric sold or purchased in the
+          range, ordered by fabric_id.
+        """
+        count = len(data.fabric_ids)
+        sold_index = data.fabric_index(data.sales["fabric_id"])
+        bought_index = data.fabric_index(data.purchases["fabric_id"])
+        units_sold = np.bincount(sold_index, weights=data.sales["quantity"], minlength=count)
+        revenue = np.bincount(sold_index, weights=data.sales["value"], minlength=count)
+        units_purchased = np.bincount(bought_index, weights=data.purchases["quantity"], minlength=count)
+        purchase_value = np.bincount(bought_index, weights=data.purchases["value"], minlength=count)
+        cogs = np.bincount(sold_index, weights=data.sales["cost"], minlength=count)
+        profit = revenue - cogs
+        margin_pct = self._ratio(profit, revenue, 100.0)
+        sell_through = self._ratio(units_sold, units_sold + data.stock)
+        turnover = self._ratio(units_sold, data.stock)
+
+        active = np.bincount(sold_index, minlength=count) + np.bincount(bought_index, minlength=count) > 0
+        if fabric_id is not None:
+            active &= data.fabric_ids == fabric_id
+        columns = (data.fabric_ids, data.fabric_names, units_sold, revenue, cogs, profit, margin_pct,
+                   units_purchased, purchase_value, data.stock, sell_through, turnover)
+        return [FabricMetrics(*row) for row in zip(*(column[active].tolist() for column in columns))]
+
+    @staticmethod
+    def period_start(days, freq):
+        """Map days since 1970-01-01 to the first day of their day, week (Monday) or month."""
+        if freq == "day":
+            return days
+        if freq == "week":
+            # 1970-01-01 was a Thursday
+            return days - (days + 3) % 7
+        if freq == "month":
+            return days.astype("datetime64[D]").astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+        raise ValueError(f"Unknown frequency: {freq}")
+
+    def time_series(self, data, freq="day", fabric_id=None):
+        """
+        Compute sales and purchase totals per day, week or month.
+
+        Parameters:
+        - data (RangeData): Loaded with load_range.
+        - freq (str): "day", "week" (weeks start on Monday) or "month".
+        - fabric_id (int, optional): Only report this fabric.
+
+        Returns:
+        - rows (list): PeriodMetrics ordered by period; period is the first day
+          of the period as a 'YYYY-MM-DD' string. Periods without sales or
+          purchases are left out.
+        """
+        sales, purchases = data.sales, data.purchases
+        if fabric_id is not None:
+            sales = sales[sales["fabric_id"] == fabric_id]
+            purchases = purchases[purchases["fabric_id"] == fabric_id]
+        sale_periods = self.period_start(sales["day"], freq)
+        purchase_periods = self.period_start(purchases["day"], freq)
+        all_periods = np.concatenate([sale_periods, purchase_periods])
+        # Periods are day numbers in a short span, so they index bincount directly
+        first = all_periods.min() if len(all_periods) else 0
+        count = int(all_periods.max() - first + 1) if len(all_periods) else 0
+        sold_index, bought_index = sale_periods - first, purchase_periods - first
+
+        units_sold = np.bincount(sold_index, weights=sales["quantity"], minlength=count)
+        revenue = np.bincount(sold_index, weights=sales["value"], minlength=count)
+        cogs = np.bincount(sold_index, weights=sales["cost"], minlength=count)
+        units_purchased = np.bincount(bought_index, weights=purchases["quantity"], minlength=count)
+        purchase_value = np.bincount(bought_index, weights=purchases["value"], minlength=count)
+        profit = revenue - cogs
+        margin_pct = self._ratio(profit, revenue, 100.0)
+
+        active = np.flatnonzero(np.bincount(sold_index, minlength=count) + np.bincount(bought_index, minlength=count))
+        labels = np.datetime_as_string((active + first).astype("datetime64[D]"), unit="D")
+        columns = (units_sold, revenue, cogs, profit, margin_pct, units_purchased, purchase_value)
+        return [PeriodMetrics(*row) for row in zip(labels.tolist(), *(column[active].tolist() for column in columns))]
+
+    def summary(self, start_date, end_date, fabric_id=None, freqs=FREQUENCIES):
+        """
+        Load a range once and compute the per-fabric metrics and time series.
+
+        Returns:
+        - summary (dict): "fabrics" holds the fabric_metrics rows and each
+          frequency in freqs holds its time_series rows.
+        """
+        data = self.load_range(start_date, end_date)
+        result = {"fabrics": self.fabric_metrics(data, fabric_id)}
+        for freq in freqs:
+            result[freq] = self.time_series(data, freq, fabric_id)
+        return result
@@ -0,0 +1,122 @@
+"""
+Compare three ways of computing per-fabric revenue, COGS and margin plus
+daily/weekly/monthly totals for a date range:
+
+- sql:     the current path, a GROUP BY query per report (get_total_profit_loss,
+           then one more per time series) with margins in a Python loop
+- rowwise: fetch the raw rows and accumulate them in Python dicts
+- numpy:   Analytics.summary, one bulk fetch and vectorized group-bys
+
+Usage: python benchmarks/bench_analytics.py [sales]
+"""
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import Analytics
+from db_manager import DBManager
+
+PERIOD_SQL = {
+    "day": "substr(sale_date, 1, 10)",
+    "week": "date(sale_date, '-' || ((CAST(strftime('%w', sale_date) AS INTEGER) + 6) % 7) || ' days')",
+    "month": "substr(sale_date, 1, 7) || '-01'",
+}
+
+
+def sql_summary(db, start_date, end_date):
+    result = {"fabrics": []}
+    for row in db.get_total_profit_loss(start_date, end_date)[:-1]:
+        margin = row.profit / row.revenue * 100 if row.revenue else float("nan")
+        result["fabrics"].append((row.fabric_id, row.units_sold, row.revenue, row.cost, row.profit, margin))
+    for freq, period in PERIOD_SQL.items():
+        result[freq] = db._fetchall(f"""SELECT {period} AS period, SUM(quantity), SUM(quantity*selling_price), SUM(cogs)
+                                        FROM sales WHERE sale_date BETWEEN ? AND ? GROUP BY period ORDER BY period""",
+                                     (start_date, end_date))
+    return result
+
+
+def rowwise_summary(db, start_date, end_date):
+    fabrics = {}
+    series = {"day": {}, "week": {}, "month": {}}
+    for fabric_id, quantity, price, cogs, sale_date in db._fetchall(
+            "SELECT fabric_id, quantity, selling_price, cogs, sale_date FROM sales WHERE sale_date BETWEEN ? AND ?",
+            (start_date, end_date)):
+        value = quantity * price
+        totals = fabrics.setdefault(fabric_id, [0.0, 0.0, 0.0])
+        totals[0] += quantity
+        totals[1] += value
+        totals[2] += cogs
+        day = datetime.date.fromisoformat(sale_date[:10])
+        for freq, period in (("day", day), ("week", day - datetime.timedelta(days=day.weekday())),
+                             ("month", day.replace(day=1))):
+            totals = series[freq].setdefault(period, [0.0, 0.0, 0.0])
+            totals[0] += quantity
+            totals[1] += value
+            totals[2] += cogs
+    result = {"fabrics": [(fabric_id, units, revenue, cogs, revenue - cogs,
+                           (revenue - cogs) / revenue * 100 if revenue else float("nan"))
+                          for fabric_id, (units, revenue, cogs) in sorted(fabrics.items())]}
+    for freq, periods in series.items():
+        result[freq] = sorted((period.isoformat(), *totals) for period, totals in periods.items())
+    return result
+
+
+def close(a, b, tolerance=1e-6):
+    return abs(a - b) <= tolerance * max(1, abs(b))
+
+
+def main(sales=1000000):
+    rng = random.Random(17)
+    with tempfile.TemporaryDirectory() as directory:
+        db = DBManager(os.path.join(directory, "bench.db"))
+        with db.connections.writer() as cursor:
+            cursor.executemany("INSERT INTO fabrics (fabric_name, stock) VALUES (?, ?)",
+                               [(f"Fabric {i}", rng.randint(0, 500)) for i in range(500)])
+            cursor.executemany("INSERT INTO purchases (fabric_id, quantity, cost_price, purchase_date) VALUES (?, ?, ?, ?)",
+                               [(rng.randint(1, 500), rng.randint(10, 500), round(rng.uniform(20, 200), 2),
+                                 f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 09:00:00")
+                                for _ in range(20000)])
+            cursor.executemany("INSERT INTO sales (fabric_id, quantity, selling_price, sale_date) VALUES (?, ?, ?, ?)",
+                               [(rng.randint(1, 500), rng.randint(1, 50), round(rng.uniform(20, 400), 2),
+                                 f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} {rng.randint(8, 20):02d}:00:00")
+                                for _ in range(sales)])
+        db.replay_lots()
+        analytics = Analytics(db)
+        start_date, end_date = "2024-01-01", "2024-12-31 23:59:59"
+
+        timings = {}
+        results = {}
+        for name, run in (("sql", lambda: sql_summary(db, start_date, end_date)),
+                          ("rowwise", lambda: rowwise_summary(db, start_date, end_date)),
+                          ("numpy", lambda: analytics.summary(start_date, end_date))):
+            start = time.perf_counter()
+            results[name] = run()
+            timings[name] = time.perf_counter() - start
+
+        # The three paths must agree on revenue and COGS per fabric and per month
+        numpy_fabrics = {row.fabric_id: row for row in results["numpy"]["fabrics"]}
+        agree = all(close(numpy_fabrics[row[0]].revenue, row[2]) and close(numpy_fabrics[row[0]].cogs, row[3])
+                    for name in ("sql", "rowwise") for row in results[name]["fabrics"])
+        agree &= all(len(results[name]["month"]) == len(results["numpy"]["month"]) and
+                     all(a[0] == b.period and close(b.revenue, a[2]) and close(b.cogs, a[3])
+                         for a, b in zip(results[name]["month"], results["numpy"]["month"]))
+                     for name in ("sql", "rowwise"))
+        print(f"{sales} sales rows; results agree: {agree}")
+        for name, elapsed in timings.items():
+            print(f"{name:>8}: {elapsed * 1000:8.1f} ms")
+        data = analytics.load_range(start_date, end_date)
+        start = time.perf_counter()
+        analytics.fabric_metrics(data)
+        for freq in ("day", "week", "month"):
+            analytics.time_series(data, freq)
+        print(f"   numpy metrics on an already loaded range: {(time.perf_counter() - start) * 1000:.1f} ms")
+        db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,46 @@
+"""
+Compare recording sales one call at a time with a single bulk call.
+
+Usage: python benchmarks/bench_bulk_insert.py [rows]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DBManager
+
+
+def fresh_db(directory, name, rows):
+    """Create a database with one well-stocked fabric."""
+    db = DBManager(os.path.join(directory, name))
+    db.add_fabric("Benchmark Cotton", 0)
+    fabric_id = db.get_fabric_id("Benchmark Cotton")
+    db.add_purchase(fabric_id, rows * 10, 50.0)
+    return db, fabric_id
+
+
+def main(rows=10000):
+    with tempfile.TemporaryDirectory() as directory:
+        db, fabric_id = fresh_db(directory, "single.db", rows)
+        start = time.perf_counter()
+        for _ in range(rows):
+            db.add_sale(fabric_id, 1, 60.0)
+        single = time.perf_counter() - start
+        db.close()
+
+        db, fabric_id = fresh_db(directory, "bulk.db", rows)
+        start = time.perf_counter()
+        db.add_sales_bulk([(fabric_id, 1, 60.0)] * rows)
+        bulk = time.perf_counter() - start
+        db.close()
+
+    print(f"{rows} single add_sale calls: {single:.3f}s ({rows / single:.0f} rows/s)")
+    print(f"1 add_sales_bulk call:      {bulk:.3f}s ({rows / bulk:.0f} rows/s)")
+    print(f"speedup: {single / bulk:.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,132 @@
+"""
+Compare the frozen builds: fabric_management_app.spec (one file, nothing
+excluded) against fabric_management_app_lite.spec (one folder, runtime
+dependencies only, optimize=2). Reports each bundle's build time, size and
+file count, and how long it takes to launch, draw its window once and exit
+(main.py --smoke-test). The first launch after the build is reported
+separately from the median of the others, since a one-file build unpacks
+itself on every launch but the operating system caches the files after the
+first.
+
+Builds go to build/bench_bundle/ and need PyInstaller (see
+requirements-runtime.txt). Launching needs a display. Each launch runs in a
+scratch directory holding a copy of the database and the dropdown icon, as
+the frozen app looks for both in its working directory.
+
+Usage: python benchmarks/bench_bundle.py [--profiles old,lite] [--runs N] [--skip-build] [--db PATH]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUTPUT = os.path.join(ROOT, "build", "bench_bundle")
+PROFILES = {"old": "fabric_management_app.spec", "lite": "fabric_management_app_lite.spec"}
+EXE_NAME = "fabric_management_app" + (".exe" if sys.platform == "win32" else "")
+
+
+def build(profile):
+    """Run PyInstaller on the profile's spec; returns the build time in seconds, or None if it failed."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-m", "PyInstaller", "--noconfirm",
+                             "--distpath", os.path.join(OUTPUT, profile, "dist"),
+                             "--workpath", os.path.join(OUTPUT, profile, "work"),
+                             os.path.join(ROOT, PROFILES[profile])],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode:
+        print(f"{profile}: build failed")
+        print("\n".join(result.stderr.strip().splitlines()[-5:]))
+        return None
+    return time.perf_counter() - start
+
+
+def executable(profile):
+    """Path of the built program: the file itself for a one-file build, inside its folder for a one-dir build."""
+    dist = os.path.join(OUTPUT, profile, "dist")
+    for path in (os.path.join(dist, EXE_NAME), os.path.join(dist, "fabric_management_app", EXE_NAME)):
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def bundle_size(path):
+    """(bytes, files) of a one-file program, or of the folder holding a one-dir program."""
+    folder = os.path.dirname(path)
+    if os.path.basename(folder) != "fabric_management_app":
+        return os.path.getsize(path), 1
+    total = files = 0
+    for directory, _, names in os.walk(folder):
+        for name in names:
+            file_path = os.path.join(directory, name)
+            # Shared libraries are symlinked under their other names
+            if not os.path.islink(file_path):
+                total += os.path.getsize(file_path)
+                files += 1
+    return total, files
+
+
+def launch(path, workdir):
+    """Seconds from starting the program until it has drawn its window and exited, or None if it failed."""
+    start = time.perf_counter()
+    result = subprocess.run([path, "--smoke-test"], cwd=workdir, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode:
+        print("\n".join(result.stderr.strip().splitlines()[-3:]) or f"exit status {result.returncode}")
+        return None
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Frozen build size and launch time")
+    parser.add_argument("--profiles", default="old,lite", help="comma-separated: old, lite")
+    parser.add_argument("--runs", type=int, default=5, help="launches per profile")
+    parser.add_argument("--skip-build", action="store_true", help="measure the bundles already in build/bench_bundle")
+    parser.add_argument("--db", default=os.path.join(ROOT, "fabric_management.db"),
+                        help="database the launches open (a copy is used)")
+    args = parser.parse_args(argv)
+
+    if not args.skip_build:
+        try:
+            import PyInstaller  # noqa: F401
+        except ImportError:
+            print("PyInstaller is not installed: pip install -r requirements-runtime.txt")
+            return 1
+
+    status = 0
+    for profile in args.profiles.split(","):
+        build_time = None if args.skip_build else build(profile)
+        path = executable(profile)
+        if path is None:
+            print(f"{profile}: no build found")
+            status = 1
+            continue
+        size, files = bundle_size(path)
+        line = f"{profile:5} {size / 2**20:8.1f} MiB in {files} files"
+        if build_time is not None:
+            line += f", built in {build_time:.0f} s"
+
+        with tempfile.TemporaryDirectory() as workdir:
+            shutil.copy(os.path.join(ROOT, "dropdown_arrow.png"), workdir)
+            shutil.copy(args.db, os.path.join(workdir, "fabric_management.db"))
+            times = []
+            for _ in range(args.runs):
+                elapsed = launch(path, workdir)
+                if elapsed is None:
+                    break
+                times.append(elapsed)
+        if len(times) < args.runs:
+            print(f"{line}; launch failed (no display?)")
+            status = 1
+            continue
+        rest = f", then median {statistics.median(times[1:]):.2f} s" if len(times) > 1 else ""
+        print(f"{line}; first launch {times[0]:.2f} s{rest}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
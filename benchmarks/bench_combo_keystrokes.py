@@ -0,0 +1,58 @@
+"""
+Measure per-keystroke latency of SearchableComboBox without a display.
+
+The Tk widgets are replaced by the fakes in tests/fake_tk.py, which record the
+calls made on them and drive the after() timer by hand, so the numbers are the
+Python-side cost of filtering plus the number of Listbox calls each keystroke
+causes. tests/test_search_combo.py checks the same behaviour.
+
+Usage: python benchmarks/bench_combo_keystrokes.py [names]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import search_algo
+from db_manager import DBManager
+from tests.fake_tk import install_fakes, type_text
+
+WORDS = ["Cotton", "Silk", "Rayon", "Linen", "Printed", "Voile", "Cambric", "Satin", "Georgette",
+         "Chiffon", "Denim", "Khadi", "Organza", "Crepe", "Twill", "Poplin", "Muslin", "Lawn"]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main(count=100000):
+    install_fakes()
+    rng = random.Random(11)
+    with tempfile.TemporaryDirectory() as directory:
+        db = DBManager(os.path.join(directory, "bench.db"))
+        with db.connections.writer() as cursor:
+            cursor.executemany("INSERT INTO fabrics (fabric_name, stock) VALUES (?, 0)",
+                               [(f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}",) for i in range(count)])
+        db.catalog.load()
+
+        queries = ["cotton sil", "printed voile", "satin 12", "42", "organza crepe"]
+        print(f"{count} fabric names; latency per keystroke in ms")
+        for mode in ("prefix", "substring", "fuzzy"):
+            combo = search_algo.SearchableComboBox(None, db, 0, 0, mode=mode)
+            for label, pause in (("every key", 1), ("fast typist", None)):
+                latencies, calls = [], 0
+                for query in queries:
+                    lat, listbox_calls = type_text(combo, query, pause)
+                    latencies += lat
+                    calls += listbox_calls
+                print(f"{mode:>9} {label:>11}: p50 {percentile(latencies, .5) * 1000:7.3f}  "
+                      f"p99 {percentile(latencies, .99) * 1000:7.3f}  listbox calls {calls}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,68 @@
+"""
+Compare the old sales CSV export (load the whole result into the table buffer,
+then copy it into a list for export_to_csv) with the streaming export that
+reads fetchmany-sized chunks straight from the database.
+
+Peak memory is measured with tracemalloc on a second run, so it covers Python
+allocations only.
+
+Usage: python benchmarks/bench_export.py [sales]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DBManager
+from reports import Reports
+
+
+def legacy_export(db, reports, start_date, end_date):
+    """The old data path: fetchall, build the table rows and buffer, then scrape it into a list."""
+    rows = [(sale_date, fabric, quantity, price, revenue, "Edit")
+            for _, sale_date, fabric, quantity, price, revenue in db.get_sales_data(start_date, end_date)]
+    table = tuple(zip(*rows))  # VirtualTable keeps rows column-oriented
+    report_data = [values[:-1] for values in zip(*table)]
+    return reports.export_to_csv(report_data, Reports.SALES_COLUMNS, "legacy_sales")
+
+
+def measure(run):
+    """Time one run, then repeat it under tracemalloc (which slows it down) for the peak."""
+    start = time.perf_counter()
+    file_path = run()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, os.path.getsize(file_path)
+
+
+def main(sales=1000000):
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as directory:
+        db = DBManager(os.path.join(directory, "bench.db"))
+        with db.connections.writer() as cursor:
+            cursor.executemany("INSERT INTO fabrics (fabric_name, stock) VALUES (?, 0)",
+                               [(f"Fabric {i}",) for i in range(500)])
+            cursor.executemany("INSERT INTO sales (fabric_id, quantity, selling_price, sale_date) VALUES (?, ?, ?, ?)",
+                               [(rng.randint(1, 500), rng.randint(1, 50), round(rng.uniform(20, 400), 2),
+                                 f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 10:00:00")
+                                for _ in range(sales)])
+        reports = Reports(None, db, output_dir=os.path.join(directory, "reports"))
+
+        print(f"{sales} sales rows")
+        for name, run in (("legacy", lambda: legacy_export(db, reports, "2024-01-01", "2024-12-31")),
+                          ("streaming", lambda: reports.generate_sales_report("2024-01-01", "2024-12-31"))):
+            elapsed, peak, size = measure(run)
+            print(f"{name:>10}: {elapsed:6.2f} s, peak Python memory {peak / 2**20:7.1f} MiB, "
+                  f"file {size / 2**20:.1f} MiB")
+        db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
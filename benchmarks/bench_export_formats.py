@@ -0,0 +1,85 @@
+"""
+Compare file size and write/read time of the report export formats on a
+sales history.
+
+Reads load the whole file into typed columns: csv.reader plus float/date
+parsing for the CSV formats, pyarrow for Arrow IPC and Parquet.
+
+Usage: python benchmarks/bench_export_formats.py [sales]
+"""
+import csv
+import datetime
+import gzip
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import exporters
+from db_manager import DBManager
+from reports import Reports
+
+
+def read_csv(file_path):
+    if file_path.endswith(".gz"):
+        file = gzip.open(file_path, "rt", newline="")
+    elif file_path.endswith(".zst"):
+        raw = exporters.zstandard.ZstdDecompressor().stream_reader(open(file_path, "rb"), closefd=True)
+        file = io.TextIOWrapper(raw, newline="")
+    else:
+        file = open(file_path, newline="")
+    with file:
+        reader = csv.reader(file)
+        next(reader)
+        return [(datetime.datetime.strptime(date, "%Y-%m-%d %H:%M:%S"), fabric, float(quantity), float(price),
+                 float(revenue)) for date, fabric, quantity, price, revenue in reader]
+
+
+def read_arrow(file_path):
+    if file_path.endswith(".parquet"):
+        return exporters.pa.parquet.read_table(file_path)
+    with exporters.pa.memory_map(file_path) as source:
+        return exporters.pa.ipc.open_file(source).read_all()
+
+
+def main(sales=1000000):
+    rng = random.Random(5)
+    formats = ["csv", "csv.gz"]
+    if exporters.load_zstandard() is not None:
+        formats.append("csv.zst")
+    if exporters.load_pyarrow() is not None:
+        formats += ["arrow", "parquet"]
+    else:
+        print("pyarrow is not installed; skipping arrow and parquet")
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = DBManager(os.path.join(directory, "bench.db"))
+        with db.connections.writer() as cursor:
+            cursor.executemany("INSERT INTO fabrics (fabric_name, stock) VALUES (?, 0)",
+                               [(f"Fabric {i}",) for i in range(500)])
+            cursor.executemany("INSERT INTO sales (fabric_id, quantity, selling_price, sale_date) VALUES (?, ?, ?, ?)",
+                               [(rng.randint(1, 500), rng.randint(1, 50), round(rng.uniform(20, 400), 2),
+                                 f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} "
+                                 f"{rng.randint(8, 20):02d}:{rng.randint(0, 59):02d}:00")
+                                for _ in range(sales)])
+        reports = Reports(None, db, output_dir=os.path.join(directory, "reports"))
+
+        print(f"{sales} sales rows")
+        print(f"{'format':>8} {'size MiB':>9} {'write s':>8} {'read s':>7}")
+        for fmt in formats:
+            start = time.perf_counter()
+            file_path = reports.generate_sales_report("2024-01-01", "2024-12-31", fmt=fmt)
+            write = time.perf_counter() - start
+            start = time.perf_counter()
+            read_arrow(file_path) if fmt in ("arrow", "parquet") else read_csv(file_path)
+            read = time.perf_counter() - start
+            print(f"{fmt:>8} {os.path.getsize(file_path) / 2**20:9.1f} {write:8.2f} {read:7.2f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,120 @@
+"""
+Measure the bulk importer: rows per second for a file of fabrics, one of
+purchases and one of sales, each imported into a fresh database, compared with
+recording a sample of the same sales one get_fabric_id + add_sale call at a
+time, the way they would be typed in.
+
+The files are CSV in the layout Reports exports. One row in a hundred of each
+transaction file is deliberately bad (unknown fabric, bad quantity or date) to
+include the cost of the error report.
+
+Usage: python benchmarks/bench_import.py [--fabrics N] [--rows N] [--chunk N] [--sample N] [--excel]
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DBManager
+from importer import Importer
+
+BAD_ROWS = (("Unknown Fabric", "1", "2024-01-01"), (None, "-3", "2024-01-01"), (None, "1", "someday"))
+
+
+def write_files(directory, fabrics, rows, seed=1):
+    """Write fabrics.csv, purchases.csv and sales.csv; returns their paths."""
+    rng = random.Random(seed)
+    names = [f"Import Fabric {i:06d}" for i in range(fabrics)]
+    paths = {kind: os.path.join(directory, f"{kind}.csv") for kind in ("fabrics", "purchases", "sales")}
+    with open(paths["fabrics"], "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["Fabric", "Stock"])
+        writer.writerows((name, 0) for name in names)
+    for kind, price_column, quantity in (("purchases", "Cost price", 50), ("sales", "Selling price", 1)):
+        with open(paths[kind], "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["Id", "Date", "Fabric", "Quantity", price_column])
+            for i in range(rows):
+                name, units, day = rng.choice(names), str(quantity), f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+                if i % 100 == 99:
+                    bad_name, units, day = BAD_ROWS[i // 100 % len(BAD_ROWS)]
+                    name = bad_name or name
+                writer.writerow([i + 1, day, name, units, f"{rng.uniform(20, 200):.2f}"])
+    return paths
+
+
+def to_excel(path):
+    """Save a CSV file as .xlsx; returns the new path."""
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    with open(path, newline="") as file:
+        for row in csv.reader(file):
+            sheet.append(row)
+    excel_path = os.path.splitext(path)[0] + ".xlsx"
+    workbook.save(excel_path)
+    return excel_path
+
+
+def single_rows(db, path, sample):
+    """Record the first sample sales of a file one call at a time; returns (rows, seconds)."""
+    with open(path, newline="") as file:
+        reader = csv.reader(file)
+        next(reader)
+        rows = [row for _, row in zip(range(sample), reader)]
+    start = time.perf_counter()
+    recorded = 0
+    for _, day, name, quantity, price in rows:
+        fabric_id = db.get_fabric_id(name)
+        try:
+            db.add_sale(fabric_id, float(quantity), float(price))
+            recorded += 1
+        except (TypeError, ValueError):
+            pass
+    return len(rows), time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import benchmark")
+    parser.add_argument("--fabrics", type=int, default=20000)
+    parser.add_argument("--rows", type=int, default=200000, help="rows in each of the purchase and sale files")
+    parser.add_argument("--chunk", type=int, default=Importer.CHUNK_ROWS, help="rows per transaction")
+    parser.add_argument("--sample", type=int, default=2000, help="sales recorded one at a time for comparison")
+    parser.add_argument("--excel", action="store_true", help="import .xlsx files instead of CSV (needs openpyxl)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_files(directory, args.fabrics, args.rows)
+        if args.excel:
+            paths = {kind: to_excel(path) for kind, path in paths.items()}
+        db = DBManager(os.path.join(directory, "import.db"))
+        importer = Importer(db, args.chunk)
+        for kind in ("fabrics", "purchases", "sales"):
+            result = importer.import_file(kind, paths[kind])
+            print(f"{kind:9} {result['read']:8} rows in {result['seconds']:6.2f} s "
+                  f"({result['read'] / result['seconds']:9,.0f} rows/s), {result['rejected']} rejected")
+        problems = db.check_stock() or db.check_lots()
+        db.close()
+
+        # Same fabrics and stock, then the sales typed in one at a time
+        db = DBManager(os.path.join(directory, "single.db"))
+        importer = Importer(db, args.chunk)
+        importer.import_file("fabrics", paths["fabrics"])
+        importer.import_file("purchases", paths["purchases"])
+        rows, seconds = single_rows(db, os.path.join(directory, "sales.csv"), args.sample)
+        db.close()
+    print(f"{'one by one':9} {rows:8} rows in {seconds:6.2f} s ({rows / seconds:9,.0f} rows/s)")
+    if problems:
+        print(f"{len(problems)} stock or lot problems after importing")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
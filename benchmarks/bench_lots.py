@@ -0,0 +1,72 @@
+"""
+Time lot-based costing: adding a sale, editing a sale or purchase part way
+through a fabric's history (which replays that fabric from the edit date),
+and re-costing everything with replay_lots. Checks that the incremental
+results match a full replay.
+
+Usage: python benchmarks/bench_lots.py [sales]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DBManager
+
+
+def random_date(rng):
+    return f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:00:00"
+
+
+def timed(run, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        run()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(sales=200000, fabrics=200):
+    rng = random.Random(23)
+    with tempfile.TemporaryDirectory() as directory:
+        db = DBManager(os.path.join(directory, "bench.db"))
+        with db.connections.writer() as cursor:
+            cursor.executemany("INSERT INTO fabrics (fabric_name, stock) VALUES (?, 0)",
+                               [(f"Fabric {i}",) for i in range(fabrics)])
+        start = time.perf_counter()
+        db.add_purchases_bulk([(rng.randint(1, fabrics), rng.randint(100, 1000), round(rng.uniform(20, 200), 2),
+                                random_date(rng)) for _ in range(sales // 10)])
+        stock = dict(db._fetchall("SELECT fabric_id, stock FROM fabrics"))
+        rows = []
+        for _ in range(sales):
+            fabric_id = rng.randint(1, fabrics)
+            quantity = min(rng.randint(1, 20), stock[fabric_id])
+            if quantity > 0:
+                stock[fabric_id] -= quantity
+                rows.append((fabric_id, quantity, round(rng.uniform(20, 400), 2), random_date(rng)))
+        db.add_sales_bulk(rows)
+        print(f"{len(rows)} sales, {sales // 10} purchases, {fabrics} fabrics; "
+              f"bulk load and costing {time.perf_counter() - start:.1f} s")
+
+        sale_ids = [row[0] for row in db._fetchall("SELECT sale_id FROM sales")]
+        purchase_ids = [row[0] for row in db._fetchall("SELECT purchase_id FROM purchases")]
+        print(f"add_sale (dated now):        {timed(lambda: db.add_sale(rng.randint(1, fabrics), 0.5, 100), 50):8.1f} ms")
+        print(f"update_sale_data (backdated): "
+              f"{timed(lambda: db.update_sale_data(rng.choice(sale_ids), 1, 100, random_date(rng)), 50):7.1f} ms")
+        print(f"update_purchase_data:        "
+              f"{timed(lambda: db.update_purchase_data(rng.choice(purchase_ids), 1000, rng.uniform(20, 200), random_date(rng)), 50):8.1f} ms")
+
+        incremental = db._fetchall("SELECT sale_id, cogs FROM sales ORDER BY sale_id")
+        print(f"replay_lots (everything):    {timed(db.replay_lots, 1):8.1f} ms")
+        full = db._fetchall("SELECT sale_id, cogs FROM sales ORDER BY sale_id")
+        mismatches = sum(abs(a[1] - b[1]) > 1e-6 * max(1, abs(b[1])) for a, b in zip(incremental, full))
+        print(f"incremental vs full replay: {mismatches} sales differ; check_lots: {len(db.check_lots())} problems")
+
+        print(f"profit/loss for 2024:        {timed(lambda: db.get_total_profit_loss('2024-01-01', '2024-12-31'), 5):8.1f} ms")
+        db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
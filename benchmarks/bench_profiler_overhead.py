@@ -0,0 +1,84 @@
+"""
+Measure what the profiler costs: the same workloads with it disabled, enabled,
+and enabled with a slow-query threshold, on a generated database.
+
+"refresh" is what the Summary, Sales and Purchase tabs read on each refresh,
+plus a purchase and a sale; "lookups" is a run of single-row queries, the
+worst case for a per-statement cost. Modes are interleaved round by round so drift in machine
+speed hits them all alike, and the median round of each is reported together
+with its overhead over the disabled run (the target is under 2% enabled).
+
+Usage: python benchmarks/bench_profiler_overhead.py [--sales N] [--fabrics N] [--rounds N] [--slow-ms MS]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DBManager
+from generate_data import generate
+
+MONTH = ("2024-11-01", "2024-11-30 23:59:59")
+
+
+def workloads(db, fabrics):
+    def refresh():
+        db.get_all_fabrics_stock()
+        db.get_total_profit_loss(*MONTH)
+        db.get_sales_data(*MONTH)
+        db.get_purchase_data(*MONTH)
+        fabric_id = 1 + refresh.calls % fabrics
+        db.add_purchase(fabric_id, 1, 60)
+        db.add_sale(fabric_id, 1, 100)
+        refresh.calls += 1
+    refresh.calls = 0
+
+    def lookups():
+        for fabric_id in range(1, 201):
+            db.get_fabric_stock_by_id(1 + fabric_id % fabrics)
+            db.get_fabric_name_by_id(1 + fabric_id % fabrics)
+
+    return {"refresh": refresh, "lookups": lookups}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profiler overhead benchmark")
+    parser.add_argument("--sales", type=int, default=100000)
+    parser.add_argument("--fabrics", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=15)
+    parser.add_argument("--slow-ms", type=float, default=20.0, help="slow-query threshold of the third mode")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = DBManager(os.path.join(directory, "bench.db"))
+        generate(db, fabrics=args.fabrics, sales=args.sales, start="2023-01-01", days=730)
+        profiler = db.profiler
+        modes = {"disabled": (False, None), "enabled": (True, None), f"slow log >= {args.slow_ms:g} ms": (True, args.slow_ms)}
+
+        for name, workload in workloads(db, args.fabrics).items():
+            times = {mode: [] for mode in modes}
+            workload()
+            for _ in range(args.rounds):
+                for mode, (enabled, slow_ms) in modes.items():
+                    profiler.enabled, profiler.slow_query_ms = enabled, slow_ms
+                    start = time.perf_counter()
+                    workload()
+                    times[mode].append(time.perf_counter() - start)
+            profiler.enabled = False
+            baseline = statistics.median(times["disabled"])
+            for mode, samples in times.items():
+                median = statistics.median(samples)
+                print(f"{name:8} {mode:22} {median * 1000:9.3f} ms  {(median / baseline - 1) * 100:+6.2f}%")
+
+        print()
+        print(profiler.format_table(limit=15))
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
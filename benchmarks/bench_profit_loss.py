@@ -0,0 +1,78 @@
+"""
+Compare the old profit/loss summary (one query plus a name lookup per fabric)
+with the single joined get_total_profit_loss query.
+
+Usage: python benchmarks/bench_profit_loss.py [fabrics]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DBManager
+
+LEGACY_PROFIT_LOSS = '''
+    WITH latest_cost AS (
+        SELECT fabric_id, total_value/total_qty AS cost_price FROM fabric_cost
+    ),
+    sales_record AS (
+        SELECT fabric_id, SUM(quantity) AS total_sales,
+        SUM(quantity*selling_price)/SUM(quantity) AS selling_price
+        FROM sales WHERE sale_date BETWEEN ? AND ? GROUP BY fabric_id
+    )
+    SELECT sales_record.fabric_id, sales_record.total_sales, latest_cost.cost_price,
+        sales_record.selling_price,
+        sales_record.total_sales * sales_record.selling_price,
+        sales_record.total_sales * latest_cost.cost_price,
+        sales_record.total_sales * sales_record.selling_price - sales_record.total_sales * latest_cost.cost_price
+    FROM latest_cost JOIN sales_record ON latest_cost.fabric_id = sales_record.fabric_id
+'''
+
+
+def count_statements(db):
+    """Count every statement run on reader connections opened from now on."""
+    counter = {"queries": 0}
+    connect = db.connections._connect
+
+    def counting_connect(read_only=False):
+        conn = connect(read_only)
+        conn.set_trace_callback(lambda sql: counter.__setitem__("queries", counter["queries"] + 1))
+        return conn
+
+    db.connections._connect = counting_connect
+    return counter
+
+
+def legacy_summary(db, start_date, end_date):
+    """The old update_summary data path: one query, then a name lookup per fabric."""
+    rows = []
+    for pf in db._fetchall(LEGACY_PROFIT_LOSS, (start_date, end_date)):
+        rows.append((pf[0], db.get_fabric_name_by_id(pf[0]), *pf[1:]))
+    return rows
+
+
+def main(fabrics=5000):
+    with tempfile.TemporaryDirectory() as directory:
+        db = DBManager(os.path.join(directory, "bench.db"), readers=1)
+        counter = count_statements(db)
+        with db.connections.writer() as cursor:
+            cursor.executemany("INSERT INTO fabrics (fabric_name, stock) VALUES (?, 0)",
+                               [(f"Fabric {i}",) for i in range(fabrics)])
+        ids = [row[0] for row in db.get_all_fabrics()]
+        db.add_purchases_bulk([(fabric_id, 100, 40.0, "2024-01-01 10:00:00") for fabric_id in ids])
+        db.add_sales_bulk([(fabric_id, 10, 55.0, "2024-02-01 10:00:00") for fabric_id in ids])
+
+        for name, run in (("legacy N+1", lambda: legacy_summary(db, "2024-01-01", "2024-12-31")),
+                          ("joined", lambda: db.get_total_profit_loss("2024-01-01", "2024-12-31"))):
+            counter["queries"] = 0
+            start = time.perf_counter()
+            rows = run()
+            elapsed = time.perf_counter() - start
+            print(f"{name:>10}: {len(rows)} rows, {counter['queries']} statements, {elapsed * 1000:.1f} ms")
+        db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,152 @@
+"""
+Benchmark RemoteRepository against a local server.py: Summary-tab reads from
+the client cache versus a round trip each, how long a write on one client
+takes to reach another through the change feed, and whether the caches match
+the server after a burst of random writes.
+
+Usage: python benchmarks/bench_remote_cache.py [--sales N] [--writes N]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.serving import make_server
+
+from db_manager import DBManager, InsufficientStock
+from remote_repository import RemoteRepository
+from server import KeepAliveRequestHandler, create_app
+
+FABRICS = 300
+
+
+def recent_date(rng, days):
+    moment = datetime.now() - timedelta(days=rng.randint(0, days), hours=rng.randint(0, 10))
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def compare(name, local_rows, remote_rows):
+    local_rows, remote_rows = sorted(map(tuple, local_rows), key=repr), sorted(map(tuple, remote_rows), key=repr)
+    if local_rows != remote_rows:
+        print(f"{name}: cache differs from the server ({len(remote_rows)} vs {len(local_rows)} rows)")
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="RemoteRepository cache benchmark")
+    parser.add_argument("--sales", type=int, default=50000, help="sales rows loaded before the test")
+    parser.add_argument("--writes", type=int, default=300, help="random writes per client")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(19)
+    with tempfile.TemporaryDirectory() as directory:
+        db = DBManager(os.path.join(directory, "bench.db"))
+        with db.connections.writer() as cursor:
+            cursor.executemany("INSERT INTO fabrics (fabric_name, stock) VALUES (?, 0)",
+                               [(f"Fabric {i}",) for i in range(FABRICS)])
+        db.add_purchases_bulk([(fabric_id, 100000, 60, recent_date(rng, 400)) for fabric_id in range(1, FABRICS + 1)])
+        db.add_sales_bulk([(rng.randint(1, FABRICS), rng.randint(1, 5), 120, recent_date(rng, 400))
+                           for _ in range(args.sales)])
+
+        server = make_server("127.0.0.1", 0, create_app(db), threaded=True, request_handler=KeepAliveRequestHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}"
+
+        start = time.perf_counter()
+        first = RemoteRepository(url)
+        print(f"initial sync of {args.sales} sales: {time.perf_counter() - start:.2f} s")
+        second = RemoteRepository(url)
+
+        # What the Summary tab reads on every refresh
+        end = datetime.now().strftime("%Y-%m-%d 23:59:59")
+        month = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+        summary = lambda repo: (repo.get_all_fabrics_stock(), repo.get_total_profit_loss(month, end),
+                                repo.get_sales_data(month, end))
+        summary(first)
+        cached = timed(lambda: summary(first), 50)
+        # The same three reads fetched from the server each time
+        uncached = timed(lambda: (first._send("GET", "/api/stock", {"limit": 1000}),
+                                  first._send("GET", "/api/reports/profit-loss", {"start": month, "end": end}),
+                                  list(first._stream("/api/sales/export", {"start": month, "end": end}, ("sale_id",)))),
+                         50)
+        print(f"summary refresh: {cached:.2f} ms from the cache, {uncached:.2f} ms with round trips")
+
+        # Write on one client, wait for the other's feed to show it
+        delays = []
+        for _ in range(20):
+            fabric_id = rng.randint(1, FABRICS)
+            before = second.get_fabric_stock_by_id(fabric_id)
+            start = time.perf_counter()
+            first.add_sale(fabric_id, 1, 120)
+            while second.get_fabric_stock_by_id(fabric_id) == before:
+                time.sleep(0.001)
+            delays.append(time.perf_counter() - start)
+        delays.sort()
+        print(f"write visible on the other client: p50 {delays[len(delays) // 2] * 1000:.1f} ms, "
+              f"max {delays[-1] * 1000:.1f} ms")
+
+        # Random writes from both clients, then compare each cache with the server
+        def writer(repo, seed):
+            writer_rng = random.Random(seed)
+            for _ in range(args.writes):
+                fabric_id = writer_rng.randint(1, FABRICS)
+                roll = writer_rng.random()
+                try:
+                    if roll < 0.6:
+                        repo.add_sale(fabric_id, writer_rng.randint(1, 5), 120)
+                    elif roll < 0.8:
+                        repo.add_purchase(fabric_id, writer_rng.randint(1, 20), 60)
+                    elif roll < 0.95:
+                        sale_id = writer_rng.randint(1, args.sales)
+                        sale = repo.get_sale_by_id(sale_id)
+                        if sale:
+                            repo.update_sale_data(sale_id, writer_rng.randint(1, 5), sale[3], recent_date(writer_rng, 200))
+                    else:
+                        repo.update_fabric_name(fabric_id, f"Fabric {fabric_id} v{writer_rng.randint(0, 10**6)}")
+                except InsufficientStock:
+                    pass
+
+        threads = [threading.Thread(target=writer, args=(repo, seed)) for seed, repo in enumerate((first, second))]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        print(f"{2 * args.writes} random writes in {time.perf_counter() - start:.2f} s")
+
+        mismatches = 0
+        horizon = first._meta("horizon")
+        for name, repo in (("first", first), ("second", second)):
+            repo.refresh()
+            mismatches += compare(f"{name} stock", db.get_all_fabrics_stock(), repo.get_all_fabrics_stock())
+            mismatches += compare(f"{name} sales", db.get_sales_data(horizon, "9999"), repo.get_sales_data(horizon, "9999"))
+            mismatches += compare(f"{name} purchases", db.get_purchase_data(horizon, "9999"),
+                                  repo.get_purchase_data(horizon, "9999"))
+            mismatches += compare(f"{name} profit/loss", db.get_total_profit_loss(month, end),
+                                  repo.get_total_profit_loss(month, end))
+            mismatches += compare(f"{name} catalog", db.catalog.items(), repo.catalog.items())
+        print("caches match the server" if not mismatches else f"{mismatches} mismatches")
+
+        first.close()
+        second.close()
+        server.shutdown()
+        db.close()
+        return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
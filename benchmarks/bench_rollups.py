@@ -0,0 +1,79 @@
+"""
+Time date-range profit/loss with and without the daily rollups, and check the
+rollup-planned totals against aggregating the raw rows for random ranges,
+including ranges that start or end part way through a day.
+
+Usage: python benchmarks/bench_rollups.py [sales]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DBManager
+
+
+def random_date(rng, with_time):
+    day = f"{rng.randint(2022, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    return f"{day} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}" if with_time else day
+
+
+def same_totals(a, b, tolerance=1e-6):
+    return len(a) == len(b) and all(
+        x[0] == y[0] and all(abs(p - q) <= tolerance * max(1, abs(q)) for p, q in zip(x[1:], y[1:])
+                             if isinstance(q, float))
+        for x, y in zip(a, b))
+
+
+def timed(run, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        run()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(sales=1000000):
+    rng = random.Random(13)
+    with tempfile.TemporaryDirectory() as directory:
+        db = DBManager(os.path.join(directory, "bench.db"))
+        with db.connections.writer() as cursor:
+            cursor.executemany("INSERT INTO fabrics (fabric_name, stock) VALUES (?, 0)",
+                               [(f"Fabric {i}",) for i in range(200)])
+            cursor.executemany("INSERT INTO purchases (fabric_id, quantity, cost_price, purchase_date) VALUES (?, ?, ?, ?)",
+                               [(fabric_id, 1000, rng.uniform(20, 200), "2022-01-01 09:00:00") for fabric_id in range(1, 201)])
+            cursor.executemany("INSERT INTO sales (fabric_id, quantity, selling_price, sale_date) VALUES (?, ?, ?, ?)",
+                               [(rng.randint(1, 200), rng.randint(1, 50), round(rng.uniform(20, 400), 2),
+                                 random_date(rng, True)) for _ in range(sales)])
+
+        # Edits and deletes go through the rollup triggers too
+        for sale_id in rng.sample(range(1, sales + 1), 1000):
+            db.update_sale_data(sale_id, rng.randint(1, 50), rng.uniform(20, 400), random_date(rng, True))
+        with db.connections.writer() as cursor:
+            cursor.executemany("DELETE FROM sales WHERE sale_id = ?", [(i,) for i in rng.sample(range(1, sales + 1), 1000)])
+        drift = db.check_rollups()
+        print(f"check_rollups after edits: {len(drift)} rows out of date")
+
+        failures = 0
+        for _ in range(200):
+            start, end = sorted([random_date(rng, rng.random() < 0.5), random_date(rng, rng.random() < 0.5)])
+            fabric_id = rng.choice([None, rng.randint(1, 200)])
+            for kind in ("sales", "purchases"):
+                failures += not same_totals(db.get_range_totals(kind, start, end, fabric_id),
+                                            db.get_range_totals(kind, start, end, fabric_id, use_rollups=False))
+            failures += not same_totals(db.get_total_profit_loss(start, end, fabric_id),
+                                        db.get_total_profit_loss(start, end, fabric_id, use_rollups=False))
+        print(f"random ranges: {failures} mismatches against the raw answer")
+
+        print(f"{sales} sales rows; profit/loss ms per call")
+        for start, end in (("2024-06-01", "2024-06-30"), ("2024-01-01", "2024-12-31"), ("2022-01-01", "2024-12-31")):
+            raw = timed(lambda: db.get_total_profit_loss(start, end, use_rollups=False))
+            rolled = timed(lambda: db.get_total_profit_loss(start, end))
+            print(f"{start} .. {end}: raw {raw:8.1f}  rollups {rolled:8.1f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
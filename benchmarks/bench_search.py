@@ -0,0 +1,53 @@
+"""
+Compare the old LIKE '%term%' fabric search with the FTS5-backed search modes.
+
+Usage: python benchmarks/bench_search.py [names]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DBManager
+
+WORDS = ["Cotton", "Silk", "Rayon", "Linen", "Printed", "Voile", "Cambric", "Satin", "Georgette",
+         "Chiffon", "Denim", "Khadi", "Organza", "Crepe", "Twill", "Poplin", "Muslin", "Lawn"]
+TERMS = ["cotton", "satin cr", "organ", "coton", "poplin 4"]
+
+
+def fabric_names(count, seed=7):
+    rng = random.Random(seed)
+    return [f"{rng.choice(WORDS)} {rng.choice(WORDS)} {rng.randint(20, 120)}s #{i}" for i in range(count)]
+
+
+def timed(run, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = run()
+    return (time.perf_counter() - start) / repeat * 1000, len(result)
+
+
+def main(count=100000):
+    with tempfile.TemporaryDirectory() as directory:
+        db = DBManager(os.path.join(directory, "bench.db"))
+        with db.connections.writer() as cursor:
+            cursor.executemany("INSERT INTO fabrics (fabric_name, stock) VALUES (?, 0)",
+                               [(name,) for name in fabric_names(count)])
+        db.catalog.load()
+
+        print(f"{count} fabric names; times are ms per search")
+        print(f"{'term':>10} {'LIKE (old)':>16} {'substring':>16} {'fuzzy':>16} {'prefix':>16}")
+        for term in TERMS:
+            like = timed(lambda: db._fetchall("SELECT fabric_name FROM fabrics WHERE fabric_name LIKE ?",
+                                              ('%' + term + '%',)))
+            cells = [like] + [timed(lambda mode=mode: db.search_fabrics(term, mode=mode, limit=50))
+                              for mode in ("substring", "fuzzy", "prefix")]
+            print(f"{term:>10} " + " ".join(f"{ms:8.2f} ({rows:>5})" for ms, rows in cells))
+        db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,135 @@
+"""
+Measure cold startup of the desktop app: import time of main.py (from
+python -X importtime), time to the first drawn frame, time until the fabric
+catalog has loaded in the background, and peak memory.
+
+Each run starts a fresh interpreter on a copy of a generated database, so
+nothing is shared between runs except the operating system's file cache.
+The first frame needs a display (on Linux, run under xvfb-run without one).
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--fabrics N] [--sales N] [--db PATH] [--top N]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Run in the child: start the app like main.initialize_app, without the main loop
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+import main
+imported = time.perf_counter()
+db = main.DBManager({db!r})
+root, app = main.create_window(db)
+root.update()
+framed = time.perf_counter()
+print(json.dumps({{"imports": imported - start, "first_frame": framed - start}}), flush=True)
+while not db.catalog.loaded or app.query_executor._outstanding:
+    root.update()
+    time.sleep(0.002)
+catalog = time.perf_counter() - start
+try:
+    import resource
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, KiB elsewhere
+    peak_kb = peak_kb // 1024 if sys.platform == "darwin" else peak_kb
+except ImportError:
+    peak_kb = None
+root.destroy()
+db.close()
+print(json.dumps({{"catalog": catalog, "peak_kb": peak_kb}}), flush=True)
+"""
+
+
+def import_times(top):
+    """(total ms to import main, [(self ms, cumulative ms, module)] of the slowest modules)."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT,
+                            capture_output=True, text=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        modules.append((int(own) / 1000, int(cumulative) / 1000, name.rstrip()))
+    total = next((cumulative for _, cumulative, name in modules if name.strip() == "main"), None)
+    return total, sorted(modules, reverse=True)[:top]
+
+
+def start_once(db_path):
+    """Start the app once; returns a dict of timings in seconds and peak_kb, or None without a display."""
+    launched = time.perf_counter()
+    child = subprocess.Popen([sys.executable, "-c", CHILD.format(root=ROOT, db=db_path)], cwd=ROOT,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    timings = {}
+    for line in child.stdout:
+        if line.startswith("{"):
+            if not timings:
+                # Includes starting the interpreter, which the child cannot see
+                timings["launch_to_frame"] = time.perf_counter() - launched
+            timings.update(json.loads(line))
+    errors = child.stderr.read()
+    child.wait()
+    if child.returncode:
+        print(errors.strip().splitlines()[-1] if errors.strip() else f"exit status {child.returncode}")
+        return None
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Desktop app startup benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--fabrics", type=int, default=5000)
+    parser.add_argument("--sales", type=int, default=100000)
+    parser.add_argument("--db", help="database to start on (a copy is used); generated when omitted")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    args = parser.parse_args(argv)
+
+    total, slowest = import_times(args.top)
+    print(f"import main: {total:.1f} ms" if total is not None else "import main failed")
+    for own, cumulative, name in slowest:
+        print(f"  {own:8.1f} ms self {cumulative:8.1f} ms cumulative  {name}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "source.db")
+        if args.db:
+            shutil.copy(args.db, source)
+        else:
+            from db_manager import DBManager
+            from generate_data import generate
+            db = DBManager(source)
+            generate(db, fabrics=args.fabrics, sales=args.sales)
+            db.close()
+
+        runs = []
+        for run in range(args.runs):
+            db_path = os.path.join(directory, f"run{run}.db")
+            shutil.copy(source, db_path)
+            timings = start_once(db_path)
+            if timings is None:
+                print("the app could not start (no display?); only import times were measured")
+                return 1
+            runs.append(timings)
+
+    median = lambda key: statistics.median(run[key] for run in runs)
+    print(f"median of {len(runs)} runs:")
+    print(f"  imports in the app       {median('imports') * 1000:8.1f} ms")
+    print(f"  first frame              {median('first_frame') * 1000:8.1f} ms after the first import")
+    print(f"  launch to first frame    {median('launch_to_frame') * 1000:8.1f} ms")
+    print(f"  catalog loaded           {median('catalog') * 1000:8.1f} ms after the first import")
+    if runs[0]["peak_kb"] is not None:
+        print(f"  peak RSS                 {median('peak_kb') / 1024:8.1f} MiB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
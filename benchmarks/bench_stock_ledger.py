@@ -0,0 +1,73 @@
+"""
+Time point-in-time stock queries against the stock ledger: summing every
+movement up to the timestamp versus starting from the nearest snapshot
+(get_stock_as_of after checkpoint_stock), and check both give the same answer.
+
+Usage: python benchmarks/bench_stock_ledger.py [sales]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DBManager
+
+
+def random_date(rng):
+    return (f"{rng.randint(2022, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} "
+            f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00")
+
+
+def full_replay(db, fabric_id, timestamp):
+    return db._fetchone("SELECT COALESCE(SUM(quantity), 0) FROM stock_movements WHERE fabric_id = ? AND moved_at <= ?",
+                        (fabric_id, timestamp))[0]
+
+
+def main(sales=1000000, fabrics=50):
+    rng = random.Random(29)
+    with tempfile.TemporaryDirectory() as directory:
+        db = DBManager(os.path.join(directory, "bench.db"))
+        with db.connections.writer() as cursor:
+            cursor.executemany("INSERT INTO fabrics (fabric_name, stock) VALUES (?, 0)",
+                               [(f"Fabric {i}",) for i in range(fabrics)])
+        # Straight into the tables: the ledger triggers still fire, the lot costing and stock checks are skipped
+        start = time.perf_counter()
+        with db.connections.writer() as cursor:
+            cursor.executemany("INSERT INTO purchases (fabric_id, quantity, cost_price, purchase_date) VALUES (?, ?, ?, ?)",
+                               [(rng.randint(1, fabrics), rng.randint(100, 1000), 50, random_date(rng))
+                                for _ in range(sales // 10)])
+            cursor.executemany("INSERT INTO sales (fabric_id, quantity, selling_price, sale_date) VALUES (?, ?, ?, ?)",
+                               [(rng.randint(1, fabrics), rng.randint(1, 10), 80, random_date(rng))
+                                for _ in range(sales)])
+            cursor.execute("""UPDATE fabrics SET stock = (SELECT COALESCE(SUM(quantity), 0) FROM stock_movements
+                                                          WHERE stock_movements.fabric_id = fabrics.fabric_id)""")
+        print(f"{sales} sales, {sales // 10} purchases, {fabrics} fabrics; loaded in {time.perf_counter() - start:.1f} s")
+
+        start = time.perf_counter()
+        written = db.checkpoint_stock()
+        print(f"checkpoint_stock: {written} snapshots in {(time.perf_counter() - start) * 1000:.0f} ms; "
+              f"again with nothing new: ", end="")
+        start = time.perf_counter()
+        db.checkpoint_stock()
+        print(f"{(time.perf_counter() - start) * 1000:.0f} ms")
+
+        queries = [(rng.randint(1, fabrics), random_date(rng)) for _ in range(200)]
+        timings = {}
+        answers = {}
+        for name, run in (("full replay", lambda q: full_replay(db, *q)),
+                          ("snapshot + tail", lambda q: db.get_stock_as_of(*q))):
+            start = time.perf_counter()
+            answers[name] = [run(query) for query in queries]
+            timings[name] = (time.perf_counter() - start) / len(queries) * 1000
+        mismatches = sum(abs(a - b) > 1e-6 for a, b in zip(answers["full replay"], answers["snapshot + tail"]))
+        for name, elapsed in timings.items():
+            print(f"{name:>16}: {elapsed:7.2f} ms per get_stock_as_of")
+        print(f"{mismatches} answers differ; check_stock: {len(db.check_stock())} fabrics out of step")
+        db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,324 @@
+"""
+Reproducible benchmark suite: every public DBManager method, the Reports
+exports and SearchableComboBox filtering, on generated databases (see
+generate_data.py) of 1k, 100k and 10M sales.
+
+Each case is run once to warm up and then --repeat times (maintenance cases
+that rewrite whole tables run once). Results are written as JSON, one entry
+per scale and case with the median/min/max time and the number of rows
+returned, plus the commit, Python and SQLite versions they were taken with.
+Pass the file from an earlier commit with --compare to list the cases that
+got slower.
+
+Generated databases are kept in --data-dir and reused by later runs with the
+same scale and seed; each run works on a copy, so write cases never change
+them. Generating the 10M database takes a while.
+
+Usage: python benchmarks/bench_suite.py [--scales 1k,100k,10M] [--repeat N] [--seed N] [--output FILE]
+                                       [--compare FILE] [--threshold FRACTION] [--min-delta-ms MS] [--data-dir DIR]
+"""
+import argparse
+import contextlib
+import inspect
+import io
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import search_algo
+from db_manager import DBManager
+from generate_data import generate
+from reports import Reports
+from tests.fake_tk import install_fakes, type_text
+
+# Sales rows per scale; fabrics and purchases are derived from it
+SCALES = {"1k": 1000, "100k": 100000, "10M": 10000000}
+# Not worth timing: opening and closing the database
+SKIPPED_METHODS = {"close", "create_tables", "run_migrations"}
+# The generated data covers 2023-2024
+MONTH = ("2024-06-01", "2024-06-30 23:59:59")
+QUARTER = ("2024-04-01", "2024-06-30 23:59:59")
+YEAR = ("2024-01-01", "2024-12-31 23:59:59")
+COMBO_QUERIES = ["cotton sil", "printed voile", "satin 12", "42", "organza crepe"]
+
+
+def scale_size(sales):
+    """(fabrics, sales, purchases) generated for a scale."""
+    return min(10000, max(50, sales // 1000)), sales, max(sales // 10, 100)
+
+
+def database_for(scale, seed, data_dir):
+    """Path of the generated database for a scale, generating it on first use."""
+    path = os.path.join(data_dir, f"suite_{scale}_seed{seed}.db")
+    if not os.path.exists(path):
+        fabrics, sales, purchases = scale_size(SCALES[scale])
+        print(f"generating {scale}: {fabrics} fabrics, {sales} sales, {purchases} purchases")
+        started = time.perf_counter()
+        partial = path + ".partial"
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = DBManager(partial)
+            generate(db, fabrics, sales, purchases, seed)
+            db.close()
+        os.replace(partial, path)
+        print(f"generated {scale} in {time.perf_counter() - started:.1f} s")
+    return path
+
+
+def count_rows(result):
+    """Rows in a result: its length, or the number of items consumed from an iterator."""
+    if isinstance(result, list):
+        return len(result)
+    if inspect.isgenerator(result) or hasattr(result, "__next__"):
+        return sum(1 for _ in result)
+    return None
+
+
+def db_cases(db, names):
+    """(read cases, write cases) for the DBManager methods, each case a (name, run, heavy) tuple."""
+    fabric_id = max(range(1, len(names) + 1), key=db.get_fabric_stock_by_id)
+    fabric_name = names[fabric_id - 1]
+    sale = db._fetchone("SELECT sale_id, quantity, selling_price, sale_date FROM sales WHERE fabric_id = ? "
+                        "ORDER BY sale_id DESC LIMIT 1", (fabric_id,))
+    purchase = db._fetchone("SELECT purchase_id, quantity, cost_price, purchase_date FROM purchases WHERE fabric_id = ? "
+                            "ORDER BY purchase_id DESC LIMIT 1", (fabric_id,))
+    sale_ids = [row[0] for row in db._fetchall("SELECT sale_id FROM sales ORDER BY sale_id DESC LIMIT 100")]
+    purchase_ids = [row[0] for row in db._fetchall("SELECT purchase_id FROM purchases ORDER BY purchase_id DESC LIMIT 100")]
+    fabric_ids = list(range(1, min(len(names), 100) + 1))
+    counter = iter(range(10**9))
+
+    reads = [
+        ("test_connection", db.test_connection, False),
+        ("explain_query_plan", lambda: db.explain_query_plan("SELECT * FROM sales WHERE sale_date BETWEEN ? AND ?", MONTH),
+         False),
+        ("get_fabric_id", lambda: db.get_fabric_id(fabric_name), False),
+        ("get_fabric_name_by_id", lambda: db.get_fabric_name_by_id(fabric_id), False),
+        ("get_fabrics_list", db.get_fabrics_list, False),
+        ("get_all_fabrics", db.get_all_fabrics, False),
+        ("search_fabrics[prefix]", lambda: db.search_fabrics("cotton", "prefix"), False),
+        ("search_fabrics[substring]", lambda: db.search_fabrics("satin cr", "substring"), False),
+        ("search_fabrics[fuzzy]", lambda: db.search_fabrics("coton", "fuzzy"), False),
+        ("get_catalog_version", db.get_catalog_version, False),
+        ("get_fabric_stock", lambda: db.get_fabric_stock(fabric_name), False),
+        ("get_fabric_stock_by_id", lambda: db.get_fabric_stock_by_id(fabric_id), False),
+        ("get_total_stock", db.get_total_stock, False),
+        ("get_all_fabrics_stock", db.get_all_fabrics_stock, False),
+        ("iter_all_fabrics_stock", db.iter_all_fabrics_stock, False),
+        ("get_fabrics_stock_page", lambda: db.get_fabrics_stock_page(100, len(names) // 2), False),
+        ("get_fabrics_stock_by_ids", lambda: db.get_fabrics_stock_by_ids(fabric_ids), False),
+        ("get_purchase_cost", lambda: db.get_purchase_cost(fabric_id), False),
+        ("get_stock_as_of", lambda: db.get_stock_as_of(fabric_id, "2024-06-15 12:00:00"), False),
+        ("get_total_sales", lambda: db.get_total_sales(fabric_id), False),
+        ("plan_date_range", lambda: db.plan_date_range(*YEAR), False),
+        ("get_range_totals[sales,year]", lambda: db.get_range_totals("sales", *YEAR), False),
+        ("get_range_totals[purchases,quarter]", lambda: db.get_range_totals("purchases", *QUARTER), False),
+        ("get_total_profit_loss[month]", lambda: db.get_total_profit_loss(*MONTH), False),
+        ("get_total_profit_loss[year]", lambda: db.get_total_profit_loss(*YEAR), False),
+        ("get_total_profit_loss[year,fabric]", lambda: db.get_total_profit_loss(*YEAR, fabric_id=fabric_id), False),
+        ("analytics_summary[quarter]", lambda: db.analytics_summary(*QUARTER), False),
+        ("get_sales_data[month]", lambda: db.get_sales_data(*MONTH), False),
+        ("iter_sales_data[year]", lambda: db.iter_sales_data(*YEAR), False),
+        ("get_purchase_data[month]", lambda: db.get_purchase_data(*MONTH), False),
+        ("iter_purchase_data[year]", lambda: db.iter_purchase_data(*YEAR), False),
+        ("get_sales_page", lambda: db.get_sales_page(*YEAR, limit=100), False),
+        ("get_purchases_page", lambda: db.get_purchases_page(*YEAR, limit=100), False),
+        ("get_sales_by_ids", lambda: db.get_sales_by_ids(sale_ids), False),
+        ("get_purchases_by_ids", lambda: db.get_purchases_by_ids(purchase_ids), False),
+        ("get_sale_by_id", lambda: db.get_sale_by_id(sale[0]), False),
+        ("get_purchase_by_id", lambda: db.get_purchase_by_id(purchase[0]), False),
+        ("get_changes", lambda: db.get_changes(0, 1000), False),
+        ("check_rollups", db.check_rollups, True),
+        ("check_lots", db.check_lots, True),
+        ("check_stock", db.check_stock, True),
+        ("check_stock_snapshots", db.check_stock_snapshots, True),
+        ("check_cost_cache", db.check_cost_cache, True),
+    ]
+    writes = [
+        ("add_fabric", lambda: db.add_fabric(f"Benchmark fabric {next(counter)}", 10), False),
+        ("update_fabric_name", lambda: db.update_fabric_name(fabric_id, f"{fabric_name} {next(counter)}"), False),
+        ("update_stock", lambda: db.update_stock(fabric_id, 1, "add"), False),
+        ("add_purchase", lambda: db.add_purchase(fabric_id, 5, purchase[2]), False),
+        ("add_purchases_bulk", lambda: db.add_purchases_bulk([(fabric_id, 1, purchase[2], YEAR[1])] * 100), False),
+        ("add_sale", lambda: db.add_sale(fabric_id, 1, sale[2]), False),
+        ("add_sales_bulk", lambda: db.add_sales_bulk([(fabric_id, 1, sale[2], YEAR[1])] * 100), False),
+        ("update_sale_data", lambda: db.update_sale_data(sale[0], sale[1] + next(counter) % 2, sale[2], sale[3]), False),
+        ("update_purchase_data",
+         lambda: db.update_purchase_data(purchase[0], purchase[1] + next(counter) % 2, purchase[2], purchase[3]), False),
+        ("prune_change_log", lambda: db.prune_change_log(100000), False),
+        ("checkpoint_stock", db.checkpoint_stock, True),
+        ("rebuild_cost_cache", db.rebuild_cost_cache, True),
+        ("rebuild_rollups", db.rebuild_rollups, True),
+        ("replay_lots", db.replay_lots, True),
+    ]
+    return reads, writes
+
+
+def report_cases(reports):
+    cases = []
+    for fmt in ("csv", "csv.gz", "parquet"):
+        cases += [
+            (f"generate_sales_report[quarter,{fmt}]", lambda fmt=fmt: reports.generate_sales_report(*QUARTER, fmt=fmt)),
+            (f"generate_purchases_report[year,{fmt}]", lambda fmt=fmt: reports.generate_purchases_report(*YEAR, fmt=fmt)),
+            (f"generate_stock_report[{fmt}]", lambda fmt=fmt: reports.generate_stock_report(fmt=fmt)),
+            (f"generate_profit_loss_report[year,{fmt}]",
+             lambda fmt=fmt: reports.generate_profit_loss_report(*YEAR, fmt=fmt)),
+            (f"generate_analytics_report[quarter,{fmt}]",
+             lambda fmt=fmt: reports.generate_analytics_report(*QUARTER, fmt=fmt)),
+        ]
+    return [(name, run, False) for name, run in cases]
+
+
+def type_queries(combo):
+    """Type the test queries one key at a time, running the debounce timer after every key."""
+    for query in COMBO_QUERIES:
+        type_text(combo, query, 1)
+
+
+def combo_cases(db):
+    install_fakes()
+    return [(f"type_queries[{mode}]", lambda combo=search_algo.SearchableComboBox(None, db, 0, 0, mode=mode): type_queries(combo),
+             False) for mode in ("prefix", "substring", "fuzzy")]
+
+
+def measure(run, repeat):
+    """Time run; returns (seconds per run, rows of the last result)."""
+    times = []
+    rows = None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            rows = count_rows(run())
+            times.append(time.perf_counter() - start)
+    return times, rows
+
+
+def run_scale(scale, path, repeat, workdir):
+    copy = os.path.join(workdir, f"{scale}.db")
+    shutil.copyfile(path, copy)
+    results = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        db = DBManager(copy)
+        reports = Reports(None, db, output_dir=os.path.join(workdir, f"reports_{scale}"))
+        names = [name for _, name in db.catalog.items()]
+    reads, writes = db_cases(db, names)
+    # Read cases before the writes change the data
+    ordered = ([("DBManager", case) for case in reads] + [("Reports", case) for case in report_cases(reports)]
+               + [("SearchableComboBox", case) for case in combo_cases(db)] + [("DBManager", case) for case in writes])
+    for group, (name, run, heavy) in ordered:
+        if not heavy:
+            measure(run, 1)
+        times, rows = measure(run, 1 if heavy else repeat)
+        results.append({"scale": scale, "case": f"{group}.{name}", "runs": len(times),
+                        "median_ms": round(statistics.median(times) * 1000, 3),
+                        "min_ms": round(min(times) * 1000, 3), "max_ms": round(max(times) * 1000, 3), "rows": rows})
+        print(f"{scale:>5} {group + '.' + name:<60} {results[-1]['median_ms']:10.3f} ms"
+              + (f"  ({rows} rows)" if rows is not None else ""))
+    with contextlib.redirect_stdout(io.StringIO()):
+        db.close()
+    return results
+
+
+def uncovered_methods(results):
+    """Public DBManager methods without a case, so new ones do not go unbenchmarked."""
+    covered = {result["case"].split(".", 1)[1].split("[")[0] for result in results
+               if result["case"].startswith("DBManager.")}
+    public = {name for name, _ in inspect.getmembers(DBManager, callable) if not name.startswith("_")}
+    return sorted(public - covered - SKIPPED_METHODS)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, threshold, min_delta_ms):
+    """
+    Print the cases slower than in the baseline file by more than threshold
+    (a fraction) and min_delta_ms; returns their number.
+
+    The absolute floor keeps timer noise on sub-millisecond cases from being
+    reported.
+    """
+    with open(baseline_path) as baseline_file:
+        baseline = {(entry["scale"], entry["case"]): entry for entry in json.load(baseline_file)["results"]}
+    print(f"\ncompared with {baseline_path} (slower by more than {threshold:.0%} and {min_delta_ms} ms is flagged)")
+    regressions = 0
+    for result in results:
+        old = baseline.get((result["scale"], result["case"]))
+        if old is None or not old["median_ms"]:
+            continue
+        ratio = result["median_ms"] / old["median_ms"]
+        if abs(result["median_ms"] - old["median_ms"]) < min_delta_ms:
+            continue
+        if ratio > 1 + threshold:
+            regressions += 1
+            print(f"SLOWER {result['scale']:>5} {result['case']:<55} {old['median_ms']:10.3f} -> "
+                  f"{result['median_ms']:10.3f} ms ({ratio:.2f}x)")
+        elif ratio < 1 / (1 + threshold):
+            print(f"faster {result['scale']:>5} {result['case']:<55} {old['median_ms']:10.3f} -> "
+                  f"{result['median_ms']:10.3f} ms ({ratio:.2f}x)")
+    print(f"{regressions} regressions")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fabric Management benchmark suite")
+    parser.add_argument("--scales", default="1k,100k", help=f"comma-separated, from {', '.join(SCALES)} "
+                                                            "(default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON results file (default: %(default)s)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="slowdown flagged as a regression "
+                                                                      "(default: %(default)s)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="smaller changes are ignored "
+                                                                        "(default: %(default)s)")
+    parser.add_argument("--data-dir", help="where generated databases are kept (default: a temporary directory)")
+    args = parser.parse_args(argv)
+
+    scales = args.scales.split(",")
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"unknown scale {unknown[0]}; choose from {', '.join(SCALES)}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        data_dir = args.data_dir or workdir
+        os.makedirs(data_dir, exist_ok=True)
+        for scale in scales:
+            results += run_scale(scale, database_for(scale, args.seed, data_dir), args.repeat, workdir)
+
+    missing = uncovered_methods(results)
+    if missing:
+        print("DBManager methods without a benchmark case:", ", ".join(missing))
+    output = {
+        "meta": {"commit": git_commit(), "date": datetime.now().isoformat(timespec="seconds"),
+                 "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                 "platform": platform.platform(), "seed": args.seed, "repeat": args.repeat,
+                 "scales": {scale: dict(zip(("fabrics", "sales", "purchases"), scale_size(SCALES[scale])))
+                            for scale in scales},
+                 "uncovered": missing},
+        "results": results,
+    }
+    with open(args.output, "w") as output_file:
+        json.dump(output, output_file, indent=1)
+    print(f"results written to {args.output}")
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold, args.min_delta_ms) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
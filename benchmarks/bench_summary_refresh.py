@@ -0,0 +1,80 @@
+"""
+Compare the two ways the Summary tab can catch up after a sale: reloading
+everything (SummaryView.fetch, then every row formatted and handed to the
+tables) against reading back the one fabric written to (fetch_fabrics and
+apply, then one stock row, one profit/loss row and the totals row).
+
+Tk is not needed: the table work is measured as formatting the rows the UI
+would pass to VirtualTable, which is what grows with the number of fabrics.
+Each pass records a real sale first, so both paths see a changed database.
+
+Usage: python benchmarks/bench_summary_refresh.py [--fabrics N] [--sales N] [--writes N]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DBManager
+from generate_data import generate
+from summary_view import SummaryView
+from ui_manager import UIManager
+
+
+def full_reload(view, key, fabric_id):
+    view.replace(view.fetch(key))
+    rows = [UIManager.stock_table_row(row) for row in view.stock_rows()]
+    rows += [UIManager.profit_loss_table_row(row) for row in view.profit_loss_rows()]
+    return len(rows)
+
+
+def delta(view, key, fabric_id):
+    view.apply(view.fetch_fabrics(key, view.mark(fabric_id)))
+    rows = [UIManager.stock_table_row(view.stock[fabric_id])]
+    if fabric_id in view.profit_loss:
+        rows.append(UIManager.profit_loss_table_row(view.profit_loss[fabric_id]))
+    if view.total is not None:
+        rows.append(UIManager.profit_loss_table_row(view.total))
+    return len(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summary tab refresh after a write")
+    parser.add_argument("--fabrics", type=int, default=5000)
+    parser.add_argument("--sales", type=int, default=200000)
+    parser.add_argument("--writes", type=int, default=50, help="sales recorded, and refreshes timed, per method")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = DBManager(os.path.join(directory, "summary.db"))
+        generate(db, fabrics=args.fabrics, sales=args.sales)
+        fabric_ids = [fabric_id for fabric_id, _ in db.catalog.items()]
+        rng = random.Random(0)
+        for key in (("All", "", ""), ("All", "2023-01-01", "2030-12-31")):
+            results = {}
+            for name, refresh in (("full reload", full_reload), ("one fabric", delta)):
+                view = SummaryView(db)
+                view.replace(view.fetch(key))
+                times, rows = [], 0
+                for _ in range(args.writes):
+                    fabric_id = rng.choice(fabric_ids)
+                    db.add_purchase(fabric_id, 2, 50.0)
+                    db.add_sale(fabric_id, 1, 80.0)
+                    start = time.perf_counter()
+                    rows = refresh(view, key, fabric_id)
+                    times.append(time.perf_counter() - start)
+                results[name] = (statistics.median(times) * 1000, rows)
+            label = "no date range" if key[1] == "" else f"{key[1]}..{key[2]}"
+            for name, (ms, rows) in results.items():
+                print(f"{label:24} {name:12} {ms:9.2f} ms median, {rows} table rows")
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""
+Fill a database with synthetic fabrics, purchases and sales for benchmarks.
+
+The data is fully determined by the seed. Fabric popularity follows a Zipf
+distribution (a few fabrics account for most sales), and daily volumes follow
+the trade's seasons: weddings and festivals in October-November and April-May,
+a monsoon lull in June-August, and a quiet Sunday. Every fabric is stocked on
+the first day and restocked over the period, roughly keeping up with demand;
+a sale that would run a fabric out is preceded by a restock, so stock never
+goes negative.
+
+Rows go in through plain INSERTs in date order, so the rollup, ledger, lot and
+change-log triggers all run as in production. Sales are costed and fabric stock
+set from the ledger at the end.
+
+Usage: python benchmarks/generate_data.py PATH [--fabrics N] [--sales N] [--purchases N] [--seed N]
+                                          [--start YYYY-MM-DD] [--days N]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DBManager
+
+WORDS = ["Cotton", "Silk", "Rayon", "Linen", "Printed", "Voile", "Cambric", "Satin", "Georgette",
+         "Chiffon", "Denim", "Khadi", "Organza", "Crepe", "Twill", "Poplin", "Muslin", "Lawn"]
+# Relative demand per month
+MONTH_WEIGHTS = (1.1, 1.0, 0.9, 1.2, 1.3, 0.8, 0.7, 0.8, 1.0, 1.5, 1.6, 1.2)
+# Relative demand per weekday, Monday first
+WEEKDAY_WEIGHTS = (1.0, 0.9, 0.9, 1.0, 1.1, 1.4, 0.5)
+ZIPF_EXPONENT = 1.1
+# Sale quantities 1-20, small ones most common
+SALE_QUANTITIES = range(1, 21)
+SALE_QUANTITY_WEIGHTS = [1 / quantity for quantity in SALE_QUANTITIES]
+# Purchases bring in this much more than is sold over the period
+RESTOCK_FACTOR = 1.2
+# Rows inserted per transaction
+BATCH_ROWS = 50000
+
+
+def fabric_names(count, rng):
+    return [f"{rng.choice(WORDS)} {rng.choice(WORDS)} {rng.randint(20, 120)}s #{i}" for i in range(count)]
+
+
+def zipf_weights(count, rng):
+    """Zipf popularity of fabric ids 1..count (summing to 1), with the ranks shuffled."""
+    ranks = list(range(1, count + 1))
+    rng.shuffle(ranks)
+    weights = [1 / rank ** ZIPF_EXPONENT for rank in ranks]
+    total = sum(weights)
+    return [weight / total for weight in weights]
+
+
+def daily_counts(total, days, rng):
+    """Split total rows over the days in proportion to the seasonal weights."""
+    weights = [MONTH_WEIGHTS[day.month - 1] * WEEKDAY_WEIGHTS[day.weekday()] for day in days]
+    scale = total / sum(weights)
+    counts = [math.floor(weight * scale) for weight in weights]
+    # Hand out the rounding remainder by the fractional parts, keeping the total exact
+    fractions = [weight * scale - count for weight, count in zip(weights, counts)]
+    remainder = total - sum(counts)
+    if remainder:
+        for index in rng.choices(range(len(days)), weights=fractions, k=remainder):
+            counts[index] += 1
+    return counts
+
+
+def times_of_day(day, count, rng):
+    """count sorted timestamps during shop hours (09:00-20:59) on day."""
+    seconds = sorted(rng.randrange(9 * 3600, 21 * 3600) for _ in range(count))
+    return [f"{day.isoformat()} {second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}" for second in seconds]
+
+
+def generate(db, fabrics=1000, sales=100000, purchases=None, seed=0, start="2023-01-01", days=730):
+    """
+    Fill db with synthetic data.
+
+    Parameters:
+    - db (DBManager): Database to fill; it should be empty.
+    - fabrics (int): Number of fabrics.
+    - sales (int): Number of sales rows.
+    - purchases (int, optional): Number of purchase rows, at least one per fabric.
+      Defaults to a tenth of the sales.
+    - seed (int): Random seed; the same arguments always give the same data.
+    - start (str): First day, 'YYYY-MM-DD'.
+    - days (int): Number of days covered.
+
+    Returns:
+    - counts (dict): Rows written per table, and the first and last day.
+    """
+    rng = random.Random(seed)
+    purchases = max(fabrics, sales // 10 if purchases is None else purchases)
+    first_day = date.fromisoformat(start)
+    calendar = [first_day + timedelta(days=offset) for offset in range(days)]
+    fabric_ids = range(1, fabrics + 1)
+    popularity = zipf_weights(fabrics, rng)
+    # Typical cost per metre of each fabric, spread over a wide price range
+    base_cost = [round(min(2000.0, max(20.0, rng.lognormvariate(math.log(150), 0.6))), 2) for _ in fabric_ids]
+    mean_sale = sum(q * w for q, w in zip(SALE_QUANTITIES, SALE_QUANTITY_WEIGHTS)) / sum(SALE_QUANTITY_WEIGHTS)
+    # Purchases after the opening stock are spread over the period like the sales
+    mean_restock = sales * mean_sale * RESTOCK_FACTOR / purchases
+
+    with db.connections.writer() as cursor:
+        cursor.executemany("INSERT INTO fabrics (fabric_name, stock) VALUES (?, 0)",
+                           [(name,) for name in fabric_names(fabrics, rng)])
+        # Opening stock: about a month of each fabric's expected demand, before the shop opens
+        opening = f"{first_day.isoformat()} 08:00:00"
+        opening_rows = [(fabric_id, max(10, round(sales * share * mean_sale * 30 / days)), base_cost[fabric_id - 1], opening)
+                        for fabric_id, share in zip(fabric_ids, popularity)]
+        cursor.executemany("INSERT INTO purchases (fabric_id, quantity, cost_price, purchase_date) VALUES (?, ?, ?, ?)",
+                           opening_rows)
+
+    sale_rows, purchase_rows = [], []
+
+    def flush():
+        with db.connections.writer() as cursor:
+            cursor.executemany("INSERT INTO purchases (fabric_id, quantity, cost_price, purchase_date) VALUES (?, ?, ?, ?)",
+                               purchase_rows)
+            cursor.executemany("INSERT INTO sales (fabric_id, quantity, selling_price, sale_date) VALUES (?, ?, ?, ?)",
+                               sale_rows)
+        purchase_rows.clear()
+        sale_rows.clear()
+
+    stock = [0.0] + [quantity for _, quantity, _, _ in opening_rows]
+    # Restocks made early because a sale would have run a fabric out, to be
+    # taken off the scheduled purchases so the total stays as asked
+    early_restocks = 0
+    for day, purchase_count, sale_count in zip(calendar, daily_counts(purchases - fabrics, calendar, rng),
+                                               daily_counts(sales, calendar, rng)):
+        events = [(moment, 0, fabric_id) for fabric_id, moment in
+                  zip(rng.choices(fabric_ids, weights=popularity, k=purchase_count), times_of_day(day, purchase_count, rng))]
+        events += [(moment, 1, fabric_id) for fabric_id, moment in
+                   zip(rng.choices(fabric_ids, weights=popularity, k=sale_count), times_of_day(day, sale_count, rng))]
+        events.sort()
+        quantities = iter(rng.choices(SALE_QUANTITIES, weights=SALE_QUANTITY_WEIGHTS, k=sale_count))
+        for moment, is_sale, fabric_id in events:
+            cost = base_cost[fabric_id - 1]
+            if not is_sale:
+                if early_restocks:
+                    early_restocks -= 1
+                    continue
+                quantity = max(1, round(mean_restock * rng.uniform(0.5, 1.5)))
+                purchase_rows.append((fabric_id, quantity, round(cost * rng.uniform(0.92, 1.08), 2), moment))
+                stock[fabric_id] += quantity
+                continue
+            quantity = next(quantities)
+            if quantity > stock[fabric_id]:
+                restock = max(quantity, round(mean_restock * rng.uniform(0.5, 1.5)))
+                purchase_rows.append((fabric_id, restock, round(cost * rng.uniform(0.92, 1.08), 2), moment))
+                stock[fabric_id] += restock
+                early_restocks += 1
+            sale_rows.append((fabric_id, quantity, round(cost * rng.uniform(1.2, 1.6), 2), moment))
+            stock[fabric_id] -= quantity
+        if len(sale_rows) + len(purchase_rows) >= BATCH_ROWS:
+            flush()
+    flush()
+    # More early restocks than scheduled purchases left over
+    purchases += early_restocks
+
+    db.replay_lots()
+    with db.connections.writer() as cursor:
+        cursor.execute("""UPDATE fabrics SET stock = (SELECT COALESCE(SUM(quantity), 0) FROM stock_movements
+                                                      WHERE stock_movements.fabric_id = fabrics.fabric_id)""")
+    db.checkpoint_stock()
+    db.catalog.invalidate()
+    return {"fabrics": fabrics, "sales": sales, "purchases": purchases,
+            "first_day": calendar[0].isoformat(), "last_day": calendar[-1].isoformat()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic Fabric Management database")
+    parser.add_argument("path", help="database file to create")
+    parser.add_argument("--fabrics", type=int, default=1000)
+    parser.add_argument("--sales", type=int, default=100000)
+    parser.add_argument("--purchases", type=int, help="default: a tenth of the sales")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start", default="2023-01-01", help="first day (default: %(default)s)")
+    parser.add_argument("--days", type=int, default=730)
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.path):
+        print(f"{args.path} already exists; remove it first")
+        return 1
+    started = time.perf_counter()
+    db = DBManager(args.path)
+    try:
+        counts = generate(db, args.fabrics, args.sales, args.purchases, args.seed, args.start, args.days)
+    finally:
+        db.close()
+    print(f"{counts['fabrics']} fabrics, {counts['sales']} sales, {counts['purchases']} purchases "
+          f"from {counts['first_day']} to {counts['last_day']} in {time.perf_counter() - started:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
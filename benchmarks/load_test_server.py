@@ -0,0 +1,125 @@
+"""
+Load-test the HTTP/JSON server in-process (Flask test clients, no network)
+with mixed read/write traffic from several threads, and report requests per
+second and p50/p99 latency per endpoint.
+
+Usage: python benchmarks/load_test_server.py [--threads N] [--requests N] [--sales N]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DBManager
+from server import create_app
+
+FABRICS = 500
+
+
+def random_date(rng):
+    return f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} {rng.randint(8, 20):02d}:00:00"
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def client_loop(app, seed, count, latencies, failures):
+    rng = random.Random(seed)
+    client = app.test_client()
+    etag = None
+    gzip_headers = {"Accept-Encoding": "gzip"}
+    for _ in range(count):
+        roll = rng.random()
+        start = time.perf_counter()
+        if roll < 0.25:
+            name = "GET /api/fabrics"
+            response = client.get("/api/fabrics", headers={**gzip_headers, **({"If-None-Match": etag} if etag else {})})
+            etag = response.headers.get("ETag", etag)
+            ok = response.status_code in (200, 304)
+        elif roll < 0.40:
+            name = "GET /api/fabrics/search"
+            response = client.get(f"/api/fabrics/search?q=abric {rng.randint(1, 99)}&mode=substring&limit=20")
+            ok = response.status_code == 200
+        elif roll < 0.55:
+            name = "GET /api/stock"
+            response = client.get(f"/api/stock?limit=100&after={rng.randint(0, FABRICS - 100)}", headers=gzip_headers)
+            ok = response.status_code == 200
+        elif roll < 0.70:
+            name = "GET /api/sales"
+            month = rng.randint(1, 12)
+            response = client.get(f"/api/sales?start=2024-{month:02d}-01&end=2024-{month:02d}-28 23:59:59&limit=100",
+                                  headers=gzip_headers)
+            ok = response.status_code == 200
+        elif roll < 0.75:
+            name = "GET /api/reports/profit-loss"
+            response = client.get("/api/reports/profit-loss?start=2024-01-01&end=2024-03-31", headers=gzip_headers)
+            ok = response.status_code == 200
+        elif roll < 0.95:
+            name = "POST /api/sales"
+            response = client.post("/api/sales", json={"fabric_id": rng.randint(1, FABRICS), "quantity": rng.randint(1, 5),
+                                                        "selling_price": 120, "sale_date": random_date(rng)})
+            # Running out of stock is a valid answer under load
+            ok = response.status_code in (201, 409)
+        else:
+            name = "POST /api/purchases"
+            response = client.post("/api/purchases", json={"fabric_id": rng.randint(1, FABRICS), "quantity": 50,
+                                                           "cost_price": 60, "purchase_date": random_date(rng)})
+            ok = response.status_code == 201
+        latencies.setdefault(name, []).append(time.perf_counter() - start)
+        if not ok:
+            failures.append((name, response.status_code))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="In-process load test of server.py")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=500, help="requests per thread")
+    parser.add_argument("--sales", type=int, default=200000, help="sales rows loaded before the test")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(31)
+    with tempfile.TemporaryDirectory() as directory:
+        db = DBManager(os.path.join(directory, "bench.db"), readers=args.threads)
+        with db.connections.writer() as cursor:
+            cursor.executemany("INSERT INTO fabrics (fabric_name, stock) VALUES (?, 0)",
+                               [(f"Fabric {i}",) for i in range(FABRICS)])
+        db.add_purchases_bulk([(fabric_id, 10000, 60, "2024-01-01 09:00:00") for fabric_id in range(1, FABRICS + 1)])
+        db.add_sales_bulk([(rng.randint(1, FABRICS), rng.randint(1, 5), 120, random_date(rng))
+                           for _ in range(args.sales)])
+        app = create_app(db)
+
+        latencies, failures = {}, []
+        per_thread = [({}, []) for _ in range(args.threads)]
+        threads = [threading.Thread(target=client_loop, args=(app, seed, args.requests, *per_thread[seed]))
+                   for seed in range(args.threads)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        for thread_latencies, thread_failures in per_thread:
+            for name, values in thread_latencies.items():
+                latencies.setdefault(name, []).extend(values)
+            failures.extend(thread_failures)
+
+        every = [value for values in latencies.values() for value in values]
+        print(f"{args.sales} sales rows, {args.threads} threads x {args.requests} requests: "
+              f"{len(every) / elapsed:.0f} requests/s, p50 {percentile(every, 0.5) * 1000:.1f} ms, "
+              f"p99 {percentile(every, 0.99) * 1000:.1f} ms, {len(failures)} failures")
+        for name, values in sorted(latencies.items()):
+            print(f"{name:>30}: {len(values):5d} requests, p50 {percentile(values, 0.5) * 1000:6.1f} ms, "
+                  f"p99 {percentile(values, 0.99) * 1000:6.1f} ms")
+        db.close()
+        return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
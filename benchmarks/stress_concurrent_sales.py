@@ -0,0 +1,127 @@
+"""
+Stress test concurrent stock changes from several processes, as when more
+than one terminal shares the database file.
+
+Each worker process opens its own DBManager and hammers a few fabrics with
+sales, restocking purchases and sale edits. Afterwards the stock of every
+fabric must equal its purchases minus its sales, and the stock ledger and lot
+costing must be consistent. Replaying the ledger in write order gives the
+stock after every committed transaction, which must never have gone negative.
+tests/test_stock.py runs a short version of this on every test run.
+
+--naive replaces add_sale with the old read-then-write pattern (check the
+stock on a reader, then subtract it in a separate transaction) to show the
+overselling it allows.
+
+Usage: python benchmarks/stress_concurrent_sales.py [--workers N] [--operations N] [--naive]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DBManager, InsufficientStock
+
+FABRICS = 3
+
+
+def naive_sale(db, fabric_id, quantity, selling_price):
+    """The UI's former flow: read the stock, compare in Python, then write."""
+    if quantity > db.get_fabric_stock_by_id(fabric_id):
+        raise InsufficientStock(fabric_id, quantity, None)
+    time.sleep(0.005)
+    with db.connections.writer() as cursor:
+        cursor.execute("INSERT INTO sales (fabric_id, quantity, selling_price, sale_date) VALUES (?, ?, ?, datetime('now'))",
+                       (fabric_id, quantity, selling_price))
+        cursor.execute("UPDATE fabrics SET stock = stock - ? WHERE fabric_id = ?", (quantity, fabric_id))
+
+
+def worker(path, seed, operations, naive, results):
+    rng = random.Random(seed)
+    db = DBManager(path, readers=1)
+    counts = {"sold": 0, "short": 0, "bought": 0, "edited": 0}
+    try:
+        for _ in range(operations):
+            fabric_id = rng.randint(1, FABRICS)
+            roll = rng.random()
+            try:
+                if roll < 0.75:
+                    quantity = rng.randint(1, 5)
+                    if naive:
+                        naive_sale(db, fabric_id, quantity, 100)
+                    else:
+                        db.add_sale(fabric_id, quantity, 100)
+                    counts["sold"] += 1
+                elif roll < 0.85:
+                    db.add_purchase(fabric_id, rng.randint(1, 10), 50)
+                    counts["bought"] += 1
+                elif not naive:
+                    sale = db._fetchone("SELECT sale_id, selling_price, sale_date FROM sales WHERE fabric_id = ? "
+                                        "ORDER BY sale_id DESC LIMIT 1", (fabric_id,))
+                    if sale:
+                        db.update_sale_data(sale[0], rng.randint(1, 5), sale[1], sale[2])
+                        counts["edited"] += 1
+            except InsufficientStock:
+                counts["short"] += 1
+    finally:
+        db.close()
+    results.put(counts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent sales stress test")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--operations", type=int, default=300, help="operations per worker")
+    parser.add_argument("--naive", action="store_true", help="use the old read-then-write sale")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "stress.db")
+        db = DBManager(path)
+        for i in range(FABRICS):
+            db.add_fabric(f"Fabric {i}", 0)
+            db.add_purchase(i + 1, 200, 50)
+
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=worker, args=(path, seed, args.operations, args.naive, results))
+                     for seed in range(args.workers)]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        totals = {}
+        for _ in processes:
+            for key, value in results.get().items():
+                totals[key] = totals.get(key, 0) + value
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        stock = db._fetchall("""SELECT fabrics.fabric_id, fabrics.stock,
+                                    (SELECT COALESCE(SUM(quantity), 0) FROM purchases WHERE purchases.fabric_id = fabrics.fabric_id)
+                                    - (SELECT COALESCE(SUM(quantity), 0) FROM sales WHERE sales.fabric_id = fabrics.fabric_id)
+                                FROM fabrics""")
+        lowest = dict(db._fetchall("""SELECT fabric_id, MIN(running) FROM (
+                                          SELECT fabric_id, SUM(quantity) OVER (PARTITION BY fabric_id ORDER BY movement_id) AS running
+                                          FROM stock_movements)
+                                      GROUP BY fabric_id"""))
+        negative = [fabric_id for fabric_id, value in lowest.items() if value < -1e-9]
+        wrong = [row for row in stock if abs(row[1] - row[2]) > 1e-9]
+        print(f"{args.workers} workers x {args.operations} operations in {elapsed:.1f} s: {totals}")
+        print("stock per fabric:", {fabric_id: value for fabric_id, value, _ in stock}, "lowest ever:", lowest)
+        print(f"went negative: {len(negative)} fabrics; stock != purchases - sales: {len(wrong)} fabrics; "
+              f"check_stock: {len(db.check_stock())}; check_lots: {len(db.check_lots())} problems")
+        db.close()
+        if negative or wrong:
+            print("FAILED")
+            return 1
+        print("OK")
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
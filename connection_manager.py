@@ -0,0 +1,171 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from profiler import ProfiledCursor
+
+
+class ConnectionManager:
+    """
+    Own the SQLite connections for one database file.
+
+    There is a single writer connection, serialized by a lock, and a small pool
+    of read-only connections. The database runs in WAL mode, so readers keep
+    working from the last committed snapshot while a write is in progress.
+    Every call gets its own cursor. While the profiler is enabled the cursors
+    are ProfiledCursors, so every statement run through them is timed.
+    """
+
+    def __init__(self, db_path, readers=4, cache_size_kb=64 * 1024, mmap_size=256 * 1024 * 1024, profiler=None,
+                 reader_timeout=30):
+        """
+        Parameters:
+        - db_path (str): Path of the SQLite database file.
+        - readers (int): Maximum number of read-only connections.
+        - reader_timeout (float): Seconds to wait for a reader when all are in
+          use before raising sqlite3.OperationalError.
+        - cache_size_kb (int): Page cache size per connection, in KiB.
+        - mmap_size (int): Bytes of the database file to memory-map.
+        - profiler (Profiler, optional): Records the statements while enabled.
+        """
+        self.db_path = db_path
+        self.profiler = profiler
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.max_readers = readers
+        self.reader_timeout = reader_timeout
+
+        self._writer_lock = threading.RLock()
+        self._writer = self._connect()
+        self._writer.execute("PRAGMA journal_mode=WAL")
+
+        self._readers = queue.LifoQueue()
+        self._reader_count = 0
+        self._reader_lock = threading.Lock()
+        self._all_readers = []
+
+    def _connect(self, read_only=False):
+        """Open a connection with the tuned pragmas applied."""
+        if read_only:
+            # urllib.request pulls in http.client and email; only load it once a reader is opened
+            from urllib.request import pathname2url
+            uri = f"file:{pathname2url(self.db_path)}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def _acquire_reader(self):
+        """
+        Take an idle reader, opening a new one while under the pool limit.
+
+        A reader left checked out, such as by a row generator that is never
+        finished or closed, is not returned to the pool; the timeout turns that
+        into an error instead of every later read hanging.
+        """
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._reader_lock:
+            if self._reader_count < self.max_readers:
+                self._reader_count += 1
+                conn = self._connect(read_only=True)
+                self._all_readers.append(conn)
+                return conn
+        try:
+            return self._readers.get(timeout=self.reader_timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"No database reader became free within {self.reader_timeout} s; all {self.max_readers} are in use")
+
+    @contextmanager
+    def reader(self):
+        """Yield a cursor on a pooled read-only connection."""
+        conn = self._acquire_reader()
+        cursor = self._cursor(conn)
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+            self._readers.put(conn)
+
+    @contextmanager
+    def snapshot(self):
+        """Yield a read-only cursor whose queries all see the same committed snapshot."""
+        with self.reader() as cursor:
+            cursor.execute("BEGIN")
+            try:
+                yield cursor
+            finally:
+                cursor.execute("COMMIT")
+
+    @contextmanager
+    def writer(self):
+        """
+        Yield a cursor on the writer connection inside a transaction.
+
+        The transaction commits when the block exits normally and rolls back if it
+        raises, or if the commit itself fails. Nested writer blocks join the outer
+        transaction. It starts with
+        BEGIN IMMEDIATE, so the database write lock is taken up front: a writer in
+        another process waits (up to busy_timeout) instead of both reading stock
+        and then failing to upgrade to a write.
+        """
+        with self._writer_lock:
+            cursor = self._cursor(self._writer)
+            nested = self._writer.in_transaction
+            if not nested:
+                cursor.execute("BEGIN IMMEDIATE")
+            try:
+                yield cursor
+            except BaseException:
+                if not nested:
+                    self._writer.rollback()
+                raise
+            else:
+                if not nested:
+                    try:
+                        self._commit()
+                    except BaseException:
+                        # A failed COMMIT leaves the transaction open, and every
+                        # later writer block would join it and never commit
+                        if self._writer.in_transaction:
+                            self._writer.rollback()
+                        raise
+            finally:
+                cursor.close()
+
+    def _cursor(self, conn):
+        profiler = self.profiler
+        if profiler is not None and profiler.enabled:
+            return ProfiledCursor(conn.cursor(), profiler)
+        return conn.cursor()
+
+    def _commit(self):
+        profiler = self.profiler
+        if profiler is None or not profiler.enabled:
+            self._writer.commit()
+            return
+        # Writing the WAL happens here, not in the statements
+        start = time.perf_counter()
+        self._writer.commit()
+        profiler.record("sql: COMMIT", time.perf_counter() - start)
+
+    def close(self):
+        """Close the writer and every reader connection."""
+        with self._reader_lock:
+            for conn in self._all_readers:
+                conn.close()
+            self._all_readers = []
+            self._reader_count = 0
+            self._readers = queue.LifoQueue()
+        with self._writer_lock:
+            self._writer.close()
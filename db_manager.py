@@ -1,5 +1,12 @@
 import sqlite3
-from datetime import datetime
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from connection_manager import ConnectionManager
+from fabric_catalog import FabricCatalog
+from lot_engine import LotEngine
+from profiler import Profiler
+from repository import FabricRepository
 
 import sys
 import os
@@ -10,74 +17,675 @@ else:
     base_path = os.path.abspath(".")
 
 db_path = os.path.join(base_path, 'fabric_management.db')
-print("Database Path:", db_path)
 
 
-class DBManager:
-    def __init__(self, db_name="fabric_management.db"):
-        """Initialize and connect to the database."""
-        self.conn = sqlite3.connect(db_path)
-        if self.conn:
-            print("Connection is established")
-        else:
-            print("connection is  not established")
-        self.cursor = self.conn.cursor()
+def _create_fabric_search_index(cursor):
+    """Mirror fabric names into an FTS5 trigram index, if this SQLite build has FTS5."""
+    try:
+        cursor.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS fabrics_fts
+                          USING fts5(fabric_name, content='fabrics', content_rowid='fabric_id', tokenize='trigram')""")
+    except sqlite3.OperationalError as e:
+        # search_fabrics falls back to LIKE scans without the index
+        print("Fabric search index not created:", e)
+        return
+    cursor.execute("""CREATE TRIGGER IF NOT EXISTS trg_fabrics_fts_insert AFTER INSERT ON fabrics
+                      BEGIN
+                          INSERT INTO fabrics_fts (rowid, fabric_name) VALUES (NEW.fabric_id, NEW.fabric_name);
+                      END""")
+    cursor.execute("""CREATE TRIGGER IF NOT EXISTS trg_fabrics_fts_delete AFTER DELETE ON fabrics
+                      BEGIN
+                          INSERT INTO fabrics_fts (fabrics_fts, rowid, fabric_name) VALUES ('delete', OLD.fabric_id, OLD.fabric_name);
+                      END""")
+    cursor.execute("""CREATE TRIGGER IF NOT EXISTS trg_fabrics_fts_update AFTER UPDATE OF fabric_name ON fabrics
+                      BEGIN
+                          INSERT INTO fabrics_fts (fabrics_fts, rowid, fabric_name) VALUES ('delete', OLD.fabric_id, OLD.fabric_name);
+                          INSERT INTO fabrics_fts (rowid, fabric_name) VALUES (NEW.fabric_id, NEW.fabric_name);
+                      END""")
+    cursor.execute("INSERT INTO fabrics_fts (fabrics_fts) VALUES ('rebuild')")
+
+
+def _daily_rollup_triggers(rollup, table, date_column, price_column, cost_column=None):
+    """Triggers keeping a per-day, per-fabric rollup of table current."""
+    day = "substr({0}.%s, 1, 10)" % date_column
+    cost_insert = ", cost" if cost_column else ""
+    cost_value = f", COALESCE(NEW.{cost_column}, 0)" if cost_column else ""
+    cost_add = ",\n                    cost = cost + excluded.cost" if cost_column else ""
+    cost_remove = f",\n                    cost = cost - COALESCE(OLD.{cost_column}, 0)" if cost_column else ""
+    add = f"""INSERT INTO {rollup} (day, fabric_id, quantity, value, row_count{cost_insert})
+                VALUES ({day.format("NEW")}, NEW.fabric_id, NEW.quantity, NEW.quantity * NEW.{price_column}, 1{cost_value})
+                ON CONFLICT (day, fabric_id) DO UPDATE SET
+                    quantity = quantity + excluded.quantity,
+                    value = value + excluded.value,
+                    row_count = row_count + 1{cost_add};"""
+    remove = f"""UPDATE {rollup}
+                SET quantity = quantity - OLD.quantity,
+                    value = value - OLD.quantity * OLD.{price_column},
+                    row_count = row_count - 1{cost_remove}
+                WHERE day = {day.format("OLD")} AND fabric_id = OLD.fabric_id;
+                DELETE FROM {rollup} WHERE day = {day.format("OLD")} AND fabric_id = OLD.fabric_id AND row_count = 0;"""
+    columns = f"fabric_id, quantity, {price_column}, {date_column}" + (f", {cost_column}" if cost_column else "")
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_rollup_insert AFTER INSERT ON {table}
+            BEGIN
+                {add}
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_rollup_update
+            AFTER UPDATE OF {columns} ON {table}
+            BEGIN
+                {remove}
+                {add}
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_rollup_delete AFTER DELETE ON {table}
+            BEGIN
+                {remove}
+            END""",
+    ]
+
+
+def _daily_rollup_backfill(rollup, table, date_column, price_column, cost_column=None):
+    """Statement filling an empty rollup from table."""
+    cost_insert = ", cost" if cost_column else ""
+    cost_sum = f", SUM(COALESCE({cost_column}, 0))" if cost_column else ""
+    return f"""INSERT INTO {rollup} (day, fabric_id, quantity, value, row_count{cost_insert})
+            SELECT substr({date_column}, 1, 10), fabric_id, SUM(quantity), SUM(quantity * {price_column}), COUNT(*){cost_sum}
+            FROM {table} GROUP BY substr({date_column}, 1, 10), fabric_id"""
+
+
+def _daily_rollup_steps(rollup, table, date_column, price_column):
+    """Migration steps creating a per-day, per-fabric rollup of table kept current by triggers."""
+    return [
+        f"""CREATE TABLE IF NOT EXISTS {rollup} (
+                day TEXT NOT NULL,
+                fabric_id INTEGER NOT NULL,
+                quantity REAL NOT NULL DEFAULT 0,
+                value REAL NOT NULL DEFAULT 0,
+                row_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, fabric_id)) WITHOUT ROWID""",
+        *_daily_rollup_triggers(rollup, table, date_column, price_column),
+        _daily_rollup_backfill(rollup, table, date_column, price_column),
+    ]
+
+
+def _stock_movement_triggers(table, id_column, date_column, sign):
+    """Triggers appending a stock movement for every row written to table (sign is "+" or "-")."""
+    reverse = "-" if sign == "+" else "+"
+    add = f"""INSERT INTO stock_movements (fabric_id, moved_at, quantity, source, source_id)
+                VALUES (NEW.fabric_id, NEW.{date_column}, {sign}NEW.quantity, '{table}', NEW.{id_column});"""
+    # An edit or delete appends a reversal at the old date rather than changing the old movement
+    remove = f"""INSERT INTO stock_movements (fabric_id, moved_at, quantity, source, source_id)
+                VALUES (OLD.fabric_id, OLD.{date_column}, {reverse}OLD.quantity, '{table}', OLD.{id_column});"""
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_stock_insert AFTER INSERT ON {table}
+            BEGIN
+                {add}
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_stock_update
+            AFTER UPDATE OF fabric_id, quantity, {date_column} ON {table}
+            WHEN OLD.fabric_id IS NOT NEW.fabric_id OR OLD.quantity IS NOT NEW.quantity
+                OR OLD.{date_column} IS NOT NEW.{date_column}
+            BEGIN
+                {remove}
+                {add}
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_stock_delete AFTER DELETE ON {table}
+            BEGIN
+                {remove}
+            END""",
+    ]
+
+
+def _change_log_triggers(table, id_column, columns):
+    """Triggers appending every insert, update (of columns) and delete on table to the change log."""
+    log = """INSERT INTO change_log (entity, entity_id, fabric_id, action)
+                VALUES ('{table}', {row}.{id_column}, {row}.fabric_id, '{action}');"""
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_changes_insert AFTER INSERT ON {table}
+            BEGIN
+                {log.format(table=table, row="NEW", id_column=id_column, action="insert")}
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_changes_update AFTER UPDATE OF {columns} ON {table}
+            BEGIN
+                {log.format(table=table, row="NEW", id_column=id_column, action="update")}
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_changes_delete AFTER DELETE ON {table}
+            BEGIN
+                {log.format(table=table, row="OLD", id_column=id_column, action="delete")}
+            END""",
+    ]
+
+
+def _cost_existing_sales(cursor):
+    """Allocate every existing sale to purchase lots, oldest lots first."""
+    LotEngine("fifo").replay_all(cursor)
+
+
+# ---- Schema Migrations ----
+# Each entry upgrades the schema by one version. The number of migrations
+# applied is stored in PRAGMA user_version, so existing databases are
+# upgraded in place at startup. Only ever append to this list.
+MIGRATIONS = [
+    # 1: covering indexes for date-range and per-fabric queries
+    [
+        "CREATE INDEX IF NOT EXISTS idx_sales_date_fabric ON sales (sale_date, fabric_id, quantity, selling_price)",
+        "CREATE INDEX IF NOT EXISTS idx_sales_fabric_date ON sales (fabric_id, sale_date, quantity, selling_price)",
+        "CREATE INDEX IF NOT EXISTS idx_purchases_date_fabric ON purchases (purchase_date, fabric_id, quantity, cost_price)",
+        "CREATE INDEX IF NOT EXISTS idx_purchases_fabric_date ON purchases (fabric_id, purchase_date, quantity, cost_price)",
+    ],
+    # 2: running per-fabric purchase totals for the weighted-average cost
+    [
+        """CREATE TABLE IF NOT EXISTS fabric_cost (
+                fabric_id INTEGER PRIMARY KEY,
+                total_qty REAL NOT NULL DEFAULT 0,
+                total_value REAL NOT NULL DEFAULT 0,
+                FOREIGN KEY (fabric_id) REFERENCES fabrics(fabric_id))""",
+        """CREATE TRIGGER IF NOT EXISTS trg_purchases_cost_insert AFTER INSERT ON purchases
+            BEGIN
+                INSERT INTO fabric_cost (fabric_id, total_qty, total_value)
+                VALUES (NEW.fabric_id, NEW.quantity, NEW.quantity * NEW.cost_price)
+                ON CONFLICT (fabric_id) DO UPDATE SET
+                    total_qty = total_qty + excluded.total_qty,
+                    total_value = total_value + excluded.total_value;
+            END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_purchases_cost_update AFTER UPDATE OF fabric_id, quantity, cost_price ON purchases
+            BEGIN
+                UPDATE fabric_cost
+                SET total_qty = total_qty - OLD.quantity,
+                    total_value = total_value - OLD.quantity * OLD.cost_price
+                WHERE fabric_id = OLD.fabric_id;
+                INSERT INTO fabric_cost (fabric_id, total_qty, total_value)
+                VALUES (NEW.fabric_id, NEW.quantity, NEW.quantity * NEW.cost_price)
+                ON CONFLICT (fabric_id) DO UPDATE SET
+                    total_qty = total_qty + excluded.total_qty,
+                    total_value = total_value + excluded.total_value;
+            END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_purchases_cost_delete AFTER DELETE ON purchases
+            BEGIN
+                UPDATE fabric_cost
+                SET total_qty = total_qty - OLD.quantity,
+                    total_value = total_value - OLD.quantity * OLD.cost_price
+                WHERE fabric_id = OLD.fabric_id;
+            END""",
+        """INSERT INTO fabric_cost (fabric_id, total_qty, total_value)
+            SELECT fabric_id, SUM(quantity), SUM(quantity * cost_price)
+            FROM purchases GROUP BY fabric_id""",
+    ],
+    # 3: trigram full-text index over fabric names for substring/fuzzy search
+    [
+        _create_fabric_search_index,
+    ],
+    # 4: per-day sales and purchase totals for date-range reporting
+    _daily_rollup_steps("daily_sales_rollup", "sales", "sale_date", "selling_price")
+    + _daily_rollup_steps("daily_purchase_rollup", "purchases", "purchase_date", "cost_price"),
+    # 5: purchase lots, per-sale cost of goods stored at write time, and COGS in the sales rollup
+    [
+        "ALTER TABLE sales ADD COLUMN cogs REAL",
+        """CREATE TABLE IF NOT EXISTS purchase_lots (
+                purchase_id INTEGER PRIMARY KEY,
+                fabric_id INTEGER NOT NULL,
+                purchase_date TEXT NOT NULL,
+                quantity REAL NOT NULL,
+                cost_price REAL NOT NULL,
+                remaining REAL NOT NULL,
+                FOREIGN KEY (purchase_id) REFERENCES purchases(purchase_id))""",
+        # Only lots with stock left are searched when costing a sale
+        """CREATE INDEX IF NOT EXISTS idx_purchase_lots_open ON purchase_lots (fabric_id, purchase_date, purchase_id)
+            WHERE remaining > 0""",
+        "CREATE INDEX IF NOT EXISTS idx_purchase_lots_fabric_date ON purchase_lots (fabric_id, purchase_date)",
+        """CREATE TABLE IF NOT EXISTS lot_allocations (
+                sale_id INTEGER NOT NULL,
+                purchase_id INTEGER,
+                quantity REAL NOT NULL,
+                cost REAL NOT NULL,
+                FOREIGN KEY (sale_id) REFERENCES sales(sale_id),
+                FOREIGN KEY (purchase_id) REFERENCES purchase_lots(purchase_id))""",
+        "CREATE INDEX IF NOT EXISTS idx_lot_allocations_sale ON lot_allocations (sale_id)",
+        "CREATE INDEX IF NOT EXISTS idx_lot_allocations_purchase ON lot_allocations (purchase_id)",
+        """CREATE TRIGGER IF NOT EXISTS trg_purchases_lot_insert AFTER INSERT ON purchases
+            BEGIN
+                INSERT INTO purchase_lots (purchase_id, fabric_id, purchase_date, quantity, cost_price, remaining)
+                VALUES (NEW.purchase_id, NEW.fabric_id, NEW.purchase_date, NEW.quantity, NEW.cost_price, NEW.quantity);
+            END""",
+        # remaining is recomputed by LotEngine.replay after the edit
+        """CREATE TRIGGER IF NOT EXISTS trg_purchases_lot_update
+            AFTER UPDATE OF fabric_id, quantity, cost_price, purchase_date ON purchases
+            BEGIN
+                UPDATE purchase_lots
+                SET fabric_id = NEW.fabric_id, purchase_date = NEW.purchase_date, quantity = NEW.quantity,
+                    cost_price = NEW.cost_price, remaining = remaining + NEW.quantity - OLD.quantity
+                WHERE purchase_id = OLD.purchase_id;
+            END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_purchases_lot_delete AFTER DELETE ON purchases
+            BEGIN
+                DELETE FROM purchase_lots WHERE purchase_id = OLD.purchase_id;
+            END""",
+        """INSERT INTO purchase_lots (purchase_id, fabric_id, purchase_date, quantity, cost_price, remaining)
+            SELECT purchase_id, fabric_id, purchase_date, quantity, cost_price, quantity FROM purchases""",
+        _cost_existing_sales,
+        "ALTER TABLE daily_sales_rollup ADD COLUMN cost REAL NOT NULL DEFAULT 0",
+        "DROP TRIGGER IF EXISTS trg_sales_rollup_insert",
+        "DROP TRIGGER IF EXISTS trg_sales_rollup_update",
+        "DROP TRIGGER IF EXISTS trg_sales_rollup_delete",
+        *_daily_rollup_triggers("daily_sales_rollup", "sales", "sale_date", "selling_price", "cogs"),
+        "DELETE FROM daily_sales_rollup",
+        _daily_rollup_backfill("daily_sales_rollup", "sales", "sale_date", "selling_price", "cogs"),
+    ],
+    # 6: append-only stock ledger with per-fabric snapshot checkpoints
+    [
+        """CREATE TABLE IF NOT EXISTS stock_movements (
+                movement_id INTEGER PRIMARY KEY,
+                fabric_id INTEGER NOT NULL,
+                moved_at TEXT NOT NULL,
+                quantity REAL NOT NULL,
+                source TEXT NOT NULL,
+                source_id INTEGER,
+                FOREIGN KEY (fabric_id) REFERENCES fabrics(fabric_id))""",
+        "CREATE INDEX IF NOT EXISTS idx_stock_movements_fabric_time ON stock_movements (fabric_id, moved_at, quantity)",
+        """CREATE TABLE IF NOT EXISTS stock_snapshots (
+                fabric_id INTEGER NOT NULL,
+                taken_at TEXT NOT NULL,
+                stock REAL NOT NULL,
+                PRIMARY KEY (fabric_id, taken_at)) WITHOUT ROWID""",
+        """CREATE TRIGGER IF NOT EXISTS trg_stock_movements_no_update BEFORE UPDATE ON stock_movements
+            BEGIN
+                SELECT RAISE(ABORT, 'stock_movements is append-only');
+            END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_stock_movements_no_delete BEFORE DELETE ON stock_movements
+            BEGIN
+                SELECT RAISE(ABORT, 'stock_movements is append-only');
+            END""",
+        # A back-dated movement makes every later snapshot of its fabric stale
+        """CREATE TRIGGER IF NOT EXISTS trg_stock_movements_snapshots AFTER INSERT ON stock_movements
+            BEGIN
+                DELETE FROM stock_snapshots WHERE fabric_id = NEW.fabric_id AND taken_at >= NEW.moved_at;
+            END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_fabrics_stock_opening AFTER INSERT ON fabrics
+            WHEN NEW.stock <> 0
+            BEGIN
+                INSERT INTO stock_movements (fabric_id, moved_at, quantity, source, source_id)
+                VALUES (NEW.fabric_id, strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime'), NEW.stock, 'opening', NULL);
+            END""",
+        *_stock_movement_triggers("purchases", "purchase_id", "purchase_date", "+"),
+        *_stock_movement_triggers("sales", "sale_id", "sale_date", "-"),
+        """INSERT INTO stock_movements (fabric_id, moved_at, quantity, source, source_id)
+            SELECT fabric_id, purchase_date, quantity, 'purchases', purchase_id FROM purchases
+            UNION ALL
+            SELECT fabric_id, sale_date, -quantity, 'sales', sale_id FROM sales
+            ORDER BY 2""",
+        # Whatever the history does not explain (stock entered with the fabric or
+        # adjusted by hand) becomes an opening balance before the first movement
+        """INSERT INTO stock_movements (fabric_id, moved_at, quantity, source, source_id)
+            SELECT fabrics.fabric_id,
+                COALESCE((SELECT MIN(moved_at) FROM stock_movements WHERE stock_movements.fabric_id = fabrics.fabric_id),
+                         strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime')),
+                fabrics.stock - COALESCE((SELECT SUM(quantity) FROM stock_movements
+                                          WHERE stock_movements.fabric_id = fabrics.fabric_id), 0),
+                'opening', NULL
+            FROM fabrics
+            WHERE abs(fabrics.stock - COALESCE((SELECT SUM(quantity) FROM stock_movements
+                                                WHERE stock_movements.fabric_id = fabrics.fabric_id), 0)) > 1e-9""",
+    ],
+    # 7: a fabric catalog version for HTTP caching, and (date, id) order for keyset pagination
+    [
+        """CREATE TABLE IF NOT EXISTS data_versions (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0)""",
+        "INSERT OR IGNORE INTO data_versions (name, version) VALUES ('fabrics', 1)",
+        """CREATE TRIGGER IF NOT EXISTS trg_fabrics_version_insert AFTER INSERT ON fabrics
+            BEGIN
+                UPDATE data_versions SET version = version + 1 WHERE name = 'fabrics';
+            END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_fabrics_version_update AFTER UPDATE OF fabric_name ON fabrics
+            BEGIN
+                UPDATE data_versions SET version = version + 1 WHERE name = 'fabrics';
+            END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_fabrics_version_delete AFTER DELETE ON fabrics
+            BEGIN
+                UPDATE data_versions SET version = version + 1 WHERE name = 'fabrics';
+            END""",
+        # The rowid is the implicit last column, so these are ordered by (date, id)
+        "CREATE INDEX IF NOT EXISTS idx_sales_date ON sales (sale_date)",
+        "CREATE INDEX IF NOT EXISTS idx_purchases_date ON purchases (purchase_date)",
+    ],
+    # 8: change feed for remote clients' caches
+    [
+        # AUTOINCREMENT, so a sequence number is never reused even after pruning
+        """CREATE TABLE IF NOT EXISTS change_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                entity TEXT NOT NULL,
+                entity_id INTEGER NOT NULL,
+                fabric_id INTEGER,
+                action TEXT NOT NULL)""",
+        *_change_log_triggers("fabrics", "fabric_id", "fabric_name, stock"),
+        # cogs is left out: lot replays rewrite it for many rows, and clients
+        # refresh every report on any sales change anyway
+        *_change_log_triggers("sales", "sale_id", "fabric_id, quantity, selling_price, sale_date"),
+        *_change_log_triggers("purchases", "purchase_id", "fabric_id, quantity, cost_price, purchase_date"),
+    ],
+    # 9: opening stock as each fabric's oldest lot, costed at its weighted-average purchase cost
+    [
+        # Costing the existing sales in migration 5 may already have made an empty one
+        """INSERT INTO purchase_lots (purchase_id, fabric_id, purchase_date, quantity, cost_price, remaining)
+            SELECT -stock_movements.fabric_id, stock_movements.fabric_id, '', SUM(stock_movements.quantity),
+                COALESCE((SELECT total_value / total_qty FROM fabric_cost
+                          WHERE fabric_cost.fabric_id = stock_movements.fabric_id AND total_qty > 0), 0),
+                SUM(stock_movements.quantity)
+            FROM stock_movements WHERE source = 'opening'
+            GROUP BY stock_movements.fabric_id
+            HAVING SUM(stock_movements.quantity) > 0
+            ON CONFLICT (purchase_id) DO UPDATE SET quantity = excluded.quantity, remaining = excluded.remaining""",
+        # The lot id matches LotEngine.opening_lot_id; its cost is set when a sale draws on it
+        """CREATE TRIGGER IF NOT EXISTS trg_fabrics_opening_lot AFTER INSERT ON fabrics
+            WHEN NEW.stock > 0
+            BEGIN
+                INSERT OR REPLACE INTO purchase_lots (purchase_id, fabric_id, purchase_date, quantity, cost_price, remaining)
+                VALUES (-NEW.fabric_id, NEW.fabric_id, '', NEW.stock, 0, NEW.stock);
+            END""",
+        _cost_existing_sales,
+    ],
+    # 10: cogs in the sales covering indexes, so the range sums that read it stay index-only
+    [
+        "DROP INDEX IF EXISTS idx_sales_date_fabric",
+        "DROP INDEX IF EXISTS idx_sales_fabric_date",
+        "CREATE INDEX idx_sales_date_fabric ON sales (sale_date, fabric_id, quantity, selling_price, cogs)",
+        "CREATE INDEX idx_sales_fabric_date ON sales (fabric_id, sale_date, quantity, selling_price, cogs)",
+    ],
+    # 11: purchase_lots without its foreign key to purchases. Besides one lot per
+    # purchase it holds each fabric's opening-stock lot (purchase_id -fabric_id,
+    # see LotEngine.opening_lot_id), which no purchase row backs; the lot rows of
+    # purchases are kept in step by the trg_purchases_lot_* triggers instead.
+    # SQLite cannot drop a constraint, so the table is rebuilt.
+    [
+        """CREATE TABLE purchase_lots_new (
+                purchase_id INTEGER PRIMARY KEY,
+                fabric_id INTEGER NOT NULL,
+                purchase_date TEXT NOT NULL,
+                quantity REAL NOT NULL,
+                cost_price REAL NOT NULL,
+                remaining REAL NOT NULL)""",
+        """INSERT INTO purchase_lots_new (purchase_id, fabric_id, purchase_date, quantity, cost_price, remaining)
+            SELECT purchase_id, fabric_id, purchase_date, quantity, cost_price, remaining FROM purchase_lots""",
+        "DROP TABLE purchase_lots",
+        # The triggers naming purchase_lots are left as they are: without legacy
+        # mode the rename would reject them for naming a table that is missing
+        "PRAGMA legacy_alter_table = ON",
+        "ALTER TABLE purchase_lots_new RENAME TO purchase_lots",
+        "PRAGMA legacy_alter_table = OFF",
+        """CREATE INDEX idx_purchase_lots_open ON purchase_lots (fabric_id, purchase_date, purchase_id)
+            WHERE remaining > 0""",
+        "CREATE INDEX idx_purchase_lots_fabric_date ON purchase_lots (fabric_id, purchase_date)",
+    ],
+]
+
+
+SALES_DATA_QUERY = """
+    SELECT sales.sale_id, sales.sale_date, fabrics.fabric_name, sales.quantity, sales.selling_price,
+        sales.quantity*sales.selling_price AS revenue
+    FROM sales JOIN fabrics ON sales.fabric_id = fabrics.fabric_id
+    WHERE sales.sale_date BETWEEN ? AND ?
+    ORDER BY sales.sale_date DESC
+"""
+
+PURCHASE_DATA_QUERY = """
+    SELECT purchases.purchase_id, purchases.purchase_date, fabrics.fabric_name, purchases.quantity,
+        purchases.cost_price, purchases.quantity*purchases.cost_price AS expendicture
+    FROM purchases JOIN fabrics ON purchases.fabric_id = fabrics.fabric_id
+    WHERE purchases.purchase_date BETWEEN ? AND ?
+    ORDER BY purchases.purchase_date DESC
+"""
+
+FABRICS_STOCK_QUERY = """
+    WITH latest_cost AS (
+        SELECT fabric_id, total_value/total_qty AS cost_price
+        FROM fabric_cost
+    )
+    SELECT fabrics.fabric_id, fabrics.fabric_name, fabrics.stock,
+        COALESCE(latest_cost.cost_price, 0) AS cost_price,
+        COALESCE(latest_cost.cost_price*stock, 0) AS total_cost
+    FROM fabrics LEFT JOIN latest_cost ON fabrics.fabric_id = latest_cost.fabric_id
+"""
+
+# get_sales_data / get_purchase_data / get_all_fabrics_stock rows picked by id
+SALES_BY_IDS_QUERY = """
+    SELECT sales.sale_id, sales.sale_date, fabrics.fabric_name, sales.quantity, sales.selling_price,
+        sales.quantity*sales.selling_price AS revenue
+    FROM sales JOIN fabrics ON sales.fabric_id = fabrics.fabric_id
+    WHERE sales.sale_id IN ({ids})
+"""
+
+PURCHASES_BY_IDS_QUERY = """
+    SELECT purchases.purchase_id, purchases.purchase_date, fabrics.fabric_name, purchases.quantity,
+        purchases.cost_price, purchases.quantity*purchases.cost_price AS expendicture
+    FROM purchases JOIN fabrics ON purchases.fabric_id = fabrics.fabric_id
+    WHERE purchases.purchase_id IN ({ids})
+"""
+
+# Bumped by triggers whenever a fabric is added, renamed or deleted
+CATALOG_VERSION_QUERY = "SELECT version FROM data_versions WHERE name = 'fabrics'"
+
+FABRICS_STOCK_BY_IDS_QUERY = f"SELECT * FROM ({FABRICS_STOCK_QUERY}) WHERE fabric_id IN ({{ids}})"
+
+
+class InsufficientStock(ValueError):
+    """A sale, edit or adjustment would take a fabric's stock below zero."""
+
+    def __init__(self, fabric_id, requested, available):
+        super().__init__(f"Not enough stock for fabric id {fabric_id}: requested {requested}, available {available}")
+        self.fabric_id = fabric_id
+        self.requested = requested
+        self.available = available
+
+
+class InvalidQuantity(ValueError):
+    """A sale or purchase quantity is not greater than zero."""
+
+    def __init__(self, quantity):
+        super().__init__(f"Quantity must be greater than zero, got {quantity}.")
+        self.quantity = quantity
+
+
+# Newest first, keyset-paginated on (date, id); the extra parameters are the
+# (date, id) of the last row of the previous page
+SALES_PAGE_QUERY = """
+    SELECT sales.sale_id, sales.sale_date, fabrics.fabric_name, sales.quantity, sales.selling_price,
+        sales.quantity*sales.selling_price AS revenue
+    FROM sales JOIN fabrics ON sales.fabric_id = fabrics.fabric_id
+    WHERE sales.sale_date BETWEEN ? AND ? AND (sales.sale_date, sales.sale_id) < (?, ?)
+    ORDER BY sales.sale_date DESC, sales.sale_id DESC
+    LIMIT ?
+"""
+
+PURCHASE_PAGE_QUERY = """
+    SELECT purchases.purchase_id, purchases.purchase_date, fabrics.fabric_name, purchases.quantity,
+        purchases.cost_price, purchases.quantity*purchases.cost_price AS expendicture
+    FROM purchases JOIN fabrics ON purchases.fabric_id = fabrics.fabric_id
+    WHERE purchases.purchase_date BETWEEN ? AND ? AND (purchases.purchase_date, purchases.purchase_id) < (?, ?)
+    ORDER BY purchases.purchase_date DESC, purchases.purchase_id DESC
+    LIMIT ?
+"""
+
+
+ProfitLossRow = namedtuple("ProfitLossRow", ["fabric_id", "fabric_name", "units_sold", "cost_price",
+                                             "selling_price", "revenue", "cost", "profit"])
+
+
+class DBManager(FabricRepository):
+    # search_fabrics ranks at most this many candidates per requested result
+    SEARCH_CANDIDATES_PER_RESULT = 20
+    # Rows fetched per round trip by the iter_* methods
+    FETCH_CHUNK_ROWS = 5000
+    # Transaction tables with a daily rollup:
+    # (table, date column, price column, rollup table, cost-of-goods column or None)
+    DAILY_ROLLUPS = {
+        "sales": ("sales", "sale_date", "selling_price", "daily_sales_rollup", "cogs"),
+        "purchases": ("purchases", "purchase_date", "cost_price", "daily_purchase_rollup", None),
+    }
+    # checkpoint_stock snapshots a fabric's stock after about this many ledger movements
+    STOCK_SNAPSHOT_INTERVAL = 1000
+
+    def __init__(self, db_name=db_path, readers=4, cost_method="fifo", profiler=None):
+        """
+        Initialize and connect to the database.
+
+        cost_method is how sales draw on purchase lots ("fifo", "lifo" or
+        "average"); call replay_lots after changing it for an existing database.
+        profiler times every statement while it is enabled; by default it is
+        configured from the environment (see Profiler.from_environment).
+        """
+        self.profiler = profiler if profiler is not None else Profiler.from_environment()
+        print("Database Path:", db_name)
+        self.connections = ConnectionManager(db_name, readers=readers, profiler=self.profiler)
+        self.lots = LotEngine(cost_method)
+        self._has_search_index = None
+        print("Connection is established")
         self.create_tables()
+        # Shared by every fabric lookup and combo box; loaded on first use
+        self.catalog = FabricCatalog(lambda: self._fetchall("SELECT fabric_id, fabric_name FROM fabrics ORDER BY fabric_id"),
+                                     self.get_catalog_version)
     def test_connection(self):
         try:
-            self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = self.cursor.fetchall()
+            with self.connections.reader() as cursor:
+                cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+                tables = cursor.fetchall()
             print("Tables:", tables)
         except Exception as e:
             print("Error:", e)
     def create_tables(self):
         """Create necessary tables if they don't exist."""
-        self.cursor.execute('''CREATE TABLE IF NOT EXISTS fabrics (
-                                fabric_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                fabric_name TEXT UNIQUE NOT NULL,
-                                stock REAL NOT NULL DEFAULT 0)''')
-
-        self.cursor.execute('''CREATE TABLE IF NOT EXISTS purchases (
-                                purchase_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                fabric_id INTEGER,
-                                quantity REAL NOT NULL,
-                                cost_price REAL NOT NULL,
-                                purchase_date TEXT NOT NULL,
-                                FOREIGN KEY (fabric_id) REFERENCES fabrics(fabric_id))''')
-
-        self.cursor.execute('''CREATE TABLE IF NOT EXISTS sales (
-                                sale_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                fabric_id INTEGER,
-                                quantity REAL NOT NULL,
-                                selling_price REAL NOT NULL,
-                                sale_date TEXT NOT NULL,
-                                FOREIGN KEY (fabric_id) REFERENCES fabrics(fabric_id))''')
-
-        self.conn.commit()
+        with self.connections.writer() as cursor:
+            cursor.execute('''CREATE TABLE IF NOT EXISTS fabrics (
+                                    fabric_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                    fabric_name TEXT UNIQUE NOT NULL,
+                                    stock REAL NOT NULL DEFAULT 0)''')
+
+            cursor.execute('''CREATE TABLE IF NOT EXISTS purchases (
+                                    purchase_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                    fabric_id INTEGER,
+                                    quantity REAL NOT NULL,
+                                    cost_price REAL NOT NULL,
+                                    purchase_date TEXT NOT NULL,
+                                    FOREIGN KEY (fabric_id) REFERENCES fabrics(fabric_id))''')
+
+            cursor.execute('''CREATE TABLE IF NOT EXISTS sales (
+                                    sale_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                    fabric_id INTEGER,
+                                    quantity REAL NOT NULL,
+                                    selling_price REAL NOT NULL,
+                                    sale_date TEXT NOT NULL,
+                                    FOREIGN KEY (fabric_id) REFERENCES fabrics(fabric_id))''')
+
+        self.run_migrations()
+
+    def run_migrations(self):
+        """
+        Apply any migrations newer than the database's user_version.
+
+        Each migration reads user_version again in the transaction that applies
+        it, so when several processes open a new database at once the migration
+        is applied by whichever gets the write lock first and skipped by the rest.
+        """
+        while True:
+            with self.connections.writer() as cursor:
+                number = cursor.execute("PRAGMA user_version").fetchone()[0] + 1
+                if number > len(MIGRATIONS):
+                    return
+                for step in MIGRATIONS[number - 1]:
+                    if callable(step):
+                        step(cursor)
+                    else:
+                        cursor.execute(step)
+                # PRAGMA does not accept bound parameters
+                cursor.execute(f"PRAGMA user_version = {number}")
+            print(f"Applied database migration {number}")
+
+    def explain_query_plan(self, query, params=()):
+        """Return the EXPLAIN QUERY PLAN details for a query."""
+        return [row[3] for row in self._fetchall("EXPLAIN QUERY PLAN " + query, params)]
+
+    def _fetchall(self, query, params=()):
+        """Run a read-only query on a pooled connection and return every row."""
+        with self.connections.reader() as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+
+    def _fetchone(self, query, params=()):
+        """Run a read-only query on a pooled connection and return the first row."""
+        with self.connections.reader() as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchone()
+
+    def _iter_rows(self, query, params=(), chunk_size=None):
+        """
+        Run a read-only query and yield its rows, fetching chunk_size rows at a time.
+
+        The pooled connection is held until the generator is exhausted or closed,
+        so only a chunk of rows is ever in memory.
+        """
+        chunk_size = chunk_size or self.FETCH_CHUNK_ROWS
+        with self.connections.reader() as cursor:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield from rows
 
     # ---- CRUD Operations for Stock Management ----
     def add_fabric(self, fabric_name, stock):
         """Add a new fabric to the database."""
         try:
-            self.cursor.execute("INSERT INTO fabrics (fabric_name, stock) VALUES (?, ?)", (fabric_name,stock))
-            self.conn.commit()
+            with self.connections.writer() as cursor:
+                cursor.execute("INSERT INTO fabrics (fabric_name, stock) VALUES (?, ?)", (fabric_name,stock))
+                fabric_id = cursor.lastrowid
+                version = cursor.execute(CATALOG_VERSION_QUERY).fetchone()[0]
+            self.catalog.add(fabric_id, fabric_name, version)
             return {"success":f"Successfully added the {fabric_name}"}
         except sqlite3.IntegrityError:
             raise ValueError(f"Fabric '{fabric_name}' already exists.")
 
+    def add_fabrics_bulk(self, rows):
+        """
+        Add many fabrics in a single transaction.
+
+        Parameters:
+        - rows (iterable): (fabric_name, stock) tuples.
+
+        If any name already exists, ValueError is raised and none are added.
+        The catalog is reloaded on its next use.
+        """
+        rows = list(rows)
+        try:
+            with self.connections.writer() as cursor:
+                cursor.executemany("INSERT INTO fabrics (fabric_name, stock) VALUES (?, ?)", rows)
+        except sqlite3.IntegrityError:
+            raise ValueError("One of the fabrics already exists.")
+        finally:
+            self.catalog.invalidate()
+        return len(rows)
+
     def update_stock(self, fabric_id, quantity, operation="add"):
-        """Update fabric stock by adding or subtracting the quantity."""
+        """Update fabric stock by adding or subtracting the quantity, recording it in the ledger as an adjustment."""
         if operation == "add":
-            res=self.cursor.execute("UPDATE fabrics SET stock = stock + ? WHERE fabric_id = ?", (quantity, fabric_id))
+            delta = quantity
         elif operation == "subtract":
-            res=self.cursor.execute("UPDATE fabrics SET stock = stock - ? WHERE fabric_id = ?", (quantity, fabric_id))
-        self.conn.commit()
-        return res
+            delta = -quantity
+        else:
+            return 0
+        with self.connections.writer() as cursor:
+            if delta < 0:
+                self._take_stock(cursor, fabric_id, -delta)
+                updated = 1
+            else:
+                cursor.execute("UPDATE fabrics SET stock = stock + ? WHERE fabric_id = ?", (delta, fabric_id))
+                updated = cursor.rowcount
+            if updated:
+                cursor.execute("""INSERT INTO stock_movements (fabric_id, moved_at, quantity, source, source_id)
+                                  VALUES (?, ?, ?, 'adjustment', NULL)""",
+                               (fabric_id, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), delta))
+            return updated
 
     def get_fabric_stock(self, fabric_name):
         """Get the stock of a particular fabric."""
-        self.cursor.execute("SELECT stock FROM fabrics WHERE fabric_name = ?", (fabric_name,))
-        result = self.cursor.fetchone()
+        result = self._fetchone("SELECT stock FROM fabrics WHERE fabric_name = ?", (fabric_name,))
         if result:
             return result[0]
         else:
@@ -85,177 +693,740 @@ class DBManager:
 
     def get_total_stock(self):
         """Get the total available stock across all fabrics."""
-        self.cursor.execute("SELECT SUM(stock) FROM fabrics")
-        total_stock = self.cursor.fetchone()[0]
+        total_stock = self._fetchone("SELECT SUM(stock) FROM fabrics")[0]
         return total_stock if total_stock else 0
 
     # ---- Purchase Operations ----
     def add_purchase(self, fabric_id, quantity, cost_price):
         """Record a purchase transaction and update the stock."""
-        purchase_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        self.cursor.execute("INSERT INTO purchases (fabric_id, quantity, cost_price, purchase_date) VALUES (?, ?, ?, ?)",
-                            (fabric_id, quantity, cost_price, purchase_date))
-        self.update_stock(fabric_id, quantity, operation="add")
-        self.conn.commit()
+        self.add_purchases_bulk([(fabric_id, quantity, cost_price)])
+
+    def add_purchases_bulk(self, rows):
+        """
+        Record many purchases in a single transaction.
+
+        Parameters:
+        - rows (iterable): (fabric_id, quantity, cost_price) tuples, optionally with a
+          fourth purchase_date element; missing dates default to now.
+
+        Stock is updated with one UPDATE per fabric. If any line fails the whole
+        batch is rolled back; InvalidQuantity is raised for a quantity that is
+        not greater than zero.
+        """
+        rows = self._dated_rows(rows)
+        deltas = self._stock_deltas(rows)
+        with self.connections.writer() as cursor:
+            self._check_quantities(rows)
+            self._check_fabrics_exist(cursor, deltas)
+            cursor.executemany("INSERT INTO purchases (fabric_id, quantity, cost_price, purchase_date) VALUES (?, ?, ?, ?)", rows)
+            cursor.executemany("UPDATE fabrics SET stock = stock + ? WHERE fabric_id = ?",
+                               [(quantity, fabric_id) for fabric_id, quantity in deltas.items()])
+            self._replay_lots_from(cursor, rows)
 
     # ---- Sales Operations ----
     def add_sale(self, fabric_id, quantity, selling_price):
         """Record a sale transaction and update the stock."""
-        sale_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        self.cursor.execute("INSERT INTO sales (fabric_id, quantity, selling_price, sale_date) VALUES (?, ?, ?, ?)",
-                            (fabric_id, quantity, selling_price, sale_date))
-        self.update_stock(fabric_id, quantity, operation="subtract")
-        self.conn.commit()
+        self.add_sales_bulk([(fabric_id, quantity, selling_price)])
+
+    def add_sales_bulk(self, rows):
+        """
+        Record many sales in a single transaction.
+
+        Parameters:
+        - rows (iterable): (fabric_id, quantity, selling_price) tuples, optionally with a
+          fourth sale_date element; missing dates default to now.
+
+        Stock is taken with one conditional UPDATE per fabric inside the same
+        transaction as the inserts, so concurrent sales can never oversell. If any
+        fabric is short, InsufficientStock is raised and the whole batch is rolled
+        back. A quantity that is not greater than zero, which would put stock back
+        instead of taking it, raises InvalidQuantity.
+        """
+        rows = self._dated_rows(rows)
+        deltas = self._stock_deltas(rows)
+        with self.connections.writer() as cursor:
+            self._check_quantities(rows)
+            for fabric_id, quantity in deltas.items():
+                self._take_stock(cursor, fabric_id, quantity)
+            cursor.executemany("INSERT INTO sales (fabric_id, quantity, selling_price, sale_date) VALUES (?, ?, ?, ?)", rows)
+            self._replay_lots_from(cursor, rows)
+
+    def _take_stock(self, cursor, fabric_id, quantity):
+        """
+        Subtract quantity from a fabric's stock only if that much is available.
+
+        Check and write are one statement, so there is no window for another
+        writer between them. Raises InsufficientStock when the stock is short and
+        ValueError when the fabric does not exist.
+        """
+        cursor.execute("UPDATE fabrics SET stock = stock - ?1 WHERE fabric_id = ?2 AND stock >= ?1", (quantity, fabric_id))
+        if cursor.rowcount:
+            return
+        row = cursor.execute("SELECT stock FROM fabrics WHERE fabric_id = ?", (fabric_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"Fabric id {fabric_id} not found.")
+        raise InsufficientStock(fabric_id, quantity, row[0])
+
+    @staticmethod
+    def _check_quantities(rows):
+        """Raise InvalidQuantity unless every (fabric_id, quantity, ...) row has a quantity above zero."""
+        for row in rows:
+            # Also false for NaN
+            if not row[1] > 0:
+                raise InvalidQuantity(row[1])
+
+    def _dated_rows(self, rows):
+        """Normalize batch rows to (fabric_id, quantity, price, date) tuples."""
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        dated = []
+        for row in rows:
+            if len(row) == 3:
+                dated.append((row[0], row[1], row[2], now))
+            elif len(row) == 4:
+                dated.append((row[0], row[1], row[2], row[3] or now))
+            else:
+                raise ValueError(f"Invalid transaction row: {row!r}")
+        return dated
+
+    def _stock_deltas(self, rows):
+        """Sum the quantities of a batch per fabric."""
+        deltas = {}
+        for fabric_id, quantity, _, _ in rows:
+            deltas[fabric_id] = deltas.get(fabric_id, 0) + quantity
+        return deltas
+
+    def _replay_lots_from(self, cursor, rows):
+        """Cost the sales of each fabric in a batch from the batch's earliest date onward."""
+        earliest = {}
+        for fabric_id, _, _, date in rows:
+            if fabric_id not in earliest or date < earliest[fabric_id]:
+                earliest[fabric_id] = date
+        for fabric_id, date in earliest.items():
+            self.lots.replay(cursor, fabric_id, date)
+
+    def _check_fabrics_exist(self, cursor, fabric_ids):
+        """Return {fabric_id: stock} for the given ids, raising ValueError for unknown ones."""
+        ids = list(fabric_ids)
+        stocks = {}
+        # stay well below SQLite's bound-parameter limit
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            cursor.execute(f"SELECT fabric_id, stock FROM fabrics WHERE fabric_id IN ({','.join('?' * len(chunk))})", chunk)
+            stocks.update(cursor.fetchall())
+        missing = [fabric_id for fabric_id in ids if fabric_id not in stocks]
+        if missing:
+            raise ValueError(f"Fabric id {missing[0]} not found.")
+        return stocks
 
     def get_total_sales(self, fabric_id):
         """Get the total sales for a specific fabric."""
-        self.cursor.execute("SELECT SUM(quantity) FROM sales WHERE fabric_id = ?", (fabric_id,))
-        total_sales = self.cursor.fetchone()[0]
+        total_sales = self._fetchone("SELECT SUM(quantity) FROM sales WHERE fabric_id = ?", (fabric_id,))[0]
         return total_sales if total_sales else 0
 
     # ---- Profit/Loss Operations ----
-    def get_total_profit_loss(self, start_date, end_date):
-        """Calculate the total profit or loss based on sales and purchases between two dates."""
-        self.cursor.execute(f'''
-            WITH latest_cost AS (
-                SELECT fabric_id, SUM(quantity*cost_price)/SUM(quantity) AS cost_price 
-                FROM purchases 
-                GROUP BY fabric_id
-            ),
-            sales_record AS (
+    def get_total_profit_loss(self, start_date, end_date, fabric_id=None, use_rollups=True):
+        """
+        Calculate the profit or loss per fabric based on sales and purchases between two dates.
+
+        Parameters:
+        - start_date (str): Start date in 'YYYY-MM-DD' format.
+        - end_date (str): End date in 'YYYY-MM-DD' format.
+        - fabric_id (int, optional): Only report this fabric.
+        - use_rollups (bool, optional): Read whole days from the daily rollup;
+          False aggregates the raw sales rows.
+
+        Cost is the cost of goods stored with each sale when it was written
+        (see LotEngine), and cost_price is that cost per unit sold.
+
+        Returns:
+        - rows (list): ProfitLossRow per fabric ordered by fabric_id, followed by a
+          totals row (fabric_id None, fabric_name "Total") when any fabric sold.
+        """
+        sales_rows, params = self._range_rows_sql("sales", start_date, end_date, fabric_id, use_rollups)
+        rows = self._fetchall(f'''
+            WITH sales_record AS (
                 SELECT fabric_id, SUM(quantity) AS total_sales, 
-                SUM(quantity*selling_price)/SUM(quantity) AS selling_price 
-                FROM sales 
-                WHERE sale_date BETWEEN ? AND ? 
+                SUM(value)/SUM(quantity) AS selling_price,
+                SUM(cost) AS cost
+                FROM ({sales_rows})
                 GROUP BY fabric_id
+            ),
+            per_fabric AS (
+                SELECT sales_record.fabric_id,
+                    fabrics.fabric_name,
+                    sales_record.total_sales,
+                    sales_record.cost / sales_record.total_sales AS cost_price,
+                    sales_record.selling_price,
+                    sales_record.total_sales * sales_record.selling_price as revenue,
+                    sales_record.cost,
+                    sales_record.total_sales * sales_record.selling_price - sales_record.cost AS profit
+                FROM sales_record
+                JOIN fabrics
+                ON fabrics.fabric_id = sales_record.fabric_id
             )
-            SELECT sales_record.fabric_id,
-                sales_record.total_sales,
-                latest_cost.cost_price,
-                sales_record.selling_price,
-                sales_record.total_sales * sales_record.selling_price as revenue,
-                sales_record.total_sales * latest_cost.cost_price as cost,
-                sales_record.total_sales * sales_record.selling_price - 
-                sales_record.total_sales * latest_cost.cost_price AS profit
-            FROM latest_cost 
-            JOIN sales_record 
-            ON latest_cost.fabric_id = sales_record.fabric_id;
-        ''', (start_date, end_date))
-
-        return self.cursor.fetchall()
+            SELECT 0 AS is_total, * FROM per_fabric
+            UNION ALL
+            SELECT 1, NULL, 'Total', SUM(total_sales), NULL, NULL, SUM(revenue), SUM(cost), SUM(profit)
+            FROM per_fabric
+            HAVING COUNT(*) > 0
+            ORDER BY is_total, fabric_id;
+        ''', params)
+        return [ProfitLossRow(*row[1:]) for row in rows]
+
 
+    # ---- Date-range Planning ----
+    @staticmethod
+    def plan_date_range(start_date, end_date):
+        """
+        Split a 'date BETWEEN start_date AND end_date' range into whole days and edges.
+
+        Dates are stored as 'YYYY-MM-DD HH:MM:SS' strings and compared as text,
+        so a day is wholly inside the range when it is on or after start_date and
+        before the day of end_date.
+
+        Returns:
+        - (first_day, end_day) such that every day with first_day <= day < end_day
+          is wholly inside the range, or None when there is no such day or a date
+          is not in 'YYYY-MM-DD' form. Rows with start_date <= date < first_day
+          and end_day <= date <= end_date make up the partial edges.
+        """
+        try:
+            first = datetime.strptime(start_date[:10], "%Y-%m-%d")
+            last = datetime.strptime(end_date[:10], "%Y-%m-%d")
+        except (TypeError, ValueError):
+            return None
+        # strptime also accepts unpadded months and days, which do not compare as text
+        if first.strftime("%Y-%m-%d") != start_date[:10] or last.strftime("%Y-%m-%d") != end_date[:10]:
+            return None
+        if start_date == start_date[:10]:
+            first_day = start_date
+        else:
+            first_day = (first + timedelta(days=1)).strftime("%Y-%m-%d")
+        end_day = end_date[:10]
+        if first_day >= end_day:
+            return None
+        return first_day, end_day
+
+    def _range_rows_sql(self, kind, start_date, end_date, fabric_id=None, use_rollups=True, with_day=False):
+        """
+        Build a query whose (fabric_id, quantity, value, cost) rows sum to the totals
+        of kind ("sales" or "purchases") between two dates.
+
+        cost is the stored cost of goods for sales and 0 for purchases. Whole days
+        are read from the daily rollup; only the partial days at the edges of the
+        range are read from the raw table. with_day adds a fifth 'YYYY-MM-DD' day
+        column, so the rows can also be grouped by date.
+
+        Returns:
+        - (sql, params)
+        """
+        table, date_column, price_column, rollup, cost_column = self.DAILY_ROLLUPS[kind]
+        fabric_filter = " AND fabric_id = ?" if fabric_id is not None else ""
+        fabric_params = (fabric_id,) if fabric_id is not None else ()
+        day = f", substr({date_column}, 1, 10) AS day" if with_day else ""
+        raw_cost = f"COALESCE({cost_column}, 0)" if cost_column else "0"
+        raw = f"SELECT fabric_id, quantity, quantity*{price_column} AS value, {raw_cost} AS cost{day} FROM {table} WHERE "
+        plan = self.plan_date_range(start_date, end_date) if use_rollups else None
+        if plan is None:
+            return (raw + f"{date_column} BETWEEN ? AND ?{fabric_filter}",
+                    (start_date, end_date, *fabric_params))
+        first_day, end_day = plan
+        sql = " UNION ALL ".join([
+            f"SELECT fabric_id, quantity, value, {'cost' if cost_column else '0 AS cost'}{', day' if with_day else ''} "
+            f"FROM {rollup} WHERE day >= ? AND day < ?{fabric_filter}",
+            raw + f"{date_column} >= ? AND {date_column} < ?{fabric_filter}",
+            raw + f"{date_column} >= ? AND {date_column} <= ?{fabric_filter}",
+        ])
+        params = (first_day, end_day, *fabric_params,
+                  start_date, first_day, *fabric_params,
+                  end_day, end_date, *fabric_params)
+        return sql, params
+
+    def get_range_totals(self, kind, start_date, end_date, fabric_id=None, use_rollups=True):
+        """
+        Get the quantity, value and cost-of-goods totals per fabric between two dates.
+
+        Parameters:
+        - kind (str): "sales" or "purchases".
+        - start_date (str): Start date in 'YYYY-MM-DD' format.
+        - end_date (str): End date in 'YYYY-MM-DD' format.
+        - fabric_id (int, optional): Only report this fabric.
+        - use_rollups (bool, optional): False aggregates the raw rows only.
+
+        Returns:
+        - rows (list): (fabric_id, quantity, value, cost) tuples ordered by fabric_id;
+          cost is 0 for purchases.
+        """
+        range_rows, params = self._range_rows_sql(kind, start_date, end_date, fabric_id, use_rollups)
+        return self._fetchall(f"""SELECT fabric_id, SUM(quantity), SUM(value), SUM(cost) FROM ({range_rows})
+                                  GROUP BY fabric_id ORDER BY fabric_id""", params)
+
+    def rebuild_rollups(self):
+        """Recompute the daily rollup tables from the raw sales and purchases."""
+        with self.connections.writer() as cursor:
+            for table, date_column, price_column, rollup, cost_column in self.DAILY_ROLLUPS.values():
+                cursor.execute(f"DELETE FROM {rollup}")
+                cursor.execute(_daily_rollup_backfill(rollup, table, date_column, price_column, cost_column))
+
+    def check_rollups(self, tolerance=1e-6):
+        """Compare the daily rollups with a full recompute.
+
+        Returns a list of (rollup, day, fabric_id, cached_qty, actual_qty, cached_value, actual_value,
+        cached_cost, actual_cost) for every day and fabric whose rollup has drifted from the raw
+        rows. The costs are 0 for rollups without a cost-of-goods column.
+        """
+        drift = []
+        for table, date_column, price_column, rollup, cost_column in self.DAILY_ROLLUPS.values():
+            actual_cost = f"SUM(COALESCE({cost_column}, 0))" if cost_column else "0"
+            cached_cost = f"{rollup}.cost" if cost_column else "0"
+            rows = self._fetchall(f"""
+                                    WITH actual AS (
+                                        SELECT substr({date_column}, 1, 10) AS day, fabric_id,
+                                            SUM(quantity) AS quantity, SUM(quantity*{price_column}) AS value,
+                                            {actual_cost} AS cost
+                                        FROM {table} GROUP BY day, fabric_id
+                                    ),
+                                    keys AS (
+                                        SELECT day, fabric_id FROM actual UNION SELECT day, fabric_id FROM {rollup}
+                                    )
+                                    SELECT keys.day, keys.fabric_id,
+                                        COALESCE({rollup}.quantity, 0), COALESCE(actual.quantity, 0),
+                                        COALESCE({rollup}.value, 0), COALESCE(actual.value, 0),
+                                        COALESCE({cached_cost}, 0), COALESCE(actual.cost, 0)
+                                    FROM keys
+                                    LEFT JOIN {rollup} ON {rollup}.day = keys.day AND {rollup}.fabric_id = keys.fabric_id
+                                    LEFT JOIN actual ON actual.day = keys.day AND actual.fabric_id = keys.fabric_id
+                                """)
+            drift += [(rollup, *row) for row in rows
+                      if abs(row[2] - row[3]) > tolerance or abs(row[4] - row[5]) > tolerance * max(1, abs(row[5]))
+                      or abs(row[6] - row[7]) > tolerance * max(1, abs(row[7]))]
+        return drift
+
+    # ---- Cost of Goods ----
+    def replay_lots(self, cost_method=None):
+        """
+        Re-cost every sale against the purchase lots from scratch.
+
+        Parameters:
+        - cost_method (str, optional): Switch to "fifo", "lifo" or "average" first.
+        """
+        if cost_method is not None:
+            self.lots = LotEngine(cost_method)
+        with self.connections.writer() as cursor:
+            self.lots.replay_all(cursor)
+
+    def check_lots(self):
+        """Return descriptions of lots and sales whose allocations do not add up (empty when consistent)."""
+        with self.connections.reader() as cursor:
+            return LotEngine.check(cursor)
+
+    # ---- Stock Ledger ----
+    def get_stock_as_of(self, fabric_id, timestamp):
+        """
+        Get a fabric's stock as it stood at a point in time.
+
+        Starts from the fabric's latest snapshot at or before timestamp and adds
+        only the ledger movements after it.
+
+        Parameters:
+        - fabric_id (int)
+        - timestamp (str): 'YYYY-MM-DD HH:MM:SS'; movements dated up to and
+          including it count. A bare 'YYYY-MM-DD' means the start of that day.
+
+        Returns:
+        - stock (float)
+        """
+        return self._fetchone("""
+            WITH snapshot AS (
+                SELECT taken_at, stock FROM stock_snapshots
+                WHERE fabric_id = ?1 AND taken_at <= ?2
+                ORDER BY taken_at DESC LIMIT 1
+            )
+            SELECT COALESCE((SELECT stock FROM snapshot), 0)
+                + COALESCE((SELECT SUM(quantity) FROM stock_movements
+                            WHERE fabric_id = ?1 AND moved_at <= ?2
+                                AND moved_at > COALESCE((SELECT taken_at FROM snapshot), '')), 0)
+        """, (fabric_id, timestamp))[0]
+
+    def checkpoint_stock(self, interval=None):
+        """
+        Snapshot each fabric's stock every interval ledger movements.
+
+        Only the movements after a fabric's latest snapshot are read, so running
+        this periodically (see maintenance.py checkpoint-stock) is cheap.
+        Snapshots later than a back-dated movement are dropped when it is
+        written and recreated here.
+
+        Returns:
+        - count (int): Number of snapshots written.
+        """
+        interval = interval or self.STOCK_SNAPSHOT_INTERVAL
+        written = 0
+        with self.connections.writer() as cursor:
+            cursor.execute("""SELECT fabrics.fabric_id, snapshot.taken_at, snapshot.stock
+                              FROM fabrics LEFT JOIN stock_snapshots AS snapshot
+                                  ON snapshot.fabric_id = fabrics.fabric_id
+                                  AND snapshot.taken_at = (SELECT MAX(taken_at) FROM stock_snapshots
+                                                           WHERE stock_snapshots.fabric_id = fabrics.fabric_id)""")
+            for fabric_id, taken_at, stock in cursor.fetchall():
+                stock = stock or 0
+                since = 0
+                snapshots = []
+                # A snapshot covers every movement up to its timestamp, so walk whole timestamps
+                cursor.execute("""SELECT moved_at, SUM(quantity), COUNT(*) FROM stock_movements
+                                  WHERE fabric_id = ? AND moved_at > ?
+                                  GROUP BY moved_at ORDER BY moved_at""", (fabric_id, taken_at or ""))
+                for moved_at, quantity, count in cursor.fetchall():
+                    stock += quantity
+                    since += count
+                    if since >= interval:
+                        snapshots.append((fabric_id, moved_at, stock))
+                        since = 0
+                cursor.executemany("INSERT INTO stock_snapshots (fabric_id, taken_at, stock) VALUES (?, ?, ?)", snapshots)
+                written += len(snapshots)
+        return written
+
+    def check_stock(self, tolerance=1e-6):
+        """
+        Reconcile fabrics.stock with the ledger.
+
+        Returns a list of (fabric_id, stock, ledger_stock) for every fabric whose
+        stock column differs from the sum of its movements.
+        """
+        rows = self._fetchall("""SELECT fabrics.fabric_id, fabrics.stock, COALESCE(SUM(stock_movements.quantity), 0)
+                                 FROM fabrics LEFT JOIN stock_movements ON stock_movements.fabric_id = fabrics.fabric_id
+                                 GROUP BY fabrics.fabric_id""")
+        return [row for row in rows if abs(row[1] - row[2]) > tolerance * max(1, abs(row[2]))]
+
+    def check_stock_snapshots(self, tolerance=1e-6):
+        """
+        Compare every stock snapshot with summing the ledger up to its timestamp.
+
+        Returns a list of (fabric_id, taken_at, cached_stock, actual_stock) for
+        snapshots that have drifted.
+        """
+        rows = self._fetchall("""SELECT fabric_id, taken_at, stock,
+                                     COALESCE((SELECT SUM(quantity) FROM stock_movements
+                                               WHERE stock_movements.fabric_id = stock_snapshots.fabric_id
+                                                   AND moved_at <= stock_snapshots.taken_at), 0)
+                                 FROM stock_snapshots""")
+        return [row for row in rows if abs(row[2] - row[3]) > tolerance * max(1, abs(row[3]))]
 
     # ---- Utility Operations ----
     def get_fabric_id(self, fabric_name):
         """Get the fabric ID from the fabric name."""
-        self.cursor.execute("SELECT fabric_id FROM fabrics WHERE fabric_name = ?", (fabric_name,))
-        result = self.cursor.fetchone()
-        return result[0] if result else None
-    def search_fabrics(self, search_term):
-        # Query to search for fabrics that match the input text
-        query = "SELECT fabric_name FROM fabrics WHERE fabric_name LIKE ?"
-        self.cursor.execute(query, ('%' + search_term + '%',))
-        result = self.cursor.fetchall()
-        return [row[0] for row in result]  # Assuming fabric_name is the first column
+        return self.catalog.get_id(fabric_name)
+    def search_fabrics(self, search_term, mode="prefix", limit=50):
+        """
+        Search fabric names, best matches first.
+
+        Parameters:
+        - search_term (str): Text typed by the user.
+        - mode (str): "prefix" matches the start of the name, "substring" matches
+          anywhere in the name and "fuzzy" ranks names by how many of the term's
+          trigrams they share, so small typos still match.
+        - limit (int): Maximum number of names returned.
+
+        Returns:
+        - names (list): Matching fabric names.
+        """
+        search_term = search_term.strip()
+        if mode == "prefix" or not search_term:
+            return self.catalog.search_prefix(search_term, limit)
+        if mode not in ("substring", "fuzzy"):
+            raise ValueError(f"Unknown search mode '{mode}'.")
+        # The trigram index cannot match anything shorter than three characters
+        if not self.has_search_index or len(search_term) < 3:
+            escaped = search_term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            result = self._fetchall(r"""SELECT fabric_name FROM fabrics WHERE fabric_name LIKE ? ESCAPE '\'
+                                        ORDER BY instr(lower(fabric_name), lower(?)), length(fabric_name) LIMIT ?""",
+                                    ('%' + escaped + '%', search_term, limit))
+            return [row[0] for row in result]
+        term = search_term.lower()
+        trigrams = list(dict.fromkeys(term[i:i + 3] for i in range(len(term) - 2)))
+        if mode == "substring":
+            match = self._fts_phrase(search_term)
+        elif len(trigrams) == 1:
+            match = self._fts_phrase(trigrams[0])
+        else:
+            # Candidates must share at least two trigrams with the term
+            match = " OR ".join(f"({self._fts_phrase(first)} AND {self._fts_phrase(second)})"
+                                for i, first in enumerate(trigrams) for second in trigrams[i + 1:])
+        # Ranking every match would make common terms slow, so rank a bounded candidate set
+        result = self._fetchall("SELECT fabric_name FROM fabrics_fts WHERE fabrics_fts MATCH ? LIMIT ?",
+                                (match, limit * self.SEARCH_CANDIDATES_PER_RESULT))
+        return self._rank_names(term, trigrams, [row[0] for row in result])[:limit]
+
+    @staticmethod
+    def _rank_names(term, trigrams, names):
+        """Order names by trigram overlap with the term, then match position, then length."""
+        def score(name):
+            lowered = name.lower()
+            shared = sum(1 for trigram in trigrams if trigram in lowered)
+            position = lowered.find(term)
+            return (-shared, position if position >= 0 else len(lowered), len(name))
+        return sorted(names, key=score)
+
+    @staticmethod
+    def _fts_phrase(text):
+        """Quote text as an FTS5 phrase so user input is never parsed as query syntax."""
+        return '"' + text.replace('"', '""') + '"'
+
+    @property
+    def has_search_index(self):
+        """Whether the FTS5 fabric search index exists in this database."""
+        if self._has_search_index is None:
+            self._has_search_index = self._fetchone(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='fabrics_fts'") is not None
+        return self._has_search_index
     def get_fabric_name_by_id(self,  fabric_id):
         """Get the fabric name from the fabric ID."""
-        self.cursor.execute("SELECT fabric_name FROM fabrics WHERE fabric_id = ?", (fabric_id,))
-        result = self.cursor.fetchone()
-        return result[0] if result else None
+        return self.catalog.get_name(fabric_id)
     def get_fabrics_list(self):
-        """Get a list of fabrics from the database to populate the combo boxes."""
-        self.cursor.execute("SELECT fabric_name FROM fabrics")
-        fabrics = self.cursor.fetchall()
-        return [fabric[0] for fabric in fabrics]
+        """Get a list of fabrics to populate the combo boxes."""
+        return self.catalog.names()
     def get_fabric_stock(self, fabric_name):
         """Get stock for a specific fabric."""
-        self.cursor.execute("SELECT stock FROM fabrics WHERE fabric_name = ?", (fabric_name,))
-        result = self.cursor.fetchone()
+        result = self._fetchone("SELECT stock FROM fabrics WHERE fabric_name = ?", (fabric_name,))
         if result:
             return result[0]
     def get_fabric_stock_by_id(self, fabric_id):
         """Get stock for a specific fabric."""
-        self.cursor.execute("SELECT stock FROM fabrics WHERE fabric_id = ?", (fabric_id,))
-        result = self.cursor.fetchone()
+        result = self._fetchone("SELECT stock FROM fabrics WHERE fabric_id = ?", (fabric_id,))
         if result:
             return result[0]
     def get_all_fabrics(self):
         """Get stock for a specific fabric."""
-        self.cursor.execute("SELECT fabric_id, fabric_name, stock from fabrics")
-        result = self.cursor.fetchall()
+        result = self._fetchall("SELECT fabric_id, fabric_name, stock from fabrics")
         if result:
             return result
     def get_all_fabrics_stock(self):
         """Get stock levels for all fabrics."""
-        self.cursor.execute("""
-                                WITH latest_cost AS (
-                                SELECT fabric_id, SUM(quantity*cost_price)/SUM(quantity) AS cost_price 
-                                FROM purchases 
-                                GROUP BY fabric_id
+        return self._fetchall(FABRICS_STOCK_QUERY)
+
+    def iter_all_fabrics_stock(self, chunk_size=None):
+        """Yield the rows of get_all_fabrics_stock without loading them all at once."""
+        return self._iter_rows(FABRICS_STOCK_QUERY, (), chunk_size)
+
+    def get_purchase_cost(self, fabric_id):
+        """Get the weighted-average purchase cost of a fabric."""
+        result = self._fetchone("SELECT total_value/total_qty FROM fabric_cost WHERE fabric_id=?", (fabric_id,))
+        return result[0] if result else None
+
+    def rebuild_cost_cache(self):
+        """Recompute the fabric_cost table from the full purchase history."""
+        with self.connections.writer() as cursor:
+            cursor.execute("DELETE FROM fabric_cost")
+            cursor.execute("""INSERT INTO fabric_cost (fabric_id, total_qty, total_value)
+                              SELECT fabric_id, SUM(quantity), SUM(quantity*cost_price)
+                              FROM purchases GROUP BY fabric_id""")
+
+    def check_cost_cache(self, tolerance=1e-6):
+        """Compare fabric_cost with a full recompute.
+
+        Returns a list of (fabric_id, cached_qty, actual_qty, cached_value, actual_value)
+        for every fabric whose running totals have drifted from the purchase history.
+        """
+        rows = self._fetchall("""
+                                WITH actual AS (
+                                    SELECT fabric_id, SUM(quantity) AS total_qty, SUM(quantity*cost_price) AS total_value
+                                    FROM purchases GROUP BY fabric_id
+                                ),
+                                ids AS (
+                                    SELECT fabric_id FROM actual UNION SELECT fabric_id FROM fabric_cost
                                 )
-                                select fabrics.fabric_id, fabrics.fabric_name, fabrics.stock, COALESCE(latest_cost.cost_price,0) as cost_price, COALESCE(latest_cost.cost_price*stock,0) as total_cost 
-                                from fabrics left join latest_cost on fabrics.fabric_id = latest_cost.fabric_id
+                                SELECT ids.fabric_id,
+                                    COALESCE(fabric_cost.total_qty, 0), COALESCE(actual.total_qty, 0),
+                                    COALESCE(fabric_cost.total_value, 0), COALESCE(actual.total_value, 0)
+                                FROM ids
+                                LEFT JOIN fabric_cost ON fabric_cost.fabric_id = ids.fabric_id
+                                LEFT JOIN actual ON actual.fabric_id = ids.fabric_id
                             """)
-        return self.cursor.fetchall()
-    
-    def get_purchase_cost(self, fabric_id):
-        self.cursor.execute("""
-                                SELECT fabric_id, SUM(quantity*cost_price)/SUM(quantity) AS cost_price 
-                                FROM purchases 
-                                where fabric_id=?
-                            """,(fabric_id,))
-        return self.cursor.fetchone()[1]
-        
+        return [row for row in rows
+                if abs(row[1] - row[2]) > tolerance or abs(row[3] - row[4]) > tolerance * max(1, abs(row[4]))]
+
 
     def get_sales_data(self, start_date, end_date):
         """ Get the sales data from start_date to end_date"""
-        self.cursor.execute("select sales.sale_id, sales.sale_date, fabrics.fabric_name, sales.quantity, sales.selling_price, sales.quantity*sales.selling_price as revenue from sales join fabrics on sales.fabric_id = fabrics.fabric_id where sales.sale_date BETWEEN ? and ? order by sales.sale_date desc",(start_date,end_date))
-        return self.cursor.fetchall()
+        return self._fetchall(SALES_DATA_QUERY, (start_date, end_date))
+
+    def iter_sales_data(self, start_date, end_date, chunk_size=None):
+        """Yield the rows of get_sales_data without loading them all at once."""
+        return self._iter_rows(SALES_DATA_QUERY, (start_date, end_date), chunk_size)
 
     def get_purchase_data(self, start_date, end_date):
         """ Get the purchase  data of stocks from start_date to end_date"""
-        self.cursor.execute('''select purchases.purchase_id, purchases.purchase_date, fabrics.fabric_name, purchases.quantity, purchases.cost_price, purchases.quantity*purchases.cost_price as expendicture 
-                            from purchases join fabrics on purchases.fabric_id = fabrics.fabric_id 
-                            where purchases.purchase_date BETWEEN ? and ? order by purchases.purchase_date desc''',(start_date,end_date))
-        return self.cursor.fetchall()
-    
+        return self._fetchall(PURCHASE_DATA_QUERY, (start_date, end_date))
+
+    def iter_purchase_data(self, start_date, end_date, chunk_size=None):
+        """Yield the rows of get_purchase_data without loading them all at once."""
+        return self._iter_rows(PURCHASE_DATA_QUERY, (start_date, end_date), chunk_size)
+
+    def get_sales_page(self, start_date, end_date, limit=100, before=None):
+        """
+        Get one page of get_sales_data rows, newest first.
+
+        Parameters:
+        - limit (int): Rows per page.
+        - before (tuple, optional): (sale_date, sale_id) of the last row of the
+          previous page; omit for the first page.
+
+        Each page is an index seek, however deep, unlike LIMIT/OFFSET.
+        """
+        before = before or ("\uffff", 0)
+        return self._fetchall(SALES_PAGE_QUERY, (start_date, end_date, *before, limit))
+
+    def get_purchases_page(self, start_date, end_date, limit=100, before=None):
+        """Get one page of get_purchase_data rows, newest first; see get_sales_page."""
+        before = before or ("\uffff", 0)
+        return self._fetchall(PURCHASE_PAGE_QUERY, (start_date, end_date, *before, limit))
+
+    def get_fabrics_stock_page(self, limit=100, after=0):
+        """Get get_all_fabrics_stock rows for fabric_id > after, in fabric_id order."""
+        return self._fetchall(f"SELECT * FROM ({FABRICS_STOCK_QUERY}) WHERE fabric_id > ? ORDER BY fabric_id LIMIT ?",
+                              (after, limit))
+
+    def get_sales_by_ids(self, sale_ids):
+        """Get the get_sales_data rows of the given sales; ids that no longer exist are left out."""
+        return self._rows_by_ids(SALES_BY_IDS_QUERY, sale_ids)
+
+    def get_purchases_by_ids(self, purchase_ids):
+        """Get the get_purchase_data rows of the given purchases; ids that no longer exist are left out."""
+        return self._rows_by_ids(PURCHASES_BY_IDS_QUERY, purchase_ids)
+
+    def get_fabrics_stock_by_ids(self, fabric_ids):
+        """Get the get_all_fabrics_stock rows of the given fabrics."""
+        return self._rows_by_ids(FABRICS_STOCK_BY_IDS_QUERY, fabric_ids)
+
+    def _rows_by_ids(self, query, ids):
+        """Run a query with an {ids} placeholder, in chunks that stay below SQLite's parameter limit."""
+        ids = list(ids)
+        rows = []
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            rows += self._fetchall(query.format(ids=",".join("?" * len(chunk))), chunk)
+        return rows
+
+    def get_changes(self, since, limit=1000):
+        """
+        Read the change feed.
+
+        Parameters:
+        - since (int): Sequence number of the last change already seen.
+        - limit (int): Maximum number of changes returned.
+
+        Returns:
+        - (changes, last_seq, complete): changes is a list of (seq, entity,
+          entity_id, fabric_id, action) after since, in order; last_seq is the
+          newest sequence number in the log; complete is False when changes
+          after since have been pruned, so the caller must resynchronize.
+        """
+        with self.connections.snapshot() as cursor:
+            cursor.execute("SELECT seq, entity, entity_id, fabric_id, action FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?",
+                           (since, limit))
+            changes = cursor.fetchall()
+            last_seq = cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+            # sqlite_sequence keeps the high-water mark even after the log is pruned empty
+            row = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+            last_seq = max(last_seq, row[0] if row else 0)
+            oldest = cursor.execute("SELECT MIN(seq) FROM change_log").fetchone()[0]
+        # A client ahead of the log is talking to a different (or restored) database
+        complete = since == last_seq or (since < last_seq and oldest is not None and oldest <= since + 1)
+        return changes, last_seq, complete
+
+    def prune_change_log(self, keep=100000):
+        """Delete all but the newest keep changes; clients further behind resynchronize."""
+        with self.connections.writer() as cursor:
+            cursor.execute("DELETE FROM change_log WHERE seq <= (SELECT MAX(seq) FROM change_log) - ?", (keep,))
+            return cursor.rowcount
+
+    def get_catalog_version(self):
+        """Return a number that changes whenever any process adds, renames or deletes a fabric."""
+        return self._fetchone(CATALOG_VERSION_QUERY)[0]
+
     def get_sale_by_id(self,id):
         """Get sales by sales_id"""
-        self.cursor.execute('''SELECT * from sales where sale_id=?''',(id,))
-        return self.cursor.fetchone()
+        return self._fetchone('''SELECT sale_id, fabric_id, quantity, selling_price, sale_date from sales where sale_id=?''',(id,))
     
     def get_purchase_by_id(self, id):
         """Get purchase by purchase_id"""
-        self.cursor.execute('''SELECT * from purchases where purchase_id=?''',(id,))
-        return self.cursor.fetchone()
+        return self._fetchone('''SELECT purchase_id, fabric_id, quantity, cost_price, purchase_date from purchases where purchase_id=?''',(id,))
     def update_sale_data(self, sale_id, quantity, selling_price, sale_date):
+        """
+        Edit a sale and move the fabric's stock by the change in quantity, in one transaction.
+
+        Raises InsufficientStock if the extra quantity is not in stock, and
+        InvalidQuantity if quantity is not greater than zero; nothing is changed
+        in either case.
+
+        Returns:
+        - updated (int): 1 if the sale exists, else 0.
+        """
         query = """
             UPDATE sales
             SET quantity = ?, selling_price = ?, sale_date = ?
             WHERE sale_id = ?
         """
-        res=self.cursor.execute(query, (quantity, selling_price, sale_date, sale_id))
-        self.conn.commit()
-        return res
+        with self.connections.writer() as cursor:
+            self._check_quantities([(sale_id, quantity)])
+            old = cursor.execute("SELECT fabric_id, sale_date, quantity FROM sales WHERE sale_id = ?", (sale_id,)).fetchone()
+            cursor.execute(query, (quantity, selling_price, sale_date, sale_id))
+            updated = cursor.rowcount
+            if old is not None:
+                # Stock moves in the same transaction as the edit and its ledger entries
+                if quantity > old[2]:
+                    self._take_stock(cursor, old[0], quantity - old[2])
+                else:
+                    cursor.execute("UPDATE fabrics SET stock = stock + ? WHERE fabric_id = ?", (old[2] - quantity, old[0]))
+                # Re-cost this fabric's sales from the earlier of the old and new dates
+                self.lots.replay(cursor, old[0], min(old[1], sale_date))
+            return updated
 
     def update_purchase_data(self,purchase_id, quantity, cost_price, purchase_date):
+        """
+        Edit a purchase and move the fabric's stock by the change in quantity, in one transaction.
+
+        Raises InsufficientStock if lowering the quantity would take the stock
+        below zero, and InvalidQuantity if quantity is not greater than zero;
+        nothing is changed in either case.
+
+        Returns:
+        - updated (int): 1 if the purchase exists, else 0.
+        """
         query = """
             UPDATE purchases
             SET quantity = ?, cost_price = ?, purchase_date = ?
             WHERE purchase_id = ?
         """
-        res=self.cursor.execute(query, (quantity, cost_price, purchase_date, purchase_id))
-        self.conn.commit()
-        return res
+        with self.connections.writer() as cursor:
+            self._check_quantities([(purchase_id, quantity)])
+            old = cursor.execute("SELECT fabric_id, purchase_date, quantity FROM purchases WHERE purchase_id = ?",
+                                 (purchase_id,)).fetchone()
+            cursor.execute(query, (quantity, cost_price, purchase_date, purchase_id))
+            updated = cursor.rowcount
+            if old is not None:
+                # Stock moves in the same transaction as the edit and its ledger entries;
+                # reducing a purchase cannot take back stock that has already been sold
+                if quantity < old[2]:
+                    self._take_stock(cursor, old[0], old[2] - quantity)
+                else:
+                    cursor.execute("UPDATE fabrics SET stock = stock + ? WHERE fabric_id = ?", (quantity - old[2], old[0]))
+                # Re-cost this fabric's sales from the earlier of the old and new dates
+                self.lots.replay(cursor, old[0], min(old[1], purchase_date))
+            return updated
     def update_fabric_name(self, fabric_id,fabric_name):
         query = """
             UPDATE fabrics
             SET fabric_name = ?
             WHERE fabric_id = ?
         """
-        res=self.cursor.execute(query, (fabric_name,fabric_id))
-        self.conn.commit()
-        return  res
+        with self.connections.writer() as cursor:
+            cursor.execute(query, (fabric_name,fabric_id))
+            updated = cursor.rowcount
+            version = cursor.execute(CATALOG_VERSION_QUERY).fetchone()[0]
+        if updated:
+            self.catalog.rename(int(fabric_id), fabric_name, version)
+        return updated
     def close(self):
-        """Close the database connection."""
-        self.conn.close()
+        """Close the database connections."""
+        self.connections.close()
@@ -0,0 +1,177 @@
+import csv
+import gzip
+import io
+
+# pyarrow and zstandard are imported on first use: pyarrow (with numpy) takes
+# longer to load than the rest of the application, and only a few exports need it
+pa = None
+zstandard = None
+_missing = set()
+
+
+def load_pyarrow():
+    """Import pyarrow if that has not been done yet; None if it is not installed."""
+    global pa
+    if pa is None and "pyarrow" not in _missing:
+        try:
+            import pyarrow
+            import pyarrow.ipc
+            import pyarrow.parquet
+        except ImportError:  # Arrow and Parquet exports fall back to compressed CSV
+            _missing.add("pyarrow")
+        else:
+            pa = pyarrow
+    return pa
+
+
+def load_zstandard():
+    """Import zstandard if that has not been done yet; None if it is not installed."""
+    global zstandard
+    if zstandard is None and "zstandard" not in _missing:
+        try:
+            import zstandard as module
+        except ImportError:  # zstd CSV exports fall back to gzip
+            _missing.add("zstandard")
+        else:
+            zstandard = module
+    return zstandard
+
+
+# Column types understood by the exporters
+TIMESTAMP = "timestamp"
+FLOAT = "float64"
+INTEGER = "int64"
+STRING = "string"
+
+
+class CsvExporter:
+    """
+    Write rows as CSV, optionally compressed with gzip or zstd.
+
+    Rows are written as they arrive, so memory use does not depend on the
+    number of rows. Column types are ignored; CSV has none.
+    """
+
+    WRITE_BUFFER_BYTES = 1024 * 1024
+
+    def __init__(self, compression=None, level=None):
+        """
+        Parameters:
+        - compression (str, optional): None, "gzip" or "zstd".
+        - level (int, optional): Compression level; defaults to a fast level.
+        """
+        if compression == "zstd" and load_zstandard() is None:
+            print("zstandard is not installed; writing gzip-compressed CSV instead")
+            compression = "gzip"
+        if compression not in (None, "gzip", "zstd"):
+            raise ValueError(f"Unknown CSV compression: {compression}")
+        self.compression = compression
+        self.level = level
+        self.extension = {None: ".csv", "gzip": ".csv.gz", "zstd": ".csv.zst"}[compression]
+
+    def open(self, file_path):
+        if self.compression == "gzip":
+            raw = gzip.open(file_path, "wb", compresslevel=self.level or 6)
+        elif self.compression == "zstd":
+            compressor = zstandard.ZstdCompressor(level=self.level or 3)
+            raw = compressor.stream_writer(open(file_path, "wb"), closefd=True)
+        else:
+            return open(file_path, mode="w", newline="", buffering=self.WRITE_BUFFER_BYTES)
+        return io.TextIOWrapper(io.BufferedWriter(raw, self.WRITE_BUFFER_BYTES), newline="")
+
+    def write(self, file_path, rows, col_names, col_types=None):
+        """Write the header and every row to file_path."""
+        with self.open(file_path) as file:
+            writer = csv.writer(file)
+            writer.writerow(col_names)
+            writer.writerows(rows)
+
+
+class ArrowExporter:
+    """
+    Write rows as Apache Arrow IPC (Feather v2) or Parquet with typed columns.
+
+    Rows are converted and written in record batches of batch_rows, so only one
+    batch is in memory at a time. Timestamps are read from the
+    'YYYY-MM-DD HH:MM:SS' strings the database stores.
+    """
+
+    def __init__(self, file_format="parquet", batch_rows=65536, compression="zstd"):
+        """
+        Parameters:
+        - file_format (str): "parquet" or "arrow".
+        - batch_rows (int): Rows per record batch (and Parquet row group).
+        - compression (str, optional): Codec for the file body, e.g. "zstd", "lz4" or None.
+        """
+        if load_pyarrow() is None:
+            raise ImportError("pyarrow is required for Arrow and Parquet exports")
+        if file_format not in ("parquet", "arrow"):
+            raise ValueError(f"Unknown Arrow file format: {file_format}")
+        self.file_format = file_format
+        self.batch_rows = batch_rows
+        self.compression = compression
+        self.extension = ".parquet" if file_format == "parquet" else ".arrow"
+
+    def schema(self, col_names, col_types):
+        arrow_types = {TIMESTAMP: pa.timestamp("s"), FLOAT: pa.float64(), INTEGER: pa.int64(), STRING: pa.string()}
+        return pa.schema([(name, arrow_types[col_type]) for name, col_type in zip(col_names, col_types)])
+
+    def batches(self, rows, schema):
+        """Yield record batches of at most batch_rows rows."""
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == self.batch_rows:
+                yield self.to_batch(batch, schema)
+                batch = []
+        if batch:
+            yield self.to_batch(batch, schema)
+
+    def to_batch(self, rows, schema):
+        arrays = []
+        for values, field in zip(zip(*rows), schema):
+            if pa.types.is_timestamp(field.type):
+                arrays.append(pa.array(values, pa.string()).cast(field.type))
+            else:
+                arrays.append(pa.array(values, field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    def open(self, file_path, schema):
+        if self.file_format == "parquet":
+            return pa.parquet.ParquetWriter(file_path, schema, compression=self.compression or "none")
+        options = pa.ipc.IpcWriteOptions(compression=self.compression)
+        return pa.ipc.new_file(file_path, schema, options=options)
+
+    def write(self, file_path, rows, col_names, col_types=None):
+        """Write every row to file_path; col_types gives one column type per column."""
+        if col_types is None:
+            col_types = [STRING] * len(col_names)
+        schema = self.schema(col_names, col_types)
+        with self.open(file_path, schema) as writer:
+            for batch in self.batches(rows, schema):
+                if self.file_format == "parquet":
+                    writer.write_batch(batch, row_group_size=self.batch_rows)
+                else:
+                    writer.write_batch(batch)
+
+
+def create_exporter(fmt):
+    """
+    Return the exporter for a format name.
+
+    Formats: "csv", "csv.gz", "csv.zst", "arrow" and "parquet". Without pyarrow,
+    "arrow" and "parquet" fall back to gzip-compressed CSV; without zstandard,
+    "csv.zst" does too.
+    """
+    if fmt == "csv":
+        return CsvExporter()
+    if fmt == "csv.gz":
+        return CsvExporter("gzip")
+    if fmt == "csv.zst":
+        return CsvExporter("zstd")
+    if fmt in ("arrow", "parquet"):
+        if load_pyarrow() is None:
+            print(f"pyarrow is not installed; writing gzip-compressed CSV instead of {fmt}")
+            return CsvExporter("gzip")
+        return ArrowExporter(fmt)
+    raise ValueError(f"Unknown export format: {fmt}")
@@ -0,0 +1,153 @@
+import bisect
+import threading
+
+
+class FabricCatalog:
+    """
+    In-memory cache of the fabric master data.
+
+    Holds id->name and name->id maps plus a case-insensitive sorted index of the
+    names, so lookups and prefix searches never touch the database. It is loaded
+    on first use and kept current by DBManager when fabrics are added or renamed;
+    call invalidate() after changing the fabrics table any other way.
+
+    Given a source_version callable, every lookup first compares the database's
+    catalog version with the one the cache was built from and reloads when they
+    differ, so fabrics added or renamed by another process are seen at once.
+    """
+
+    def __init__(self, loader, source_version=None):
+        """
+        Parameters:
+        - loader (callable): Returns (fabric_id, fabric_name) rows for every fabric,
+          ordered by fabric_id.
+        - source_version (callable, optional): Returns a number that changes
+          whenever any process changes the fabrics, such as
+          DBManager.get_catalog_version.
+        """
+        self._loader = loader
+        self._source_version = source_version
+        self._lock = threading.RLock()
+        self._loaded = False
+        # The source version the cached data matches
+        self._loaded_version = None
+        self.version = 0
+        self._name_by_id = {}
+        self._id_by_name = {}
+        self._keys = []
+        self._sorted_names = []
+
+    def _ensure_loaded(self):
+        if self._loaded and self._source_version is not None and self._source_version() != self._loaded_version:
+            self.invalidate()
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.load()
+
+    def load(self):
+        """(Re)build the catalog from the database."""
+        with self._lock:
+            # Read first: a change made while loading then only causes another reload
+            self._loaded_version = self._source_version() if self._source_version is not None else None
+            rows = self._loader()
+            self._name_by_id = {fabric_id: name for fabric_id, name in rows}
+            self._id_by_name = {name: fabric_id for fabric_id, name in rows}
+            ordered = sorted((name.casefold(), name) for name in self._id_by_name)
+            self._keys = [key for key, _ in ordered]
+            self._sorted_names = [name for _, name in ordered]
+            self._loaded = True
+            self.version += 1
+
+    @property
+    def loaded(self):
+        """Whether the catalog is in memory, so lookups will not wait for the database."""
+        return self._loaded
+
+    def invalidate(self):
+        """Drop the cached data; it is reloaded on the next lookup."""
+        with self._lock:
+            self._loaded = False
+            self.version += 1
+
+    def _advance(self, source_version):
+        """
+        Move to source_version after a change of our own; returns False, and
+        invalidates the catalog, if another change came in between.
+        """
+        if source_version is None or self._loaded_version is None:
+            return True
+        if source_version != self._loaded_version + 1:
+            self.invalidate()
+            return False
+        self._loaded_version = source_version
+        return True
+
+    def add(self, fabric_id, fabric_name, source_version=None):
+        """Record a newly inserted fabric; source_version is the database's catalog version after the insert."""
+        with self._lock:
+            if not self._loaded or not self._advance(source_version):
+                return
+            self._name_by_id[fabric_id] = fabric_name
+            self._id_by_name[fabric_name] = fabric_id
+            key = fabric_name.casefold()
+            position = bisect.bisect_right(self._keys, key)
+            self._keys.insert(position, key)
+            self._sorted_names.insert(position, fabric_name)
+            self.version += 1
+
+    def rename(self, fabric_id, fabric_name, source_version=None):
+        """Record a fabric rename; source_version is the database's catalog version after it."""
+        with self._lock:
+            if not self._loaded or not self._advance(source_version):
+                return
+            old_name = self._name_by_id.get(fabric_id)
+            if old_name is not None:
+                self._id_by_name.pop(old_name, None)
+                position = bisect.bisect_left(self._keys, old_name.casefold())
+                while self._sorted_names[position] != old_name:
+                    position += 1
+                del self._keys[position]
+                del self._sorted_names[position]
+            # assigning in place keeps _name_by_id in fabric_id order
+            self.add(fabric_id, fabric_name)
+
+    def get_id(self, fabric_name):
+        """Return the id of a fabric, or None if there is no such fabric."""
+        self._ensure_loaded()
+        return self._id_by_name.get(fabric_name)
+
+    def get_name(self, fabric_id):
+        """Return the name of a fabric, or None if there is no such id."""
+        self._ensure_loaded()
+        try:
+            return self._name_by_id.get(int(fabric_id))
+        except (TypeError, ValueError):
+            return None
+
+    def names(self):
+        """Return every fabric name in fabric_id order."""
+        self._ensure_loaded()
+        with self._lock:
+            return list(self._name_by_id.values())
+
+    def items(self):
+        """Return (fabric_id, fabric_name) pairs in fabric_id order."""
+        self._ensure_loaded()
+        with self._lock:
+            return list(self._name_by_id.items())
+
+    def search_prefix(self, prefix, limit=None):
+        """Return names starting with prefix (case-insensitive), in alphabetical order."""
+        self._ensure_loaded()
+        key = prefix.casefold()
+        with self._lock:
+            start = bisect.bisect_left(self._keys, key)
+            end = bisect.bisect_left(self._keys, key + "\U0010ffff", start)
+            if limit is not None:
+                end = min(end, start + limit)
+            return self._sorted_names[start:end]
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._name_by_id)
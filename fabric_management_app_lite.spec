@@ -0,0 +1,83 @@
+# -*- mode: python ; coding: utf-8 -*-
+# Trimmed one-dir build of the desktop app:
+#     pyinstaller fabric_management_app_lite.spec
+#
+# Unlike fabric_management_app.spec (one file, nothing excluded), this bundles
+# only the runtime dependencies in requirements-runtime.txt, leaves out the
+# rest of the development environment explicitly, and builds a folder
+# (dist/fabric_management_app/) so launching does not unpack an archive to a
+# temporary directory first. Bytecode is compiled with optimize=2, which drops
+# docstrings and asserts.
+#
+# FABRIC_BUILD_CHARTS=0 leaves out matplotlib (the sales chart reports that it
+# is missing); FABRIC_BUILD_ARROW=1 adds pyarrow and zstandard for the Arrow,
+# Parquet and zstd exports. benchmarks/bench_bundle.py compares both specs.
+import os
+
+with_charts = os.environ.get("FABRIC_BUILD_CHARTS", "1") != "0"
+with_arrow = os.environ.get("FABRIC_BUILD_ARROW", "0") == "1"
+
+excludes = [
+    # Machine learning and data science stacks from the development environment
+    'tensorflow', 'tensorboard', 'keras', 'torch', 'scipy', 'sklearn', 'pandas', 'seaborn',
+    'cv2', 'h5py', 'grpc', 'google.protobuf', 'ml_dtypes', 'opt_einsum', 'optree', 'joblib',
+    'sqlalchemy', 'fuzzywuzzy', 'yaml',
+    # Notebooks, shells and test tools
+    'IPython', 'ipykernel', 'jupyter_client', 'jupyter_core', 'zmq', 'tornado', 'jedi', 'parso',
+    'prompt_toolkit', 'pygments', 'rich', 'debugpy', 'pytest', '_pytest', 'pydoc', 'lib2to3',
+    # The HTTP server runs from source, not from the desktop build
+    'flask', 'werkzeug', 'jinja2', 'itsdangerous', 'click', 'blinker',
+    # GUI toolkits matplotlib could use besides Tk
+    'PyQt5', 'PyQt6', 'PySide2', 'PySide6', 'wx', 'gi',
+    'matplotlib.backends.backend_qtagg', 'matplotlib.backends.backend_qt5agg',
+    'matplotlib.backends.backend_wxagg', 'matplotlib.backends.backend_gtk3agg',
+    'matplotlib.backends.backend_gtk4agg', 'matplotlib.backends.backend_webagg',
+]
+if not with_charts:
+    excludes += ['matplotlib', 'contourpy', 'kiwisolver', 'fontTools', 'cycler', 'pyparsing']
+if not with_arrow:
+    excludes += ['pyarrow', 'zstandard']
+
+
+a = Analysis(
+    ['main.py'],
+    pathex=[],
+    binaries=[],
+    datas=[],
+    hiddenimports=[],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=excludes,
+    noarchive=False,
+    optimize=2,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='fabric_management_app',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    # Compressed DLLs have to be unpacked in memory on every launch
+    upx=False,
+    console=False,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+)
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='fabric_management_app',
+)
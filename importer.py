@@ -0,0 +1,366 @@
+"""
+Bulk import of fabrics, purchases and sales from CSV or Excel files.
+
+Rows are read and inserted in chunks, so a file of any size is imported with
+bounded memory. Each row is validated and normalized first; fabric names are
+resolved to ids through the catalog, held as one dictionary for the whole
+import. Rows that cannot be imported are written, with the reason, to an error
+report next to the file, and the rest go in through the repository's bulk
+methods, one transaction per chunk.
+
+Columns are matched by their header, case and punctuation ignored, so files
+exported by Reports import unchanged:
+
+    fabrics:    fabric name, optional stock
+    purchases:  fabric name or fabric id, quantity, cost price, optional date
+    sales:      fabric name or fabric id, quantity, selling price, optional date
+
+Rows without a date are dated now.
+"""
+import csv
+import gzip
+import os
+import re
+import time
+from datetime import date, datetime
+
+KINDS = ("fabrics", "purchases", "sales")
+
+# Header (normalized by _header_key) -> field, per kind
+# "Id" in a Reports export is the sale or purchase id, so it is not taken for the fabric id
+_COMMON_COLUMNS = {"fabric": "fabric_name", "fabric_name": "fabric_name", "name": "fabric_name",
+                   "fabric_id": "fabric_id"}
+_TRANSACTION_COLUMNS = dict(_COMMON_COLUMNS, quantity="quantity", qty="quantity", units="quantity",
+                            meters="quantity", metres="quantity", date="date")
+COLUMNS = {
+    "fabrics": {"fabric": "fabric_name", "fabric_name": "fabric_name", "name": "fabric_name", "stock": "stock",
+                "opening_stock": "stock"},
+    "purchases": dict(_TRANSACTION_COLUMNS, cost_price="price", cost="price", price="price", rate="price",
+                      unit_cost="price", purchase_date="date"),
+    "sales": dict(_TRANSACTION_COLUMNS, selling_price="price", price="price", rate="price", unit_price="price",
+                  sale_date="date"),
+}
+REQUIRED = {"fabrics": ("fabric_name",), "purchases": ("fabric", "quantity", "price"),
+            "sales": ("fabric", "quantity", "price")}
+
+_NON_ALPHANUMERIC = re.compile(r"[^0-9a-z]+")
+_WHITESPACE = re.compile(r"\s+")
+# Unit suffixes like "Cost price (Rs)" or "Stock (units)"
+_UNIT_SUFFIX = re.compile(r"\(.*\)$")
+
+
+def _header_key(header):
+    key = _UNIT_SUFFIX.sub("", str(header or "").strip().casefold())
+    return _NON_ALPHANUMERIC.sub("_", key).strip("_")
+
+
+def _name_key(name):
+    """Fabric names compared ignoring case and runs of whitespace."""
+    return _WHITESPACE.sub(" ", name).strip().casefold()
+
+
+class RowError(ValueError):
+    """A row that cannot be imported; the message goes into the error report."""
+
+
+class Importer:
+    """
+    Import CSV (.csv, .csv.gz) and Excel (.xlsx) files into a repository.
+
+    Excel files need openpyxl, which is imported only when one is opened.
+    """
+
+    # Rows validated and inserted per transaction
+    CHUNK_ROWS = 20000
+    # Accepted date formats, tried in order; day-first as written in India
+    DATE_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d", "%Y-%m-%dT%H:%M:%S",
+                    "%d-%m-%Y %H:%M:%S", "%d-%m-%Y", "%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y",
+                    "%d.%m.%Y")
+
+    def __init__(self, db_manager, chunk_rows=None):
+        """
+        Parameters:
+        - db_manager (FabricRepository): Where the rows go.
+        - chunk_rows (int, optional): Rows per transaction; defaults to CHUNK_ROWS.
+        """
+        self.db_manager = db_manager
+        self.chunk_rows = chunk_rows or self.CHUNK_ROWS
+
+    # ---- Reading ----
+    def read_rows(self, file_path, sheet=None):
+        """
+        Yield the file's rows as lists of cells, the header row first.
+
+        Parameters:
+        - file_path (str): A .csv, .csv.gz or .xlsx file.
+        - sheet (str, optional): Worksheet of an Excel file; the first one by default.
+        """
+        lower = file_path.lower()
+        if lower.endswith((".xlsx", ".xlsm")):
+            yield from self._read_excel(file_path, sheet)
+            return
+        opener = gzip.open if lower.endswith(".gz") else open
+        # utf-8-sig drops the byte order mark Excel writes at the start of CSV files
+        with opener(file_path, "rt", newline="", encoding="utf-8-sig") as file:
+            yield from csv.reader(file)
+
+    def _read_excel(self, file_path, sheet):
+        try:
+            import openpyxl
+        except ImportError:
+            raise ImportError("openpyxl is required to import Excel files; save the sheet as CSV instead")
+        # read_only streams the rows instead of loading the whole workbook
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+            for row in worksheet.iter_rows(values_only=True):
+                yield list(row)
+        finally:
+            workbook.close()
+
+    # ---- Validation ----
+    def column_map(self, kind, header):
+        """Return {field: column index} for a header row, raising ValueError if a required column is missing."""
+        aliases = COLUMNS[kind]
+        columns = {}
+        for index, cell in enumerate(header):
+            field = aliases.get(_header_key(cell))
+            if field is not None and field not in columns:
+                columns[field] = index
+        for field in REQUIRED[kind]:
+            if field == "fabric":
+                if "fabric_name" not in columns and "fabric_id" not in columns:
+                    raise ValueError("The file needs a fabric name or fabric id column.")
+            elif field not in columns:
+                raise ValueError(f"The file needs a {field.replace('_', ' ')} column.")
+        return columns
+
+    @staticmethod
+    def _cell(row, columns, field):
+        index = columns.get(field)
+        if index is None or index >= len(row):
+            return None
+        value = row[index]
+        if isinstance(value, str):
+            value = value.strip()
+            return value or None
+        return value
+
+    def parse_number(self, value, what, positive=False):
+        if value is None:
+            raise RowError(f"missing {what}")
+        try:
+            # Thousands separators, as in "1,250.50"
+            number = float(value.replace(",", "") if isinstance(value, str) else value)
+        except (TypeError, ValueError):
+            raise RowError(f"{what} is not a number: {value!r}")
+        if number != number or number in (float("inf"), float("-inf")):
+            raise RowError(f"{what} is not a number: {value!r}")
+        if number < 0 or (positive and number == 0):
+            raise RowError(f"{what} must be {'positive' if positive else 'zero or more'}: {value!r}")
+        return number
+
+    def parse_date(self, value):
+        """Return value as 'YYYY-MM-DD HH:MM:SS', or None for an empty cell."""
+        if value is None:
+            return None
+        if isinstance(value, datetime):
+            return value.strftime("%Y-%m-%d %H:%M:%S")
+        if isinstance(value, date):
+            return value.strftime("%Y-%m-%d 00:00:00")
+        text = str(value)
+        # ISO dates, as the app writes them, without strptime's per-call locale lookups
+        if text[4:5] == "-" and text[7:8] == "-":
+            try:
+                return datetime.fromisoformat(text).strftime("%Y-%m-%d %H:%M:%S")
+            except ValueError:
+                pass
+        for date_format in self.DATE_FORMATS:
+            try:
+                return datetime.strptime(text, date_format).strftime("%Y-%m-%d %H:%M:%S")
+            except ValueError:
+                pass
+        raise RowError(f"unrecognized date: {text!r}")
+
+    def _fabric_maps(self):
+        """({name key: fabric_id}, {fabric_id}) from the catalog, as it is now."""
+        items = self.db_manager.catalog.items()
+        return {_name_key(name): fabric_id for fabric_id, name in items}, {fabric_id for fabric_id, _ in items}
+
+    # ---- Importing ----
+    def import_file(self, kind, file_path, error_report=None, sheet=None, create_fabrics=False):
+        """
+        Import a file of fabrics, purchases or sales.
+
+        Parameters:
+        - kind (str): "fabrics", "purchases" or "sales".
+        - file_path (str): The file; see read_rows.
+        - error_report (str, optional): CSV file the rejected rows are written to,
+          with their line number and the reason. Defaults to
+          '<file>.rejected.csv'; it is only created if a row is rejected.
+        - sheet (str, optional): Worksheet of an Excel file.
+        - create_fabrics (bool): Add fabrics named in a purchase or sale file that
+          do not exist yet (with no stock), instead of rejecting their rows.
+
+        Returns:
+        - result (dict): read, imported and rejected row counts, seconds taken
+          and the error_report path (None if nothing was rejected).
+
+        Sales are only imported while there is stock for them, so import
+        purchases before the sales they supply. A sale that would take a
+        fabric below zero is rejected.
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Unknown import kind: {kind}")
+        started = time.perf_counter()
+        rows = self.read_rows(file_path, sheet)
+        header = next(rows, None)
+        if header is None:
+            raise ValueError("The file is empty.")
+        columns = self.column_map(kind, header)
+        if error_report is None:
+            base = file_path[:-3] if file_path.lower().endswith(".gz") else file_path
+            error_report = os.path.splitext(base)[0] + ".rejected.csv"
+        report = _ErrorReport(error_report, header)
+        counts = {"read": 0, "imported": 0}
+        names, fabric_ids = self._fabric_maps()
+        seen_names = set()
+
+        chunk = []
+        try:
+            # The header is line 1
+            for line, row in enumerate(rows, start=2):
+                if not any(cell not in (None, "") for cell in row):
+                    continue
+                counts["read"] += 1
+                chunk.append((line, row))
+                if len(chunk) >= self.chunk_rows:
+                    names, fabric_ids = self._import_chunk(kind, chunk, columns, names, fabric_ids, seen_names,
+                                                           report, counts, create_fabrics)
+                    chunk = []
+            if chunk:
+                self._import_chunk(kind, chunk, columns, names, fabric_ids, seen_names, report, counts, create_fabrics)
+        finally:
+            report.close()
+        return {"kind": kind, "read": counts["read"], "imported": counts["imported"], "rejected": report.rejected,
+                "seconds": time.perf_counter() - started, "error_report": report.path if report.rejected else None}
+
+    def _import_chunk(self, kind, chunk, columns, names, fabric_ids, seen_names, report, counts, create_fabrics):
+        """Validate and insert one chunk; returns the fabric maps, reloaded if fabrics were added."""
+        if kind == "fabrics":
+            rows = []
+            for line, row in chunk:
+                try:
+                    name = self._cell(row, columns, "fabric_name")
+                    if name is None:
+                        raise RowError("missing fabric name")
+                    name = _WHITESPACE.sub(" ", str(name)).strip()
+                    key = _name_key(name)
+                    if key in names:
+                        raise RowError(f"fabric {name!r} already exists")
+                    if key in seen_names:
+                        raise RowError(f"fabric {name!r} appears twice in the file")
+                    stock = self._cell(row, columns, "stock")
+                    stock = 0.0 if stock is None else self.parse_number(stock, "stock")
+                except RowError as e:
+                    report.reject(line, row, e)
+                    continue
+                seen_names.add(key)
+                rows.append((name, stock))
+            if rows:
+                counts["imported"] += self.db_manager.add_fabrics_bulk(rows)
+            return names, fabric_ids
+
+        valid, missing = [], {}
+        for line, row in chunk:
+            try:
+                fabric_id = self._cell(row, columns, "fabric_id")
+                name = self._cell(row, columns, "fabric_name")
+                if fabric_id is not None:
+                    try:
+                        fabric_id = int(float(fabric_id))
+                    except (TypeError, ValueError):
+                        raise RowError(f"fabric id is not a number: {fabric_id!r}")
+                    if fabric_id not in fabric_ids:
+                        raise RowError(f"unknown fabric id {fabric_id}")
+                elif name is None:
+                    raise RowError("missing fabric")
+                else:
+                    name = _WHITESPACE.sub(" ", str(name)).strip()
+                    fabric_id = names.get(_name_key(name))
+                    if fabric_id is None:
+                        if not create_fabrics:
+                            raise RowError(f"unknown fabric {name!r}")
+                        # Resolved once the missing fabrics have been added
+                        missing.setdefault(_name_key(name), name)
+                        fabric_id = _name_key(name)
+                quantity = self.parse_number(self._cell(row, columns, "quantity"), "quantity", positive=True)
+                price = self.parse_number(self._cell(row, columns, "price"), "price")
+                sale_date = self.parse_date(self._cell(row, columns, "date"))
+            except RowError as e:
+                report.reject(line, row, e)
+                continue
+            valid.append((line, row, (fabric_id, quantity, price, sale_date)))
+
+        if missing:
+            self.db_manager.add_fabrics_bulk([(name, 0) for name in missing.values()])
+            names, fabric_ids = self._fabric_maps()
+            valid = [(line, row, (names[values[0]] if isinstance(values[0], str) else values[0],) + values[1:])
+                     for line, row, values in valid]
+        if kind == "purchases":
+            if valid:
+                self.db_manager.add_purchases_bulk([values for _, _, values in valid])
+                counts["imported"] += len(valid)
+        else:
+            counts["imported"] += self._import_sales(valid, report)
+        return names, fabric_ids
+
+    def _import_sales(self, valid, report):
+        """Insert the sales there is stock for, in file order, rejecting the rest."""
+        from db_manager import InsufficientStock
+
+        stock = {}
+        accepted = []
+        for line, row, values in valid:
+            fabric_id, quantity = values[0], values[1]
+            if fabric_id not in stock:
+                stock[fabric_id] = self.db_manager.get_fabric_stock_by_id(fabric_id) or 0
+            if quantity > stock[fabric_id]:
+                report.reject(line, row, f"not enough stock: {quantity:g} sold, {stock[fabric_id]:g} available")
+                continue
+            stock[fabric_id] -= quantity
+            accepted.append((line, row, values))
+        while accepted:
+            try:
+                self.db_manager.add_sales_bulk([values for _, _, values in accepted])
+                return len(accepted)
+            except InsufficientStock as e:
+                # Stock was sold elsewhere since it was checked; drop that fabric's sales and try the rest again
+                for line, row, values in accepted:
+                    if values[0] == e.fabric_id:
+                        report.reject(line, row, e)
+                accepted = [item for item in accepted if item[2][0] != e.fabric_id]
+        return 0
+
+
+class _ErrorReport:
+    """CSV of rejected rows: line number, reason, then the row as it was read."""
+
+    def __init__(self, path, header):
+        self.path = path
+        self.header = header
+        self.rejected = 0
+        self._file = None
+        self._writer = None
+
+    def reject(self, line, row, error):
+        if self._file is None:
+            self._file = open(self.path, "w", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(["line", "error", *self.header])
+        self._writer.writerow([line, str(error), *row])
+        self.rejected += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
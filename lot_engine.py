@@ -0,0 +1,221 @@
+class LotEngine:
+    """
+    Costs sales against purchase lots.
+
+    Every purchase is a lot in purchase_lots (kept in step with the purchases
+    table by triggers) with a remaining quantity. A sale consumes lots dated on
+    or before the sale, and the quantity taken from each lot is recorded in
+    lot_allocations, so the sale's cost of goods is stored in sales.cogs when it
+    is written.
+
+    Stock entered with the fabric is an opening stock lot (id -fabric_id,
+    dated '' so it is the oldest), costed at the fabric's weighted-average
+    purchase cost from fabric_cost. Any quantity the lots cannot cover is drawn
+    from that lot too, taking its remaining quantity below zero. No purchase
+    row backs it, which is why purchase_lots has no foreign key to purchases.
+
+    Lots are consumed oldest first ("fifo"), newest first ("lifo"), or
+    proportionally at their average cost ("average").
+
+    Sales and lots are ordered by (date, id), and a sale only ever depends on
+    lots and sales ordered before it. So after any change dated D for one fabric,
+    replaying that fabric's sales from D onward (replay) gives the same result
+    as re-costing its whole history.
+    """
+
+    METHODS = ("fifo", "lifo", "average")
+    # Quantities below this are treated as zero when consuming lots
+    EPSILON = 1e-9
+
+    def __init__(self, method="fifo"):
+        """
+        Parameters:
+        - method (str): "fifo", "lifo" or "average".
+        """
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown costing method: {method}")
+        self.method = method
+
+    def replay(self, cursor, fabric_id, from_date):
+        """
+        Re-cost every sale of fabric_id dated from_date or later.
+
+        Must run inside the writer transaction that made the change.
+
+        Returns:
+        - count (int): Number of sales re-costed.
+        """
+        cursor.execute("""SELECT DISTINCT lot_allocations.purchase_id FROM lot_allocations
+                          JOIN sales ON sales.sale_id = lot_allocations.sale_id
+                          WHERE sales.fabric_id = ? AND sales.sale_date >= ?
+                              AND lot_allocations.purchase_id IS NOT NULL""", (fabric_id, from_date))
+        touched = [row[0] for row in cursor.fetchall()]
+        cursor.execute("""DELETE FROM lot_allocations WHERE sale_id IN (
+                              SELECT sale_id FROM sales WHERE fabric_id = ? AND sale_date >= ?)""",
+                       (fabric_id, from_date))
+        # Lots the undone sales drew on, and lots dated in the replayed range
+        # (which may be new or edited), get their remaining quantity recomputed
+        remaining = """UPDATE purchase_lots
+                       SET remaining = quantity - COALESCE((SELECT SUM(quantity) FROM lot_allocations
+                                                            WHERE lot_allocations.purchase_id = purchase_lots.purchase_id), 0)
+                       WHERE """
+        cursor.execute(remaining + "fabric_id = ? AND purchase_date >= ?", (fabric_id, from_date))
+        for i in range(0, len(touched), 500):
+            chunk = touched[i:i + 500]
+            cursor.execute(remaining + f"purchase_id IN ({','.join('?' * len(chunk))})", chunk)
+        opening_cost = self._reprice_opening_lot(cursor, fabric_id)
+
+        cursor.execute("""SELECT sale_id, quantity, sale_date FROM sales
+                          WHERE fabric_id = ? AND sale_date >= ? ORDER BY sale_date, sale_id""",
+                       (fabric_id, from_date))
+        sales = cursor.fetchall()
+        if not sales:
+            return 0
+        # Lots used up before from_date cannot be drawn on again, so only the
+        # open ones (through the partial index), the ones dated in the replayed
+        # range and the opening stock lot are read. They are consumed in memory
+        # and the results written back in three batched statements.
+        cursor.execute("""SELECT purchase_id, purchase_date, quantity, cost_price, remaining FROM purchase_lots
+                          WHERE fabric_id = ?1 AND remaining > 0
+                          UNION
+                          SELECT purchase_id, purchase_date, quantity, cost_price, remaining FROM purchase_lots
+                          WHERE fabric_id = ?1 AND purchase_date >= ?2
+                          UNION
+                          SELECT purchase_id, purchase_date, quantity, cost_price, remaining FROM purchase_lots
+                          WHERE purchase_id = ?3
+                          ORDER BY 2, 1""", (fabric_id, from_date, self.opening_lot_id(fabric_id)))
+        lots = [list(row) for row in cursor.fetchall()]
+        before = {lot[0]: lot[4] for lot in lots}
+        opening = lots[0] if lots and lots[0][0] == self.opening_lot_id(fabric_id) else None
+        allocations, costs = [], []
+        open_lots = []
+        next_lot = 0
+        for sale_id, quantity, sale_date in sales:
+            while next_lot < len(lots) and lots[next_lot][1] <= sale_date:
+                lot = lots[next_lot]
+                next_lot += 1
+                if lot[4] > self.EPSILON:
+                    open_lots.append(lot)
+            if self.method == "average":
+                taken = self._allocate_average(open_lots, quantity)
+            else:
+                taken = self._allocate_in_order(open_lots, quantity)
+            covered = sum(amount for _, amount, _ in taken)
+            if quantity - covered > self.EPSILON:
+                # Stock no lot covers (adjusted by hand, or sold before the lots
+                # it came from are dated) is drawn from the opening stock lot,
+                # which may go below zero, at the fabric's average cost
+                if opening is None:
+                    opening = [self.opening_lot_id(fabric_id), "", 0.0, opening_cost, 0.0]
+                    cursor.execute("""INSERT INTO purchase_lots (purchase_id, fabric_id, purchase_date, quantity,
+                                          cost_price, remaining) VALUES (?, ?, '', 0, ?, 0)""",
+                                   (opening[0], fabric_id, opening_cost))
+                    before[opening[0]] = 0.0
+                    lots.insert(0, opening)
+                    next_lot += 1
+                opening[4] -= quantity - covered
+                taken.append((opening[0], quantity - covered, (quantity - covered) * opening[3]))
+            allocations.extend((sale_id, purchase_id, amount, cost) for purchase_id, amount, cost in taken)
+            costs.append((sum(cost for _, _, cost in taken), sale_id))
+            open_lots = [lot for lot in open_lots if lot[4] > self.EPSILON]
+
+        # Only lots the replay drew on are written back
+        cursor.executemany("UPDATE purchase_lots SET remaining = ? WHERE purchase_id = ?",
+                           [(lot[4], lot[0]) for lot in lots if lot[4] != before[lot[0]]])
+        cursor.executemany("INSERT INTO lot_allocations (sale_id, purchase_id, quantity, cost) VALUES (?, ?, ?, ?)",
+                           allocations)
+        # Unchanged costs are skipped, sparing the daily rollup trigger
+        cursor.executemany("UPDATE sales SET cogs = ?1 WHERE sale_id = ?2 AND cogs IS NOT ?1", costs)
+        return len(sales)
+
+    @staticmethod
+    def opening_lot_id(fabric_id):
+        """The purchase_lots id of a fabric's opening stock; purchases have positive ids."""
+        return -fabric_id
+
+    def _reprice_opening_lot(self, cursor, fabric_id):
+        """
+        Set the opening stock lot's cost to the fabric's weighted-average purchase cost.
+
+        Sales already drawn from it before the replayed range are re-costed
+        too, so their cost does not depend on when they were last replayed.
+
+        Returns:
+        - cost (float): The average cost, 0 if the fabric has no purchases.
+        """
+        row = cursor.execute("SELECT total_value / total_qty FROM fabric_cost WHERE fabric_id = ? AND total_qty > 0",
+                             (fabric_id,)).fetchone()
+        cost = row[0] if row else 0.0
+        lot_id = self.opening_lot_id(fabric_id)
+        cursor.execute("UPDATE purchase_lots SET cost_price = ?1 WHERE purchase_id = ?2 AND cost_price IS NOT ?1",
+                       (cost, lot_id))
+        if cursor.rowcount:
+            cursor.execute("UPDATE lot_allocations SET cost = quantity * ? WHERE purchase_id = ?", (cost, lot_id))
+            cursor.execute("""UPDATE sales SET cogs = (SELECT SUM(cost) FROM lot_allocations
+                                                       WHERE lot_allocations.sale_id = sales.sale_id)
+                              WHERE sale_id IN (SELECT sale_id FROM lot_allocations WHERE purchase_id = ?)""",
+                           (lot_id,))
+        return cost
+
+    def replay_all(self, cursor):
+        """Re-cost every sale of every fabric from scratch."""
+        cursor.execute("DELETE FROM lot_allocations")
+        cursor.execute("UPDATE purchase_lots SET remaining = quantity")
+        cursor.execute("SELECT DISTINCT fabric_id FROM sales")
+        for (fabric_id,) in cursor.fetchall():
+            self.replay(cursor, fabric_id, "")
+
+    def _allocate_in_order(self, open_lots, quantity):
+        """FIFO/LIFO: take whole lots in date order until quantity is covered."""
+        allocations = []
+        needed = quantity
+        for lot in (open_lots if self.method == "fifo" else reversed(open_lots)):
+            taken = min(needed, lot[4])
+            lot[4] -= taken
+            allocations.append((lot[0], taken, taken * lot[3]))
+            needed -= taken
+            if needed <= self.EPSILON:
+                break
+        return allocations
+
+    def _allocate_average(self, open_lots, quantity):
+        """Moving average: take the same fraction of every open lot, so the average cost is unchanged."""
+        available = sum(lot[4] for lot in open_lots)
+        if available <= self.EPSILON:
+            return []
+        fraction = min(1.0, quantity / available)
+        allocations = []
+        for lot in open_lots:
+            taken = lot[4] * fraction
+            lot[4] -= taken
+            allocations.append((lot[0], taken, taken * lot[3]))
+        return allocations
+
+    @staticmethod
+    def check(cursor, tolerance=1e-6):
+        """
+        Compare the stored lot state with the allocations.
+
+        Returns:
+        - problems (list): Descriptions of lots whose remaining quantity does not
+          match their allocations, and sales whose allocations or stored COGS do
+          not add up.
+        """
+        problems = []
+        cursor.execute("""SELECT purchase_lots.purchase_id, purchase_lots.remaining,
+                              purchase_lots.quantity - COALESCE(SUM(lot_allocations.quantity), 0)
+                          FROM purchase_lots LEFT JOIN lot_allocations ON lot_allocations.purchase_id = purchase_lots.purchase_id
+                          GROUP BY purchase_lots.purchase_id""")
+        for purchase_id, remaining, expected in cursor.fetchall():
+            if abs(remaining - expected) > tolerance * max(1, abs(expected)):
+                problems.append(f"lot {purchase_id}: remaining {remaining}, allocations leave {expected}")
+        cursor.execute("""SELECT sales.sale_id, sales.quantity, sales.cogs,
+                              COALESCE(SUM(lot_allocations.quantity), 0), COALESCE(SUM(lot_allocations.cost), 0)
+                          FROM sales LEFT JOIN lot_allocations ON lot_allocations.sale_id = sales.sale_id
+                          GROUP BY sales.sale_id""")
+        for sale_id, quantity, cogs, allocated, cost in cursor.fetchall():
+            if abs(quantity - allocated) > tolerance * max(1, abs(quantity)):
+                problems.append(f"sale {sale_id}: quantity {quantity}, allocated {allocated}")
+            elif cogs is None or abs(cogs - cost) > tolerance * max(1, abs(cost)):
+                problems.append(f"sale {sale_id}: cogs {cogs}, allocations cost {cost}")
+        return problems
@@ -1,12 +1,15 @@
+import argparse
 import tkinter as tk
 from ui_manager import UIManager
 from db_manager import DBManager
 
-def initialize_app():
-    """Initialize the main application components."""
-    # Initialize the database manager
-    db_manager = DBManager()
+def create_window(db_manager):
+    """
+    Create the main window and its UIManager for a repository.
 
+    Returns:
+    - (root, app) (tuple): The tk.Tk window and the UIManager.
+    """
     # Create the main window for the application
     root = tk.Tk()
     root.title("Siri Matching and Collection")
@@ -17,9 +20,49 @@ def initialize_app():
 
     # Initialize the UI manager, passing the root window and database manager
     app = UIManager(root, db_manager)
+    return root, app
+
+def initialize_app(server_url=None, cache_path=None, profile_path=None, smoke_test=False):
+    """
+    Initialize the main application components.
+
+    Parameters:
+    - server_url (str): Address of a server.py instance to work against; the
+      local database file is used when omitted.
+    - cache_path (str): SQLite file for the remote read cache (in memory if omitted).
+    - profile_path (str): Record query and refresh timings from the start, save
+      them to this JSON file on exit and print a summary.
+    - smoke_test (bool): Draw the window once and exit, e.g. to check that a
+      frozen build starts and to time its launch.
+    """
+    # Initialize the data repository: the local database, or a shared server
+    if server_url:
+        from remote_repository import RemoteRepository
+        db_manager = RemoteRepository(server_url, cache_path or ":memory:")
+    else:
+        db_manager = DBManager()
+    if profile_path:
+        db_manager.profiler.enabled = True
+
+    root, app = create_window(db_manager)
+    if smoke_test:
+        root.update()
+        root.destroy()
+        return
 
     # Start the Tkinter main event loop
     root.mainloop()
 
+    if profile_path:
+        print(db_manager.profiler.format_table(limit=40))
+        print("Timings saved to", db_manager.profiler.save(profile_path))
+
 if __name__ == "__main__":
-    initialize_app()
+    parser = argparse.ArgumentParser(description="Fabric Management")
+    parser.add_argument("--server", help="URL of a shared server, e.g. http://192.168.1.10:8000")
+    parser.add_argument("--cache", help="file for the server read cache")
+    parser.add_argument("--profile", nargs="?", const="profile.json", metavar="FILE",
+                        help="record query timings and save them to FILE on exit (default: %(const)s)")
+    parser.add_argument("--smoke-test", action="store_true", help="draw the window once and exit")
+    args = parser.parse_args()
+    initialize_app(args.server, args.cache, args.profile, args.smoke_test)
@@ -0,0 +1,169 @@
+"""
+Database maintenance commands.
+
+Usage:
+    python maintenance.py [--db PATH] rebuild-rollups
+    python maintenance.py [--db PATH] check-rollups
+    python maintenance.py [--db PATH] verify-range START END
+    python maintenance.py [--db PATH] replay-lots [--method fifo|lifo|average]
+    python maintenance.py [--db PATH] check-lots
+    python maintenance.py [--db PATH] rebuild-cost-cache
+    python maintenance.py [--db PATH] check-cost-cache
+    python maintenance.py [--db PATH] checkpoint-stock [--interval N]
+    python maintenance.py [--db PATH] check-stock
+    python maintenance.py [--db PATH] prune-changes [--keep N]
+    python maintenance.py [--db PATH] import fabrics|purchases|sales FILE [--sheet NAME] [--errors FILE]
+                                            [--chunk N] [--create-fabrics]
+"""
+import argparse
+import sys
+
+from db_manager import DBManager, db_path
+from importer import KINDS, Importer
+from lot_engine import LotEngine
+
+
+def rebuild_rollups(db, args):
+    db.rebuild_rollups()
+    print("Daily rollups rebuilt")
+    return 0
+
+
+def check_rollups(db, args):
+    drift = db.check_rollups()
+    for rollup, day, fabric_id, cached_qty, actual_qty, cached_value, actual_value, cached_cost, actual_cost in drift:
+        print(f"{rollup} {day} fabric {fabric_id}: quantity {cached_qty} (actual {actual_qty}), "
+              f"value {cached_value} (actual {actual_value}), cost {cached_cost} (actual {actual_cost})")
+    print(f"{len(drift)} rollup rows out of date" if drift else "Daily rollups match the raw tables")
+    return 1 if drift else 0
+
+
+def verify_range(db, args, tolerance=1e-6):
+    """Compare the rollup-planned totals for a date range with aggregating the raw rows."""
+    print("Plan:", db.plan_date_range(args.start, args.end) or "raw rows only")
+    mismatches = 0
+    for kind in DBManager.DAILY_ROLLUPS:
+        planned = db.get_range_totals(kind, args.start, args.end)
+        raw = db.get_range_totals(kind, args.start, args.end, use_rollups=False)
+        ok = len(planned) == len(raw) and all(
+            a[0] == b[0] and all(abs(x - y) <= tolerance * max(1, abs(y)) for x, y in zip(a[1:], b[1:]))
+            for a, b in zip(planned, raw))
+        print(f"{kind}: {len(raw)} fabrics, {'match' if ok else 'MISMATCH'}")
+        mismatches += not ok
+    return 1 if mismatches else 0
+
+
+def rebuild_cost_cache(db, args):
+    db.rebuild_cost_cache()
+    print("Cost cache rebuilt")
+    return 0
+
+
+def check_cost_cache(db, args):
+    drift = db.check_cost_cache()
+    for fabric_id, cached_qty, actual_qty, cached_value, actual_value in drift:
+        print(f"fabric {fabric_id}: quantity {cached_qty} (actual {actual_qty}), "
+              f"value {cached_value} (actual {actual_value})")
+    print(f"{len(drift)} fabrics out of date" if drift else "Cost cache matches the purchases")
+    return 1 if drift else 0
+
+
+def replay_lots(db, args):
+    db.replay_lots(args.method)
+    print(f"Sales re-costed ({db.lots.method})")
+    return 0
+
+
+def check_lots(db, args):
+    problems = db.check_lots()
+    for problem in problems:
+        print(problem)
+    print(f"{len(problems)} lot problems" if problems else "Lots and sale costs are consistent")
+    return 1 if problems else 0
+
+
+def checkpoint_stock(db, args):
+    written = db.checkpoint_stock(args.interval)
+    print(f"{written} stock snapshots written")
+    return 0
+
+
+def check_stock(db, args):
+    drift = db.check_stock()
+    for fabric_id, stock, ledger_stock in drift:
+        print(f"fabric {fabric_id}: stock {stock} (ledger {ledger_stock})")
+    stale = db.check_stock_snapshots()
+    for fabric_id, taken_at, cached, actual in stale:
+        print(f"fabric {fabric_id} snapshot {taken_at}: stock {cached} (ledger {actual})")
+    if drift or stale:
+        print(f"{len(drift)} fabrics and {len(stale)} snapshots disagree with the ledger")
+        return 1
+    print("Stock matches the ledger")
+    return 0
+
+
+def prune_changes(db, args):
+    deleted = db.prune_change_log(args.keep)
+    print(f"{deleted} change log entries deleted")
+    return 0
+
+
+def import_file(db, args):
+    try:
+        result = Importer(db, args.chunk).import_file(args.kind, args.file, error_report=args.errors, sheet=args.sheet,
+                                                      create_fabrics=args.create_fabrics)
+    except (OSError, ImportError, ValueError) as e:
+        print(f"Import failed: {e}")
+        return 1
+    rate = result["read"] / result["seconds"] if result["seconds"] else 0
+    print(f"{result['imported']} of {result['read']} {args.kind} rows imported in {result['seconds']:.1f} s "
+          f"({rate:,.0f} rows/s)")
+    if result["rejected"]:
+        print(f"{result['rejected']} rows rejected, see {result['error_report']}")
+    return 1 if result["rejected"] else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fabric Management database maintenance")
+    parser.add_argument("--db", default=db_path, help="database file (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("rebuild-rollups", help="recompute the daily sales/purchase rollups").set_defaults(run=rebuild_rollups)
+    commands.add_parser("check-rollups", help="compare the daily rollups with the raw tables").set_defaults(run=check_rollups)
+    verify = commands.add_parser("verify-range", help="compare rollup-planned range totals with the raw answer")
+    verify.add_argument("start", help="start date, e.g. 2024-01-01")
+    verify.add_argument("end", help="end date, e.g. 2024-12-31")
+    verify.set_defaults(run=verify_range)
+    replay = commands.add_parser("replay-lots", help="re-cost every sale against the purchase lots")
+    replay.add_argument("--method", choices=LotEngine.METHODS, help="costing method (default: fifo)")
+    replay.set_defaults(run=replay_lots)
+    commands.add_parser("check-lots", help="check lot remaining quantities and sale costs").set_defaults(run=check_lots)
+    commands.add_parser("rebuild-cost-cache", help="recompute the weighted-average cost totals").set_defaults(run=rebuild_cost_cache)
+    commands.add_parser("check-cost-cache", help="compare the cost totals with the purchases").set_defaults(run=check_cost_cache)
+    checkpoint = commands.add_parser("checkpoint-stock", help="snapshot each fabric's stock for point-in-time queries")
+    checkpoint.add_argument("--interval", type=int, help="movements between snapshots (default: %d)"
+                            % DBManager.STOCK_SNAPSHOT_INTERVAL)
+    checkpoint.set_defaults(run=checkpoint_stock)
+    commands.add_parser("check-stock", help="reconcile fabric stock and snapshots with the ledger").set_defaults(run=check_stock)
+    prune = commands.add_parser("prune-changes", help="trim the change feed that remote clients follow")
+    prune.add_argument("--keep", type=int, default=100000, help="newest changes to keep (default: %(default)s)")
+    prune.set_defaults(run=prune_changes)
+    importing = commands.add_parser("import", help="bulk import fabrics, purchases or sales from CSV or Excel")
+    importing.add_argument("kind", choices=KINDS)
+    importing.add_argument("file", help=".csv, .csv.gz or .xlsx file with a header row")
+    importing.add_argument("--sheet", help="worksheet of an Excel file (default: the first)")
+    importing.add_argument("--errors", help="where to write rejected rows (default: FILE.rejected.csv)")
+    importing.add_argument("--chunk", type=int, help="rows per transaction (default: %d)" % Importer.CHUNK_ROWS)
+    importing.add_argument("--create-fabrics", action="store_true",
+                           help="add fabrics a purchase or sale file names that do not exist yet")
+    importing.set_defaults(run=import_file)
+    args = parser.parse_args(argv)
+
+    db = DBManager(args.db)
+    try:
+        return args.run(db, args)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,391 @@
+"""
+Low-overhead timing of database queries and UI refreshes.
+
+Usage: python profiler.py DUMP.json   print a dump saved with Profiler.save
+"""
+import collections
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+# Histogram buckets per doubling of the duration (about 19% wide each), and
+# the range covered: 2**-24 s (60 ns) to 2**8 s (256 s)
+SUB_BUCKETS = 4
+MIN_EXPONENT = -24
+MAX_EXPONENT = 8
+BUCKETS = (MAX_EXPONENT - MIN_EXPONENT) * SUB_BUCKETS
+
+_clock = time.perf_counter
+_WHITESPACE = re.compile(r"\s+")
+# IN lists built for a batch of ids, which would otherwise make every batch size its own query
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+
+
+def _bucket(seconds):
+    mantissa, exponent = math.frexp(seconds)
+    index = (exponent - MIN_EXPONENT) * SUB_BUCKETS + int((mantissa - 0.5) * 2 * SUB_BUCKETS)
+    return 0 if index < 0 else BUCKETS - 1 if index >= BUCKETS else index
+
+
+def _bucket_upper(index):
+    exponent, sub = divmod(index, SUB_BUCKETS)
+    return math.ldexp(0.5 + (sub + 1) / (2 * SUB_BUCKETS), exponent + MIN_EXPONENT)
+
+
+class OperationStats:
+    """Call count, errors, rows and a log-bucketed latency histogram for one operation."""
+
+    __slots__ = ("count", "errors", "total", "max", "rows", "max_rows", "binds", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.max_rows = 0
+        self.binds = 0
+        self.buckets = [0] * BUCKETS
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of calls, in seconds (capped at the maximum)."""
+        if not self.count:
+            return 0.0
+        wanted = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= wanted and count:
+                return min(_bucket_upper(index), self.max)
+        return self.max
+
+    def merge(self, other):
+        self.count += other.count
+        self.errors += other.errors
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.rows += other.rows
+        self.max_rows = max(self.max_rows, other.max_rows)
+        self.binds += other.binds
+        self.buckets = [mine + theirs for mine, theirs in zip(self.buckets, other.buckets)]
+
+    def as_dict(self):
+        return {"count": self.count, "errors": self.errors, "total_ms": self.total * 1000,
+                "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+                "p50_ms": self.percentile(0.5) * 1000, "p95_ms": self.percentile(0.95) * 1000,
+                "p99_ms": self.percentile(0.99) * 1000, "max_ms": self.max * 1000,
+                "rows": self.rows, "max_rows": self.max_rows, "binds": self.binds}
+
+
+class Profiler:
+    """
+    Per-operation latency histograms plus an optional slow-query log.
+
+    Operations are named "sql: <statement>" for database statements (as
+    recorded by ProfiledCursor), "http: <method> <path>" for server requests
+    and "ui.<key>" for UI refreshes. Nothing is recorded while enabled is
+    False, and callers check enabled before doing any timing work, so a
+    disabled profiler costs one attribute test per query.
+
+    Each thread records into its own table, so recording takes no lock;
+    snapshot() adds the tables up.
+    """
+
+    # Slow queries kept in memory for the Diagnostics tab
+    SLOW_QUERIES_KEPT = 200
+    # Statement texts whose operation names are remembered
+    NAMES_CACHED = 10000
+
+    def __init__(self, enabled=False, slow_query_ms=None, slow_query_log=None):
+        """
+        Parameters:
+        - enabled (bool): Start recording straight away.
+        - slow_query_ms (float, optional): Statements slower than this are added
+          to the slow-query log with their EXPLAIN QUERY PLAN; None turns it off.
+        - slow_query_log (str, optional): File the slow queries are also appended
+          to, one JSON object per line.
+        """
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self.slow_query_log = slow_query_log
+        self.started = time.time()
+        self._names = {}
+        self._local = threading.local()
+        # (thread, table) for every thread that has recorded something, and
+        # the tables of finished threads added together
+        self._tables = []
+        self._retired = {}
+        self._lock = threading.Lock()
+        self.slow_queries = collections.deque(maxlen=self.SLOW_QUERIES_KEPT)
+
+    @classmethod
+    def from_environment(cls):
+        """
+        A profiler configured by environment variables: FABRIC_PROFILE=1 enables
+        it, FABRIC_SLOW_QUERY_MS sets the slow-query threshold and
+        FABRIC_SLOW_QUERY_LOG the file slow queries are appended to.
+        """
+        slow_ms = os.environ.get("FABRIC_SLOW_QUERY_MS")
+        return cls(enabled=os.environ.get("FABRIC_PROFILE") == "1",
+                   slow_query_ms=float(slow_ms) if slow_ms else None,
+                   slow_query_log=os.environ.get("FABRIC_SLOW_QUERY_LOG"))
+
+    # ---- Recording ----
+    def sql_name(self, sql):
+        """The operation name of a statement: whitespace collapsed and IN lists folded into one."""
+        name = self._names.get(sql)
+        if name is None:
+            name = "sql: " + _PLACEHOLDER_LIST.sub("?, ...", _WHITESPACE.sub(" ", sql).strip())
+            if len(self._names) >= self.NAMES_CACHED:
+                self._names = {}
+            self._names[sql] = name
+        return name
+
+    def _thread_table(self):
+        table = {}
+        with self._lock:
+            # Threads come and go (one per request in the server); fold finished ones into _retired
+            alive = []
+            for thread, finished in self._tables:
+                if thread.is_alive():
+                    alive.append((thread, finished))
+                else:
+                    _merge_table(self._retired, finished)
+            alive.append((threading.current_thread(), table))
+            self._tables = alive
+        self._local.table = table
+        return table
+
+    def record(self, operation, seconds, rows=None, binds=None, error=False):
+        """Add one call of operation taking seconds."""
+        try:
+            table = self._local.table
+        except AttributeError:
+            table = self._thread_table()
+        stats = table.get(operation)
+        if stats is None:
+            stats = table[operation] = OperationStats()
+        stats.count += 1
+        stats.total += seconds
+        if seconds > stats.max:
+            stats.max = seconds
+        stats.buckets[_bucket(seconds)] += 1
+        if error:
+            stats.errors += 1
+        if rows:
+            stats.rows += rows
+            if rows > stats.max_rows:
+                stats.max_rows = rows
+        if binds:
+            stats.binds += binds
+
+    def record_query(self, sql, params, seconds, rows, connection):
+        """Record a finished statement, logging it with its plan if it was slow."""
+        name = self._names.get(sql)
+        self.record(name if name is not None else self.sql_name(sql), seconds, rows, len(params) if params else 0)
+        if self.slow_query_ms is not None and seconds * 1000 >= self.slow_query_ms:
+            self._log_slow_query(sql, params, seconds, rows, connection)
+
+    def _log_slow_query(self, sql, params, seconds, rows, connection):
+        try:
+            plan = [row[3] for row in connection.execute("EXPLAIN QUERY PLAN " + sql, params or ())]
+        except (sqlite3.Error, ValueError):
+            # Statements like BEGIN or PRAGMA have no plan
+            plan = None
+        entry = {"at": datetime.now().isoformat(timespec="milliseconds"), "ms": round(seconds * 1000, 3),
+                 "rows": rows, "binds": len(params) if params else 0, "sql": _WHITESPACE.sub(" ", sql).strip(),
+                 "plan": plan, "thread": threading.current_thread().name}
+        self.slow_queries.append(entry)
+        if self.slow_query_log:
+            try:
+                with open(self.slow_query_log, "a") as log:
+                    log.write(json.dumps(entry) + "\n")
+            except OSError as e:
+                print("Could not write the slow-query log:", e)
+
+    def timed(self, operation, func):
+        """Wrap func so each call is recorded under operation (errors included)."""
+        def wrapper(*args, **kwargs):
+            start = _clock()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                self.record(operation, _clock() - start, error=True)
+                raise
+            self.record(operation, _clock() - start,
+                        rows=len(result) if isinstance(result, list) else None)
+            return result
+        return wrapper
+
+    # ---- Reading ----
+    def snapshot(self):
+        """Return {operation: stats dict} for every operation recorded so far."""
+        merged = {}
+        with self._lock:
+            _merge_table(merged, self._retired)
+            for _, table in self._tables:
+                _merge_table(merged, table)
+        return {operation: stats.as_dict() for operation, stats in merged.items()}
+
+    def reset(self):
+        """Forget everything recorded so far."""
+        with self._lock:
+            self._retired = {}
+            for _, table in self._tables:
+                table.clear()
+            self.slow_queries.clear()
+            self.started = time.time()
+
+    def save(self, path):
+        """Write the statistics and slow queries to path as JSON."""
+        with open(path, "w") as dump:
+            json.dump({"started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+                       "saved": datetime.now().isoformat(timespec="seconds"), "operations": self.snapshot(),
+                       "slow_queries": list(self.slow_queries)}, dump, indent=1)
+        return path
+
+    def format_table(self, sort_by="total_ms", limit=None):
+        return format_table(self.snapshot(), sort_by, limit)
+
+
+def _merge_table(into, table):
+    # list() copies the items in one step, while the owning thread may be adding operations
+    for operation, stats in list(table.items()):
+        total = into.get(operation)
+        if total is None:
+            total = into[operation] = OperationStats()
+        total.merge(stats)
+
+
+def format_table(operations, sort_by="total_ms", limit=None):
+    """Render {operation: stats dict} as a text table, the most expensive first."""
+    rows = sorted(operations.items(), key=lambda item: item[1][sort_by], reverse=True)[:limit]
+    lines = [f"{'count':>8} {'total ms':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} "
+             f"{'rows':>9}  operation"]
+    for operation, stats in rows:
+        lines.append(f"{stats['count']:8d} {stats['total_ms']:10.1f} {stats['p50_ms']:9.3f} {stats['p95_ms']:9.3f} "
+                     f"{stats['p99_ms']:9.3f} {stats['max_ms']:9.3f} {stats['rows']:9d}  "
+                     f"{operation if len(operation) <= 120 else operation[:117] + '...'}"
+                     + (f"  [{stats['errors']} errors]" if stats["errors"] else ""))
+    return "\n".join(lines)
+
+
+class ProfiledCursor:
+    """
+    Wrap an sqlite3 cursor, recording each statement with the profiler.
+
+    A statement's time covers its execute call and every fetch from it, and it
+    is recorded when the next statement starts or the cursor is closed.
+    """
+
+    __slots__ = ("_cursor", "_profiler", "_sql", "_params", "_elapsed", "_rows")
+
+    def __init__(self, cursor, profiler):
+        self._cursor = cursor
+        self._profiler = profiler
+        self._sql = None
+
+    def __getattr__(self, name):
+        # rowcount, lastrowid, description, connection, ...
+        return getattr(self._cursor, name)
+
+    def _finish(self):
+        if self._sql is not None:
+            sql, self._sql = self._sql, None
+            self._profiler.record_query(sql, self._params, self._elapsed, self._rows, self._cursor.connection)
+
+    def _failed(self, sql, start):
+        self._profiler.record(self._profiler.sql_name(sql), _clock() - start, error=True)
+
+    # Inlined rather than shared helpers: these run once per statement or fetch,
+    # and every extra call shows up against a point lookup's few microseconds
+    def execute(self, sql, params=()):
+        if self._sql is not None:
+            self._finish()
+        start = _clock()
+        try:
+            self._cursor.execute(sql, params)
+        except BaseException:
+            self._failed(sql, start)
+            raise
+        self._elapsed = _clock() - start
+        self._sql, self._params, self._rows = sql, params, 0
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        if self._sql is not None:
+            self._finish()
+        if not isinstance(seq_of_params, (list, tuple)):
+            seq_of_params = list(seq_of_params)
+        start = _clock()
+        try:
+            self._cursor.executemany(sql, seq_of_params)
+        except BaseException:
+            self._failed(sql, start)
+            raise
+        self._elapsed = _clock() - start
+        # The first row's bindings stand in for the batch in the slow-query plan
+        self._sql, self._params = sql, seq_of_params[0] if seq_of_params else ()
+        self._rows = len(seq_of_params)
+        return self
+
+    def fetchone(self):
+        start = _clock()
+        row = self._cursor.fetchone()
+        self._elapsed += _clock() - start
+        if row is not None:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        start = _clock()
+        rows = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        self._elapsed += _clock() - start
+        self._rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        start = _clock()
+        rows = self._cursor.fetchall()
+        self._elapsed += _clock() - start
+        self._rows += len(rows)
+        return rows
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany(256)
+            if not rows:
+                return
+            yield from rows
+
+    def close(self):
+        self._finish()
+        self._cursor.close()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        print(__doc__.strip())
+        return 2
+    with open(argv[0]) as dump_file:
+        dump = json.load(dump_file)
+    print(f"Recorded {dump['started']} to {dump['saved']}")
+    print(format_table(dump["operations"]))
+    if dump["slow_queries"]:
+        print(f"\n{len(dump['slow_queries'])} slow queries:")
+        for entry in dump["slow_queries"]:
+            print(f"{entry['at']} {entry['ms']:9.3f} ms {entry['rows']} rows  {entry['sql']}")
+            for step in entry["plan"] or ():
+                print(f"    {step}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
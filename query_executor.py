@@ -0,0 +1,118 @@
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+
+class QueryExecutor:
+    """
+    Run database calls on worker threads and deliver their results to Tk.
+
+    Tk widgets may only be touched from the main thread, so finished calls are
+    queued and picked up by a root.after() poll. Every request is submitted
+    under a key (e.g. "summary"); submitting again under the same key makes the
+    earlier request stale, and stale results are dropped instead of rendered.
+    """
+
+    def __init__(self, root, workers=2, poll_interval=50, on_error=None):
+        """
+        Parameters:
+        - root (tk.Tk): Window whose event loop receives the results.
+        - workers (int): Number of worker threads.
+        - poll_interval (int): Milliseconds between result polls while work is pending.
+        - on_error (callable, optional): on_error(key, exception) on the Tk thread
+          for failed requests submitted without their own on_error; without it
+          they are logged.
+        """
+        self.root = root
+        self.poll_interval = poll_interval
+        self.on_error = on_error
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db-query")
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._generations = {}
+        self._futures = {}
+        self._outstanding = 0
+        self._poll_id = None
+
+    def submit(self, key, func, *args, on_done=None, on_error=None):
+        """
+        Run func(*args) on a worker thread.
+
+        on_done(result) or on_error(exception) is called on the Tk thread, but only
+        if no newer request has been submitted under the same key in the meantime.
+        Without on_error, a failure goes to the executor's on_error, or the log.
+        """
+        with self._lock:
+            generation = self._generations.get(key, 0) + 1
+            self._generations[key] = generation
+            previous = self._futures.get(key)
+            if previous is not None:
+                # Not started yet: it never runs. Running: its result is ignored.
+                previous.cancel()
+            self._outstanding += 1
+            future = self._pool.submit(func, *args)
+            self._futures[key] = future
+        future.add_done_callback(
+            lambda f: self._results.put((key, generation, f, on_done, on_error)))
+        self._schedule_poll()
+        return generation
+
+    def cancel(self, key):
+        """Mark any outstanding request under key as stale."""
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            future = self._futures.pop(key, None)
+        if future is not None:
+            future.cancel()
+
+    def is_pending(self, key):
+        """Return True while the latest request under key has not been delivered."""
+        with self._lock:
+            return key in self._futures
+
+    def _schedule_poll(self):
+        if self._poll_id is None:
+            self._poll_id = self.root.after(self.poll_interval, self._poll)
+
+    def _poll(self):
+        """Deliver finished results on the Tk thread."""
+        self._poll_id = None
+        while True:
+            try:
+                key, generation, future, on_done, on_error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._outstanding -= 1
+                current = self._generations.get(key) == generation
+                if current:
+                    self._futures.pop(key, None)
+            if not current or future.cancelled():
+                continue
+            error = future.exception()
+            if error is None:
+                if on_done is not None:
+                    on_done(future.result())
+            elif on_error is not None:
+                on_error(error)
+            elif self.on_error is not None:
+                self.on_error(key, error)
+            else:
+                # A windowed build has no console for print
+                log.error("Background query %r failed", key, exc_info=error)
+        if self._outstanding > 0:
+            self._schedule_poll()
+
+    def shutdown(self):
+        """Stop accepting work and drop anything still queued."""
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
@@ -0,0 +1,471 @@
+import gzip
+import http.client
+import json
+import re
+import sqlite3
+import threading
+import zlib
+from datetime import datetime, timedelta
+from urllib.parse import urlencode, urlsplit
+
+from db_manager import InsufficientStock, ProfitLossRow
+from fabric_catalog import FabricCatalog
+from profiler import Profiler
+from repository import FabricRepository
+
+
+class RemoteError(Exception):
+    """The server answered with an unexpected HTTP status."""
+
+    def __init__(self, status, message):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+
+# Column order of the cached rows, matching DBManager's row shapes
+STOCK_COLUMNS = ("fabric_id", "fabric_name", "stock", "cost_price", "total_cost")
+SALE_COLUMNS = ("sale_id", "sale_date", "fabric_name", "quantity", "selling_price", "revenue")
+PURCHASE_COLUMNS = ("purchase_id", "purchase_date", "fabric_name", "quantity", "cost_price", "expenditure")
+
+CACHE_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+    """CREATE TABLE IF NOT EXISTS fabric_stock (
+            fabric_id INTEGER PRIMARY KEY, fabric_name TEXT, stock REAL, cost_price REAL, total_cost REAL)""",
+    """CREATE TABLE IF NOT EXISTS sales (
+            sale_id INTEGER PRIMARY KEY, sale_date TEXT, fabric_name TEXT, quantity REAL, selling_price REAL, revenue REAL)""",
+    "CREATE INDEX IF NOT EXISTS idx_cache_sales_date ON sales (sale_date)",
+    """CREATE TABLE IF NOT EXISTS purchases (
+            purchase_id INTEGER PRIMARY KEY, purchase_date TEXT, fabric_name TEXT, quantity REAL, cost_price REAL,
+            expenditure REAL)""",
+    "CREATE INDEX IF NOT EXISTS idx_cache_purchases_date ON purchases (purchase_date)",
+]
+
+
+class RemoteRepository(FabricRepository):
+    """
+    FabricRepository backed by server.py, with a local SQLite read cache.
+
+    The cache holds every fabric with its stock, plus the sales and purchases
+    of the last RECENT_DAYS days. A background thread follows the server's
+    change feed (/api/changes, a monotonic sequence number with long-polling)
+    and applies each change to the cache, so the Summary tab, stock lookups
+    and recent sales/purchases are read locally. Report results are memoized
+    until the next change. Older date ranges go to the server. After each
+    write the feed is pulled at once, so this terminal sees its own changes
+    immediately.
+    """
+
+    RECENT_DAYS = 90
+    # Seconds a change-feed request waits on the server for something to happen
+    POLL_WAIT = 20
+    # Seconds between reconnection attempts while the server is unreachable
+    RETRY_SECONDS = 2
+    CHANGES_PER_REQUEST = 1000
+
+    def __init__(self, base_url, cache_path=":memory:", timeout=30, follow=True):
+        """
+        Parameters:
+        - base_url (str): Server address, e.g. "http://192.168.1.10:8000".
+        - cache_path (str): SQLite file for the read cache; a file survives
+          restarts and only catches up on the changes since.
+        - timeout (int): Seconds to wait for an ordinary request.
+        - follow (bool): Follow the change feed on a background thread; without
+          it call refresh() to bring the cache up to date.
+        """
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.base_path = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.profiler = Profiler.from_environment()
+        self._local = threading.local()
+
+        self._cache = sqlite3.connect(cache_path, check_same_thread=False, isolation_level=None)
+        self._cache_lock = threading.RLock()
+        for statement in CACHE_SCHEMA:
+            self._cache.execute(statement)
+        # Serializes catching up, whether from the feed thread or after a write
+        self._sync_lock = threading.Lock()
+        self._memo = {}
+        self.catalog = FabricCatalog(lambda: self._cached("SELECT fabric_id, fabric_name FROM fabric_stock ORDER BY fabric_id"))
+
+        if self._meta("base_url") != base_url or self._meta("last_seq") is None:
+            self.sync()
+            self._set_meta("base_url", base_url)
+        else:
+            self.refresh()
+
+        self._stopped = threading.Event()
+        self._follower = None
+        if follow:
+            self._follower = threading.Thread(target=self._follow, name="change-feed", daemon=True)
+            self._follower.start()
+
+    # ---- HTTP ----
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout + self.POLL_WAIT)
+            self._local.conn = conn
+        return conn
+
+    def _send(self, method, path, params=None, body=None, stream=False):
+        if not self.profiler.enabled:
+            return self._request(method, path, params, body, stream)
+        # One operation per endpoint, not per id
+        operation = f"http: {method} {re.sub(r'/[0-9]+', '/<id>', path)}"
+        if params and params.get("wait"):
+            # Mostly time spent waiting for a change; keep it apart from the real requests
+            operation += " (long poll)"
+        return self.profiler.timed(operation, self._request)(method, path, params, body, stream)
+
+    def _request(self, method, path, params, body, stream):
+        url = self.base_path + path + ("?" + urlencode(params) if params else "")
+        headers = {"Accept-Encoding": "gzip"}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        # A kept-alive connection the server has since closed fails on first use;
+        # only reads are retried, since a write may already have been applied
+        for attempt in range(2 if method == "GET" else 1):
+            conn = self._connection()
+            try:
+                conn.request(method, url, payload, headers)
+                response = conn.getresponse()
+                break
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                self._local.conn = None
+                if attempt or method != "GET":
+                    raise
+        if stream:
+            return response
+        data = response.read()
+        if response.getheader("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+        result = json.loads(data) if data else {}
+        if response.status == 409 and "available" in result:
+            raise InsufficientStock(result["fabric_id"], result["requested"], result["available"])
+        if response.status == 400:
+            raise ValueError(result.get("error", "Bad request"))
+        if response.status == 404:
+            return None
+        if response.status >= 300:
+            raise RemoteError(response.status, result.get("error", ""))
+        return result
+
+    def _stream(self, path, params, columns):
+        """Yield the rows of an NDJSON export as tuples in columns order, decompressing as they arrive."""
+        response = self._send("GET", path, params, stream=True)
+        if response.status != 200:
+            raise RemoteError(response.status, response.read()[:200])
+        decompressor = zlib.decompressobj(31) if response.getheader("Content-Encoding") == "gzip" else None
+        pending = b""
+        while True:
+            received = response.read(64 * 1024)
+            chunk = received
+            if decompressor:
+                chunk = decompressor.decompress(received) if received else decompressor.flush()
+            pending += chunk
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                if line:
+                    row = json.loads(line)
+                    yield tuple(row[column] for column in columns)
+            if not received:
+                break
+
+    # ---- Cache ----
+    def _cached(self, query, params=()):
+        with self._cache_lock:
+            return self._cache.execute(query, params).fetchall()
+
+    def _meta(self, key):
+        row = self._cached("SELECT value FROM meta WHERE key = ?", (key,))
+        return row[0][0] if row else None
+
+    def _set_meta(self, key, value):
+        with self._cache_lock:
+            self._cache.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _in_cache(self, start_date):
+        horizon = self._meta("horizon")
+        return horizon is not None and start_date >= horizon
+
+    def sync(self):
+        """Reload the whole cache from the server."""
+        with self._sync_lock:
+            # Changes made while the snapshot below is read are replayed afterwards;
+            # applying one twice is harmless
+            last_seq = self._send("GET", "/api/changes", {"since": 0, "limit": 1})["last_seq"]
+            horizon = (datetime.now() - timedelta(days=self.RECENT_DAYS)).strftime("%Y-%m-%d")
+            stock, after = [], 0
+            while after is not None:
+                page = self._send("GET", "/api/stock", {"limit": 1000, "after": after})
+                stock += [tuple(row[column] for column in STOCK_COLUMNS) for row in page["rows"]]
+                after = page["next"]
+            sales = list(self._stream("/api/sales/export", {"start": horizon, "end": "9999"}, SALE_COLUMNS))
+            purchases = list(self._stream("/api/purchases/export", {"start": horizon, "end": "9999"}, PURCHASE_COLUMNS))
+            with self._cache_lock:
+                self._cache.execute("BEGIN")
+                for table in ("fabric_stock", "sales", "purchases"):
+                    self._cache.execute(f"DELETE FROM {table}")
+                self._cache.executemany("INSERT INTO fabric_stock VALUES (?, ?, ?, ?, ?)", stock)
+                self._cache.executemany("INSERT INTO sales VALUES (?, ?, ?, ?, ?, ?)", sales)
+                self._cache.executemany("INSERT INTO purchases VALUES (?, ?, ?, ?, ?, ?)", purchases)
+                self._cache.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                        [("last_seq", str(last_seq)), ("horizon", horizon)])
+                self._cache.execute("COMMIT")
+                self._memo.clear()
+            self.catalog.load()
+
+    def refresh(self, wait=0):
+        """
+        Apply the server's pending changes to the cache.
+
+        Parameters:
+        - wait (float): Seconds the server may hold the request open waiting for
+          a change when there is none yet.
+
+        Returns:
+        - count (int): Number of changes applied.
+        """
+        applied = 0
+        while True:
+            # Waited for without the lock, so a write's own refresh is not held up
+            # behind the feed thread's long poll
+            since = int(self._meta("last_seq"))
+            result = self._send("GET", "/api/changes", {"since": since, "wait": wait,
+                                                        "limit": self.CHANGES_PER_REQUEST})
+            if result["reset"]:
+                # The changes since our sequence number are gone; start over
+                self.sync()
+                return applied
+            with self._sync_lock:
+                if int(self._meta("last_seq")) != since:
+                    # Another thread applied changes meanwhile; ask again from where it got to
+                    wait = 0
+                    continue
+                self._apply(result["changes"])
+            applied += len(result["changes"])
+            if len(result["changes"]) < self.CHANGES_PER_REQUEST:
+                return applied
+            wait = 0
+
+    def _apply(self, changes):
+        if not changes:
+            return
+        fabric_ids, sale_ids, purchase_ids = set(), set(), set()
+        for change in changes:
+            if change["fabric_id"] is not None:
+                fabric_ids.add(change["fabric_id"])
+            if change["entity"] == "sales":
+                sale_ids.add(change["entity_id"])
+            elif change["entity"] == "purchases":
+                purchase_ids.add(change["entity_id"])
+        stock = self._fetch_by_ids("/api/stock", fabric_ids, STOCK_COLUMNS)
+        sales = self._fetch_by_ids("/api/sales", sale_ids, SALE_COLUMNS)
+        purchases = self._fetch_by_ids("/api/purchases", purchase_ids, PURCHASE_COLUMNS)
+        horizon = self._meta("horizon")
+        added = any(change["entity"] == "fabrics" and change["action"] != "update" for change in changes)
+        with self._cache_lock:
+            old_names = dict(self._cache.execute(
+                f"SELECT fabric_id, fabric_name FROM fabric_stock WHERE fabric_id IN ({','.join('?' * len(fabric_ids))})",
+                list(fabric_ids)).fetchall()) if fabric_ids else {}
+            renames = [(row[1], old_names[row[0]]) for row in stock
+                       if row[0] in old_names and old_names[row[0]] != row[1]]
+            self._cache.execute("BEGIN")
+            self._replace("fabric_stock", "fabric_id", fabric_ids, stock)
+            # Cached rows carry the fabric name, so a rename rewrites them too
+            for table in ("sales", "purchases"):
+                self._cache.executemany(f"UPDATE {table} SET fabric_name = ? WHERE fabric_name = ?", renames)
+            # Only the recent window is cached; rows edited to older dates drop out
+            self._replace("sales", "sale_id", sale_ids, [row for row in sales if row[1] >= horizon])
+            self._replace("purchases", "purchase_id", purchase_ids, [row for row in purchases if row[1] >= horizon])
+            self._cache.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_seq', ?)", (str(changes[-1]["seq"]),))
+            self._cache.execute("COMMIT")
+            self._memo.clear()
+        if added or renames:
+            self.catalog.load()
+
+    def _fetch_by_ids(self, path, ids, columns):
+        rows = []
+        ids = sorted(ids)
+        for i in range(0, len(ids), 200):
+            result = self._send("GET", path, {"ids": ",".join(map(str, ids[i:i + 200]))})
+            rows += [tuple(row[column] for column in columns) for row in result["rows"]]
+        return rows
+
+    def _replace(self, table, id_column, ids, rows):
+        """Delete the changed ids, then insert the rows that still exist."""
+        self._cache.executemany(f"DELETE FROM {table} WHERE {id_column} = ?", [(i,) for i in ids])
+        if rows:
+            self._cache.executemany(f"INSERT INTO {table} VALUES ({','.join('?' * len(rows[0]))})", rows)
+
+    def _follow(self):
+        while not self._stopped.is_set():
+            try:
+                self.refresh(wait=self.POLL_WAIT)
+            except (OSError, http.client.HTTPException, RemoteError, ValueError) as e:
+                print("Change feed unavailable, retrying:", e)
+                self._stopped.wait(self.RETRY_SECONDS)
+
+    def _memoized(self, key, load):
+        """Return load()'s result, computed once per key until the next change arrives."""
+        with self._cache_lock:
+            if key in self._memo:
+                return self._memo[key]
+            # A change applied while loading clears the memo; don't store the stale result then
+            memo = self._memo
+        result = load()
+        with self._cache_lock:
+            if memo is self._memo:
+                memo[key] = result
+        return result
+
+    def _written(self, result):
+        """Bring the cache up to date after a write of our own, so it is visible at once."""
+        self.refresh()
+        return result
+
+    # ---- Fabrics ----
+    def add_fabric(self, fabric_name, stock):
+        self._send("POST", "/api/fabrics", body={"fabric_name": fabric_name, "stock": stock})
+        return self._written({"success": f"Successfully added the {fabric_name}"})
+
+    def add_fabrics_bulk(self, rows):
+        rows = list(rows)
+        self._send("POST", "/api/fabrics", body={"rows": [{"fabric_name": name, "stock": stock} for name, stock in rows]})
+        return self._written(len(rows))
+
+    def update_fabric_name(self, fabric_id, fabric_name):
+        result = self._send("PATCH", f"/api/fabrics/{int(fabric_id)}", body={"fabric_name": fabric_name})
+        return self._written(0 if result is None else 1)
+
+    def get_fabric_id(self, fabric_name):
+        return self.catalog.get_id(fabric_name)
+
+    def get_fabric_name_by_id(self, fabric_id):
+        return self.catalog.get_name(fabric_id)
+
+    def get_fabrics_list(self):
+        return self.catalog.names()
+
+    def search_fabrics(self, search_term, mode="prefix", limit=50):
+        search_term = search_term.strip()
+        if mode == "prefix" or not search_term:
+            return self.catalog.search_prefix(search_term, limit)
+        return self._send("GET", "/api/fabrics/search", {"q": search_term, "mode": mode, "limit": limit})["names"]
+
+    # ---- Stock ----
+    def get_fabric_stock(self, fabric_name):
+        rows = self._cached("SELECT stock FROM fabric_stock WHERE fabric_name = ?", (fabric_name,))
+        return rows[0][0] if rows else None
+
+    def get_fabric_stock_by_id(self, fabric_id):
+        rows = self._cached("SELECT stock FROM fabric_stock WHERE fabric_id = ?", (fabric_id,))
+        return rows[0][0] if rows else None
+
+    def get_all_fabrics_stock(self):
+        return self._cached("SELECT fabric_id, fabric_name, stock, cost_price, total_cost FROM fabric_stock")
+
+    def iter_all_fabrics_stock(self, chunk_size=None):
+        return iter(self.get_all_fabrics_stock())
+
+    def get_fabrics_stock_by_ids(self, fabric_ids):
+        fabric_ids = list(fabric_ids)
+        rows = []
+        for i in range(0, len(fabric_ids), 500):
+            chunk = fabric_ids[i:i + 500]
+            rows += self._cached("SELECT fabric_id, fabric_name, stock, cost_price, total_cost FROM fabric_stock "
+                                 f"WHERE fabric_id IN ({','.join('?' * len(chunk))})", tuple(chunk))
+        return rows
+
+    def get_purchase_cost(self, fabric_id):
+        rows = self._cached("SELECT cost_price FROM fabric_stock WHERE fabric_id = ?", (fabric_id,))
+        return rows[0][0] if rows else None
+
+    # ---- Sales and Purchases ----
+    def add_sale(self, fabric_id, quantity, selling_price):
+        self.add_sales_bulk([(fabric_id, quantity, selling_price)])
+
+    def add_purchase(self, fabric_id, quantity, cost_price):
+        self.add_purchases_bulk([(fabric_id, quantity, cost_price)])
+
+    def add_sales_bulk(self, rows):
+        self._send("POST", "/api/sales", body={"rows": [
+            {"fabric_id": row[0], "quantity": row[1], "selling_price": row[2], "sale_date": row[3] if len(row) > 3 else None}
+            for row in rows]})
+        self._written(None)
+
+    def add_purchases_bulk(self, rows):
+        self._send("POST", "/api/purchases", body={"rows": [
+            {"fabric_id": row[0], "quantity": row[1], "cost_price": row[2], "purchase_date": row[3] if len(row) > 3 else None}
+            for row in rows]})
+        self._written(None)
+
+    def get_sale_by_id(self, id):
+        row = self._send("GET", f"/api/sales/{int(id)}")
+        return row and (row["sale_id"], row["fabric_id"], row["quantity"], row["selling_price"], row["sale_date"])
+
+    def get_purchase_by_id(self, id):
+        row = self._send("GET", f"/api/purchases/{int(id)}")
+        return row and (row["purchase_id"], row["fabric_id"], row["quantity"], row["cost_price"], row["purchase_date"])
+
+    def update_sale_data(self, sale_id, quantity, selling_price, sale_date):
+        result = self._send("PUT", f"/api/sales/{int(sale_id)}",
+                            body={"quantity": quantity, "selling_price": selling_price, "sale_date": sale_date})
+        return self._written(0 if result is None else 1)
+
+    def update_purchase_data(self, purchase_id, quantity, cost_price, purchase_date):
+        result = self._send("PUT", f"/api/purchases/{int(purchase_id)}",
+                            body={"quantity": quantity, "cost_price": cost_price, "purchase_date": purchase_date})
+        return self._written(0 if result is None else 1)
+
+    def get_sales_data(self, start_date, end_date):
+        return list(self.iter_sales_data(start_date, end_date))
+
+    def iter_sales_data(self, start_date, end_date, chunk_size=None):
+        if self._in_cache(start_date):
+            return iter(self._cached("""SELECT * FROM sales WHERE sale_date BETWEEN ? AND ?
+                                        ORDER BY sale_date DESC, sale_id DESC""", (start_date, end_date)))
+        return self._stream("/api/sales/export", {"start": start_date, "end": end_date}, SALE_COLUMNS)
+
+    def get_purchase_data(self, start_date, end_date):
+        return list(self.iter_purchase_data(start_date, end_date))
+
+    def iter_purchase_data(self, start_date, end_date, chunk_size=None):
+        if self._in_cache(start_date):
+            return iter(self._cached("""SELECT * FROM purchases WHERE purchase_date BETWEEN ? AND ?
+                                        ORDER BY purchase_date DESC, purchase_id DESC""", (start_date, end_date)))
+        return self._stream("/api/purchases/export", {"start": start_date, "end": end_date}, PURCHASE_COLUMNS)
+
+    # ---- Reports ----
+    def get_total_profit_loss(self, start_date, end_date, fabric_id=None):
+        def load():
+            params = {"start": start_date, "end": end_date}
+            if fabric_id is not None:
+                params["fabric_id"] = fabric_id
+            return [ProfitLossRow(**row) for row in self._send("GET", "/api/reports/profit-loss", params)["rows"]]
+        return self._memoized(("profit_loss", start_date, end_date, fabric_id), load)
+
+    def analytics_summary(self, start_date, end_date, fabric_id=None):
+        from analytics import FabricMetrics, PeriodMetrics
+
+        def load():
+            params = {"start": start_date, "end": end_date}
+            if fabric_id is not None:
+                params["fabric_id"] = fabric_id
+            result = self._send("GET", "/api/reports/analytics", params)
+            return {key: [(FabricMetrics if key == "fabrics" else PeriodMetrics)(**row) for row in rows]
+                    for key, rows in result.items()}
+        return self._memoized(("analytics", start_date, end_date, fabric_id), load)
+
+    def close(self):
+        """Stop following the change feed and close the cache."""
+        self._stopped.set()
+        if self._follower is not None:
+            # The feed request in flight ends by POLL_WAIT at the latest
+            self._follower.join(timeout=self.timeout + self.POLL_WAIT)
+        with self._cache_lock:
+            self._cache.close()
@@ -1,140 +1,237 @@
-import csv
 import os
-import matplotlib.pyplot as plt
 import datetime
 
+from exporters import create_exporter, TIMESTAMP, FLOAT, INTEGER, STRING
+
 class Reports:
     def __init__(self, ui_mmanager,db_manager, output_dir='./reports'):
-        """Initialize with a DBManager instance and define the output directory for reports."""
+        """
+        Initialize with a repository (DBManager or RemoteRepository) and define the
+        output directory for reports.
+
+        ui_mmanager may be None when reports are generated without the UI; the
+        report dates must then be passed explicitly.
+        """
         self.ui_manager=ui_mmanager
         self.db_manager = db_manager
-        self.output_dir = os.path.join(os.getcwd(),'reports')
+        self.output_dir = os.path.abspath(output_dir)
+
+        # Exporters registered with register_exporter, by format name
+        self.exporters = {}
 
         # Create the reports directory if it doesn't exist
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
         print(self.output_dir)
 
-    def generate_sales_report(self):
+    # Header rows of the exported reports, matching the UI tables without the Edit column
+    SALES_COLUMNS = ("Date", "Fabric", "Quantity", "Selling price", "Revenue")
+    PURCHASES_COLUMNS = ("Date", "Fabric", "Quantity", "Cost price", "Expenditure")
+    STOCK_COLUMNS = ("Id", "Fabric", "Stock", "Cost price", "Total cost")
+    PROFIT_LOSS_COLUMNS = ("Id", "Fabric", "Units sold", "Cost price", "Selling price",
+                           "Revenue", "Expenditure", "Profit/Loss")
+    # Column types of the reports, used by the typed (Arrow/Parquet) formats
+    SALES_TYPES = (TIMESTAMP, STRING, FLOAT, FLOAT, FLOAT)
+    PURCHASES_TYPES = (TIMESTAMP, STRING, FLOAT, FLOAT, FLOAT)
+    STOCK_TYPES = (INTEGER, STRING, FLOAT, FLOAT, FLOAT)
+    PROFIT_LOSS_TYPES = (INTEGER, STRING, FLOAT, FLOAT, FLOAT, FLOAT, FLOAT, FLOAT)
+    ANALYTICS_COLUMNS = ("Id", "Fabric", "Units sold", "Revenue", "COGS", "Profit/Loss", "Margin %",
+                         "Units purchased", "Purchase value", "Stock", "Sell-through", "Turnover")
+    ANALYTICS_TYPES = (INTEGER, STRING) + (FLOAT,) * 10
+    TIME_SERIES_COLUMNS = ("Period", "Units sold", "Revenue", "COGS", "Profit/Loss", "Margin %",
+                           "Units purchased", "Purchase value")
+    TIME_SERIES_TYPES = (TIMESTAMP,) + (FLOAT,) * 7
+
+    def report_dates(self, start_date, end_date, start_entry, end_entry):
+        """Fill in dates that were not given from the matching UI entries."""
+        if start_date is None:
+            start_date = start_entry.get()
+        if end_date is None:
+            end_date = end_entry.get()
+        return start_date, end_date
+
+    def generate_sales_report(self, start_date=None, end_date=None, fmt="csv"):
         """
-        Generate a sales report for the specified time period.
+        Export the sales between two dates, streaming rows from the database.
 
         Parameters:
-        - start_date (str, optional): Start date in 'YYYY-MM-DD' format.
-        - end_date (str, optional): End date in 'YYYY-MM-DD' format.
-        - export_to_csv (bool, optional): If True, export the report to a CSV file.
+        - start_date (str, optional): Start date in 'YYYY-MM-DD' format. Defaults to the sales tab entry.
+        - end_date (str, optional): End date in 'YYYY-MM-DD' format. Defaults to the sales tab entry.
+        - fmt (str, optional): Export format, see export_report.
 
         Returns:
-        - report_data (list): List of tuples containing fabric name, quantity sold, and total sales value.
+        - file_path (str): Path of the exported file, or None on failure.
         """
         try:
-            report_data = []
-            cols=self.ui_manager.sales_record_tree["columns"]
-            if len(cols)>0:
-                cols=cols[:len(cols)-1]
-            if len(cols)>0:
-                cols=cols[:len(cols)-1]
-            for row in self.ui_manager.sales_record_tree.get_children():
-                values=self.ui_manager.sales_record_tree.item(row,"values")
-                report_data.append(values[:len(values)-1])
+            if start_date is None or end_date is None:
+                start_date, end_date = self.report_dates(start_date, end_date,
+                                                         self.ui_manager.entry_start_date_sales,
+                                                         self.ui_manager.entry_end_date_sales)
+            rows = (sale[1:] for sale in self.db_manager.iter_sales_data(start_date, end_date))
             current_date = datetime.datetime.now().strftime("%Y-%m-%d")
-            report_name=f"sales_report_from_{self.ui_manager.entry_start_date_sales.get()}_to_{self.ui_manager.entry_end_date_sales.get()}_on_{current_date}"
-            self.export_to_csv(report_data,cols,report_name)
+            report_name=f"sales_report_from_{start_date}_to_{end_date}_on_{current_date}"
+            return self.export_report(rows, self.SALES_COLUMNS, report_name, fmt, self.SALES_TYPES)
 
         except Exception as e:
             print(f"Error generating sales report: {e}")
-            return []
 
-    def generate_stock_report(self, export_to_csv=True):
+    def generate_stock_report(self, fmt="csv"):
         """
-        Generate a report on current stock levels for all fabrics.
+        Export the current stock level and cost of every fabric.
 
         Parameters:
-        - export_to_csv (bool, optional): If True, export the report to a CSV file.
+        - fmt (str, optional): Export format, see export_report.
 
         Returns:
-        - report_data (list): List of tuples containing fabric name and current stock.
+        - file_path (str): Path of the exported file, or None on failure.
         """
         try:
-            report_data = []
-            cols=self.ui_manager.tree_fabric_stock["columns"]
-            if len(cols)>0:
-                cols=cols[:len(cols)-1]
-            for row in self.ui_manager.tree_fabric_stock.get_children():
-                values=self.ui_manager.tree_fabric_stock.item(row,"values")
-                report_data.append(values[:len(values)-1])
             current_date = datetime.datetime.now().strftime("%Y-%m-%d")
             report_name="stock_report_" + current_date
-            self.export_to_csv(report_data,cols,report_name)
+            return self.export_report(self.db_manager.iter_all_fabrics_stock(), self.STOCK_COLUMNS, report_name,
+                                      fmt, self.STOCK_TYPES)
         except Exception as e:
             print(f"Error generating stock report: {e}")
-    def generate_purchases_report(self):
+
+    def generate_purchases_report(self, start_date=None, end_date=None, fmt="csv"):
+        """
+        Export the purchases between two dates, streaming rows from the database.
+
+        Parameters:
+        - start_date (str, optional): Start date in 'YYYY-MM-DD' format. Defaults to the purchase tab entry.
+        - end_date (str, optional): End date in 'YYYY-MM-DD' format. Defaults to the purchase tab entry.
+        - fmt (str, optional): Export format, see export_report.
+
+        Returns:
+        - file_path (str): Path of the exported file, or None on failure.
+        """
         try:
-            report_data = []
-            cols=self.ui_manager.purchases_record_tree["columns"]
-            if len(cols)>0:
-                cols=cols[:len(cols)-1]
-            if len(cols)>0:
-                cols=cols[:len(cols)-1]
-            for row in self.ui_manager.purchases_record_tree.get_children():
-                values=self.ui_manager.purchases_record_tree.item(row,"values")
-                report_data.append(values[:len(values)-1])
+            if start_date is None or end_date is None:
+                start_date, end_date = self.report_dates(start_date, end_date,
+                                                         self.ui_manager.entry_start_date_purchase,
+                                                         self.ui_manager.entry_end_date_purchase)
+            rows = (purchase[1:] for purchase in self.db_manager.iter_purchase_data(start_date, end_date))
             current_date = datetime.datetime.now().strftime("%Y-%m-%d")
-            report_name=f"purchases_report_from_{self.ui_manager.entry_start_date_purchase.get()}_to_{self.ui_manager.entry_end_date_purchase.get()}_on_{current_date}"
-            self.export_to_csv(report_data,cols,report_name)
+            report_name=f"purchases_report_from_{start_date}_to_{end_date}_on_{current_date}"
+            return self.export_report(rows, self.PURCHASES_COLUMNS, report_name, fmt, self.PURCHASES_TYPES)
 
         except Exception as e:
-            print(f"Error generating sales report: {e}")
-            return []
+            print(f"Error generating purchases report: {e}")
 
-    def generate_profit_loss_report(self, start_date=None, end_date=None, export_to_csv=False):
+    def generate_profit_loss_report(self, start_date=None, end_date=None, fmt="csv"):
         """
-        Generate a profit/loss report for the specified time period.
+        Export the profit/loss per fabric between two dates.
 
         Parameters:
-        - start_date (str, optional): Start date in 'YYYY-MM-DD' format.
-        - end_date (str, optional): End date in 'YYYY-MM-DD' format.
-        - export_to_csv (bool, optional): If True, export the report to a CSV file.
+        - start_date (str, optional): Start date in 'YYYY-MM-DD' format. Defaults to the summary tab entry.
+        - end_date (str, optional): End date in 'YYYY-MM-DD' format. Defaults to the summary tab entry.
+        - fmt (str, optional): Export format, see export_report.
 
         Returns:
-        - report_data (list): List of tuples containing fabric name and profit/loss.
+        - file_path (str): Path of the exported file, or None on failure.
         """
         try:
-            report_data = []
-            cols=self.ui_manager.tree_profit_loss["columns"]
-            for row in self.ui_manager.tree_profit_loss.get_children():
-                values=self.ui_manager.tree_profit_loss.item(row,"values")
-                report_data.append([values[0],values[1],float(values[2][1:]),float(values[3][1:])])
+            if start_date is None or end_date is None:
+                start_date, end_date = self.report_dates(start_date, end_date,
+                                                         self.ui_manager.entry_start_date,
+                                                         self.ui_manager.entry_end_date)
+            # One row per fabric plus the totals row, so this is small enough to load at once
+            rows = self.db_manager.get_total_profit_loss(start_date, end_date)
             current_date = datetime.datetime.now().strftime("%Y-%m-%d")
-            report_name=f"profit_loss_report_from_{self.ui_manager.entry_start_date.get()}_to_{self.ui_manager.entry_end_date.get()}_on_{current_date}"
-            self.export_to_csv(report_data,cols,report_name)
+            report_name=f"profit_loss_report_from_{start_date}_to_{end_date}_on_{current_date}"
+            return self.export_report(rows, self.PROFIT_LOSS_COLUMNS, report_name, fmt, self.PROFIT_LOSS_TYPES)
 
         except Exception as e:
             print(f"Error generating profit/loss report: {e}")
-            return []
 
-    def export_to_csv(self, report_data, col_names, report_name, start_date=None, end_date=None):
+    def generate_analytics_report(self, start_date=None, end_date=None, fmt="csv"):
         """
-        Export report data to a CSV file.
+        Export revenue, COGS, margin, sell-through and turnover per fabric, plus
+        daily, weekly and monthly totals, for the period between two dates.
 
         Parameters:
-        - report_data (list): Data to export.
+        - start_date (str, optional): Start date in 'YYYY-MM-DD' format. Defaults to the summary tab entry.
+        - end_date (str, optional): End date in 'YYYY-MM-DD' format. Defaults to the summary tab entry.
+        - fmt (str, optional): Export format, see export_report.
+
+        Returns:
+        - file_paths (list): Paths of the per-fabric report followed by the day,
+          week and month reports, or None on failure.
+        """
+        try:
+            if start_date is None or end_date is None:
+                start_date, end_date = self.report_dates(start_date, end_date,
+                                                         self.ui_manager.entry_start_date,
+                                                         self.ui_manager.entry_end_date)
+            summary = self.db_manager.analytics_summary(start_date, end_date)
+            current_date = datetime.datetime.now().strftime("%Y-%m-%d")
+            period = f"from_{start_date}_to_{end_date}_on_{current_date}"
+            file_paths = [self.export_report(summary["fabrics"], self.ANALYTICS_COLUMNS,
+                                             f"analytics_report_{period}", fmt, self.ANALYTICS_TYPES)]
+            for freq, label in (("day", "daily"), ("week", "weekly"), ("month", "monthly")):
+                file_paths.append(self.export_report(summary[freq], self.TIME_SERIES_COLUMNS,
+                                                     f"{label}_totals_{period}", fmt, self.TIME_SERIES_TYPES))
+            return file_paths
+
+        except Exception as e:
+            print(f"Error generating analytics report: {e}")
+
+    def register_exporter(self, fmt, exporter):
+        """
+        Add or replace an export format.
+
+        Parameters:
+        - fmt (str): Format name passed to the generate_* methods.
+        - exporter: Object with an extension attribute and a
+          write(file_path, rows, col_names, col_types) method.
+        """
+        self.exporters[fmt] = exporter
+
+    def export_report(self, report_data, col_names, report_name, fmt="csv", col_types=None):
+        """
+        Export report data to a file in the given format.
+
+        Rows are written as they are read from report_data (in batches for the
+        columnar formats), so passing a generator keeps memory use bounded.
+
+        Parameters:
+        - report_data (iterable): Rows to export.
+        - col_names (sequence): Column names.
         - report_name (str): The base name of the report file.
-        - start_date (str, optional): Start date in 'YYYY-MM-DD' format.
-        - end_date (str, optional): End date in 'YYYY-MM-DD' format.
+        - fmt (str, optional): "csv", "csv.gz", "csv.zst", "arrow", "parquet" or a
+          format added with register_exporter.
+        - col_types (sequence, optional): Column types from exporters, for typed formats.
+
+        Returns:
+        - file_path (str): Path of the exported file, or None on failure.
         """
         try:
-            date_range = f"_{start_date}_to_{end_date}" if start_date and end_date else ""
-            file_path = os.path.join(self.output_dir, f"{report_name}{date_range}.csv")
-            with open(file_path, mode='w', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow(col_names)
-                writer.writerows(report_data)
+            exporter = self.exporters.get(fmt) or create_exporter(fmt)
+            file_path = os.path.join(self.output_dir, f"{report_name}{exporter.extension}")
+            exporter.write(file_path, report_data, col_names, col_types)
 
             print(f"Report exported to {file_path}")
+            return file_path
 
         except Exception as e:
-            print(f"Error exporting report to CSV: {e}")
+            print(f"Error exporting report: {e}")
+
+    def export_to_csv(self, report_data, col_names, report_name, start_date=None, end_date=None):
+        """
+        Export report data to a CSV file.
+
+        Parameters:
+        - report_data (iterable): Rows to export.
+        - col_names (sequence): Header row.
+        - report_name (str): The base name of the report file.
+        - start_date (str, optional): Start date in 'YYYY-MM-DD' format.
+        - end_date (str, optional): End date in 'YYYY-MM-DD' format.
+
+        Returns:
+        - file_path (str): Path of the exported file, or None on failure.
+        """
+        date_range = f"_{start_date}_to_{end_date}" if start_date and end_date else ""
+        return self.export_report(report_data, col_names, f"{report_name}{date_range}", "csv")
 
     def generate_sales_chart(self, start_date=None, end_date=None):
         """
@@ -145,9 +242,13 @@ class Reports:
         - end_date (str, optional): End date in 'YYYY-MM-DD' format.
         """
         try:
-            report_data = self.generate_sales_report(start_date, end_date)
-            fabric_names = [data[0] for data in report_data]
-            sales_values = [data[2] for data in report_data]
+            # matplotlib is only needed for charts, so CSV exports work without it
+            import matplotlib.pyplot as plt
+
+            # Revenue per fabric; the last row is the totals row
+            report_data = self.db_manager.get_total_profit_loss(start_date, end_date)[:-1]
+            fabric_names = [data.fabric_name for data in report_data]
+            sales_values = [data.revenue for data in report_data]
 
             plt.figure(figsize=(10, 6))
             plt.bar(fabric_names, sales_values, color='blue')
@@ -0,0 +1,143 @@
+from abc import ABC, abstractmethod
+
+
+class FabricRepository(ABC):
+    """
+    The data operations UIManager, Reports and SearchableComboBox rely on.
+
+    DBManager implements them against a local SQLite file and RemoteRepository
+    against server.py, so the UI runs unchanged on either. Row shapes are the
+    same in both: see DBManager for the columns each method returns. Every
+    method but analytics_summary is abstract, so an implementation missing one
+    fails when it is instantiated rather than when the UI first calls it.
+
+    A repository also has a catalog attribute (FabricCatalog) for id/name
+    lookups and prefix search, and a profiler attribute (Profiler) recording
+    its queries or requests.
+    """
+
+    catalog = None
+    profiler = None
+
+    # ---- Fabrics ----
+    @abstractmethod
+    def add_fabric(self, fabric_name, stock):
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_fabrics_bulk(self, rows):
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_fabric_name(self, fabric_id, fabric_name):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_fabric_id(self, fabric_name):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_fabric_name_by_id(self, fabric_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_fabrics_list(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def search_fabrics(self, search_term, mode="prefix", limit=50):
+        raise NotImplementedError
+
+    # ---- Stock ----
+    @abstractmethod
+    def get_fabric_stock(self, fabric_name):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_fabric_stock_by_id(self, fabric_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_all_fabrics_stock(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_all_fabrics_stock(self, chunk_size=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_fabrics_stock_by_ids(self, fabric_ids):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_purchase_cost(self, fabric_id):
+        raise NotImplementedError
+
+    # ---- Sales and Purchases ----
+    @abstractmethod
+    def add_sale(self, fabric_id, quantity, selling_price):
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_purchase(self, fabric_id, quantity, cost_price):
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_sales_bulk(self, rows):
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_purchases_bulk(self, rows):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_sale_by_id(self, id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_purchase_by_id(self, id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_sale_data(self, sale_id, quantity, selling_price, sale_date):
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_purchase_data(self, purchase_id, quantity, cost_price, purchase_date):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_sales_data(self, start_date, end_date):
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_sales_data(self, start_date, end_date, chunk_size=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_purchase_data(self, start_date, end_date):
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_purchase_data(self, start_date, end_date, chunk_size=None):
+        raise NotImplementedError
+
+    # ---- Reports ----
+    @abstractmethod
+    def get_total_profit_loss(self, start_date, end_date, fabric_id=None):
+        raise NotImplementedError
+
+    def analytics_summary(self, start_date, end_date, fabric_id=None):
+        """
+        Per-fabric metrics and day/week/month time series for a date range.
+
+        Returns:
+        - summary (dict): See Analytics.summary.
+        """
+        # numpy is only imported once analytics are asked for
+        from analytics import Analytics
+        return Analytics(self).summary(start_date, end_date, fabric_id)
+
+    @abstractmethod
+    def close(self):
+        raise NotImplementedError
@@ -1,17 +1,51 @@
 import tkinter as tk
-from tkinter import messagebox
-from PIL import Image, ImageTk
 
 class SearchableComboBox():
-    def __init__(self, parent, db_manager, row, col,ALL=False) -> None:
+    # Upper bound on the entries shown for a typed prefix
+    MAX_RESULTS = 200
+    # Entries added to the dropdown per timer tick when it shows a long list,
+    # such as every fabric for an empty entry
+    LISTBOX_PAGE = 200
+    # Upper bound on substring/fuzzy database search results
+    SEARCH_RESULTS = 50
+    # Milliseconds of typing inactivity before the dropdown is refiltered
+    KEY_DEBOUNCE_MS = 80
+    # Milliseconds of typing inactivity before a substring/fuzzy database search is run
+    SEARCH_DEBOUNCE_MS = 250
+    # The dropdown arrow, decoded once and shared by every combo box
+    _icon = None
+
+    def __init__(self, parent, db_manager, row, col,ALL=False, mode="prefix") -> None:
+        """
+        mode selects how typed text is matched: "prefix" filters the in-memory
+        catalog, "substring" and "fuzzy" query DBManager.search_fabrics once the
+        user pauses typing.
+        """
         self.dropdown_id = None
+        self.search_id = None
+        self.fill_id = None
+        self.mode = mode
         self.db_manager=db_manager
-        self.options = ["All",*db_manager.get_fabrics_list()] if ALL else db_manager.get_fabrics_list()
+        # Shared with every other combo box through the DBManager
+        self.catalog = db_manager.catalog
+        self.ALL = ALL
         self.parent = parent
         self.selected_option=None
         self.row=row
         self.col=col
 
+        # State for incremental filtering: the query the dropdown currently shows,
+        # its results, whether those results are complete (not cut off at
+        # MAX_RESULTS), every entry the dropdown is to show, and the leading
+        # ones actually in the Listbox so far.
+        self.pending_query = None
+        self.shown_query = None
+        self.shown_results = []
+        self.results_complete = False
+        self.results_version = None
+        self.listbox_target = []
+        self.listbox_items = []
+
         # Create a Text widget for the entry field
         wrapper = tk.Frame(self.parent, padx=0, pady=0)
         wrapper.grid(row=self.row, column=self.col)
@@ -20,51 +54,165 @@ class SearchableComboBox():
         self.entry.bind("<KeyRelease>", self.on_entry_key)
         self.entry.bind("<FocusIn>", self.show_dropdown) 
         self.entry.pack(side=tk.LEFT)
+        self.entry_fg = self.entry.cget("fg")
         # Dropdown icon/button
-        self.icon = ImageTk.PhotoImage(Image.open("dropdown_arrow.png").resize((16,16)))
-        tk.Button(wrapper, image=self.icon, command=self.show_dropdown).pack(side=tk.LEFT)
+        tk.Button(wrapper, image=self.dropdown_icon(), command=self.show_dropdown).pack(side=tk.LEFT)
 
         # Create a Listbox widget for the dropdown menu
         self.listbox = tk.Listbox(self.parent, height=5, width=30)
         self.listbox.bind("<<ListboxSelect>>", self.on_select)
 
-        for option in self.options:
-            self.listbox.insert(tk.END, option)
+        # Loading the catalog would hold up the first frame; UIManager loads it in
+        # the background and refreshes the combo boxes once it is in
+        if self.catalog.loaded:
+            self.refresh_options()
 
         if ALL:
             self.entry.insert(0,"All")
             self.selected_option="All"
 
+    @classmethod
+    def dropdown_icon(cls):
+        """The dropdown arrow image, decoded on first use."""
+        if cls._icon is None:
+            # PIL is only needed for this one image
+            from PIL import Image, ImageTk
+            cls._icon = ImageTk.PhotoImage(Image.open("dropdown_arrow.png").resize((16,16)))
+        return cls._icon
+
+    def all_options(self):
+        """The options shown when nothing has been typed: every fabric, alphabetically."""
+        options = self.catalog.search_prefix("")
+        return ["All", *options] if self.ALL else options
+
+    def filter_options(self, typed_value):
+        """Return (options matching what has been typed, whether that list is complete)."""
+        # One or two characters are too short for a useful substring search
+        if self.mode == "prefix" or len(typed_value) < 3:
+            options = self.catalog.search_prefix(typed_value, self.MAX_RESULTS)
+            return options, self.mode == "prefix" and len(options) < self.MAX_RESULTS
+        options = self.db_manager.search_fabrics(typed_value, mode=self.mode, limit=self.SEARCH_RESULTS)
+        return options, len(options) < self.SEARCH_RESULTS
+
+    def matches(self, option, typed_value):
+        """Whether option still matches typed_value, for narrowing a previous result set."""
+        if self.mode == "prefix":
+            return option.casefold().startswith(typed_value.casefold())
+        return typed_value.casefold() in option.casefold()
+
+    def can_narrow(self, typed_value):
+        """
+        Whether typed_value can be answered by filtering the results on screen.
+
+        That holds when it extends the previous query, the previous results were
+        not cut off and no fabric has been added or renamed since. Fuzzy results
+        do not shrink monotonically as the term grows, so they are always re-run.
+        """
+        return (self.mode != "fuzzy" and self.results_complete and bool(self.shown_query)
+                and self.results_version == self.catalog.version
+                and typed_value.casefold().startswith(self.shown_query.casefold()))
+
+    def set_listbox(self, options):
+        """
+        Show options in the dropdown, touching only the entries that changed.
+
+        Narrowing (options is an ordered subset of what is shown) deletes the
+        dropped entries in contiguous runs; anything else keeps the common
+        leading entries and replaces the rest in a single insert call. Entries
+        beyond what was shown and the first LISTBOX_PAGE are added a page at a
+        time by fill_listbox, so a long list does not hold up the keystroke.
+        """
+        if self.fill_id:
+            self.listbox.after_cancel(self.fill_id)
+            self.fill_id = None
+        old = self.listbox_items
+        self.listbox_target = list(options)
+        options = self.listbox_target[:max(len(old), self.LISTBOX_PAGE)]
+        if len(options) < len(self.listbox_target):
+            self.fill_id = self.listbox.after(1, self.fill_listbox)
+        if options == old:
+            return
+        keep = set(options)
+        if len(keep) == len(options) and [item for item in old if item in keep] == options:
+            index = len(old) - 1
+            while index >= 0:
+                if old[index] in keep:
+                    index -= 1
+                    continue
+                last = index
+                while index >= 0 and old[index] not in keep:
+                    index -= 1
+                self.listbox.delete(index + 1, last)
+        else:
+            common = 0
+            for before, after in zip(old, options):
+                if before != after:
+                    break
+                common += 1
+            self.listbox.delete(common, tk.END)
+            if options[common:]:
+                self.listbox.insert(tk.END, *options[common:])
+        self.listbox_items = options
+
+    def fill_listbox(self):
+        """Add the next LISTBOX_PAGE entries still missing from the dropdown."""
+        self.fill_id = None
+        start = len(self.listbox_items)
+        page = self.listbox_target[start:start + self.LISTBOX_PAGE]
+        self.listbox.insert(tk.END, *page)
+        self.listbox_items.extend(page)
+        if len(self.listbox_items) < len(self.listbox_target):
+            self.fill_id = self.listbox.after(1, self.fill_listbox)
+
+    def refresh_options(self):
+        """Reload the dropdown from the catalog without touching the entry."""
+        self.pending_query = None
+        self.show_results("", self.all_options(), complete=False)
+
+    def show_results(self, typed_value, results, complete):
+        self.shown_query = typed_value
+        self.shown_results = results
+        self.results_complete = complete
+        self.results_version = self.catalog.version
+        self.set_listbox(results)
+
     def on_entry_key(self, event):
-        typed_value = event.widget.get().strip()
+        """Schedule a refilter; bursts of keystrokes collapse into one update."""
+        typed_value = self.entry.get().strip()
+        # Arrow keys, Shift and the like do not change the query
+        if typed_value == self.pending_query:
+            return
+        self.pending_query = typed_value
+        if self.search_id:
+            self.entry.after_cancel(self.search_id)
+        slow = (self.mode != "prefix" and len(typed_value) >= 3 and not typed_value.isdigit()
+                and not self.can_narrow(typed_value))
+        delay = self.SEARCH_DEBOUNCE_MS if slow else self.KEY_DEBOUNCE_MS
+        self.search_id = self.entry.after(delay, self.run_search, typed_value)
+
+    def run_search(self, typed_value):
+        """Refilter the dropdown for typed_value."""
+        self.search_id = None
+        # Ignore searches for text that has since been edited
+        if self.entry.get().strip() != typed_value:
+            return
+        self.entry.config(fg=self.entry_fg)
         if not typed_value:
-                # If the entry is empty, display all options
-                self.listbox.delete(0, tk.END)
-                for option in self.options:
-                    self.listbox.insert(tk.END, option)
-        try:
-            typed_value=int(typed_value)
-            elem=self.db_manager.get_fabric_name_by_id(typed_value)
-            if elem  is  not None:
-                self.listbox.delete(0, tk.END)
-                self.listbox.insert(tk.END,elem)
-            else:
-                messagebox.showerror("Error", "No fabric found with the id provided")
-                self.listbox.delete(0, tk.END)
-                for option in self.options:
-                    self.listbox.insert(tk.END, option)
-                self.entry.delete(0,tk.END)
-
-        except ValueError:
-            typed_value=event.widget.get().strip().lower()
-            # Filter options based on the typed value
-            self.listbox.delete(0, tk.END)
-            filtered_options = [option for option in self.options if option.lower().startswith(typed_value)]
-            for option in filtered_options:
-                self.listbox.insert(tk.END, option)
-        except:
-            messagebox.showerror("Error", "Enter a valid search key")
+            # If the entry is empty, display all options
+            self.show_results("", self.all_options(), complete=False)
+        elif typed_value.isdigit():
+            elem = self.catalog.get_name(int(typed_value))
+            if elem is None:
+                # Flag the unknown id without interrupting the typist
+                self.entry.config(fg="red")
+            self.show_results(typed_value, [elem] if elem is not None else [], complete=False)
+        elif self.can_narrow(typed_value):
+            self.show_results(typed_value, [option for option in self.shown_results
+                                            if self.matches(option, typed_value)], complete=True)
+        else:
+            self.show_results(typed_value, *self.filter_options(typed_value))
         self.show_dropdown()
+
     def on_select(self, event):
         selected_index = self.listbox.curselection()
         if selected_index:
@@ -74,11 +222,10 @@ class SearchableComboBox():
             self.entry.delete(0, tk.END)
             self.entry.insert(0, selected_option)
     def update_listView(self,ALL=False):
-        self.options = ["All",*self.db_manager.get_fabrics_list()] if ALL else self.db_manager.get_fabrics_list()
-        self.listbox.delete(0, tk.END)
+        self.ALL = ALL
         self.entry.delete(0,tk.END)
-        for option in self.options:
-            self.listbox.insert(tk.END, option)
+        self.entry.config(fg=self.entry_fg)
+        self.refresh_options()
         if ALL:
             self.entry.insert(0,"All")
             self.selected_option="All"
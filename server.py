@@ -0,0 +1,393 @@
+"""
+HTTP/JSON server over DBManager, so several billing counters can share one
+database.
+
+Usage:
+    python server.py [--db PATH] [--host HOST] [--port PORT] [--readers N]
+
+Endpoints (all JSON unless noted):
+    GET  /api/fabrics                       catalog; ETag / If-None-Match
+    POST /api/fabrics                       {"fabric_name", "stock"?} or {"rows": [...]} for a batch
+    PATCH /api/fabrics/<fabric_id>          {"fabric_name"}
+    GET  /api/fabrics/search?q=&mode=&limit=
+    GET  /api/stock?limit=&after=           paginated on fabric_id, or ?ids=1,2,3
+    GET  /api/stock/<fabric_id>?as_of=
+    POST /api/sales                         {"fabric_id", "quantity", "selling_price", "sale_date"?}
+                                            or {"rows": [...]} for a batch
+    POST /api/purchases                     likewise, with "cost_price"
+    GET  /api/sales?start=&end=&limit=&before=   or ?ids=1,2,3
+    GET  /api/purchases?start=&end=&limit=&before=
+    GET  /api/sales/<sale_id>               PUT {"quantity", "selling_price", "sale_date"} edits it
+    GET  /api/purchases/<purchase_id>       PUT {"quantity", "cost_price", "purchase_date"} edits it
+    GET  /api/sales/export?start=&end=      streamed NDJSON, one row per line
+    GET  /api/purchases/export?start=&end=
+    GET  /api/reports/profit-loss?start=&end=&fabric_id=
+    GET  /api/reports/analytics?start=&end=&fabric_id=
+    GET  /api/changes?since=&wait=&limit=   change feed; waits up to wait seconds for a change
+    GET  /api/diagnostics                   query timings and slow queries (FABRIC_PROFILE=1)
+
+Responses are gzip-compressed when the client accepts it. Paginated responses
+carry a "next" token to pass back as before/after, or null on the last page.
+"""
+import argparse
+import gzip
+import json
+import threading
+import time
+import zlib
+
+from flask import Flask, Response, jsonify, request
+from werkzeug.serving import WSGIRequestHandler
+
+from db_manager import DBManager, InsufficientStock, db_path
+
+# Rows per page when the client does not ask, and the most it may ask for
+DEFAULT_PAGE_ROWS = 100
+MAX_PAGE_ROWS = 1000
+# Smaller bodies are sent uncompressed
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+# Longest a /api/changes request may wait, and how often it checks for
+# changes written by other processes
+MAX_CHANGES_WAIT = 30
+CHANGES_POLL_SECONDS = 0.25
+
+
+class KeepAliveRequestHandler(WSGIRequestHandler):
+    """Speak HTTP/1.1, so clients reuse one connection for their requests."""
+    protocol_version = "HTTP/1.1"
+
+
+class ApiError(Exception):
+    """An error reported to the client as {"error": message} with an HTTP status."""
+
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+
+def _page_limit():
+    try:
+        limit = int(request.args.get("limit", DEFAULT_PAGE_ROWS))
+    except ValueError:
+        raise ApiError("limit must be an integer")
+    return max(1, min(limit, MAX_PAGE_ROWS))
+
+
+def _date_range():
+    start, end = request.args.get("start"), request.args.get("end")
+    if not start or not end:
+        raise ApiError("start and end are required")
+    return start, end
+
+
+def _accepts_gzip():
+    return "gzip" in request.headers.get("Accept-Encoding", "")
+
+
+def _id_list():
+    """The ?ids=1,2,3 query argument as a list of ints, or None if absent."""
+    ids = request.args.get("ids")
+    if ids is None:
+        return None
+    try:
+        return [int(value) for value in ids.split(",") if value]
+    except ValueError:
+        raise ApiError("ids must be comma-separated integers")
+
+
+def _json_body(*fields):
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or any(field not in body for field in fields):
+        raise ApiError(f"expected a JSON object with {', '.join(fields)}")
+    return body
+
+
+def _transaction_rows(body, price_field, date_field):
+    """Turn a POSTed sale/purchase (or {"rows": [...]}) into DBManager batch rows."""
+    if not isinstance(body, dict):
+        raise ApiError("expected a JSON object")
+    items = body["rows"] if "rows" in body else [body]
+    rows = []
+    for item in items:
+        try:
+            rows.append((int(item["fabric_id"]), float(item["quantity"]), float(item[price_field]),
+                         item.get(date_field)))
+        except (KeyError, TypeError, ValueError):
+            raise ApiError(f"each row needs fabric_id, quantity and {price_field}")
+        if rows[-1][1] <= 0:
+            raise ApiError("quantity must be positive")
+    return rows
+
+
+def _ndjson_stream(rows, columns, compress):
+    """Yield rows as newline-delimited JSON objects, gzip-compressed on the fly if asked."""
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) if compress else None
+    batch = []
+    for row in rows:
+        batch.append(json.dumps(dict(zip(columns, row))))
+        if len(batch) == 500:
+            chunk = ("\n".join(batch) + "\n").encode()
+            batch = []
+            chunk = compressor.compress(chunk) if compressor else chunk
+            if chunk:
+                yield chunk
+    chunk = ("\n".join(batch) + "\n").encode() if batch else b""
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+SALE_COLUMNS = ("sale_id", "sale_date", "fabric_name", "quantity", "selling_price", "revenue")
+PURCHASE_COLUMNS = ("purchase_id", "purchase_date", "fabric_name", "quantity", "cost_price", "expenditure")
+STOCK_COLUMNS = ("fabric_id", "fabric_name", "stock", "cost_price", "total_cost")
+
+
+def create_app(db_manager):
+    """
+    Build the Flask app serving db_manager.
+
+    db_manager is shared by every request thread: writes are serialized on its
+    writer connection and reads run on its pool of reader connections.
+    """
+    app = Flask(__name__)
+    # The fabric catalog version db_manager.catalog was last loaded at
+    catalog_state = {"version": None}
+    catalog_lock = threading.Lock()
+    # Wakes /api/changes waiters as soon as a write through this server commits
+    changed = threading.Condition()
+
+    @app.errorhandler(ApiError)
+    def api_error(error):
+        return jsonify(error=str(error), **error.extra), error.status
+
+    @app.errorhandler(InsufficientStock)
+    def insufficient_stock(error):
+        return jsonify(error=str(error), fabric_id=error.fabric_id, requested=error.requested,
+                       available=error.available), 409
+
+    @app.errorhandler(ValueError)
+    def bad_value(error):
+        return jsonify(error=str(error)), 400
+
+    @app.after_request
+    def notify_changes(response):
+        if request.method in ("POST", "PUT", "PATCH") and response.status_code < 300:
+            with changed:
+                changed.notify_all()
+        return response
+
+    @app.after_request
+    def compress(response):
+        if (response.direct_passthrough or response.status_code < 200 or response.status_code == 304
+                or "Content-Encoding" in response.headers or not _accepts_gzip()):
+            return response
+        data = response.get_data()
+        if len(data) < GZIP_MIN_BYTES:
+            return response
+        response.set_data(gzip.compress(data, GZIP_LEVEL))
+        response.headers["Content-Encoding"] = "gzip"
+        response.vary.add("Accept-Encoding")
+        return response
+
+    @app.get("/api/fabrics")
+    def fabrics():
+        version = db_manager.get_catalog_version()
+        # Weak, since the gzip and identity bodies differ byte for byte
+        etag = f'W/"fabrics-{version}"'
+        if etag in request.headers.get("If-None-Match", ""):
+            return Response(status=304, headers={"ETag": etag})
+        with catalog_lock:
+            # Another process (or counter) changed the fabrics since the catalog was loaded
+            if catalog_state["version"] != version:
+                db_manager.catalog.load()
+                catalog_state["version"] = version
+        response = jsonify(version=version, fabrics=[{"fabric_id": fabric_id, "fabric_name": name}
+                                                     for fabric_id, name in db_manager.catalog.items()])
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    @app.post("/api/fabrics")
+    def add_fabric():
+        body = request.get_json(silent=True)
+        if isinstance(body, dict) and "rows" in body:
+            try:
+                rows = [(str(item["fabric_name"]), float(item.get("stock", 0))) for item in body["rows"]]
+            except (KeyError, TypeError, ValueError, AttributeError):
+                raise ApiError("each row needs fabric_name, and optionally stock")
+            return jsonify(recorded=db_manager.add_fabrics_bulk(rows)), 201
+        body = _json_body("fabric_name")
+        db_manager.add_fabric(body["fabric_name"], float(body.get("stock", 0)))
+        return jsonify(fabric_id=db_manager.get_fabric_id(body["fabric_name"])), 201
+
+    @app.patch("/api/fabrics/<int:fabric_id>")
+    def rename_fabric(fabric_id):
+        if not db_manager.update_fabric_name(fabric_id, _json_body("fabric_name")["fabric_name"]):
+            raise ApiError(f"Fabric id {fabric_id} not found.", 404)
+        return jsonify(fabric_id=fabric_id)
+
+    @app.get("/api/fabrics/search")
+    def search_fabrics():
+        names = db_manager.search_fabrics(request.args.get("q", ""), request.args.get("mode", "prefix"),
+                                          _page_limit())
+        return jsonify(names=names)
+
+    @app.get("/api/stock")
+    def stock():
+        ids = _id_list()
+        if ids is not None:
+            return jsonify(rows=[dict(zip(STOCK_COLUMNS, row)) for row in db_manager.get_fabrics_stock_by_ids(ids)])
+        limit = _page_limit()
+        rows = db_manager.get_fabrics_stock_page(limit, int(request.args.get("after", 0)))
+        return jsonify(rows=[dict(zip(STOCK_COLUMNS, row)) for row in rows],
+                       next=rows[-1][0] if len(rows) == limit else None)
+
+    @app.get("/api/stock/<int:fabric_id>")
+    def fabric_stock(fabric_id):
+        as_of = request.args.get("as_of")
+        if as_of:
+            return jsonify(fabric_id=fabric_id, as_of=as_of, stock=db_manager.get_stock_as_of(fabric_id, as_of))
+        stock = db_manager.get_fabric_stock_by_id(fabric_id)
+        if stock is None:
+            raise ApiError(f"Fabric id {fabric_id} not found.", 404)
+        return jsonify(fabric_id=fabric_id, stock=stock)
+
+    @app.post("/api/sales")
+    def add_sales():
+        rows = _transaction_rows(request.get_json(silent=True), "selling_price", "sale_date")
+        db_manager.add_sales_bulk(rows)
+        return jsonify(recorded=len(rows)), 201
+
+    @app.post("/api/purchases")
+    def add_purchases():
+        rows = _transaction_rows(request.get_json(silent=True), "cost_price", "purchase_date")
+        db_manager.add_purchases_bulk(rows)
+        return jsonify(recorded=len(rows)), 201
+
+    def transactions_page(get_page, get_by_ids, columns):
+        ids = _id_list()
+        if ids is not None:
+            return jsonify(rows=[dict(zip(columns, row)) for row in get_by_ids(ids)])
+        start, end = _date_range()
+        limit = _page_limit()
+        before = request.args.get("before")
+        if before:
+            date, _, row_id = before.rpartition("|")
+            try:
+                before = (date, int(row_id))
+            except ValueError:
+                raise ApiError("invalid before token")
+        rows = get_page(start, end, limit, before)
+        token = f"{rows[-1][1]}|{rows[-1][0]}" if len(rows) == limit else None
+        return jsonify(rows=[dict(zip(columns, row)) for row in rows], next=token)
+
+    @app.get("/api/sales")
+    def sales():
+        return transactions_page(db_manager.get_sales_page, db_manager.get_sales_by_ids, SALE_COLUMNS)
+
+    @app.get("/api/purchases")
+    def purchases():
+        return transactions_page(db_manager.get_purchases_page, db_manager.get_purchases_by_ids, PURCHASE_COLUMNS)
+
+    @app.get("/api/sales/<int:sale_id>")
+    def get_sale(sale_id):
+        row = db_manager.get_sale_by_id(sale_id)
+        if row is None:
+            raise ApiError(f"Sale id {sale_id} not found.", 404)
+        return jsonify(dict(zip(("sale_id", "fabric_id", "quantity", "selling_price", "sale_date"), row)))
+
+    @app.put("/api/sales/<int:sale_id>")
+    def edit_sale(sale_id):
+        body = _json_body("quantity", "selling_price", "sale_date")
+        if not db_manager.update_sale_data(sale_id, float(body["quantity"]), float(body["selling_price"]),
+                                           body["sale_date"]):
+            raise ApiError(f"Sale id {sale_id} not found.", 404)
+        return jsonify(sale_id=sale_id)
+
+    @app.get("/api/purchases/<int:purchase_id>")
+    def get_purchase(purchase_id):
+        row = db_manager.get_purchase_by_id(purchase_id)
+        if row is None:
+            raise ApiError(f"Purchase id {purchase_id} not found.", 404)
+        return jsonify(dict(zip(("purchase_id", "fabric_id", "quantity", "cost_price", "purchase_date"), row)))
+
+    @app.put("/api/purchases/<int:purchase_id>")
+    def edit_purchase(purchase_id):
+        body = _json_body("quantity", "cost_price", "purchase_date")
+        if not db_manager.update_purchase_data(purchase_id, float(body["quantity"]), float(body["cost_price"]),
+                                               body["purchase_date"]):
+            raise ApiError(f"Purchase id {purchase_id} not found.", 404)
+        return jsonify(purchase_id=purchase_id)
+
+    def export(iter_rows, columns):
+        start, end = _date_range()
+        compress = _accepts_gzip()
+        headers = {"Content-Encoding": "gzip", "Vary": "Accept-Encoding"} if compress else {}
+        # The rows are read and sent a chunk at a time, so memory use does not grow with the range
+        return Response(_ndjson_stream(iter_rows(start, end), columns, compress),
+                        mimetype="application/x-ndjson", headers=headers, direct_passthrough=True)
+
+    @app.get("/api/sales/export")
+    def export_sales():
+        return export(db_manager.iter_sales_data, SALE_COLUMNS)
+
+    @app.get("/api/purchases/export")
+    def export_purchases():
+        return export(db_manager.iter_purchase_data, PURCHASE_COLUMNS)
+
+    @app.get("/api/reports/profit-loss")
+    def profit_loss():
+        start, end = _date_range()
+        fabric_id = request.args.get("fabric_id", type=int)
+        rows = db_manager.get_total_profit_loss(start, end, fabric_id)
+        return jsonify(rows=[row._asdict() for row in rows])
+
+    @app.get("/api/reports/analytics")
+    def analytics():
+        start, end = _date_range()
+        summary = db_manager.analytics_summary(start, end, request.args.get("fabric_id", type=int))
+        return jsonify({key: [row._asdict() for row in rows] for key, rows in summary.items()})
+
+    @app.get("/api/changes")
+    def changes():
+        since = request.args.get("since", 0, type=int)
+        limit = max(1, min(request.args.get("limit", MAX_PAGE_ROWS, type=int), MAX_PAGE_ROWS))
+        deadline = time.monotonic() + max(0.0, min(request.args.get("wait", 0, type=float), MAX_CHANGES_WAIT))
+        while True:
+            rows, last_seq, complete = db_manager.get_changes(since, limit)
+            remaining = deadline - time.monotonic()
+            if rows or not complete or remaining <= 0:
+                break
+            with changed:
+                changed.wait(min(remaining, CHANGES_POLL_SECONDS))
+        return jsonify(changes=[dict(zip(("seq", "entity", "entity_id", "fabric_id", "action"), row)) for row in rows],
+                       last_seq=last_seq, reset=not complete)
+
+    @app.get("/api/diagnostics")
+    def diagnostics():
+        profiler = db_manager.profiler
+        return jsonify(enabled=profiler.enabled, operations=profiler.snapshot(), slow_queries=list(profiler.slow_queries))
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fabric Management HTTP/JSON server")
+    parser.add_argument("--db", default=db_path, help="database file (default: %(default)s)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--readers", type=int, default=8, help="pooled read-only connections")
+    args = parser.parse_args(argv)
+
+    db = DBManager(args.db, readers=args.readers)
+    try:
+        create_app(db).run(host=args.host, port=args.port, threaded=True, request_handler=KeepAliveRequestHandler)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+from db_manager import ProfitLossRow
+
+
+class SummaryView:
+    """
+    The data behind the Summary tab, kept so a write only refreshes what it changed.
+
+    A full load is cached under its key, (selected fabric, start date, end
+    date). After a sale, purchase or edit, fetch_fabrics reads back just the
+    stock and profit/loss rows of the fabrics written to, and apply swaps them
+    into the cache and adjusts the totals by the difference. The fetch methods
+    run on a worker thread and only read the repository; replace, mark and
+    apply run on the Tk thread and are the only ones that change the cache.
+    """
+
+    def __init__(self, db_manager):
+        """
+        Parameters:
+        - db_manager (FabricRepository): Where the rows come from.
+        """
+        self.db_manager = db_manager
+        self.key = None
+        self.fabric_id = None
+        self.stock = {}
+        self.profit_loss = {}
+        self.total = None
+        self.total_cost = 0.0
+        # Fabrics written to whose rows have not been read back yet
+        self.pending = set()
+
+    @staticmethod
+    def make_key(selected_fabric, start_date, end_date):
+        return (selected_fabric, start_date, end_date)
+
+    def covers(self, fabric_id):
+        """Return True if the cached summary shows fabric_id."""
+        return self.key is not None and (self.key[0] == "All" or self.fabric_id == fabric_id)
+
+    # ---- Worker thread ----
+    def fetch(self, key):
+        """
+        Run the summary queries for a key.
+
+        Returns:
+        - result (dict): key, fabric_id (None for "All"), stock rows as
+          get_all_fabrics_stock and profit_loss rows as get_total_profit_loss
+          (empty without a date range).
+        """
+        selected_fabric, start_date, end_date = key
+        if selected_fabric == "All":
+            fabric_id = None
+            stock = self.db_manager.get_all_fabrics_stock()
+        else:
+            fabric_id = self.db_manager.get_fabric_id(selected_fabric)
+            if fabric_id is None:
+                raise ValueError(f"Fabric '{selected_fabric}' not found.")
+            stock = self.db_manager.get_fabrics_stock_by_ids([fabric_id])
+        has_range = start_date != "" and end_date != ""
+        profit_loss = self.db_manager.get_total_profit_loss(start_date, end_date, fabric_id) if has_range else []
+        return {"key": key, "fabric_id": fabric_id, "stock": stock or [], "profit_loss": profit_loss}
+
+    def fetch_fabrics(self, key, fabric_ids):
+        """
+        Read back the rows of a few fabrics for a key.
+
+        Returns:
+        - result (dict): key, and changes: (fabric_id, stock row, profit/loss
+          row) per fabric, the profit/loss row None if it has not sold in the
+          date range.
+        """
+        _, start_date, end_date = key
+        stock = {row[0]: row for row in self.db_manager.get_fabrics_stock_by_ids(fabric_ids)}
+        has_range = start_date != "" and end_date != ""
+        changes = []
+        for fabric_id in fabric_ids:
+            rows = self.db_manager.get_total_profit_loss(start_date, end_date, fabric_id) if has_range else []
+            changes.append((fabric_id, stock.get(fabric_id), rows[0] if rows else None))
+        return {"key": key, "changes": changes}
+
+    # ---- Tk thread ----
+    def replace(self, result):
+        """Cache the result of fetch, dropping whatever was cached before."""
+        self.key = result["key"]
+        self.fabric_id = result["fabric_id"]
+        # Loaded after those writes, so it already has them
+        self.pending.clear()
+        self.stock = {row[0]: tuple(row) for row in result["stock"]}
+        self.total_cost = sum(row[4] for row in self.stock.values())
+        rows = result["profit_loss"]
+        # The last row holds the totals
+        self.profit_loss = {row.fabric_id: row for row in rows[:-1]}
+        self.total = rows[-1] if rows else None
+
+    def mark(self, fabric_id):
+        """Note a write to fabric_id; returns every fabric written since its rows were last applied."""
+        self.pending.add(fabric_id)
+        return sorted(self.pending)
+
+    def apply(self, result):
+        """
+        Swap the rows read by fetch_fabrics into the cache and adjust the totals.
+
+        Returns:
+        - changed (bool): False if the result was for another key, and nothing
+          was applied.
+        """
+        if result["key"] != self.key:
+            return False
+        for fabric_id, stock, profit_loss in result["changes"]:
+            self.pending.discard(fabric_id)
+            self.stock, old_stock = self._swap(self.stock, fabric_id, None if stock is None else tuple(stock))
+            if old_stock is not None:
+                self.total_cost -= old_stock[4]
+            if stock is not None:
+                self.total_cost += stock[4]
+            self.profit_loss, old = self._swap(self.profit_loss, fabric_id, profit_loss)
+            self.total = self._adjust_total(old, profit_loss)
+        return True
+
+    @staticmethod
+    def _swap(rows, fabric_id, row):
+        """Put row in place of fabric_id's (None removes it); returns (rows, the old row)."""
+        old = rows.get(fabric_id)
+        if row is None:
+            rows.pop(fabric_id, None)
+        elif old is not None:
+            rows[fabric_id] = row
+        else:
+            # A new row: keep fabric_id order, as the full queries return it
+            rows[fabric_id] = row
+            rows = dict(sorted(rows.items()))
+        return rows, old
+
+    def _adjust_total(self, old, new):
+        if not self.profit_loss:
+            return None
+        total = self.total or ProfitLossRow(None, "Total", 0, None, None, 0, 0, 0)
+        sums = [total.units_sold, total.revenue, total.cost, total.profit]
+        for row, sign in ((old, -1), (new, 1)):
+            if row is not None:
+                for i, value in enumerate((row.units_sold, row.revenue, row.cost, row.profit)):
+                    sums[i] += sign * value
+        units_sold, revenue, cost, profit = sums
+        return total._replace(units_sold=units_sold, revenue=revenue, cost=cost, profit=profit)
+
+    def stock_rows(self):
+        """Cached stock rows, in fabric_id order."""
+        return list(self.stock.values())
+
+    def profit_loss_rows(self):
+        """Cached profit/loss rows in fabric_id order, then the totals row if any fabric sold."""
+        rows = list(self.profit_loss.values())
+        return rows + [self.total] if self.total is not None else rows
@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DBManager
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A fresh, fully migrated database in a temporary directory."""
+    db = DBManager(str(tmp_path / "test.db"))
+    yield db
+    db.close()
@@ -0,0 +1,108 @@
+"""
+Display-free stand-ins for the Tk widgets SearchableComboBox uses.
+
+The fakes record the calls made on them, and the after() timers are driven by
+hand, so the combo box can be exercised in tests and timed in benchmarks
+without a display.
+"""
+import time
+
+import search_algo
+
+
+class FakeWidget:
+    """Stands in for Frame and Button, and provides after() timers driven by hand."""
+
+    def __init__(self, *args, **kwargs):
+        self.timers = {}
+        self.next_timer = 0
+        self.options = {"fg": "black"}
+
+    # geometry, binding and configuration are no-ops
+    def grid(self, **kwargs): pass
+    def pack(self, **kwargs): pass
+    def place(self, **kwargs): pass
+    def place_forget(self): pass
+    def lift(self): pass
+    def bind(self, *args): pass
+    def config(self, **kwargs): self.options.update(kwargs)
+    def cget(self, key): return self.options[key]
+
+    def after(self, ms, func, *args):
+        self.next_timer += 1
+        self.timers[self.next_timer] = (func, args)
+        return self.next_timer
+
+    def after_cancel(self, timer_id):
+        self.timers.pop(timer_id, None)
+
+    def run_timers(self):
+        while self.timers:
+            func, args = self.timers.pop(min(self.timers))
+            func(*args)
+
+
+class FakeEntry(FakeWidget):
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.text = ""
+
+    def get(self): return self.text
+    def delete(self, first, last=None): self.text = ""
+    def insert(self, index, value): self.text = value + self.text
+
+
+class FakeListbox(FakeWidget):
+    """
+    Counts the Tcl calls that would be made on a real Listbox.
+
+    log holds ("delete", first, last) and ("insert", index, count) per call,
+    with indexes resolved to row numbers.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.items = []
+        self.calls = 0
+        self.log = []
+
+    def delete(self, first, last=None):
+        self.calls += 1
+        end = len(self.items) if last == search_algo.tk.END else int(last if last is not None else first) + 1
+        self.log.append(("delete", int(first), end - 1))
+        del self.items[int(first):end]
+
+    def insert(self, index, *values):
+        self.calls += 1
+        self.log.append(("insert", len(self.items), len(values)))
+        self.items.extend(values)
+
+
+# The tkinter names search_algo creates widgets from, and the fakes replacing them
+FAKES = {"Frame": FakeWidget, "Button": FakeWidget, "Entry": FakeEntry, "Listbox": FakeListbox}
+
+
+def install_fakes(monkeypatch=None):
+    """Replace the Tk widgets search_algo uses; through monkeypatch when given, so a test can undo it."""
+    setattr_ = monkeypatch.setattr if monkeypatch is not None else setattr
+    for name, fake in FAKES.items():
+        setattr_(search_algo.tk, name, fake)
+    # Stands in for the decoded dropdown icon, so PIL is never imported
+    setattr_(search_algo.SearchableComboBox, "_icon", object())
+
+
+def type_text(combo, text, pause_every=None):
+    """Type text one key at a time; returns (per-key latencies, listbox calls)."""
+    combo.entry.text = ""
+    latencies = []
+    combo.listbox.calls = 0
+    for count, char in enumerate(text, start=1):
+        combo.entry.text += char
+        start = time.perf_counter()
+        combo.on_entry_key(None)
+        # Without a pause the debounce timer is still pending when the next key arrives
+        if (pause_every is not None and count % pause_every == 0) or count == len(text):
+            combo.entry.run_timers()
+            combo.listbox.run_timers()
+        latencies.append(time.perf_counter() - start)
+    return latencies, combo.listbox.calls
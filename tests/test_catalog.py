@@ -0,0 +1,52 @@
+from db_manager import DBManager
+
+
+def test_fabric_added_elsewhere_is_found(db, tmp_path):
+    db.add_fabric("Silk", 0)
+    other = DBManager(str(tmp_path / "test.db"))
+    try:
+        assert other.get_fabrics_list() == ["Silk"]
+        db.add_fabric("Cotton", 5)
+        assert other.get_fabric_id("Cotton") == db.get_fabric_id("Cotton")
+        assert other.get_fabrics_list() == ["Silk", "Cotton"]
+        assert other.search_fabrics("co") == ["Cotton"]
+    finally:
+        other.close()
+
+
+def test_fabric_renamed_elsewhere_is_found(db, tmp_path):
+    db.add_fabric("Silk", 0)
+    silk = db.get_fabric_id("Silk")
+    other = DBManager(str(tmp_path / "test.db"))
+    try:
+        assert other.get_fabric_name_by_id(silk) == "Silk"
+        db.update_fabric_name(silk, "Raw Silk")
+        assert other.get_fabric_name_by_id(silk) == "Raw Silk"
+        assert other.get_fabric_id("Silk") is None
+    finally:
+        other.close()
+
+
+def test_own_changes_do_not_reload(db, monkeypatch):
+    db.add_fabric("Silk", 0)
+    db.get_fabrics_list()
+    loads = []
+    load = db.catalog.load
+    monkeypatch.setattr(db.catalog, "load", lambda: loads.append(1) or load())
+    db.add_fabric("Cotton", 0)
+    db.update_fabric_name(db.get_fabric_id("Cotton"), "Cotton Plain")
+    assert db.get_fabrics_list() == ["Silk", "Cotton Plain"]
+    assert loads == []
+
+
+def test_own_change_after_another_reloads(db, tmp_path):
+    db.add_fabric("Silk", 0)
+    db.get_fabrics_list()
+    other = DBManager(str(tmp_path / "test.db"))
+    try:
+        other.add_fabric("Linen", 0)
+        # Our insert follows theirs, so the cache cannot just add ours
+        db.add_fabric("Cotton", 0)
+        assert db.get_fabrics_list() == ["Silk", "Linen", "Cotton"]
+    finally:
+        other.close()
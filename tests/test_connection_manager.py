@@ -0,0 +1,91 @@
+import sqlite3
+
+import pytest
+
+from connection_manager import ConnectionManager
+
+
+@pytest.fixture
+def connections(tmp_path):
+    connections = ConnectionManager(str(tmp_path / "connections.db"))
+    with connections.writer() as cursor:
+        cursor.execute("CREATE TABLE items (name TEXT)")
+    yield connections
+    connections.close()
+
+
+def names(connections):
+    with connections.reader() as cursor:
+        return [row[0] for row in cursor.execute("SELECT name FROM items ORDER BY rowid")]
+
+
+def test_block_commits(connections):
+    with connections.writer() as cursor:
+        cursor.execute("INSERT INTO items VALUES ('a')")
+    assert names(connections) == ["a"]
+
+
+def test_error_rolls_back(connections):
+    with pytest.raises(RuntimeError):
+        with connections.writer() as cursor:
+            cursor.execute("INSERT INTO items VALUES ('a')")
+            raise RuntimeError
+    assert names(connections) == []
+
+
+def test_nested_blocks_share_the_transaction(connections):
+    with pytest.raises(RuntimeError):
+        with connections.writer() as cursor:
+            cursor.execute("INSERT INTO items VALUES ('a')")
+            with connections.writer() as inner:
+                inner.execute("INSERT INTO items VALUES ('b')")
+            raise RuntimeError
+    assert names(connections) == []
+
+
+def test_failed_commit_rolls_back(connections, monkeypatch):
+    def fail():
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(connections, "_commit", fail)
+    with pytest.raises(sqlite3.OperationalError):
+        with connections.writer() as cursor:
+            cursor.execute("INSERT INTO items VALUES ('lost')")
+    assert not connections._writer.in_transaction
+    monkeypatch.undo()
+
+    # The next block starts its own transaction and commits
+    with connections.writer() as cursor:
+        cursor.execute("INSERT INTO items VALUES ('kept')")
+    assert names(connections) == ["kept"]
+
+
+def test_busy_pool_times_out(tmp_path):
+    connections = ConnectionManager(str(tmp_path / "pool.db"), readers=1, reader_timeout=0.05)
+    try:
+        with connections.reader():
+            with pytest.raises(sqlite3.OperationalError, match="No database reader"):
+                with connections.reader():
+                    pass
+        # The held reader went back to the pool
+        with connections.reader() as cursor:
+            assert cursor.execute("SELECT 1").fetchone() == (1,)
+    finally:
+        connections.close()
+
+
+def test_abandoned_row_generator_times_out_then_frees(tmp_path):
+    from db_manager import DBManager
+
+    db = DBManager(str(tmp_path / "rows.db"), readers=1)
+    db.connections.reader_timeout = 0.05
+    try:
+        db.add_fabrics_bulk([(f"Fabric {i}", 0) for i in range(5)])
+        rows = db.iter_all_fabrics_stock(chunk_size=2)
+        next(rows)
+        with pytest.raises(sqlite3.OperationalError):
+            db.get_total_stock()
+        rows.close()
+        assert db.get_total_stock() == 0
+    finally:
+        db.close()
@@ -0,0 +1,108 @@
+import random
+
+import pytest
+
+from db_manager import DBManager
+
+METHODS = ["fifo", "lifo", "average"]
+
+
+@pytest.fixture(params=METHODS)
+def costed(request, tmp_path):
+    db = DBManager(str(tmp_path / "lots.db"), cost_method=request.param)
+    yield db, request.param
+    db.close()
+
+
+def cogs(db):
+    return [row[0] for row in db._fetchall("SELECT cogs FROM sales ORDER BY sale_id")]
+
+
+def state(db):
+    """Every sale's cost of goods, lot's remaining quantity and allocation, rounded for comparison."""
+    return (db._fetchall("SELECT sale_id, round(cogs, 6) FROM sales ORDER BY sale_id"),
+            db._fetchall("SELECT purchase_id, round(remaining, 6), round(cost_price, 6) FROM purchase_lots ORDER BY purchase_id"),
+            db._fetchall("""SELECT sale_id, purchase_id, round(SUM(quantity), 6), round(SUM(cost), 6) FROM lot_allocations
+                            GROUP BY sale_id, purchase_id ORDER BY sale_id, purchase_id"""))
+
+
+def test_cost_of_goods_by_method(costed):
+    db, method = costed
+    db.add_fabric("Cotton", 0)
+    db.add_purchases_bulk([(1, 10, 5.0, "2024-01-01 09:00:00"), (1, 10, 7.0, "2024-01-02 09:00:00")])
+    db.add_sales_bulk([(1, 15, 10.0, "2024-01-03 09:00:00")])
+    assert cogs(db) == pytest.approx([{"fifo": 10 * 5 + 5 * 7, "lifo": 10 * 7 + 5 * 5, "average": 15 * 6}[method]])
+    # The next sale takes what is left of the lots
+    db.add_sales_bulk([(1, 5, 10.0, "2024-01-04 09:00:00")])
+    assert sum(cogs(db)) == pytest.approx(10 * 5 + 10 * 7)
+    assert db.check_lots() == []
+
+
+def test_lots_are_only_used_from_their_purchase_date(costed):
+    db, method = costed
+    db.add_fabric("Cotton", 0)
+    db.add_purchases_bulk([(1, 10, 5.0, "2024-01-01 09:00:00")])
+    db.add_sales_bulk([(1, 4, 10.0, "2024-01-02 09:00:00")])
+    # Bought after the sale, so it cannot change what the sale cost
+    db.add_purchases_bulk([(1, 10, 9.0, "2024-01-05 09:00:00")])
+    assert cogs(db) == pytest.approx([20])
+
+
+def test_opening_stock_is_the_oldest_lot(costed):
+    db, method = costed
+    db.add_fabric("Linen", 5)
+    db.add_purchases_bulk([(1, 5, 8.0, "2024-01-02 09:00:00")])
+    db.add_sales_bulk([(1, 2, 10.0, "2024-01-03 09:00:00")])
+    # Opening stock is costed at the weighted-average purchase cost, 8
+    assert cogs(db) == pytest.approx([16])
+    assert db.check_lots() == []
+
+
+def test_uncovered_sale_is_costed_at_the_average(costed):
+    db, method = costed
+    db.add_fabric("Silk", 0)
+    db.add_purchases_bulk([(1, 10, 40.0, "2024-01-05 09:00:00"), (1, 10, 60.0, "2024-01-06 09:00:00")])
+    # Dated before any purchase: no lot covers it
+    db.add_sales_bulk([(1, 3, 80.0, "2024-01-01 09:00:00")])
+    assert cogs(db) == pytest.approx([3 * 50])
+    assert db.check_lots() == []
+
+
+def random_date(rng):
+    return f"2024-{rng.randint(1, 3):02d}-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:00:00"
+
+
+def test_edits_replay_like_a_full_replay(costed):
+    db, method = costed
+    rng = random.Random(method)
+    db.add_fabrics_bulk([(f"Fabric {i}", 20) for i in range(3)])
+    for _ in range(150):
+        fabric_id, roll = rng.randint(1, 3), rng.random()
+        try:
+            if roll < 0.35:
+                db.add_purchases_bulk([(fabric_id, rng.randint(1, 30), rng.uniform(10, 50), random_date(rng))])
+            elif roll < 0.7:
+                db.add_sales_bulk([(fabric_id, rng.randint(1, 10), rng.uniform(20, 80), random_date(rng))])
+            elif roll < 0.85:
+                sale_ids = db._fetchall("SELECT sale_id FROM sales")
+                if sale_ids:
+                    db.update_sale_data(rng.choice(sale_ids)[0], rng.randint(1, 10), rng.uniform(20, 80), random_date(rng))
+            else:
+                purchase_ids = db._fetchall("SELECT purchase_id FROM purchases")
+                if purchase_ids:
+                    db.update_purchase_data(rng.choice(purchase_ids)[0], rng.randint(1, 30), rng.uniform(10, 50),
+                                            random_date(rng))
+        except ValueError:
+            # Short of stock: nothing was written
+            pass
+    assert db.check_lots() == []
+    incremental = state(db)
+    db.replay_lots()
+    assert state(db) == incremental
+
+
+def test_opening_lot_satisfies_foreign_keys(db):
+    db.add_fabric("Linen", 5)
+    db.add_sale(1, 2, 10.0)
+    with db.connections.reader() as cursor:
+        assert cursor.execute("PRAGMA foreign_key_check").fetchall() == []
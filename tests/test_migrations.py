@@ -0,0 +1,95 @@
+import multiprocessing
+import sqlite3
+
+import pytest
+
+from db_manager import MIGRATIONS, DBManager
+
+START, END = "2024-01-01 10:00:00", "2024-03-01 12:00:00"
+
+
+def plan_for(db, kind, fabric_id, use_rollups):
+    """EXPLAIN QUERY PLAN of the get_range_totals query for kind, as one string."""
+    range_rows, params = db._range_rows_sql(kind, START, END, fabric_id, use_rollups)
+    query = f"SELECT fabric_id, SUM(quantity), SUM(value), SUM(cost) FROM ({range_rows}) GROUP BY fabric_id"
+    return "\n".join(db.explain_query_plan(query, params))
+
+
+def test_migrations_set_user_version(db):
+    with db.connections.reader() as cursor:
+        assert cursor.execute("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS)
+
+
+def test_run_migrations_is_idempotent(db):
+    db.run_migrations()
+    with db.connections.reader() as cursor:
+        assert cursor.execute("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS)
+
+
+@pytest.mark.parametrize("use_rollups", [False, True])
+@pytest.mark.parametrize("kind, fabric_id, index", [
+    ("sales", None, "idx_sales_date_fabric"),
+    ("sales", 1, "idx_sales_fabric_date"),
+    ("purchases", None, "idx_purchases_date_fabric"),
+    ("purchases", 1, "idx_purchases_fabric_date"),
+])
+def test_range_totals_use_covering_index(db, kind, fabric_id, index, use_rollups):
+    assert f"COVERING INDEX {index}" in plan_for(db, kind, fabric_id, use_rollups)
+
+
+def test_migrations_upgrade_a_baseline_database(tmp_path):
+    path = str(tmp_path / "old.db")
+    # The schema as it was before any migration
+    connection = sqlite3.connect(path)
+    connection.executescript("""
+        CREATE TABLE fabrics (fabric_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fabric_name TEXT UNIQUE NOT NULL, stock REAL NOT NULL DEFAULT 0);
+        CREATE TABLE purchases (purchase_id INTEGER PRIMARY KEY AUTOINCREMENT, fabric_id INTEGER,
+            quantity REAL NOT NULL, cost_price REAL NOT NULL, purchase_date TEXT NOT NULL);
+        CREATE TABLE sales (sale_id INTEGER PRIMARY KEY AUTOINCREMENT, fabric_id INTEGER,
+            quantity REAL NOT NULL, selling_price REAL NOT NULL, sale_date TEXT NOT NULL);
+        INSERT INTO fabrics (fabric_name, stock) VALUES ('Cotton', 10);
+        INSERT INTO purchases (fabric_id, quantity, cost_price, purchase_date) VALUES (1, 20, 5, '2024-01-02 09:00:00');
+        INSERT INTO sales (fabric_id, quantity, selling_price, sale_date) VALUES (1, 10, 8, '2024-01-03 09:00:00');
+    """)
+    connection.close()
+    db = DBManager(path)
+    try:
+        with db.connections.reader() as cursor:
+            assert cursor.execute("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS)
+        assert "COVERING INDEX idx_sales_date_fabric" in plan_for(db, "sales", None, False)
+        assert db.check_rollups() == []
+        assert db.check_lots() == []
+    finally:
+        db.close()
+
+
+def open_database(path, barrier, results):
+    """Run in a child process: open (and so migrate) the database once every process is ready."""
+    barrier.wait()
+    try:
+        DBManager(path).close()
+        results.put(None)
+    except Exception as error:
+        results.put(repr(error))
+
+
+def test_concurrent_processes_migrate_once(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    # The race is timing dependent, so try a few new databases
+    for trial in range(3):
+        path = str(tmp_path / f"new{trial}.db")
+        barrier, results = context.Barrier(6), context.Queue()
+        processes = [context.Process(target=open_database, args=(path, barrier, results)) for _ in range(6)]
+        for process in processes:
+            process.start()
+        errors = [results.get(timeout=60) for _ in processes]
+        for process in processes:
+            process.join()
+        assert errors == [None] * len(processes)
+        db = DBManager(path)
+        try:
+            with db.connections.reader() as cursor:
+                assert cursor.execute("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS)
+        finally:
+            db.close()
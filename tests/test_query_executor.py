@@ -0,0 +1,83 @@
+import logging
+import threading
+
+import pytest
+
+from query_executor import QueryExecutor
+
+
+class FakeRoot:
+    """Stands in for tk.Tk: after() callbacks are run by hand."""
+
+    def __init__(self):
+        self.callbacks = {}
+        self.next_id = 0
+
+    def after(self, ms, func):
+        self.next_id += 1
+        self.callbacks[self.next_id] = func
+        return self.next_id
+
+    def after_cancel(self, callback_id):
+        self.callbacks.pop(callback_id, None)
+
+    def run_until_idle(self, executor):
+        executor._pool.shutdown(wait=True)
+        while self.callbacks:
+            self.callbacks.pop(min(self.callbacks))()
+
+
+def fail():
+    raise RuntimeError("no such table")
+
+
+@pytest.fixture
+def root():
+    return FakeRoot()
+
+
+def test_result_goes_to_on_done(root):
+    executor = QueryExecutor(root)
+    results = []
+    executor.submit("summary", lambda: 42, on_done=results.append)
+    root.run_until_idle(executor)
+    assert results == [42]
+
+
+def test_error_goes_to_the_callers_on_error(root):
+    fallback = []
+    executor = QueryExecutor(root, on_error=lambda key, error: fallback.append(key))
+    errors = []
+    executor.submit("sales", fail, on_error=errors.append)
+    root.run_until_idle(executor)
+    assert [str(error) for error in errors] == ["no such table"]
+    assert fallback == []
+
+
+def test_error_without_on_error_goes_to_the_executor(root):
+    fallback = []
+    executor = QueryExecutor(root, on_error=lambda key, error: fallback.append((key, str(error))))
+    executor.submit("catalog", fail)
+    root.run_until_idle(executor)
+    assert fallback == [("catalog", "no such table")]
+
+
+def test_error_without_any_handler_is_logged(root, caplog, capsys):
+    executor = QueryExecutor(root)
+    with caplog.at_level(logging.ERROR, logger="query_executor"):
+        executor.submit("catalog", fail)
+        root.run_until_idle(executor)
+    assert "'catalog' failed" in caplog.text
+    assert "no such table" in caplog.text
+    assert capsys.readouterr().out == ""
+
+
+def test_stale_result_is_dropped(root):
+    executor = QueryExecutor(root)
+    release = threading.Event()
+    results = []
+    executor.submit("summary", lambda: release.wait(5) and "old", on_done=results.append)
+    executor.submit("summary", lambda: "new", on_done=results.append)
+    release.set()
+    root.run_until_idle(executor)
+    assert results == ["new"]
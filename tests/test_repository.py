@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+
+from db_manager import DBManager, InsufficientStock
+from repository import FabricRepository
+
+pytest.importorskip("flask")
+from werkzeug.serving import make_server
+
+from remote_repository import RemoteRepository
+from server import KeepAliveRequestHandler, create_app
+
+
+@pytest.fixture
+def remote(db):
+    """A RemoteRepository talking to server.py over db on a local port."""
+    server = make_server("127.0.0.1", 0, create_app(db), threaded=True, request_handler=KeepAliveRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    repo = RemoteRepository(f"http://127.0.0.1:{server.server_port}", follow=False)
+    yield repo
+    repo.close()
+    server.shutdown()
+
+
+@pytest.mark.parametrize("implementation", [DBManager, RemoteRepository])
+def test_implementations_are_complete(implementation):
+    assert not implementation.__abstractmethods__
+
+
+def test_missing_method_fails_at_instantiation():
+    class Partial(FabricRepository):
+        def add_fabric(self, fabric_name, stock):
+            pass
+
+    with pytest.raises(TypeError, match="abstract"):
+        Partial()
+
+
+def test_round_trip(db, remote):
+    remote.add_fabric("Cotton", 10)
+    remote.add_fabrics_bulk([("Linen", 0), ("Silk", 4)])
+    cotton, linen = remote.get_fabric_id("Cotton"), remote.get_fabric_id("Linen")
+    assert cotton == db.get_fabric_id("Cotton")
+    assert remote.get_fabric_name_by_id(linen) == "Linen"
+    assert remote.search_fabrics("co") == ["Cotton"]
+
+    remote.add_purchases_bulk([(linen, 20, 5.0, "2024-01-02 09:00:00")])
+    remote.add_sales_bulk([(linen, 6, 9.0, "2024-01-03 09:00:00"), (cotton, 2, 7.0, "2024-01-03 10:00:00")])
+    assert remote.get_fabric_stock("Linen") == db.get_fabric_stock("Linen") == 14
+    assert remote.get_fabric_stock_by_id(cotton) == 8
+    assert sorted(remote.get_all_fabrics_stock()) == sorted(map(tuple, db.get_all_fabrics_stock()))
+    assert remote.get_fabrics_stock_by_ids([linen]) == [tuple(row) for row in db.get_fabrics_stock_by_ids([linen])]
+    assert remote.get_purchase_cost(linen) == pytest.approx(5.0)
+
+    sale_id = remote.get_sales_data("2024-01-03", "2024-01-03 23:59:59")[-1][0]
+    assert remote.get_sale_by_id(sale_id) == tuple(db.get_sale_by_id(sale_id))
+    assert remote.update_sale_data(sale_id, 4, 9.5, "2024-01-03 09:00:00") == 1
+    assert db.get_fabric_stock("Linen") == 16
+    assert remote.get_sales_data("2024-01-01", "2024-01-31") == [tuple(row) for row in db.get_sales_data("2024-01-01", "2024-01-31")]
+    assert ([tuple(row) for row in remote.get_total_profit_loss("2024-01-01", "2024-01-31")]
+            == [tuple(row) for row in db.get_total_profit_loss("2024-01-01", "2024-01-31")])
+
+    assert remote.update_fabric_name(cotton, "Cotton Plain") == 1
+    assert db.get_fabric_name_by_id(cotton) == "Cotton Plain"
+    assert remote.get_fabric_id("Cotton Plain") == cotton
+
+
+def test_errors_round_trip(db, remote):
+    remote.add_fabric("Cotton", 1)
+    cotton = remote.get_fabric_id("Cotton")
+    with pytest.raises(InsufficientStock):
+        remote.add_sale(cotton, 5, 10.0)
+    with pytest.raises(ValueError):
+        remote.add_fabric("Cotton", 1)
+    assert remote.get_sale_by_id(12345) is None
+    assert db.get_fabric_stock("Cotton") == 1
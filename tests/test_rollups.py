@@ -0,0 +1,103 @@
+import pytest
+
+RANGES = [
+    # Partial first and last days around whole days
+    ("2024-01-02 12:00:00", "2024-01-05 08:00:00"),
+    ("2024-01-01", "2024-01-06"),
+    ("2024-01-01", "2024-01-06 23:59:59"),
+    # A single day, whole and partial
+    ("2024-01-03", "2024-01-03 23:59:59"),
+    ("2024-01-03 10:00:00", "2024-01-03 15:00:00"),
+    ("2024-01-03", "2024-01-03"),
+    # Nothing in range, and a range that ends before it starts
+    ("2025-01-01", "2025-01-31"),
+    ("2024-01-05", "2024-01-02"),
+]
+
+
+@pytest.fixture
+def fabrics(db):
+    db.add_fabrics_bulk([("Cotton", 0), ("Linen", 5), ("Silk", 0)])
+    return [db.get_fabric_id(name) for name in ("Cotton", "Linen", "Silk")]
+
+
+def record(db, fabrics):
+    """Purchases and sales spread over 2024-01-01..06 at several times of day."""
+    cotton, linen, silk = fabrics
+    db.add_purchases_bulk([
+        (cotton, 100, 4.0, "2024-01-01 09:00:00"),
+        (linen, 50, 7.5, "2024-01-01 23:59:59"),
+        (silk, 30, 12.0, "2024-01-02 00:00:00"),
+        (cotton, 40, 4.5, "2024-01-03 10:00:00"),
+        (silk, 10, 13.0, "2024-01-05 08:00:00"),
+    ])
+    db.add_sales_bulk([
+        (cotton, 10, 6.0, "2024-01-02 11:59:59"),
+        (cotton, 5, 6.5, "2024-01-02 12:00:00"),
+        (linen, 8, 10.0, "2024-01-03 00:00:00"),
+        (silk, 3, 20.0, "2024-01-03 12:30:00"),
+        (cotton, 7, 6.0, "2024-01-03 15:00:01"),
+        (linen, 4, 11.0, "2024-01-04 18:00:00"),
+        (silk, 2, 21.0, "2024-01-05 07:59:59"),
+        (cotton, 6, 6.2, "2024-01-05 08:00:00"),
+        (linen, 1, 12.0, "2024-01-06 23:59:59"),
+    ])
+
+
+def row_id(db, table, column, date):
+    with db.connections.reader() as cursor:
+        return cursor.execute(f"SELECT {column} FROM {table} WHERE {table[:-1]}_date = ?", (date,)).fetchone()[0]
+
+
+def edit_and_delete(db):
+    """Move rows across days and range edges, change amounts, and delete some."""
+    db.update_sale_data(row_id(db, "sales", "sale_id", "2024-01-02 11:59:59"), 12, 6.1, "2024-01-04 09:00:00")
+    db.update_sale_data(row_id(db, "sales", "sale_id", "2024-01-03 12:30:00"), 1, 19.0, "2024-01-03 12:30:00")
+    db.update_purchase_data(row_id(db, "purchases", "purchase_id", "2024-01-03 10:00:00"), 45, 4.4, "2024-01-02 12:00:00")
+    db.update_purchase_data(row_id(db, "purchases", "purchase_id", "2024-01-05 08:00:00"), 10, 13.5, "2024-01-06 01:00:00")
+    with db.connections.writer() as cursor:
+        cursor.execute("DELETE FROM sales WHERE sale_date = '2024-01-04 18:00:00'")
+        cursor.execute("DELETE FROM purchases WHERE purchase_date = '2024-01-01 23:59:59'")
+
+
+def assert_rows_equal(rollup_rows, raw_rows):
+    assert len(rollup_rows) == len(raw_rows)
+    for rollup_row, raw_row in zip(rollup_rows, raw_rows):
+        assert rollup_row == pytest.approx(raw_row)
+
+
+def assert_rollups_match(db, fabrics):
+    for start, end in RANGES:
+        for fabric_id in (None, *fabrics):
+            for kind in ("sales", "purchases"):
+                assert_rows_equal(db.get_range_totals(kind, start, end, fabric_id, use_rollups=True),
+                                  db.get_range_totals(kind, start, end, fabric_id, use_rollups=False))
+            assert_rows_equal([tuple(row) for row in db.get_total_profit_loss(start, end, fabric_id, use_rollups=True)],
+                              [tuple(row) for row in db.get_total_profit_loss(start, end, fabric_id, use_rollups=False)])
+
+
+def test_rollups_match_raw_after_inserts(db, fabrics):
+    record(db, fabrics)
+    assert_rollups_match(db, fabrics)
+
+
+def test_rollups_match_raw_after_edits_and_deletes(db, fabrics):
+    record(db, fabrics)
+    edit_and_delete(db)
+    assert_rollups_match(db, fabrics)
+    assert db.check_rollups() == []
+
+
+def test_empty_ranges_have_no_rows(db, fabrics):
+    record(db, fabrics)
+    for use_rollups in (True, False):
+        assert db.get_range_totals("sales", "2025-01-01", "2025-01-31", use_rollups=use_rollups) == []
+        assert db.get_total_profit_loss("2025-01-01", "2025-01-31", use_rollups=use_rollups) == []
+
+
+def test_partial_edges_are_counted_once(db, fabrics):
+    record(db, fabrics)
+    cotton = fabrics[0]
+    # 12:00:00 on the 2nd and 08:00:00 on the 5th are both inside the range
+    rows = db.get_range_totals("sales", "2024-01-02 12:00:00", "2024-01-05 08:00:00", cotton)
+    assert rows[0][1] == pytest.approx(5 + 7 + 6)
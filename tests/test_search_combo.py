@@ -0,0 +1,163 @@
+import pytest
+
+import search_algo
+from fake_tk import install_fakes, type_text
+
+NAMES = ["Cotton Plain", "Cotton Printed", "Cotton Silk", "Cotton Voile", "Corduroy",
+         "Linen White", "Linen Blue", "Silk Satin", "Printed Cotton Lawn"]
+
+
+@pytest.fixture
+def make_combo(db, monkeypatch):
+    """Build a SearchableComboBox on fake widgets over NAMES, counting the searches it runs."""
+    install_fakes(monkeypatch)
+    db.add_fabrics_bulk([(name, 0) for name in NAMES])
+    db.catalog.load()
+    searches = []
+    search_prefix, search_fabrics = db.catalog.search_prefix, db.search_fabrics
+    monkeypatch.setattr(db.catalog, "search_prefix",
+                        lambda *args, **kwargs: searches.append(("prefix", args)) or search_prefix(*args, **kwargs))
+    monkeypatch.setattr(db, "search_fabrics",
+                        lambda *args, **kwargs: searches.append((kwargs.get("mode"), args)) or search_fabrics(*args, **kwargs))
+
+    def make(mode="prefix"):
+        combo = search_algo.SearchableComboBox(None, db, 0, 0, mode=mode)
+        refilters = []
+        run_search = combo.run_search
+        combo.run_search = lambda typed_value: refilters.append(typed_value) or run_search(typed_value)
+        searches.clear()
+        return combo, refilters, searches
+    return make
+
+
+def press(combo, text):
+    """Type text without pausing: the debounce timer is not run."""
+    for char in text:
+        combo.entry.text += char
+        combo.on_entry_key(None)
+
+
+def settle(combo):
+    combo.entry.run_timers()
+    combo.listbox.run_timers()
+
+
+@pytest.mark.parametrize("mode", ["prefix", "substring", "fuzzy"])
+def test_burst_of_keys_refilters_once(make_combo, mode):
+    combo, refilters, searches = make_combo(mode)
+    press(combo, "cotton")
+    assert len(combo.entry.timers) == 1
+    settle(combo)
+    assert refilters == ["cotton"]
+    assert len(searches) == 1
+
+
+def test_repeated_key_release_does_not_reschedule(make_combo):
+    combo, refilters, _ = make_combo()
+    press(combo, "co")
+    combo.on_entry_key(None)
+    settle(combo)
+    assert refilters == ["co"]
+
+
+@pytest.mark.parametrize("mode, first, extended", [
+    ("prefix", "cot", "cotton s"),
+    ("substring", "cotton", "cotton p"),
+])
+def test_extending_query_narrows_shown_results(make_combo, mode, first, extended):
+    combo, _, searches = make_combo(mode)
+    type_text(combo, first)
+    assert combo.results_complete
+    shown = list(combo.shown_results)
+    searches.clear()
+
+    press(combo, extended[len(first):])
+    settle(combo)
+    assert searches == []
+    assert combo.shown_results == [option for option in shown if combo.matches(option, extended)]
+    assert combo.listbox.items == combo.shown_results
+
+
+def test_fuzzy_query_is_searched_again(make_combo):
+    combo, _, searches = make_combo("fuzzy")
+    type_text(combo, "cotton")
+    searches.clear()
+    press(combo, " s")
+    settle(combo)
+    assert [mode for mode, _ in searches] == ["fuzzy"]
+
+
+def test_new_fabric_stops_narrowing(make_combo, db):
+    combo, _, searches = make_combo()
+    type_text(combo, "cot")
+    db.add_fabric("Cotton Twill", 0)
+    searches.clear()
+    press(combo, "t")
+    settle(combo)
+    assert [mode for mode, _ in searches] == ["prefix"]
+    assert "Cotton Twill" in combo.listbox.items
+
+
+def test_narrowing_only_deletes_dropped_rows(make_combo):
+    combo, _, _ = make_combo()
+    type_text(combo, "co")
+    before = list(combo.listbox.items)
+    combo.listbox.log.clear()
+
+    press(combo, "tton p")
+    settle(combo)
+    assert all(op == "delete" for op, *_ in combo.listbox.log)
+    deleted = [row for _, first, last in combo.listbox.log for row in range(first, last + 1)]
+    # Rows are deleted from the end, so each index still refers to the original row
+    assert sorted(before[row] for row in deleted) == sorted(set(before) - set(combo.listbox.items))
+    assert combo.listbox.items == ["Cotton Plain", "Cotton Printed"]
+
+
+def test_unchanged_results_touch_no_rows(make_combo):
+    combo, _, _ = make_combo()
+    type_text(combo, "cotton s")
+    combo.listbox.log.clear()
+    press(combo, "il")
+    settle(combo)
+    assert combo.shown_query == "cotton sil"
+    assert combo.listbox.log == []
+
+
+def test_replacement_keeps_common_leading_rows(make_combo):
+    combo, _, _ = make_combo()
+    type_text(combo, "cotton p")
+    combo.listbox.log.clear()
+    # Backspacing to "cotton" adds rows after the two already shown
+    type_text(combo, "cotton")
+    assert combo.listbox.log == [("delete", 2, 1), ("insert", 2, 2)]
+    assert combo.listbox.items == ["Cotton Plain", "Cotton Printed", "Cotton Silk", "Cotton Voile"]
+
+
+def test_empty_entry_shows_every_fabric_a_page_at_a_time(make_combo, monkeypatch):
+    monkeypatch.setattr(search_algo.SearchableComboBox, "MAX_RESULTS", 2)
+    monkeypatch.setattr(search_algo.SearchableComboBox, "LISTBOX_PAGE", 4)
+    combo, _, _ = make_combo()
+    assert combo.shown_results == sorted(NAMES, key=str.casefold)
+    # Only the first page is in before the fill timer runs
+    assert combo.listbox.items == combo.shown_results[:4]
+    combo.listbox.run_timers()
+    assert combo.listbox.items == combo.shown_results
+    assert [count for op, _, count in combo.listbox.log if op == "insert"] == [4, 4, 1]
+
+
+def test_typed_prefix_is_capped(make_combo, monkeypatch):
+    monkeypatch.setattr(search_algo.SearchableComboBox, "MAX_RESULTS", 2)
+    combo, _, _ = make_combo()
+    settle(combo)
+    type_text(combo, "co")
+    assert combo.listbox.items == ["Corduroy", "Cotton Plain"]
+    assert not combo.results_complete
+
+
+def test_typing_stops_the_fill(make_combo, monkeypatch):
+    monkeypatch.setattr(search_algo.SearchableComboBox, "LISTBOX_PAGE", 2)
+    combo, _, _ = make_combo()
+    type_text(combo, "linen")
+    assert combo.listbox.items == ["Linen Blue", "Linen White"]
+    settle(combo)
+    assert combo.listbox.items == ["Linen Blue", "Linen White"]
@@ -0,0 +1,94 @@
+import multiprocessing
+import random
+
+import pytest
+
+from db_manager import DBManager, InsufficientStock, InvalidQuantity
+
+OPENING_STOCK = 60
+
+
+@pytest.fixture
+def cotton(db):
+    db.add_fabric("Cotton", 10)
+    return db.get_fabric_id("Cotton")
+
+
+@pytest.mark.parametrize("quantity", [0, -5, float("nan")])
+def test_sale_quantity_must_be_positive(db, cotton, quantity):
+    with pytest.raises(InvalidQuantity):
+        db.add_sale(cotton, quantity, 100)
+    assert db.get_fabric_stock_by_id(cotton) == 10
+    assert db.get_sales_data("0000", "9999") == []
+
+
+def test_one_bad_row_rolls_back_the_batch(db, cotton):
+    # The batch sums to a positive quantity, but one row would put stock back
+    with pytest.raises(InvalidQuantity):
+        db.add_sales_bulk([(cotton, 8, 100), (cotton, -5, 100)])
+    with pytest.raises(InvalidQuantity):
+        db.add_purchases_bulk([(cotton, 5, 50), (cotton, -20, 50)])
+    assert db.get_fabric_stock_by_id(cotton) == 10
+    assert db.check_stock() == []
+
+
+def test_edits_must_keep_a_positive_quantity(db, cotton):
+    db.add_purchase(cotton, 5, 50)
+    db.add_sale(cotton, 4, 100)
+    sale_id = db.get_sales_data("0000", "9999")[0][0]
+    purchase_id = db.get_purchase_data("0000", "9999")[0][0]
+    with pytest.raises(InvalidQuantity):
+        db.update_sale_data(sale_id, -4, 100, "2024-01-01 10:00:00")
+    with pytest.raises(InvalidQuantity):
+        db.update_purchase_data(purchase_id, 0, 50, "2024-01-01 09:00:00")
+    assert db.get_fabric_stock_by_id(cotton) == 11
+    assert db.check_stock() == []
+
+
+def sell(path, seed, barrier, results):
+    """Run in a child process: sell from fabric 1 until it runs out; reports (sales, quantity sold, errors)."""
+    rng = random.Random(seed)
+    db = DBManager(path, readers=1)
+    sales, sold, errors = 0, 0, []
+    barrier.wait()
+    try:
+        for _ in range(40):
+            quantity = rng.randint(1, 3)
+            try:
+                db.add_sale(1, quantity, 100)
+            except InsufficientStock:
+                continue
+            except Exception as error:
+                errors.append(repr(error))
+                continue
+            sales += 1
+            sold += quantity
+    finally:
+        db.close()
+        results.put((sales, sold, errors))
+
+
+def test_concurrent_sales_never_oversell(tmp_path):
+    path = str(tmp_path / "shared.db")
+    db = DBManager(path)
+    db.add_fabric("Cotton", OPENING_STOCK)
+    context = multiprocessing.get_context("spawn")
+    barrier, results = context.Barrier(4), context.Queue()
+    processes = [context.Process(target=sell, args=(path, seed, barrier, results)) for seed in range(4)]
+    for process in processes:
+        process.start()
+    reports = [results.get(timeout=120) for _ in processes]
+    for process in processes:
+        process.join()
+    try:
+        assert [errors for _, _, errors in reports] == [[]] * len(processes)
+        stock = db.get_fabric_stock_by_id(1)
+        sales = sum(count for count, _, _ in reports)
+        sold = sum(quantity for _, quantity, _ in reports)
+        assert stock >= 0
+        assert sold == OPENING_STOCK - stock
+        assert len(db.get_sales_data("0000", "9999")) == sales
+        assert db.check_stock() == []
+        assert db.check_lots() == []
+    finally:
+        db.close()
@@ -1,14 +1,34 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 from reports import Reports
 from search_algo import SearchableComboBox
+from query_executor import QueryExecutor
+from virtual_table import VirtualTable
+from db_manager import InsufficientStock, InvalidQuantity
+from profiler import Profiler
+from importer import KINDS, Importer
+from summary_view import SummaryView
 import  datetime
+import os
+import time
 class UIManager:
     def __init__(self, root, db_manager):
-        """Initialize the UIManager with the root Tkinter window and a DBManager instance."""
+        """
+        Initialize the UIManager with the root Tkinter window and a repository.
+
+        db_manager is any FabricRepository: a local DBManager, or a
+        RemoteRepository talking to server.py.
+        """
         self.root = root
         self.db_manager = db_manager
         self.reports = Reports(self,db_manager)
+        # Shared with the repository so the Diagnostics tab shows queries and refreshes together
+        self.profiler = db_manager.profiler or Profiler()
+        # Runs database queries off the Tk thread
+        self.query_executor = QueryExecutor(
+            root, on_error=lambda key, error: messagebox.showerror("Error", f"Could not load {key}: {error}"))
+        # What the Summary tab shows, updated per fabric after each write
+        self.summary_view = SummaryView(db_manager)
         # Setup UI elements
         self.setup_ui()
 
@@ -20,7 +40,14 @@ class UIManager:
 
         # Create a Notebook (tabbed interface)
         self.tab_control = ttk.Notebook(self.main_frame)
-        
+
+        # Only the Summary tab is built up front; the others are built the first
+        # time they are selected, keyed here by their frame's widget path
+        self.pending_tabs = {}
+        # Combo boxes on tabs that have not been built yet stay None
+        self.fabric_selector_SALES = None
+        self.fabric_selector_purchase = None
+
         # Create Summary tab
         self.tab_summary = ttk.Frame(self.tab_control)
         self.tab_control.add(self.tab_summary, text="Summary")
@@ -29,21 +56,53 @@ class UIManager:
         # Create Sales tab
         self.tab_sales = ttk.Frame(self.tab_control)
         self.tab_control.add(self.tab_sales, text="   Sales  ")
-        self.create_sales_tab()
+        self.pending_tabs[str(self.tab_sales)] = self.create_sales_tab
 
         # Create Purchase tab
         self.tab_purchase = ttk.Frame(self.tab_control)
         self.tab_control.add(self.tab_purchase, text="Purchase")
-        self.create_purchase_tab()
+        self.pending_tabs[str(self.tab_purchase)] = self.create_purchase_tab
 
         # Create Add Fabrics tab
         self.tab_add_fabric = ttk.Frame(self.tab_control)
         self.tab_control.add(self.tab_add_fabric, text="Add Fabrics")
-        self.create_add_fabric_tab()
+        self.pending_tabs[str(self.tab_add_fabric)] = self.create_add_fabric_tab
+
+        # Create Diagnostics tab
+        self.tab_diagnostics = ttk.Frame(self.tab_control)
+        self.tab_control.add(self.tab_diagnostics, text="Diagnostics")
+        self.pending_tabs[str(self.tab_diagnostics)] = self.create_diagnostics_tab
+
+        self.tab_control.bind("<<NotebookTabChanged>>", self.on_tab_changed)
 
         # Display tabs
         self.tab_control.pack(expand=1, fill="both")
 
+        # Load the fabric catalog off the Tk thread, so the window shows without waiting for it
+        if not self.db_manager.catalog.loaded:
+            self.query_executor.submit("catalog", self.db_manager.catalog.items,
+                                       on_done=lambda items: self.refresh_fabric_selectors(),
+                                       on_error=lambda error: messagebox.showerror("Error", f"Could not load the fabrics: {error}"))
+
+    def on_tab_changed(self, event):
+        """Build a tab the first time it is selected, and refresh the Diagnostics tab."""
+        tab = self.tab_control.select()
+        create_tab = self.pending_tabs.pop(tab, None)
+        if create_tab is not None:
+            create_tab()
+        if tab == str(self.tab_diagnostics):
+            self.refresh_diagnostics()
+
+    def fabric_selectors(self):
+        """The fabric combo boxes on the tabs built so far."""
+        return [selector for selector in (self.fabric_selector_summary, self.fabric_selector_SALES,
+                                          self.fabric_selector_purchase) if selector is not None]
+
+    def refresh_fabric_selectors(self):
+        """Redraw every fabric dropdown from the catalog."""
+        for selector in self.fabric_selectors():
+            selector.refresh_options()
+
     def create_summary_tab(self):
         """Create the summary tab that shows an overview of stock and profit/loss."""
         # Configure grid to center elements and distribute them equally
@@ -56,7 +115,7 @@ class UIManager:
         self.label_total_stock = tk.Label(self.tab_summary, text="Stock Information", font=("Arial", 14))
         self.label_total_stock.grid(row=0, column=0, padx=20, pady=10, sticky="e")
         
-        self.label_total_stock = tk.Button(self.tab_summary, text="download", font=("Arial", 14), command=self.reports.generate_stock_report)
+        self.label_total_stock = tk.Button(self.tab_summary, text="download", font=("Arial", 14), command=self.download_stock_report)
         self.label_total_stock.grid(row=0, column=1, padx=20, pady=10, sticky="e")
 
         self.label_stock_value = tk.Label(self.tab_summary, text="", font=("Arial", 14))
@@ -67,10 +126,10 @@ class UIManager:
         self.label_select_fabric.grid(row=1, column=0, padx=10, pady=10, sticky="e")
 
         # Searchable fabric selector instance
-        self.fabric_selector_summary = SearchableComboBox(self.tab_summary, self.db_manager,1,1,ALL=True)
+        self.fabric_selector_summary = SearchableComboBox(self.tab_summary, self.db_manager,1,1,ALL=True, mode="substring")
 
         # Create a table for displaying individual fabric stocks (when "All" is selected)
-        self.tree_fabric_stock = ttk.Treeview(self.tab_summary, columns=("Id","Fabric", "Stock","Cost price","Total cost","Edit"), show="headings", height=5)
+        self.tree_fabric_stock = VirtualTable(self.tab_summary, columns=("Id","Fabric", "Stock","Cost price","Total cost","Edit"), height=5, on_click=self.on_treeview_click)
         self.tree_fabric_stock.grid(row=2, column=0, columnspan=2, padx=10, pady=10, sticky="nsew")
 
         # Define the headings for the stock table
@@ -93,11 +152,14 @@ class UIManager:
         self.label_profit_loss = tk.Label(self.tab_summary, text="Profit/Loss Information", font=("Arial", 14))
         self.label_profit_loss.grid(row=3, column=0, padx=20, pady=10, sticky="e")
 
-        self.label_total_stock = tk.Button(self.tab_summary, text="download", font=("Arial", 14), command=self.reports.generate_profit_loss_report)
+        self.label_total_stock = tk.Button(self.tab_summary, text="download", font=("Arial", 14), command=self.download_profit_loss_report)
         self.label_total_stock.grid(row=3, column=1, padx=20, pady=10, sticky="e")
 
+        self.btn_analytics = tk.Button(self.tab_summary, text="analytics", font=("Arial", 14), command=self.show_analytics)
+        self.btn_analytics.grid(row=3, column=1, padx=20, pady=10, sticky="w")
+
         # Create a table for displaying profit/loss information
-        self.tree_profit_loss = ttk.Treeview(self.tab_summary, columns=("Id","Fabric","Units sold","Cost price","Selling price", "Revenue","Expenditure", "Profit/Loss"), show="headings", height=5)
+        self.tree_profit_loss = VirtualTable(self.tab_summary, columns=("Id","Fabric","Units sold","Cost price","Selling price", "Revenue","Expenditure", "Profit/Loss"), height=5)
         self.tree_profit_loss.grid(row=4, column=0, columnspan=3, padx=10, pady=10, sticky="nsew")
 
         # Define the headings for the profit/loss table
@@ -137,6 +199,9 @@ class UIManager:
         self.btn_refresh_summary = tk.Button(self.tab_summary, text="Refresh", command=self.update_summary)
         self.btn_refresh_summary.grid(row=7, column=0, columnspan=2, pady=20, sticky="nsew")
 
+        self.label_loading_summary = tk.Label(self.tab_summary, text="", fg="gray")
+        self.label_loading_summary.grid(row=8, column=0, columnspan=2)
+
         # Configure grid to stretch components when the window is resized
         self.tab_summary.grid_rowconfigure(2, weight=1)
         self.tab_summary.grid_rowconfigure(3, weight=1)
@@ -155,7 +220,7 @@ class UIManager:
         tk.Label(self.tab_sales, text="Select Fabric:", font=("Arial", 12)).grid(row=0, column=0, padx=10, pady=10, sticky="e")
 
         # Searchable fabric selector instance
-        self.fabric_selector_SALES = SearchableComboBox(self.tab_sales, self.db_manager,0,1)
+        self.fabric_selector_SALES = SearchableComboBox(self.tab_sales, self.db_manager,0,1, mode="substring")
 
 
         tk.Label(self.tab_sales, text="Quantity Sold:", font=("Arial", 12)).grid(row=1, column=0, padx=10, pady=10, sticky="e")
@@ -169,11 +234,11 @@ class UIManager:
         self.btn_add_sale = tk.Button(self.tab_sales, text="Add Sale", command=self.add_sale)
         self.btn_add_sale.grid(row=3, column=0, columnspan=2, pady=20)
 
-        self.label_total_stock = tk.Button(self.tab_sales, text="download", font=("Arial", 14), command=self.reports.generate_sales_report)
+        self.label_total_stock = tk.Button(self.tab_sales, text="download", font=("Arial", 14), command=self.download_sales_report)
         self.label_total_stock.grid(row=3, column=1, padx=20, pady=10, sticky="e")
 
         # Create a table for displaying sales information
-        self.sales_record_tree = ttk.Treeview(self.tab_sales, columns=("Date", "Fabric", "Quantity","Selling price", "Revenue", "Edit"), show="headings", height=5)
+        self.sales_record_tree = VirtualTable(self.tab_sales, columns=("Date", "Fabric", "Quantity","Selling price", "Revenue", "Edit"), height=5, on_click=self.on_sales_treeview_click)
         self.sales_record_tree.grid(row=4, column=0, columnspan=3, padx=10, pady=10, sticky="nsew")
 
         # Define the headings for the profit/loss table
@@ -200,6 +265,9 @@ class UIManager:
         self.btn_fetch_sales = tk.Button(self.tab_sales, text="fetch sales", command=self.fetch_sales)
         self.btn_fetch_sales.grid(row=7, column=0, columnspan=2, pady=20, sticky="nsew")
 
+        self.label_loading_sales = tk.Label(self.tab_sales, text="", fg="gray")
+        self.label_loading_sales.grid(row=8, column=0, columnspan=2)
+
         self.sales_record_tree.column("Date", anchor="center")
         self.sales_record_tree.column("Fabric", anchor="center")
         self.sales_record_tree.column("Quantity", anchor="center")
@@ -223,7 +291,7 @@ class UIManager:
         tk.Label(self.tab_purchase, text="Select Fabric:", font=("Arial", 12)).grid(row=0, column=0, padx=10, pady=10, sticky="e")
 
         # Searchable fabric selector instance
-        self.fabric_selector_purchase = SearchableComboBox(self.tab_purchase, self.db_manager,0,1)
+        self.fabric_selector_purchase = SearchableComboBox(self.tab_purchase, self.db_manager,0,1, mode="substring")
 
         tk.Label(self.tab_purchase, text="Quantity Purchased:", font=("Arial", 12)).grid(row=1, column=0, padx=10, pady=10, sticky="e")
         self.entry_quantity_purchase = tk.Entry(self.tab_purchase)
@@ -236,11 +304,11 @@ class UIManager:
         self.btn_add_purchase = tk.Button(self.tab_purchase, text="Add Purchase", command=self.add_purchase)
         self.btn_add_purchase.grid(row=3, column=0, columnspan=2, pady=20)
 
-        self.label_total_stock = tk.Button(self.tab_purchase, text="download", font=("Arial", 14), command=self.reports.generate_purchases_report)
+        self.label_total_stock = tk.Button(self.tab_purchase, text="download", font=("Arial", 14), command=self.download_purchases_report)
         self.label_total_stock.grid(row=3, column=1, padx=20, pady=10, sticky="e")
 
         # Create a table for displaying sales information
-        self.purchases_record_tree = ttk.Treeview(self.tab_purchase, columns=("Date", "Fabric", "Quantity","Cost price", "Expenditure","Edit"), show="headings", height=5)
+        self.purchases_record_tree = VirtualTable(self.tab_purchase, columns=("Date", "Fabric", "Quantity","Cost price", "Expenditure","Edit"), height=5, on_click=self.on_purchases_treeview_click)
         self.purchases_record_tree.grid(row=4, column=0, columnspan=3, padx=10, pady=10, sticky="nsew")
 
         # Define the headings for the profit/loss table
@@ -268,6 +336,9 @@ class UIManager:
         self.btn_fetch_purchases = tk.Button(self.tab_purchase, text="fetch purchases", command=self.fetch_purchases)
         self.btn_fetch_purchases.grid(row=7, column=0, columnspan=2, pady=20, sticky="nsew")
 
+        self.label_loading_purchases = tk.Label(self.tab_purchase, text="", fg="gray")
+        self.label_loading_purchases.grid(row=8, column=0, columnspan=2)
+
         self.purchases_record_tree.column("Date", anchor="center")
         self.purchases_record_tree.column("Fabric", anchor="center")
         self.purchases_record_tree.column("Quantity", anchor="center")
@@ -296,6 +367,55 @@ class UIManager:
         self.btn_add_fabric = tk.Button(self.tab_add_fabric, text="Add Fabric", command=self.add_fabric)
         self.btn_add_fabric.grid(row=2, column=0, columnspan=2, pady=20)
 
+        # Bulk import of fabrics, purchases or sales from a CSV or Excel file
+        tk.Label(self.tab_add_fabric, text="Import:", font=("Arial", 12)).grid(row=3, column=0, padx=10, pady=10, sticky="w")
+        self.var_import_kind = tk.StringVar(value=KINDS[0])
+        tk.OptionMenu(self.tab_add_fabric, self.var_import_kind, *KINDS).grid(row=3, column=1, padx=10, pady=10, sticky="w")
+        self.var_create_fabrics = tk.BooleanVar(value=False)
+        tk.Checkbutton(self.tab_add_fabric, text="Add missing fabrics", variable=self.var_create_fabrics).grid(row=4, column=1, padx=10, sticky="w")
+        tk.Button(self.tab_add_fabric, text="Import file...", command=self.import_file).grid(row=5, column=0, columnspan=2, pady=10)
+        self.label_import = tk.Label(self.tab_add_fabric, text="", fg="gray")
+        self.label_import.grid(row=6, column=0, columnspan=2)
+
+    def create_diagnostics_tab(self):
+        """Create the tab showing query and refresh latencies recorded by the profiler."""
+        self.var_profiling = tk.BooleanVar(value=self.profiler.enabled)
+        tk.Checkbutton(self.tab_diagnostics, text="Record timings", variable=self.var_profiling,
+                       command=self.toggle_profiling).grid(row=0, column=0, padx=10, pady=10, sticky="w")
+
+        tk.Label(self.tab_diagnostics, text="Slow query (ms):", font=("Arial", 12)).grid(row=0, column=1, padx=10, pady=10, sticky="e")
+        self.entry_slow_query_ms = tk.Entry(self.tab_diagnostics, width=8)
+        if self.profiler.slow_query_ms is not None:
+            self.entry_slow_query_ms.insert(0, f"{self.profiler.slow_query_ms:g}")
+        self.entry_slow_query_ms.grid(row=0, column=2, padx=10, pady=10, sticky="w")
+        tk.Button(self.tab_diagnostics, text="Apply", command=self.apply_slow_query_ms).grid(row=0, column=3, padx=10, pady=10)
+
+        # Operations, the most time spent first
+        self.diagnostics_tree = VirtualTable(self.tab_diagnostics, columns=("Operation", "Count", "p50 ms", "p95 ms", "p99 ms", "Max ms", "Rows", "Errors"), height=10)
+        self.diagnostics_tree.grid(row=1, column=0, columnspan=4, padx=10, pady=10, sticky="nsew")
+        for column in ("Operation", "Count", "p50 ms", "p95 ms", "p99 ms", "Max ms", "Rows", "Errors"):
+            self.diagnostics_tree.heading(column, text=column)
+            self.diagnostics_tree.column(column, anchor="w" if column == "Operation" else "e", width=420 if column == "Operation" else 70)
+
+        # Statements over the slow-query threshold, with their query plans
+        self.slow_query_tree = VirtualTable(self.tab_diagnostics, columns=("At", "ms", "Rows", "SQL", "Plan"), height=5)
+        self.slow_query_tree.grid(row=2, column=0, columnspan=4, padx=10, pady=10, sticky="nsew")
+        for column, width in (("At", 160), ("ms", 70), ("Rows", 60), ("SQL", 360), ("Plan", 300)):
+            self.slow_query_tree.heading(column, text=column)
+            self.slow_query_tree.column(column, anchor="w", width=width)
+
+        tk.Button(self.tab_diagnostics, text="Refresh", command=self.refresh_diagnostics).grid(row=3, column=0, padx=10, pady=10)
+        tk.Button(self.tab_diagnostics, text="Reset", command=self.reset_diagnostics).grid(row=3, column=1, padx=10, pady=10)
+        tk.Button(self.tab_diagnostics, text="Save", command=self.save_diagnostics).grid(row=3, column=2, padx=10, pady=10)
+
+        self.label_diagnostics = tk.Label(self.tab_diagnostics, text="", fg="gray")
+        self.label_diagnostics.grid(row=4, column=0, columnspan=4)
+
+        self.tab_diagnostics.grid_rowconfigure(1, weight=3)
+        self.tab_diagnostics.grid_rowconfigure(2, weight=1)
+        for column in range(4):
+            self.tab_diagnostics.grid_columnconfigure(column, weight=1)
+
     def add_fabric(self):
         """Add a new fabric to the database."""
         fabric_name = self.entry_fabric_name.get().strip()
@@ -310,13 +430,8 @@ class UIManager:
             print(response)
             if "success" in response:
                 messagebox.showinfo("Success", response["success"])
-                self.fabric_selector_summary.listbox.insert(tk.END,fabric_name)
-                self.fabric_selector_SALES.listbox.insert(tk.END,fabric_name)
-                self.fabric_selector_purchase.listbox.insert(tk.END,fabric_name)
-
-                self.fabric_selector_summary.options.append(fabric_name)
-                self.fabric_selector_SALES.options.append(fabric_name)
-                self.fabric_selector_purchase.options.append(fabric_name)
+                # The catalog already knows the new fabric; just redraw the dropdowns
+                self.refresh_fabric_selectors()
 
                 self.entry_fabric_name.delete(0, tk.END)
                 # self.entry_cost_price_add.delete(0, tk.END)
@@ -325,12 +440,34 @@ class UIManager:
         except ValueError:
             messagebox.showerror("Error", "Error while adding..")
 
+    def import_file(self):
+        """Import the fabrics, purchases or sales of a CSV or Excel file chosen by the user."""
+        kind = self.var_import_kind.get()
+        file_path = filedialog.askopenfilename(title=f"Import {kind}", filetypes=[
+            ("CSV or Excel", "*.csv *.csv.gz *.xlsx"), ("All files", "*.*")])
+        if not file_path:
+            return
+
+        def done(result):
+            message = f"{result['imported']} of {result['read']} rows imported in {result['seconds']:.1f} s."
+            if result["rejected"]:
+                message += f"\n{result['rejected']} rows were rejected; see {result['error_report']}"
+            messagebox.showinfo("Import", message)
+            # Imported fabrics are in the catalog already; just redraw the dropdowns
+            self.refresh_fabric_selectors()
+            if result["imported"]:
+                self.update_summary()
+
+        importer = Importer(self.db_manager)
+        create_fabrics = self.var_create_fabrics.get()
+        self.run_in_background("import", self.label_import,
+                               lambda: importer.import_file(kind, file_path, create_fabrics=create_fabrics),
+                               on_done=done, error_suffix="\nRows before the failing chunk were imported.")
+
     # ---- Helper Methods for Sales and Purchases ----
     def get_fabrics_list(self):
         """Get a list of fabrics from the database to populate the combo boxes."""
-        self.db_manager.cursor.execute("SELECT fabric_name FROM fabrics")
-        fabrics = self.db_manager.cursor.fetchall()
-        return [fabric[0] for fabric in fabrics]
+        return self.db_manager.get_fabrics_list()
 
     def add_sale(self):
         """Add a new sale to the database and update the stock."""
@@ -343,19 +480,20 @@ class UIManager:
                 selling_price = float(self.entry_selling_price.get())
                 try:
                     fabric_id = self.db_manager.get_fabric_id(fabric_name)
-                    avl_stock=self.db_manager.get_fabric_stock_by_id(fabric_id)
-                    if quantity <= avl_stock:
-                        if fabric_id is not None:
-                            self.db_manager.add_sale(fabric_id, quantity, selling_price)
-                            messagebox.showinfo("Success", "Sale recorded successfully!")
-                            self.fabric_selector_SALES.entry.delete(0,tk.END)
-                            self.entry_quantity_sales.delete(0,tk.END)
-                            self.entry_selling_price.delete(0,tk.END)
-                            self.update_summary()
-                        else:
-                            messagebox.showerror("Error", "Fabric not found.")
+                    if fabric_id is not None:
+                        # The stock check happens in the same transaction as the sale
+                        self.db_manager.add_sale(fabric_id, quantity, selling_price)
+                        messagebox.showinfo("Success", "Sale recorded successfully!")
+                        self.fabric_selector_SALES.entry.delete(0,tk.END)
+                        self.entry_quantity_sales.delete(0,tk.END)
+                        self.entry_selling_price.delete(0,tk.END)
+                        self.refresh_summary_fabric(fabric_id)
                     else:
-                        messagebox.showerror("Error", f"Not enough stock to complete the sale.\n available stock:{avl_stock}")
+                        messagebox.showerror("Error", "Fabric not found.")
+                except InsufficientStock as e:
+                    messagebox.showerror("Error", f"Not enough stock to complete the sale.\n available stock:{e.available}")
+                except InvalidQuantity:
+                    messagebox.showerror("Error", "Enter a valid quantity")
                 except Exception as e:
                     messagebox.showerror("Error", str(e)+"raised from here")
             except ValueError:
@@ -383,7 +521,7 @@ class UIManager:
                         self.fabric_selector_purchase.entry.delete(0, tk.END)
                         self.entry_quantity_purchase.delete(0,tk.END)
                         self.entry_cost_price.delete(0,tk.END)
-                        self.update_summary()
+                        self.refresh_summary_fabric(fabric_id)
                     else:
                         messagebox.showerror("Error", "Fabric not found.")
                 except Exception as e:
@@ -393,136 +531,232 @@ class UIManager:
         except ValueError:
             messagebox.showinfo("Error", "Enter a valid quantity")
 
+    # ---- Background Queries ----
+    def run_in_background(self, key, loading_label, func, *args, on_done, error_suffix=""):
+        """
+        Run a DBManager call on the query executor, showing a loading indicator until it finishes.
+
+        With the profiler enabled, the call is recorded as "ui.<key>.query", the
+        rendering of its result as "ui.<key>.render" and the whole refresh, from
+        the click to the last row drawn, as "ui.<key>".
+        """
+        loading_label.config(text="Loading...")
+        profiler = self.profiler
+        # Read once: the Diagnostics tab may switch profiling while the query runs
+        timing = profiler.enabled
+        if timing:
+            submitted = time.perf_counter()
+            func = profiler.timed(f"ui.{key}.query", func)
+            on_done = profiler.timed(f"ui.{key}.render", on_done)
+
+        def done(result):
+            loading_label.config(text="")
+            on_done(result)
+            if timing:
+                profiler.record(f"ui.{key}", time.perf_counter() - submitted)
+
+        def failed(error):
+            loading_label.config(text="")
+            if timing:
+                profiler.record(f"ui.{key}", time.perf_counter() - submitted, error=True)
+            messagebox.showerror("Error", str(error)+error_suffix)
+
+        self.query_executor.submit(key, func, *args, on_done=done, on_error=failed)
+
+    def export_report(self, key, loading_label, export, *args):
+        """Write a report on the query executor; the dates are read from the entries beforehand."""
+        def done(file_path):
+            # Reports made of several files return a list of paths
+            if isinstance(file_path, list):
+                file_path = file_path[0] if all(file_path) else None
+            loading_label.config(text=f"Saved {os.path.basename(file_path)}" if file_path else "Export failed")
+
+        self.run_in_background(key, loading_label, export, *args, on_done=done, error_suffix=" raised from export")
+
+    def download_stock_report(self):
+        self.export_report("stock_report", self.label_loading_summary, self.reports.generate_stock_report)
+
+    def download_profit_loss_report(self):
+        self.export_report("profit_loss_report", self.label_loading_summary, self.reports.generate_profit_loss_report,
+                           self.entry_start_date.get(), self.entry_end_date.get())
+
+    def download_sales_report(self):
+        self.export_report("sales_report", self.label_loading_sales, self.reports.generate_sales_report,
+                           self.entry_start_date_sales.get(), self.entry_end_date_sales.get())
+
+    def download_purchases_report(self):
+        self.export_report("purchases_report", self.label_loading_purchases, self.reports.generate_purchases_report,
+                           self.entry_start_date_purchase.get(), self.entry_end_date_purchase.get())
+
     # ---- Update Summary Tab ----
+    def summary_key(self):
+        """The (selected fabric, start date, end date) the Summary tab is set to show."""
+        return SummaryView.make_key(self.fabric_selector_summary.selected_option,
+                                    self.entry_start_date.get(), self.entry_end_date.get())
+
     def update_summary(self):
-        """Update the summary information (total stock, profit/loss)."""
+        """Reload the summary information (total stock, profit/loss) from scratch."""
+        self.run_in_background("summary", self.label_loading_summary, self.summary_view.fetch, self.summary_key(),
+                               on_done=self.render_summary, error_suffix="raised from summary")
+
+    def refresh_summary_fabric(self, fabric_id):
+        """
+        Bring the summary up to date after a write to one fabric.
+
+        Only that fabric's rows are read back and redrawn, unless the selection
+        or date range has changed since the last load, or a load is still
+        running, in which case the whole summary is reloaded.
+        """
+        key = self.summary_key()
+        if key != self.summary_view.key or self.query_executor.is_pending("summary"):
+            self.update_summary()
+            return
+        if not self.summary_view.covers(fabric_id):
+            return
+        # A newer request supersedes an older one still running, so ask for every fabric not read back yet
+        self.run_in_background("summary.fabrics", self.label_loading_summary, self.summary_view.fetch_fabrics,
+                               key, self.summary_view.mark(fabric_id), on_done=self.render_summary_fabrics,
+                               error_suffix="raised from summary")
+
+    @staticmethod
+    def stock_table_row(row):
+        fabric_id, fabric_name, stock, cost_price, total_cost = row
+        return (fabric_id, fabric_name, stock, cost_price, total_cost, "Edit")
+
+    @staticmethod
+    def profit_loss_table_row(pf):
+        if pf.fabric_id is None:
+            return ("Total", "", "", "", "", f"₹{pf.revenue:.2f}", f"₹{pf.cost:.2f}", f"₹{pf.profit:.2f}")
+        return (pf.fabric_id, pf.fabric_name, f"{pf.units_sold:.2f}", f"₹{pf.cost_price:.2f}",
+                f"₹{pf.selling_price:.2f}", f"₹{pf.revenue:.2f}", f"₹{pf.cost:.2f}", f"₹{pf.profit:.2f}")
+
+    def profit_loss_table_rows(self):
+        rows = self.summary_view.profit_loss_rows()
+        # The totals row is only shown once there is something to total
+        if rows and not (rows[-1].profit != 0 and rows[-1].revenue != 0):
+            rows = rows[:-1]
+        return [self.profit_loss_table_row(pf) for pf in rows]
+
+    def render_summary(self, result):
+        """Cache the result of SummaryView.fetch and redraw both summary tables."""
+        self.summary_view.replace(result)
+        stock_rows = [self.stock_table_row(row) for row in self.summary_view.stock_rows()]
+        self.tree_fabric_stock.set_rows(stock_rows, row_ids=[row[0] for row in stock_rows])
+        profit_loss_rows = self.profit_loss_table_rows()
+        self.tree_profit_loss.set_rows(profit_loss_rows, row_ids=[row[0] for row in profit_loss_rows])
+        self.render_stock_value()
+
+    def render_summary_fabrics(self, result):
+        """Apply the result of SummaryView.fetch_fabrics, redrawing only the rows it changed."""
+        view = self.summary_view
+        if not view.apply(result):
+            return
+        fabric_ids = [fabric_id for fabric_id, _, _ in result["changes"]]
+        stock_table = self.tree_fabric_stock
+        if not all(stock_table.update_row(fabric_id, self.stock_table_row(view.stock[fabric_id]))
+                   for fabric_id in fabric_ids if fabric_id in view.stock):
+            stock_rows = [self.stock_table_row(row) for row in view.stock_rows()]
+            stock_table.set_rows(stock_rows, row_ids=[row[0] for row in stock_rows])
+
+        profit_loss_rows = self.profit_loss_table_rows()
+        row_ids = [row[0] for row in profit_loss_rows]
+        table = self.tree_profit_loss
+        if row_ids != [table.row_id(index) for index in range(len(table))]:
+            # A fabric's first sale in the range, or its last one edited away
+            table.set_rows(profit_loss_rows, row_ids=row_ids)
+        else:
+            for fabric_id in fabric_ids:
+                if fabric_id in view.profit_loss:
+                    table.update_row(fabric_id, self.profit_loss_table_row(view.profit_loss[fabric_id]))
+            if row_ids and row_ids[-1] == "Total":
+                table.update_row("Total", profit_loss_rows[-1])
+        self.render_stock_value()
+
+    def render_stock_value(self):
+        view = self.summary_view
+        if view.key[0] == "All":
+            self.label_stock_value.config(text=f"total cost: ₹{view.total_cost:.2f}", fg="red")
+        elif view.stock:
+            fabric_stock = next(iter(view.stock.values()))[2]
+            self.label_stock_value.config(text=f"{fabric_stock} units total cost: ₹{view.total_cost:.2f}", fg="red")
+
+    def show_analytics(self):
+        """Compute margin, sell-through and turnover for the summary date range and show them in a popup."""
         start_date = self.entry_start_date.get()
         end_date = self.entry_end_date.get()
-        try:
-            selected_fabric = self.fabric_selector_summary.selected_option
-            if selected_fabric == "All":
-                # Show total stock of all fabrics
-                total_stock = self.db_manager.get_total_stock()
-                profit_loss = self.db_manager.get_total_profit_loss(start_date,end_date) if start_date !="" and end_date !="" else []
-
-                # Clear total stock label as individual fabric stocks will be shown
-                self.label_stock_value.config(text="")
-
-                # Clear the stock table before inserting new data
-                for row in self.tree_fabric_stock.get_children():
-                    self.tree_fabric_stock.delete(row)
-
-                # Insert stock data for all fabrics
-                all_fabrics_stock = self.db_manager.get_all_fabrics_stock()
-                all_total_cost=0
-                for fabric_id ,fabric_name, stock,cost_price, total_cost in all_fabrics_stock:
-                    self.tree_fabric_stock.insert("", "end", values=(fabric_id, fabric_name, stock,cost_price,total_cost,"Edit"))
-                    all_total_cost+=total_cost
-                self.tree_fabric_stock.bind("<Button-1>", self.on_treeview_click)
-                self.label_stock_value.config(text=f"total cost: ₹{all_total_cost:.2f}", fg="red")
-                if len(profit_loss)>0:
-                    # Clear the profit/loss table before inserting new data
-                    for row in self.tree_profit_loss.get_children():
-                        self.tree_profit_loss.delete(row)
-
-                    # Insert profit/loss data into the table
-                    total_revenue=0
-                    total_expenditure=0
-                    total_profit_loss=0
-                    for pf in profit_loss:
-                        total_revenue+=pf[4]
-                        total_expenditure+=pf[5]
-                        total_profit_loss+=pf[6]
-                        fabric_name = self.db_manager.get_fabric_name_by_id(pf[0])
-                        self.tree_profit_loss.insert("", "end", values=(pf[0],fabric_name,f'{pf[1]:.2f}', f"₹{pf[2]:.2f}", f"₹{pf[3]:.2f}", f"₹{pf[4]:.2f}", f"₹{pf[5]:.2f}", f"₹{pf[6]:.2f}"))
-                    if total_profit_loss!=0 and total_revenue!=0:
-                        self.tree_profit_loss.insert("", "end", values=("Total","","","","",f'₹{total_revenue:.2f}',f'₹{total_expenditure:.2f}', f"₹{total_profit_loss:.2f}"))
-            else:
-                # Get stock and profit/loss for the selected fabric
-                selected_fabric = self.fabric_selector_summary.selected_option
-                fabric_id = self.db_manager.get_fabric_id(selected_fabric)
-                fabric_stock = self.db_manager.get_fabric_stock(selected_fabric)
-                cost_price = self.db_manager.get_purchase_cost(fabric_id)
-                total_cost = cost_price*fabric_stock
-                profit_loss = self.db_manager.get_total_profit_loss(start_date,end_date) if start_date !="" and end_date !="" else []
-                self.label_stock_value.config(text=f"{fabric_stock} units total cost: ₹{total_cost:.2f}", fg="red")
-
-                # Clear the stock tables
-                for row in self.tree_fabric_stock.get_children():
-                    self.tree_fabric_stock.delete(row)
-                self.tree_fabric_stock.insert("", "end", values=(fabric_id,selected_fabric, fabric_stock, cost_price,total_cost, "Edit"))
-                self.tree_fabric_stock.bind("<Button-1>", self.on_treeview_click)
-
-                # Insert selected fabric's stock and profit/loss into the tables
-                if len(profit_loss)>0:
-                    # Clear the profit/loss table before inserting new data
-                    for row in self.tree_profit_loss.get_children():
-                        self.tree_profit_loss.delete(row)
-
-                    # Insert profit/loss data into the table
-                    total_revenue=0
-                    total_expenditure=0
-                    total_profit_loss=0
-                    for pf in profit_loss:
-                        total_revenue+=pf[4]
-                        total_expenditure+=pf[5]
-                        total_profit_loss+=pf[6]
-                        fabric_name = self.db_manager.get_fabric_name_by_id(pf[0])
-                        self.tree_profit_loss.insert("", "end", values=(pf[0],fabric_name,f'{pf[1]:.2f}', f"₹{pf[2]:.2f}", f"₹{pf[3]:.2f}", f"₹{pf[4]:.2f}", f"₹{pf[5]:.2f}", f"₹{pf[6]:.2f}"))
-                    if total_profit_loss!=0 and total_revenue!=0:
-                        self.tree_profit_loss.insert("", "end", values=("Total","","","","",f'₹{total_revenue:.2f}',f'₹{total_expenditure:.2f}', f"₹{total_profit_loss:.2f}"))
-
-        except Exception as e:
-            messagebox.showerror("Error", str(e)+"raised from summary")
-            
-    def on_treeview_click(self, event):
+        if start_date == "" or end_date == "":
+            messagebox.showerror("Error", "Enter a start and end date for the analytics")
+            return
+        selected_fabric = self.fabric_selector_summary.selected_option
+        fabric_id = None if selected_fabric in (None, "All") else self.db_manager.get_fabric_id(selected_fabric)
+        self.run_in_background("analytics", self.label_loading_summary, self.db_manager.analytics_summary,
+                               start_date, end_date, fabric_id,
+                               on_done=lambda summary: self.render_analytics(summary, start_date, end_date),
+                               error_suffix=" raised from analytics")
+
+    def render_analytics(self, summary, start_date, end_date):
+        def number(value, suffix=""):
+            return "-" if value != value else f"{value:.2f}{suffix}"  # NaN when undefined
+
+        popup = tk.Toplevel(self.tab_summary)
+        popup.title(f"Analytics {start_date} to {end_date}")
+        popup.geometry("900x420")
+
+        fabric_table = VirtualTable(popup, columns=self.reports.ANALYTICS_COLUMNS, height=6)
+        fabric_table.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
+        for column in self.reports.ANALYTICS_COLUMNS:
+            fabric_table.heading(column, text=column)
+            fabric_table.column(column, width=90, anchor="center")
+        fabric_table.set_rows([(row.fabric_id, row.fabric_name, number(row.units_sold), f"₹{row.revenue:.2f}",
+                                f"₹{row.cogs:.2f}", f"₹{row.profit:.2f}", number(row.margin_pct, "%"),
+                                number(row.units_purchased), f"₹{row.purchase_value:.2f}", number(row.stock),
+                                number(row.sell_through * 100, "%"), number(row.turnover))
+                               for row in summary["fabrics"]])
+
+        tk.Label(popup, text="Monthly totals", font=("Arial", 12)).grid(row=1, column=0, padx=10, sticky="w")
+        month_table = VirtualTable(popup, columns=self.reports.TIME_SERIES_COLUMNS, height=6)
+        month_table.grid(row=2, column=0, padx=10, pady=10, sticky="nsew")
+        for column in self.reports.TIME_SERIES_COLUMNS:
+            month_table.heading(column, text=column)
+            month_table.column(column, width=110, anchor="center")
+        month_table.set_rows([(row.period[:7], number(row.units_sold), f"₹{row.revenue:.2f}", f"₹{row.cogs:.2f}",
+                               f"₹{row.profit:.2f}", number(row.margin_pct, "%"), number(row.units_purchased),
+                               f"₹{row.purchase_value:.2f}")
+                              for row in summary["month"]])
+
+        tk.Button(popup, text="download", command=lambda: self.export_report(
+            "analytics_report", self.label_loading_summary, self.reports.generate_analytics_report,
+            start_date, end_date)).grid(row=3, column=0, pady=10)
+        popup.grid_columnconfigure(0, weight=1)
+        popup.grid_rowconfigure(0, weight=1)
+        popup.grid_rowconfigure(2, weight=1)
+
+    def on_treeview_click(self, fabric_id, column, values):
         """Handle the click event on the 'Edit' column."""
-        # Get the item under the cursor
-        item_id = self.tree_fabric_stock.identify_row(event.y)
-        column = self.tree_fabric_stock.identify_column(event.x)
-
-        # Check if the click is on the "Edit" column (adjust column index if needed)
-        if column == "#6" and item_id:  # "#4" corresponds to the fourth column (Edit)
-            # Extract fabric_id for the selected row and open the edit popup
-            fabric_id = self.tree_fabric_stock.item(item_id, "values")[0]  # Assuming 'fabric_id' is the first value
+        # Check if the click is on the "Edit" column
+        if column == "#6":
             self.open_edit_popup_fabric(fabric_id)
 
 
     def fetch_sales(self):
         start_date = self.entry_start_date_sales.get()
         end_date = self.entry_end_date_sales.get()
-        # print(start_date,end_date)
-        try:
-            # Fetch sales records from the database
-            sales_data = self.db_manager.get_sales_data(start_date,end_date)
-            # Clear the sales table before inserting new data
-            for row in self.sales_record_tree.get_children():
-                self.sales_record_tree.delete(row)
-            for sale in sales_data:
-                sale_id, sale_date, fabric, quantity, selling_price, revenue = sale
-                self.sales_record_tree.insert(
-                    "", "end", values=(sale_date, fabric, quantity, selling_price, revenue, "Edit"),
-                    tags=(sale_id,)
-                )
-                # Insert "Edit" button directly on row
-                self.sales_record_tree.tag_bind(sale_id, '<Button-1>', lambda e, id=sale_id: self.open_edit_popup_sales(id))
-
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-    def on_sales_treeview_click(self, event):
-        """Handle the click event on the 'Edit' column."""
-        # Get the item under the cursor
-        print("event has occured")
-        print(event)
-        item_id = self.tree_fabric_stock.identify_row(event.y)
-        column = self.tree_fabric_stock.identify_column(event.x)
-        print(item_id,column)
-
-        # Check if the click is on the "Edit" column (adjust column index if needed)
-        if column == "#6" and item_id:  # "#4" corresponds to the fourth column (Edit)
-            # Extract sale_id for the selected row and open the edit popup
-            row_tags = self.sales_record_tree.item(item_id, "tags")  
-            self.open_edit_popup_sales(row_tags[0])
+        # Fetch sales records from the database
+        self.run_in_background("sales", self.label_loading_sales, self.db_manager.get_sales_data,
+                               start_date, end_date, on_done=self.render_sales)
+
+    def render_sales(self, sales_data):
+        rows=[]
+        sale_ids=[]
+        for sale in sales_data:
+            sale_id, sale_date, fabric, quantity, selling_price, revenue = sale
+            rows.append((sale_date, fabric, quantity, selling_price, revenue, "Edit"))
+            sale_ids.append(sale_id)
+        self.sales_record_tree.set_rows(rows, row_ids=sale_ids)
+
+    def on_sales_treeview_click(self, sale_id, column, values):
+        """Open the edit popup for the clicked sale."""
+        self.open_edit_popup_sales(sale_id)
 
     def open_edit_popup_sales(self, sale_id):
         # Create pop-up window
@@ -560,42 +794,41 @@ class UIManager:
         btn_save.grid(row=3, column=0, columnspan=2, pady=10)
 
     def save_sale_edit(self, fabric_id, sale_id, quantity, selling_price, sale_date, prev_quan, popwin):
-        # Validate and update data in the database
-        res1=self.db_manager.update_sale_data(sale_id, quantity, selling_price, sale_date)
+        # Validate and update data in the database; the stock is adjusted in the same transaction
+        try:
+            res1=self.db_manager.update_sale_data(sale_id, quantity, selling_price, sale_date)
+        except InsufficientStock as e:
+            messagebox.showerror("Error", f"Not enough stock for this quantity.\n available stock:{e.available}")
+            return
         # Refresh the sales table view to reflect updates
-        quan= quantity-prev_quan
-        print(quan)
-        if quan>0:
-            res2= self.db_manager.update_stock(fabric_id, quan, "subtract")
-        if quan<0:
-            res2= self.db_manager.update_stock(fabric_id, abs(quan), "add")
-
         if res1:
             messagebox.showinfo("success","updated successfully")
             popwin.destroy()
         else:
             messagebox.showerror("error","error occured while updating")
         self.fetch_sales()
+        self.refresh_summary_fabric(fabric_id)
 
 
     def fetch_purchases(self):
         start_date = self.entry_start_date_purchase.get()
         end_date = self.entry_end_date_purchase.get()
-        try:
-                purchase_data = self.db_manager.get_purchase_data(start_date,end_date)
-                # Clear the purchases table before inserting new data
-                for row in self.purchases_record_tree.get_children():
-                    self.purchases_record_tree.delete(row)
-                for purchase in purchase_data :
-                    purchase_id, purchase_date, fabric_name, quantity, cost_price, expendicture = purchase
-                    self.purchases_record_tree.insert(
-                        "", "end", values=(purchase_date,fabric_name, quantity, cost_price, expendicture, "Edit"),
-                        tags=(purchase_id,)
-                    )
-                    # Insert "Edit" button directly on row
-                    self.purchases_record_tree.tag_bind(purchase_id, '<Button-1>', lambda e, id=purchase_id: self.open_edit_popup_purchases(id))
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+        self.run_in_background("purchases", self.label_loading_purchases, self.db_manager.get_purchase_data,
+                               start_date, end_date, on_done=self.render_purchases)
+
+    def render_purchases(self, purchase_data):
+        rows=[]
+        purchase_ids=[]
+        for purchase in purchase_data :
+            purchase_id, purchase_date, fabric_name, quantity, cost_price, expendicture = purchase
+            rows.append((purchase_date,fabric_name, quantity, cost_price, expendicture, "Edit"))
+            purchase_ids.append(purchase_id)
+        self.purchases_record_tree.set_rows(rows, row_ids=purchase_ids)
+
+    def on_purchases_treeview_click(self, purchase_id, column, values):
+        """Open the edit popup for the clicked purchase."""
+        self.open_edit_popup_purchases(purchase_id)
+
     def open_edit_popup_purchases(self, purchase_id):
         # Create pop-up window
         popup = tk.Toplevel(self.tab_purchase)
@@ -632,24 +865,22 @@ class UIManager:
 
     def save_purchase_edit(self, fabric_id, purchase_id, quantity, cost_price, purchase_date,prev_quan, popwin):
         
-        # Validate and update data in the database
-        res1=self.db_manager.update_purchase_data(purchase_id, quantity, cost_price, purchase_date)
-        #update stock
-        quan= quantity-prev_quan
-        if quan>0:
-            res2= self.db_manager.update_stock(fabric_id, quan, "add")
-        if quan<0:
-            res2= self.db_manager.update_stock(fabric_id, abs(quan), "subtract")
-
+        # Validate and update data in the database; the stock is adjusted in the same transaction
+        try:
+            res1=self.db_manager.update_purchase_data(purchase_id, quantity, cost_price, purchase_date)
+        except InsufficientStock as e:
+            messagebox.showerror("Error", f"The stock cannot go below zero.\n available stock:{e.available}")
+            return
 
         # Refresh the sales table view to reflect updates
-        if res1 and res2:
+        if res1:
             messagebox.showinfo("success","updated successfully")
             popwin.destroy()
             
         else:
             messagebox.showerror("error","error occured while updating")
         self.fetch_purchases()
+        self.refresh_summary_fabric(fabric_id)
 
     def open_edit_popup_fabric(self, fabric_id):
 
@@ -680,9 +911,48 @@ class UIManager:
             messagebox.showinfo("success","updated successfully")
             popwin.destroy()
             self.fabric_selector_summary.selected_option=fabric_name
-            self.fabric_selector_summary.update_listView(ALL=True)
-            self.fabric_selector_purchase.update_listView()
-            self.fabric_selector_SALES.update_listView()
+            for selector in self.fabric_selectors():
+                selector.update_listView(ALL=selector is self.fabric_selector_summary)
         else:
             messagebox.showerror("error","error occured while updating")
-        self.update_summary()
\ No newline at end of file
+        self.update_summary()
+
+    # ---- Diagnostics Tab ----
+    def toggle_profiling(self):
+        self.profiler.enabled = self.var_profiling.get()
+        self.refresh_diagnostics()
+
+    def apply_slow_query_ms(self):
+        text = self.entry_slow_query_ms.get().strip()
+        try:
+            self.profiler.slow_query_ms = float(text) if text else None
+        except ValueError:
+            messagebox.showerror("Error", "Enter the slow-query threshold in milliseconds, or leave it empty to turn it off")
+            return
+        self.refresh_diagnostics()
+
+    def refresh_diagnostics(self):
+        """Show the profiler's statistics; cheap enough to run on the Tk thread."""
+        operations = sorted(self.profiler.snapshot().items(), key=lambda item: item[1]["total_ms"], reverse=True)
+        self.diagnostics_tree.set_rows(
+            (operation, stats["count"], f"{stats['p50_ms']:.3f}", f"{stats['p95_ms']:.3f}", f"{stats['p99_ms']:.3f}",
+             f"{stats['max_ms']:.3f}", stats["rows"], stats["errors"]) for operation, stats in operations)
+        slow_queries = list(self.profiler.slow_queries)[::-1]
+        self.slow_query_tree.set_rows(
+            (entry["at"], f"{entry['ms']:.3f}", entry["rows"], entry["sql"], " | ".join(entry["plan"] or ()))
+            for entry in slow_queries)
+        state = "Recording" if self.profiler.enabled else "Not recording"
+        self.label_diagnostics.config(text=f"{state}: {len(operations)} operations, {len(slow_queries)} slow queries")
+
+    def reset_diagnostics(self):
+        self.profiler.reset()
+        self.refresh_diagnostics()
+
+    def save_diagnostics(self):
+        file_name = f"diagnostics_{datetime.datetime.now():%Y%m%d_%H%M%S}.json"
+        try:
+            path = self.profiler.save(os.path.join(self.reports.output_dir, file_name))
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not save the diagnostics: {e}")
+            return
+        self.label_diagnostics.config(text=f"Saved {os.path.basename(path)}")
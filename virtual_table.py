@@ -0,0 +1,181 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+class VirtualTable:
+    """
+    A ttk.Treeview that only materializes the rows currently on screen.
+
+    Rows are kept in a column-oriented buffer (one list per column) and a fixed
+    pool of Treeview items is reused to show the visible window plus a small
+    margin. Scrolling just rewrites the values of the pooled items, so showing
+    50k rows costs the same as showing 50. A single click handler on the whole
+    table reports the id of the row under the pointer.
+    """
+
+    def __init__(self, parent, columns, height=5, margin=5, on_click=None):
+        """
+        Parameters:
+        - parent (tk.Widget): Parent widget.
+        - columns (tuple): Column identifiers, as for ttk.Treeview.
+        - height (int): Number of visible rows.
+        - margin (int): Extra rows materialized below the visible window.
+        - on_click (callable, optional): Called as on_click(row_id, column, values)
+          when a row is clicked; column is the Treeview column id such as "#6".
+        """
+        self.frame = tk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, columns=columns, show="headings", height=height)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self.on_scrollbar)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.frame.grid_rowconfigure(0, weight=1)
+        self.frame.grid_columnconfigure(0, weight=1)
+
+        self.columns = tuple(columns)
+        self.on_click = on_click
+        self.margin = margin
+        self.visible_rows = height
+        self.offset = 0
+        self._data = [[] for _ in self.columns]
+        self._row_ids = []
+        self._positions = None
+        self._pool = []
+
+        self.tree.bind("<Button-1>", self._on_click)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        self.tree.bind("<Prior>", lambda e: self.scroll(-self.visible_rows))
+        self.tree.bind("<Next>", lambda e: self.scroll(self.visible_rows))
+        self.tree.bind("<Configure>", self._on_configure)
+
+    # ---- Treeview pass-through ----
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def heading(self, column, **kwargs):
+        return self.tree.heading(column, **kwargs)
+
+    def column(self, column, **kwargs):
+        return self.tree.column(column, **kwargs)
+
+    def bind(self, sequence, func):
+        return self.tree.bind(sequence, func)
+
+    def __getitem__(self, key):
+        return self.tree[key]
+
+    # ---- Data ----
+    def set_rows(self, rows, row_ids=None):
+        """
+        Replace the table contents.
+
+        Parameters:
+        - rows (iterable): Row tuples, one value per column.
+        - row_ids (iterable, optional): An id per row, passed to on_click.
+          Defaults to the row index.
+        """
+        rows = list(rows)
+        if rows:
+            self._data = [list(column) for column in zip(*rows)]
+        else:
+            self._data = [[] for _ in self.columns]
+        self._row_ids = list(row_ids) if row_ids is not None else list(range(len(rows)))
+        self._positions = None
+        self.offset = 0
+        self._render()
+
+    def update_row(self, row_id, values):
+        """
+        Replace the values of one row, keeping the scroll position.
+
+        Only the Treeview item showing the row, if it is on screen, is rewritten.
+
+        Returns:
+        - found (bool): False if no row has that id.
+        """
+        if self._positions is None:
+            self._positions = {row_id: index for index, row_id in enumerate(self._row_ids)}
+        index = self._positions.get(row_id)
+        if index is None:
+            return False
+        for column, value in zip(self._data, values):
+            column[index] = value
+        position = index - self.offset
+        if 0 <= position < len(self._pool):
+            self.tree.item(self._pool[position], values=tuple(values))
+        return True
+
+    def clear(self):
+        self.set_rows([])
+
+    def __len__(self):
+        return len(self._row_ids)
+
+    def row(self, index):
+        """Return the values of the row at index."""
+        return tuple(column[index] for column in self._data)
+
+    def row_id(self, index):
+        return self._row_ids[index]
+
+    def iter_rows(self):
+        """Yield every row in the buffer, including rows that are not on screen."""
+        return zip(*self._data)
+
+    # ---- Scrolling ----
+    def scroll(self, rows):
+        self.scroll_to(self.offset + rows)
+
+    def scroll_to(self, offset):
+        last = max(0, len(self) - self.visible_rows)
+        offset = min(max(0, int(offset)), last)
+        if offset != self.offset:
+            self.offset = offset
+            self._render()
+
+    def on_scrollbar(self, action, amount, unit=None):
+        """Handle the scrollbar's moveto/scroll commands."""
+        if action == "moveto":
+            self.scroll_to(float(amount) * len(self))
+        elif action == "scroll":
+            step = self.visible_rows if unit == "pages" else 1
+            self.scroll(int(amount) * step)
+
+    def _on_mousewheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+        return "break"
+
+    def _on_configure(self, event):
+        # Work out how many rows fit now that the widget has a real size
+        first = self.tree.bbox(self._pool[0]) if self._pool else None
+        if first:
+            row_height = first[3] or 20
+            visible = max(1, (event.height - first[1]) // row_height)
+            if visible != self.visible_rows:
+                self.visible_rows = visible
+                self.offset = min(self.offset, max(0, len(self) - visible))
+                self._render()
+
+    def _render(self):
+        """Write the visible window into the pooled Treeview items."""
+        wanted = min(len(self) - self.offset, self.visible_rows + self.margin)
+        while len(self._pool) < wanted:
+            self._pool.append(self.tree.insert("", "end"))
+        while len(self._pool) > wanted:
+            self.tree.delete(self._pool.pop())
+        for position, iid in enumerate(self._pool):
+            self.tree.item(iid, values=self.row(self.offset + position))
+        self.tree.selection_remove(self.tree.selection())
+        self.tree.yview_moveto(0)
+        if len(self):
+            self.scrollbar.set(self.offset / len(self), min(1.0, (self.offset + self.visible_rows) / len(self)))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _on_click(self, event):
+        iid = self.tree.identify_row(event.y)
+        if not iid or self.on_click is None:
+            return
+        index = self.offset + self._pool.index(iid)
+        self.on_click(self._row_ids[index], self.tree.identify_column(event.x), self.row(index))